@@ -36,6 +36,7 @@ CREATE TABLE IF NOT EXISTS Users (
     middle_name VARCHAR(50),
     last_name VARCHAR(50),
     password VARCHAR(255) NOT NULL,
+    INDEX idx_users_email (email),
     FOREIGN KEY (group_id) REFERENCES `Groups`(group_id) ON UPDATE CASCADE ON DELETE CASCADE
 );
 
@@ -75,6 +76,9 @@ CREATE TABLE IF NOT EXISTS Receipts (
     tag_id INT,
     category_id INT,
     category_source VARCHAR(20) DEFAULT NULL,
+    INDEX idx_receipts_user_category_date (user_id, category_id, date),
+    INDEX idx_receipts_user_date (user_id, date),
+    INDEX idx_receipts_date (date),
     FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
     FOREIGN KEY (store_id) REFERENCES Stores(store_id) ON UPDATE CASCADE ON DELETE CASCADE,
     FOREIGN KEY (tag_id) REFERENCES Tags(tag_id)  ON UPDATE CASCADE ON DELETE CASCADE,
@@ -99,8 +103,10 @@ CREATE TABLE IF NOT EXISTS Notifications (
     notification_date DATE NOT NULL,
     Message VARCHAR(255) NOT NULL,
     user_id INT NOT NULL,
-    budget_id INT NOT NULL,
-    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+    budget_id INT,
+    receipt_id INT,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (receipt_id) REFERENCES Receipts(receipt_id) ON UPDATE CASCADE ON DELETE CASCADE
 
 );
 -- Spending goals table
@@ -132,6 +138,116 @@ CREATE TABLE IF NOT EXISTS Budgets (
     FOREIGN KEY (user_id) REFERENCES Users( user_id) ON UPDATE CASCADE ON DELETE CASCADE
 );
 
+-- Materialized spend per budget, kept current by the receipt routes
+CREATE TABLE IF NOT EXISTS BudgetProgress (
+    budget_id INT PRIMARY KEY,
+    spent DECIMAL(12,2) NOT NULL DEFAULT 0,
+    last_receipt_id INT,
+    notified BOOLEAN NOT NULL DEFAULT FALSE,
+    FOREIGN KEY (budget_id) REFERENCES Budgets(budget_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Daily spend of receipts moved to cold storage by `flask archive run`,
+-- so budgets and goals keep counting them
+CREATE TABLE IF NOT EXISTS ArchivedSpend (
+    user_id INT NOT NULL,
+    category_id INT,
+    date DATE NOT NULL,
+    total_amount DECIMAL(12,2) NOT NULL,
+    receipts INT NOT NULL,
+    INDEX idx_archived_spend_user_category_date (user_id, category_id, date),
+    INDEX idx_archived_spend_user_date (user_id, date),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Recurring charges detected by `flask recurring scan`, one row per user and store
+CREATE TABLE IF NOT EXISTS RecurringCharges (
+    user_id INT NOT NULL,
+    store_id INT NOT NULL,
+    cadence VARCHAR(20) NOT NULL,
+    interval_days DECIMAL(6,1) NOT NULL,
+    typical_amount DECIMAL(10,2) NOT NULL,
+    monthly_cost DECIMAL(10,2) NOT NULL,
+    occurrences INT NOT NULL,
+    last_date DATE NOT NULL,
+    next_date DATE NOT NULL,
+    confidence DECIMAL(4,3) NOT NULL,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    PRIMARY KEY (user_id, store_id),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (store_id) REFERENCES Stores(store_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Each user's receipt count and newest receipt id at their last scan;
+-- users whose receipts no longer match are the ones rescanned
+CREATE TABLE IF NOT EXISTS RecurringScans (
+    user_id INT PRIMARY KEY,
+    receipt_count INT NOT NULL,
+    last_receipt_id INT NOT NULL,
+    scanned_at DATETIME NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Expected spend per user, category and day of the month, refitted by `flask forecast run`
+CREATE TABLE IF NOT EXISTS SpendCurves (
+    user_id INT NOT NULL,
+    category_id INT NOT NULL,
+    day SMALLINT NOT NULL,
+    expected_amount DECIMAL(12,4) NOT NULL,
+    PRIMARY KEY (user_id, category_id, day),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Median and MAD of log receipt amounts per user and category, for anomaly scoring
+CREATE TABLE IF NOT EXISTS SpendStats (
+    user_id INT NOT NULL,
+    category_id INT NOT NULL,
+    observations INT NOT NULL,
+    log_median DOUBLE NOT NULL,
+    log_mad DOUBLE NOT NULL,
+    PRIMARY KEY (user_id, category_id),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Line-item spend per user, normalized item name, store and day, for price history
+CREATE TABLE IF NOT EXISTS ItemPrices (
+    user_id INT NOT NULL,
+    item_key VARCHAR(100) NOT NULL,
+    store_id INT NOT NULL,
+    date DATE NOT NULL,
+    item_name VARCHAR(100) NOT NULL,
+    quantity INT NOT NULL,
+    spent DECIMAL(12,2) NOT NULL,
+    min_unit_cost DECIMAL(10,2) NOT NULL,
+    PRIMARY KEY (user_id, item_key, store_id, date),
+    INDEX idx_item_prices_store_date (user_id, store_id, date),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (store_id) REFERENCES Stores(store_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Per-user sequence counters for ChangeLog
+CREATE TABLE IF NOT EXISTS ChangeCursors (
+    user_id INT NOT NULL PRIMARY KEY,
+    last_seq BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Append-only log of receipt and budget changes per user, for the change feed
+CREATE TABLE IF NOT EXISTS ChangeLog (
+    user_id INT NOT NULL,
+    seq BIGINT NOT NULL,
+    entity VARCHAR(20) NOT NULL,
+    entity_id INT,
+    action VARCHAR(10) NOT NULL,
+    payload TEXT NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, seq),
+    INDEX idx_change_log_created (created_at),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
 -- Seed data generation for the database
 
 -- Groups for demo users
@@ -2401,4 +2517,16 @@ UPDATE Receipts SET total_amount = 215.00,
     date = STR_TO_DATE(CONCAT(YEAR(date), '-', MONTH(date), '-01'), '%Y-%m-%d')
 WHERE store_id = 71;
 
+-- Seed BudgetProgress from the receipts above
+INSERT INTO BudgetProgress (budget_id, spent, last_receipt_id, notified)
+SELECT b.budget_id,
+       COALESCE(SUM(r.total_amount), 0),
+       MAX(r.receipt_id),
+       COALESCE(SUM(r.total_amount), 0) >= COALESCE(b.notification_threshold, b.amount)
+FROM Budgets b
+LEFT JOIN Receipts r ON r.user_id = b.user_id
+    AND r.category_id = b.category_id
+    AND r.date BETWEEN b.start_date AND b.end_date
+GROUP BY b.budget_id, b.notification_threshold, b.amount;
+
 SET FOREIGN_KEY_CHECKS = 1;
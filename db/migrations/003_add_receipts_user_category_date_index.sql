@@ -0,0 +1 @@
+CREATE INDEX idx_receipts_user_category_date ON Receipts (user_id, category_id, date);
@@ -0,0 +1,20 @@
+-- Materialized spend per budget, kept current by the receipt routes
+CREATE TABLE IF NOT EXISTS BudgetProgress (
+    budget_id INT PRIMARY KEY,
+    spent DECIMAL(12,2) NOT NULL DEFAULT 0,
+    last_receipt_id INT,
+    notified BOOLEAN NOT NULL DEFAULT FALSE,
+    FOREIGN KEY (budget_id) REFERENCES Budgets(budget_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Backfill progress for existing budgets
+INSERT INTO BudgetProgress (budget_id, spent, last_receipt_id, notified)
+SELECT b.budget_id,
+       COALESCE(SUM(r.total_amount), 0),
+       MAX(r.receipt_id),
+       COALESCE(SUM(r.total_amount), 0) >= COALESCE(b.notification_threshold, b.amount)
+FROM Budgets b
+LEFT JOIN Receipts r ON r.user_id = b.user_id
+    AND r.category_id = b.category_id
+    AND r.date BETWEEN b.start_date AND b.end_date
+GROUP BY b.budget_id, b.notification_threshold, b.amount;
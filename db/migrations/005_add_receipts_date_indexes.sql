@@ -0,0 +1,2 @@
+CREATE INDEX idx_receipts_user_date ON Receipts (user_id, date);
+CREATE INDEX idx_receipts_date ON Receipts (date);
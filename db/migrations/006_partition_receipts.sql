@@ -0,0 +1,74 @@
+-- Range-partition Receipts by month so date-bounded queries only touch the
+-- partitions they need. MySQL cannot partition a table that has or is
+-- referenced by foreign keys, and every unique key must include the
+-- partitioning column, so the cascades move into the application
+-- (see purge_receipts) and the primary key becomes (receipt_id, date).
+-- Future months are added with `flask partitions create`.
+
+ALTER TABLE Transactions DROP FOREIGN KEY Transactions_ibfk_1;
+CREATE INDEX idx_transactions_receipt ON Transactions (receipt_id);
+
+ALTER TABLE Receipts
+    DROP FOREIGN KEY Receipts_ibfk_1,
+    DROP FOREIGN KEY Receipts_ibfk_2,
+    DROP FOREIGN KEY Receipts_ibfk_3,
+    DROP FOREIGN KEY Receipts_ibfk_4;
+
+ALTER TABLE Receipts
+    MODIFY receipt_id INT NOT NULL AUTO_INCREMENT,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (receipt_id, date);
+
+ALTER TABLE Receipts
+PARTITION BY RANGE (TO_DAYS(date)) (
+    PARTITION p_before VALUES LESS THAN (TO_DAYS('2023-01-01')),
+    PARTITION p202301 VALUES LESS THAN (TO_DAYS('2023-02-01')),
+    PARTITION p202302 VALUES LESS THAN (TO_DAYS('2023-03-01')),
+    PARTITION p202303 VALUES LESS THAN (TO_DAYS('2023-04-01')),
+    PARTITION p202304 VALUES LESS THAN (TO_DAYS('2023-05-01')),
+    PARTITION p202305 VALUES LESS THAN (TO_DAYS('2023-06-01')),
+    PARTITION p202306 VALUES LESS THAN (TO_DAYS('2023-07-01')),
+    PARTITION p202307 VALUES LESS THAN (TO_DAYS('2023-08-01')),
+    PARTITION p202308 VALUES LESS THAN (TO_DAYS('2023-09-01')),
+    PARTITION p202309 VALUES LESS THAN (TO_DAYS('2023-10-01')),
+    PARTITION p202310 VALUES LESS THAN (TO_DAYS('2023-11-01')),
+    PARTITION p202311 VALUES LESS THAN (TO_DAYS('2023-12-01')),
+    PARTITION p202312 VALUES LESS THAN (TO_DAYS('2024-01-01')),
+    PARTITION p202401 VALUES LESS THAN (TO_DAYS('2024-02-01')),
+    PARTITION p202402 VALUES LESS THAN (TO_DAYS('2024-03-01')),
+    PARTITION p202403 VALUES LESS THAN (TO_DAYS('2024-04-01')),
+    PARTITION p202404 VALUES LESS THAN (TO_DAYS('2024-05-01')),
+    PARTITION p202405 VALUES LESS THAN (TO_DAYS('2024-06-01')),
+    PARTITION p202406 VALUES LESS THAN (TO_DAYS('2024-07-01')),
+    PARTITION p202407 VALUES LESS THAN (TO_DAYS('2024-08-01')),
+    PARTITION p202408 VALUES LESS THAN (TO_DAYS('2024-09-01')),
+    PARTITION p202409 VALUES LESS THAN (TO_DAYS('2024-10-01')),
+    PARTITION p202410 VALUES LESS THAN (TO_DAYS('2024-11-01')),
+    PARTITION p202411 VALUES LESS THAN (TO_DAYS('2024-12-01')),
+    PARTITION p202412 VALUES LESS THAN (TO_DAYS('2025-01-01')),
+    PARTITION p202501 VALUES LESS THAN (TO_DAYS('2025-02-01')),
+    PARTITION p202502 VALUES LESS THAN (TO_DAYS('2025-03-01')),
+    PARTITION p202503 VALUES LESS THAN (TO_DAYS('2025-04-01')),
+    PARTITION p202504 VALUES LESS THAN (TO_DAYS('2025-05-01')),
+    PARTITION p202505 VALUES LESS THAN (TO_DAYS('2025-06-01')),
+    PARTITION p202506 VALUES LESS THAN (TO_DAYS('2025-07-01')),
+    PARTITION p202507 VALUES LESS THAN (TO_DAYS('2025-08-01')),
+    PARTITION p202508 VALUES LESS THAN (TO_DAYS('2025-09-01')),
+    PARTITION p202509 VALUES LESS THAN (TO_DAYS('2025-10-01')),
+    PARTITION p202510 VALUES LESS THAN (TO_DAYS('2025-11-01')),
+    PARTITION p202511 VALUES LESS THAN (TO_DAYS('2025-12-01')),
+    PARTITION p202512 VALUES LESS THAN (TO_DAYS('2026-01-01')),
+    PARTITION p202601 VALUES LESS THAN (TO_DAYS('2026-02-01')),
+    PARTITION p202602 VALUES LESS THAN (TO_DAYS('2026-03-01')),
+    PARTITION p202603 VALUES LESS THAN (TO_DAYS('2026-04-01')),
+    PARTITION p202604 VALUES LESS THAN (TO_DAYS('2026-05-01')),
+    PARTITION p202605 VALUES LESS THAN (TO_DAYS('2026-06-01')),
+    PARTITION p202606 VALUES LESS THAN (TO_DAYS('2026-07-01')),
+    PARTITION p202607 VALUES LESS THAN (TO_DAYS('2026-08-01')),
+    PARTITION p202608 VALUES LESS THAN (TO_DAYS('2026-09-01')),
+    PARTITION p202609 VALUES LESS THAN (TO_DAYS('2026-10-01')),
+    PARTITION p202610 VALUES LESS THAN (TO_DAYS('2026-11-01')),
+    PARTITION p202611 VALUES LESS THAN (TO_DAYS('2026-12-01')),
+    PARTITION p202612 VALUES LESS THAN (TO_DAYS('2027-01-01')),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
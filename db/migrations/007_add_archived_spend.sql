@@ -0,0 +1,11 @@
+-- Daily spend of receipts moved to cold storage by `flask archive run`,
+-- so budgets and goals keep counting them
+CREATE TABLE IF NOT EXISTS ArchivedSpend (
+    user_id INT NOT NULL,
+    category_id INT,
+    date DATE NOT NULL,
+    total_amount DECIMAL(12,2) NOT NULL,
+    receipts INT NOT NULL,
+    INDEX idx_archived_spend_user_category_date (user_id, category_id, date),
+    INDEX idx_archived_spend_user_date (user_id, date)
+);
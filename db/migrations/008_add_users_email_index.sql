@@ -0,0 +1,2 @@
+-- login looks users up by email
+CREATE INDEX idx_users_email ON Users (email);
@@ -0,0 +1,28 @@
+-- Recurring charges detected by `flask recurring scan` (and on demand by
+-- GET /purchases/subscriptions/<user_id>), one row per user and store
+CREATE TABLE IF NOT EXISTS RecurringCharges (
+    user_id INT NOT NULL,
+    store_id INT NOT NULL,
+    cadence VARCHAR(20) NOT NULL,
+    interval_days DECIMAL(6,1) NOT NULL,
+    typical_amount DECIMAL(10,2) NOT NULL,
+    monthly_cost DECIMAL(10,2) NOT NULL,
+    occurrences INT NOT NULL,
+    last_date DATE NOT NULL,
+    next_date DATE NOT NULL,
+    confidence DECIMAL(4,3) NOT NULL,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    PRIMARY KEY (user_id, store_id),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (store_id) REFERENCES Stores(store_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Each user's receipt count and newest receipt id at their last scan;
+-- users whose receipts no longer match are the ones rescanned
+CREATE TABLE IF NOT EXISTS RecurringScans (
+    user_id INT PRIMARY KEY,
+    receipt_count INT NOT NULL,
+    last_receipt_id INT NOT NULL,
+    scanned_at DATETIME NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
@@ -0,0 +1,12 @@
+-- Expected spend per user, category and day of the month, refitted nightly
+-- by `flask forecast run` and read by GET /management/forecast/<user_id>.
+-- Days with no expected spend have no row.
+CREATE TABLE IF NOT EXISTS SpendCurves (
+    user_id INT NOT NULL,
+    category_id INT NOT NULL,
+    day SMALLINT NOT NULL,
+    expected_amount DECIMAL(12,4) NOT NULL,
+    PRIMARY KEY (user_id, category_id, day),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
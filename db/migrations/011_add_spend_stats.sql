@@ -0,0 +1,17 @@
+-- Anomaly notifications point at a receipt instead of a budget
+ALTER TABLE Notifications
+    MODIFY budget_id INT NULL,
+    ADD COLUMN receipt_id INT NULL;
+
+-- Median and MAD of log receipt amounts per user and category, updated on
+-- every insert and rebuilt by `flask anomalies backfill`
+CREATE TABLE IF NOT EXISTS SpendStats (
+    user_id INT NOT NULL,
+    category_id INT NOT NULL,
+    observations INT NOT NULL,
+    log_median DOUBLE NOT NULL,
+    log_mad DOUBLE NOT NULL,
+    PRIMARY KEY (user_id, category_id),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
@@ -0,0 +1,16 @@
+-- Line-item prices per user, normalized item name, store and day, kept up
+-- to date on every line-item write and rebuilt by `flask prices rebuild`
+CREATE TABLE IF NOT EXISTS ItemPrices (
+    user_id INT NOT NULL,
+    item_key VARCHAR(100) NOT NULL,
+    store_id INT NOT NULL,
+    date DATE NOT NULL,
+    item_name VARCHAR(100) NOT NULL,
+    quantity INT NOT NULL,
+    spent DECIMAL(12,2) NOT NULL,
+    min_unit_cost DECIMAL(10,2) NOT NULL,
+    PRIMARY KEY (user_id, item_key, store_id, date),
+    INDEX idx_item_prices_store_date (user_id, store_id, date),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (store_id) REFERENCES Stores(store_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
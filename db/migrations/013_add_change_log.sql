@@ -0,0 +1,20 @@
+-- Append-only log of receipt and budget changes per user, read by the
+-- change feed; ChangeCursors hands out each user's next sequence number
+CREATE TABLE IF NOT EXISTS ChangeCursors (
+    user_id INT NOT NULL PRIMARY KEY,
+    last_seq BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ChangeLog (
+    user_id INT NOT NULL,
+    seq BIGINT NOT NULL,
+    entity VARCHAR(20) NOT NULL,
+    entity_id INT,
+    action VARCHAR(10) NOT NULL,
+    payload TEXT NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, seq),
+    INDEX idx_change_log_created (created_at),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
@@ -0,0 +1,7 @@
+-- Archived spend of deleted users kept counting in group totals; drop those
+-- rows and cascade future user deletes to ArchivedSpend
+DELETE FROM ArchivedSpend WHERE user_id NOT IN (SELECT user_id FROM Users);
+
+ALTER TABLE ArchivedSpend
+    ADD CONSTRAINT fk_archived_spend_user
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE;
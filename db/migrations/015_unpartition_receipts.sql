@@ -0,0 +1,29 @@
+-- Undo the monthly partitioning from 006: it cost Receipts and Transactions
+-- their foreign keys, leaving integrity to application-side deletes. Date
+-- bounded reads are served by idx_receipts_user_date instead.
+ALTER TABLE Receipts REMOVE PARTITIONING;
+
+ALTER TABLE Receipts
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (receipt_id);
+
+-- rows a missed application cascade left behind would block the constraints
+DELETE FROM Receipts WHERE user_id NOT IN (SELECT user_id FROM Users);
+DELETE FROM Receipts WHERE store_id NOT IN (SELECT store_id FROM Stores);
+DELETE FROM Receipts WHERE tag_id IS NOT NULL AND tag_id NOT IN (SELECT tag_id FROM Tags);
+DELETE FROM Receipts WHERE category_id IS NOT NULL AND category_id NOT IN (SELECT category_id FROM Categories);
+DELETE FROM Transactions WHERE receipt_id NOT IN (SELECT receipt_id FROM Receipts);
+DELETE FROM Notifications WHERE receipt_id IS NOT NULL AND receipt_id NOT IN (SELECT receipt_id FROM Receipts);
+
+ALTER TABLE Receipts
+    ADD FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    ADD FOREIGN KEY (store_id) REFERENCES Stores(store_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    ADD FOREIGN KEY (tag_id) REFERENCES Tags(tag_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    ADD FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON UPDATE CASCADE ON DELETE CASCADE;
+
+ALTER TABLE Transactions
+    ADD FOREIGN KEY (receipt_id) REFERENCES Receipts(receipt_id) ON UPDATE CASCADE ON DELETE CASCADE;
+
+-- anomaly alerts (011) point at a receipt and go with it
+ALTER TABLE Notifications
+    ADD FOREIGN KEY (receipt_id) REFERENCES Receipts(receipt_id) ON UPDATE CASCADE ON DELETE CASCADE;
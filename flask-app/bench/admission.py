@@ -0,0 +1,96 @@
+"""
+Cheap-route latency under an analytics spike, with and without admission control.
+
+    DB_BACKEND=sqlite DB_PATH=bench.db python -m bench.admission --spike 32 --output admission.json
+
+Starts --spike threads hammering the receipts summary (analytics cache off, so
+every call is real SQL) and, alongside them, one thread timing
+/descriptors/categories. Runs once with ADMISSION off and once on, and
+reports the cheap route's latency plus how many analytics calls were shed.
+"""
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from src import create_app, db
+
+
+def _run(admission, args, user_ids):
+    app = create_app()
+    app.config['ADMISSION'] = admission
+    app.config['ANALYTICS_CACHE_BYTES'] = 0
+    app.config['SINGLE_FLIGHT'] = False
+
+    stop = threading.Event()
+    statuses = []
+    lock = threading.Lock()
+
+    def spike(index):
+        client = app.test_client()
+        user_id = user_ids[index % len(user_ids)]
+        while not stop.is_set():
+            status = client.get(f'/purchases/receipts/{user_id}/summary?period=year').status_code
+            with lock:
+                statuses.append(status)
+
+    threads = [threading.Thread(target=spike, args=(i,)) for i in range(args.spike)]
+    for t in threads:
+        t.start()
+    time.sleep(0.5)
+
+    client = app.test_client()
+    latencies = []
+    for _ in range(args.requests):
+        started = time.perf_counter()
+        client.get('/descriptors/categories')
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    stop.set()
+    for t in threads:
+        t.join()
+
+    ms = np.array(latencies)
+    return {
+        'cheap_p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'cheap_p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'cheap_p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'analytics_ok': sum(1 for s in statuses if s < 400),
+        'analytics_shed': sum(1 for s in statuses if s in (429, 503)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spike', type=int, default=32, help='concurrent summary callers')
+    parser.add_argument('--requests', type=int, default=200, help='timed cheap requests')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        cursor = db.get_db().cursor()
+        cursor.execute('SELECT DISTINCT user_id FROM Receipts ORDER BY user_id LIMIT 50')
+        user_ids = [row[0] for row in cursor.fetchall()]
+    if not user_ids:
+        raise SystemExit('No receipts found, run python -m bench.generate first.')
+
+    results = {'spike': args.spike}
+    for label, enabled in (('off', False), ('on', True)):
+        results[label] = _run(enabled, args, user_ids)
+
+    print(f'{"admission":10s} {"p50 ms":>9s} {"p95 ms":>9s} {"p99 ms":>9s} {"summaries":>10s} {"shed":>6s}')
+    for label in ('off', 'on'):
+        r = results[label]
+        print(f'{label:10s} {r["cheap_p50_ms"]:9.2f} {r["cheap_p95_ms"]:9.2f} {r["cheap_p99_ms"]:9.2f} '
+              f'{r["analytics_ok"]:10d} {r["analytics_shed"]:6d}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
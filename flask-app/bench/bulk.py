@@ -0,0 +1,90 @@
+"""
+Per-item vs bulk receipt entry benchmark.
+
+    python -m bench.bulk --sizes 5 20 40 100 --repeat 20 --output bulk.json
+
+For each receipt size, times entering one receipt the old way (POST the
+receipt, then one POST per line item, each with its own commit) against a
+single POST /purchases/receipts/<user_id>/with-items. Runs in-process
+against the database the app is configured for, under a scratch user that
+is deleted afterwards.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import date
+
+from src import create_app, db
+
+
+def _items(count):
+    return [{'unit_cost': 1.25 + i % 7, 'quantity': 1 + i % 3, 'item_name': f'Bench Item {i}'}
+            for i in range(count)]
+
+
+def _per_item(client, user_id, items):
+    response = client.post(f'/purchases/receipts/{user_id}', json={
+        'date': date.today().isoformat(), 'total_amount': 42.0, 'store_name': 'Harbor Market 7'
+    })
+    receipt_id = response.get_json()['receipt_id']
+    for item in items:
+        client.post(f'/purchases/transactions/{receipt_id}', json=item)
+    return 1 + len(items)
+
+
+def _bulk(client, user_id, items):
+    client.post(f'/purchases/receipts/{user_id}/with-items', json={
+        'date': date.today().isoformat(), 'total_amount': 42.0, 'store_name': 'Harbor Market 7',
+        'items': items,
+    })
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 20, 40, 100])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        cursor = db.get_db().cursor()
+        cursor.execute(
+            'INSERT INTO Users (email, first_name, last_name, password) VALUES (%s, %s, %s, %s)',
+            ('bulk-bench@bench.example', 'Bulk', 'Bench', 'x')
+        )
+        user_id = cursor.lastrowid
+        db.get_db().commit()
+
+    results = {}
+    try:
+        for size in args.sizes:
+            items = _items(size)
+            row = {}
+            for name, enter in (('per_item', _per_item), ('bulk', _bulk)):
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    requests = enter(client, user_id, items)
+                    timings.append((time.perf_counter() - started) * 1000)
+                row[name] = {'requests': requests, 'median_ms': round(statistics.median(timings), 3)}
+            results[size] = row
+    finally:
+        client.delete(f'/users/{user_id}')
+
+    print(f'{"items":>6s} {"per-item reqs":>14s} {"per-item ms":>12s} {"bulk reqs":>10s} {"bulk ms":>9s} {"speedup":>8s}')
+    for size, row in results.items():
+        per_item, bulk = row['per_item'], row['bulk']
+        print(f'{size:6d} {per_item["requests"]:14d} {per_item["median_ms"]:12.2f} '
+              f'{bulk["requests"]:10d} {bulk["median_ms"]:9.2f} {per_item["median_ms"] / bulk["median_ms"]:7.1f}x')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
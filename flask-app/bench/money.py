@@ -0,0 +1,146 @@
+"""
+Decimal vs integer-cents aggregation micro-benchmark.
+
+    python -m bench.money --rows 1000000 --output money.json
+
+Builds a seeded set of receipt amounts and category ids, then times the same
+rollups (grand total, per-category totals, per-day totals) three ways:
+Decimal objects in Python, int cents in Python, and int64 cents in NumPy.
+Every path is checked to produce the same cents before timing is reported.
+"""
+import argparse
+import json
+import random
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from src.money import cents_array, from_cents
+
+
+def _timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+def _decimal_paths(amounts, categories, days):
+    def total():
+        return sum(amounts, Decimal(0))
+
+    def by_category():
+        totals = {}
+        for category, amount in zip(categories, amounts):
+            totals[category] = totals.get(category, Decimal(0)) + amount
+        return totals
+
+    def by_day():
+        totals = {}
+        for day, amount in zip(days, amounts):
+            totals[day] = totals.get(day, Decimal(0)) + amount
+        return totals
+
+    return total, by_category, by_day
+
+
+def _int_paths(cents, categories, days):
+    def total():
+        return sum(cents)
+
+    def by_category():
+        totals = {}
+        for category, amount in zip(categories, cents):
+            totals[category] = totals.get(category, 0) + amount
+        return totals
+
+    def by_day():
+        totals = {}
+        for day, amount in zip(days, cents):
+            totals[day] = totals.get(day, 0) + amount
+        return totals
+
+    return total, by_category, by_day
+
+
+def _numpy_paths(cents, categories, days):
+    def total():
+        return int(cents.sum())
+
+    def by_category():
+        return _grouped(categories, cents)
+
+    def by_day():
+        return _grouped(days, cents)
+
+    return total, by_category, by_day
+
+
+def _grouped(keys, cents):
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    sums = np.zeros(len(uniq), dtype=np.int64)
+    np.add.at(sums, inverse, cents)
+    return dict(zip(uniq.tolist(), sums.tolist()))
+
+
+def _as_cents(result):
+    if isinstance(result, dict):
+        return {k: _as_cents(v) for k, v in result.items()}
+    if isinstance(result, Decimal):
+        return int(result.scaleb(2))
+    return int(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    amounts = [from_cents(rng.randint(50, 25_000)) for _ in range(args.rows)]
+    category_list = [rng.randint(1, 7) for _ in range(args.rows)]
+    day_list = [rng.randint(0, 3 * 365) for _ in range(args.rows)]
+
+    _, convert_ms = _timed(lambda: cents_array(amounts), 1)
+    cents = cents_array(amounts)
+    cents_list = cents.tolist()
+
+    paths = {
+        'decimal': _decimal_paths(amounts, category_list, day_list),
+        'int': _int_paths(cents_list, category_list, day_list),
+        'numpy': _numpy_paths(cents, np.array(category_list), np.array(day_list)),
+    }
+
+    results = {'rows': args.rows, 'convert_ms': round(convert_ms, 3), 'rollups': {}}
+    for index, rollup in enumerate(('total', 'by_category', 'by_day')):
+        timings, expected = {}, None
+        for name, fns in paths.items():
+            value, ms = _timed(fns[index], args.repeat)
+            value = _as_cents(value)
+            if expected is None:
+                expected = value
+            elif value != expected:
+                raise SystemExit(f'{name} {rollup} disagrees with decimal')
+            timings[name] = round(ms, 3)
+        results['rollups'][rollup] = timings
+
+    print(f'{args.rows} rows, Decimal -> cents conversion {results["convert_ms"]:.1f} ms')
+    print(f'{"rollup":12s} {"decimal ms":>12s} {"int ms":>10s} {"numpy ms":>10s} {"speedup":>9s}')
+    for rollup, t in results['rollups'].items():
+        print(f'{rollup:12s} {t["decimal"]:12.2f} {t["int"]:10.2f} {t["numpy"]:10.2f} '
+              f'{t["decimal"] / t["numpy"]:8.1f}x')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,498 @@
+"""
+Repeatable load benchmark over every blueprint route.
+
+    python -m bench.run --output bench_results.json
+    python -m bench.run --writes --concurrency 8 --requests 500 --output after.json --compare before.json
+
+Requests go through the Flask test client in-process against the database the
+app is configured for (DB_* env vars), so numbers reflect handler + SQL time
+without network noise. Pass --url to hit a running server over HTTP instead
+(read routes only). Results hold p50/p95/p99 latency and throughput per route.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+from datetime import date, datetime
+
+import numpy as np
+
+from src import create_app, db
+from src.purchases.receipts import compute_date_range
+
+Scenario = namedtuple('Scenario', 'name endpoint method build writes heavy needs')
+
+
+def scenario(name, endpoint, method, build, writes=False, heavy=False, needs=None):
+    """needs names a context list the scenario is skipped without, e.g. 'groups'."""
+    return Scenario(name, endpoint, method, build, writes, heavy, needs)
+
+
+def _pick(ctx, key):
+    return ctx['rng'].choice(ctx[key])
+
+
+def _pop(ctx, key):
+    with ctx['lock']:
+        return ctx[key].pop() if ctx[key] else None
+
+
+def _period(ctx):
+    return ctx['rng'].choice(['week', 'month', 'year']), ctx['rng'].randint(-12, 0)
+
+
+def _summary(ctx):
+    period, offset = _period(ctx)
+    return f'/purchases/receipts/{_pick(ctx, "users")}/summary?period={period}&offset={offset}', None
+
+
+def _drilldown(ctx):
+    start, end = compute_date_range(*_period(ctx))
+    return (f'/purchases/receipts/{_pick(ctx, "users")}?start_date={start}&end_date={end}'
+            f'&category=Food%20%26%20Drink&page=1&per_page=20', None)
+
+
+def _top_merchants(ctx):
+    period, offset = _period(ctx)
+    return f'/purchases/receipts/{_pick(ctx, "users")}/top-merchants?period={period}&offset={offset}&limit=5', None
+
+
+def _receipt_payload(ctx):
+    return {
+        'date': date.today().isoformat(),
+        'total_amount': round(ctx['rng'].uniform(3, 120), 2),
+        'store_name': ctx['rng'].choice(['Trader Joe', 'Starbucks', 'CVS', 'Harbor Market 7']),
+    }
+
+
+def _statement(ctx, rows=200):
+    lines = [f'{date.today().isoformat()},{ctx["rng"].choice(["Trader Joe", "Starbucks", "CVS"])} #{i % 9},'
+             f'-{ctx["rng"].uniform(3, 120):.2f}' for i in range(rows)]
+    return ('Date,Description,Amount\n' + '\n'.join(lines) + '\n').encode()
+
+
+def _line_items(ctx, count=20):
+    return [{'unit_cost': round(ctx['rng'].uniform(0.5, 12), 2), 'quantity': ctx['rng'].randint(1, 3),
+             'item_name': f'Bench Item {i}'} for i in range(count)]
+
+
+SCENARIOS = [
+    scenario('welcome', 'welcome', 'GET', lambda c: ('/', None)),
+    scenario('metrics', 'metrics', 'GET', lambda c: ('/metrics', None)),
+    scenario('categories', 'descriptors.get_all_categories', 'GET', lambda c: ('/descriptors/categories', None)),
+    scenario('category', 'descriptors.get_category', 'GET',
+             lambda c: (f'/descriptors/categories/{_pick(c, "categories")}', None)),
+    scenario('tags', 'descriptors.get_all_tags', 'GET', lambda c: (f'/descriptors/tags/{_pick(c, "users")}', None)),
+    scenario('receipts_page', 'purchases.get_user_receipts', 'GET',
+             lambda c: (f'/purchases/receipts/{_pick(c, "users")}?page=1&per_page=20', None)),
+    scenario('receipts_search', 'purchases.get_user_receipts', 'GET',
+             lambda c: (f'/purchases/receipts/{_pick(c, "users")}?search=trader&page=1&per_page=20', None)),
+    scenario('receipts_drilldown', 'purchases.get_user_receipts', 'GET', _drilldown),
+    scenario('summary', 'purchases.get_user_receipt_summary', 'GET', _summary),
+    scenario('dashboard', 'users.get_dashboard', 'GET',
+             lambda c: (f'/users/{_pick(c, "users")}/dashboard?period={_period(c)[0]}&offset={_period(c)[1]}', None)),
+    scenario('top_merchants', 'purchases.get_top_merchants', 'GET', _top_merchants),
+    scenario('forecast', 'management.get_spend_forecast', 'GET',
+             lambda c: (f'/management/forecast/{_pick(c, "users")}', None)),
+    scenario('subscriptions', 'purchases.get_subscriptions', 'GET',
+             lambda c: (f'/purchases/subscriptions/{_pick(c, "users")}', None)),
+    scenario('item_search', 'purchases.search_items', 'GET',
+             lambda c: (f'/purchases/items/search/{_pick(c, "users")}?q=oat+milk', None)),
+    scenario('item_prices', 'purchases.get_item_prices', 'GET',
+             lambda c: (f'/purchases/items/prices/{_pick(c, "users")}?item=oat+milk', None)),
+    scenario('cheapest_items', 'purchases.get_cheapest_stores', 'GET',
+             lambda c: (f'/purchases/items/cheapest/{_pick(c, "users")}', None)),
+    scenario('changes', 'users.get_changes', 'GET',
+             lambda c: (f'/users/{_pick(c, "users")}/changes?after=0', None)),
+    scenario('changes_stream', 'users.stream_changes', 'GET',
+             lambda c: (f'/users/{_pick(c, "users")}/changes/stream?after=0', None)),
+    scenario('receipts_by_store', 'purchases.get_receipts_by_store', 'GET',
+             lambda c: (f'/purchases/receipts/{_pick(c, "users")}/store/{_pick(c, "stores")}', None)),
+    scenario('export', 'purchases.export_receipts', 'GET',
+             lambda c: (f'/purchases/receipts/{_pick(c, "users")}/export', None), heavy=True),
+    scenario('receipt', 'purchases.get_receipt', 'GET',
+             lambda c: (f'/purchases/receipts/detail/{_pick(c, "receipts")}', None)),
+    scenario('transactions', 'purchases.get_transactions', 'GET',
+             lambda c: (f'/purchases/transactions/{_pick(c, "receipts")}', None)),
+    scenario('transaction', 'purchases.get_transaction', 'GET',
+             lambda c: (f'/purchases/transactions/detail/{_pick(c, "transactions")}', None)),
+    scenario('stores', 'purchases.get_stores', 'GET', lambda c: ('/purchases/stores', None)),
+    scenario('store_search', 'purchases.search_stores', 'GET', lambda c: ('/purchases/stores/search?q=tra', None)),
+    scenario('store', 'purchases.get_store', 'GET', lambda c: (f'/purchases/stores/{_pick(c, "stores")}', None)),
+    scenario('spending_goals', 'management.get_spending_goals', 'GET',
+             lambda c: (f'/management/spending-goals/{_pick(c, "users")}', None)),
+    scenario('spending_goal', 'management.get_spending_goal', 'GET',
+             lambda c: (f'/management/spending-goals/goal/{_pick(c, "goals")}', None)),
+    scenario('budgets_by_category', 'management.get_budget_of_category', 'GET',
+             lambda c: (f'/management/budgets/{_pick(c, "categories")}', None), heavy=True),
+    scenario('user_budgets', 'management.get_all_budgets_from_user', 'GET',
+             lambda c: (f'/management/budgets/user/{_pick(c, "users")}', None)),
+    scenario('budget_alerts', 'management.get_budget_alerts', 'GET',
+             lambda c: (f'/management/budgets/alerts/{_pick(c, "users")}', None)),
+    scenario('notifications', 'management.get_all_notifications_from_user', 'GET',
+             lambda c: (f'/management/budgets/notifications/{_pick(c, "users")}', None)),
+    scenario('users', 'users.get_users', 'GET', lambda c: ('/users', None), heavy=True),
+    scenario('user', 'users.get_user', 'GET', lambda c: (f'/users/{_pick(c, "users")}', None)),
+    scenario('group_members', 'users.get_users_from_group', 'GET',
+             lambda c: (f'/users/group-members/{_pick(c, "groups")}', None), needs='groups'),
+    scenario('group_summary', 'users.get_group_summary', 'GET',
+             lambda c: (f'/users/group/{_pick(c, "groups")}/summary?period={_period(c)[0]}', None),
+             needs='groups'),
+    scenario('group_top_merchants', 'users.get_group_top_merchants', 'GET',
+             lambda c: (f'/users/group/{_pick(c, "groups")}/top-merchants?period={_period(c)[0]}', None),
+             needs='groups'),
+    scenario('group_budgets', 'users.get_group_budgets', 'GET',
+             lambda c: (f'/users/group/{_pick(c, "groups")}/budgets?active=true', None), needs='groups'),
+    scenario('login', 'users.login', 'POST',
+             lambda c: ('/users/login', {'email': c['login_email'], 'password': c['login_password']}),
+             heavy=True),
+    scenario('me', 'users.get_me', 'GET', lambda c: ('/users/me', None)),
+
+    scenario('create_receipt', 'purchases.create_receipt', 'POST',
+             lambda c: (f'/purchases/receipts/{c["scratch_user"]}', _receipt_payload(c)), writes=True),
+    scenario('update_receipt', 'purchases.update_receipt', 'PUT',
+             lambda c: (f'/purchases/receipts/{_pick(c, "scratch_receipts")}',
+                        {'total_amount': round(c['rng'].uniform(3, 120), 2)}), writes=True),
+    scenario('delete_receipt', 'purchases.delete_receipt', 'DELETE',
+             lambda c: (f'/purchases/receipts/{_pop(c, "scratch_receipts")}', None), writes=True),
+    scenario('create_transaction', 'purchases.create_transaction', 'POST',
+             lambda c: (f'/purchases/transactions/{c["scratch_receipt"]}',
+                        {'unit_cost': 3.49, 'quantity': 1, 'item_name': 'Oat Milk'}), writes=True),
+    scenario('create_receipt_with_items', 'purchases.create_receipt_with_items', 'POST',
+             lambda c: (f'/purchases/receipts/{c["scratch_user"]}/with-items',
+                        {**_receipt_payload(c), 'items': _line_items(c)}), writes=True),
+    scenario('create_transactions_bulk', 'purchases.create_transactions_bulk', 'POST',
+             lambda c: (f'/purchases/transactions/{c["scratch_receipt"]}/bulk',
+                        {'items': _line_items(c)}), writes=True),
+    scenario('import_statement', 'purchases.import_statement', 'POST',
+             lambda c: (f'/purchases/receipts/{c["scratch_user"]}/import', _statement(c)), writes=True),
+    scenario('delete_transaction', 'purchases.delete_transaction', 'DELETE',
+             lambda c: (f'/purchases/transactions/{_pop(c, "scratch_transactions")}', None), writes=True),
+    scenario('create_store', 'purchases.create_store', 'POST',
+             lambda c: ('/purchases/stores', {'store_name': 'Bench Scratch Store', 'zip_code': '02139',
+                                              'street_address': '1 Bench St', 'city': 'Cambridge',
+                                              'state': 'MA'}), writes=True),
+    scenario('update_store', 'purchases.update_store', 'PUT',
+             lambda c: (f'/purchases/stores/{_pick(c, "scratch_stores")}',
+                        {'store_name': 'Bench Scratch Store', 'zip_code': '02139',
+                         'street_address': '2 Bench St', 'city': 'Cambridge', 'state': 'MA'}), writes=True),
+    scenario('delete_store', 'purchases.delete_store', 'DELETE',
+             lambda c: (f'/purchases/stores/{_pop(c, "scratch_stores")}', None), writes=True),
+    scenario('create_tag', 'descriptors.create_tag', 'POST',
+             lambda c: (f'/descriptors/tags/{c["scratch_user"]}', {'tag_name': 'bench'}), writes=True),
+    scenario('update_tag', 'descriptors.update_tag', 'PUT',
+             lambda c: (f'/descriptors/tags/{_pick(c, "scratch_tags")}', {'tag_name': 'bench-renamed'}),
+             writes=True),
+    scenario('delete_tag', 'descriptors.delete_tag', 'DELETE',
+             lambda c: (f'/descriptors/tags/{_pop(c, "scratch_tags")}', None), writes=True),
+    scenario('create_goal', 'management.create_spending_goal', 'POST',
+             lambda c: (f'/management/spending-goals/{c["scratch_user"]}',
+                        {'current_amount': 0, 'target_amount': 400, 'month': 'March'}), writes=True),
+    scenario('update_goal', 'management.update_spending_goal', 'PUT',
+             lambda c: (f'/management/spending-goals/{_pick(c, "scratch_goals")}',
+                        {'current_amount': 0, 'target_amount': 450, 'month': 'March'}), writes=True),
+    scenario('delete_goal', 'management.delete_spending_goal', 'DELETE',
+             lambda c: (f'/management/spending-goals/{_pop(c, "scratch_goals")}', None), writes=True),
+    scenario('create_budget', 'management.create_budget', 'POST',
+             lambda c: (f'/management/budgets/{_pick(c, "categories")}',
+                        {'amount': 300, 'start_date': date.today().replace(day=1).isoformat(),
+                         'end_date': date.today().isoformat(), 'user_id': c['scratch_user']}), writes=True),
+    scenario('update_budget', 'management.update_budget', 'PUT',
+             lambda c: (f'/management/budgets/{_pick(c, "scratch_budgets")}',
+                        {'amount': 320, 'start_date': date.today().replace(day=1).isoformat(),
+                         'end_date': date.today().isoformat(), 'notification_threshold': 250}), writes=True),
+    scenario('delete_budget', 'management.delete_budget', 'DELETE',
+             lambda c: (f'/management/budgets/{_pop(c, "scratch_budgets")}', None), writes=True),
+    scenario('create_user', 'users.create_user', 'POST',
+             lambda c: ('/users', {'email': f'scratch{c["rng"].random()}@bench.example', 'first_name': 'Scratch',
+                                   'last_name': 'User', 'password': 'scratch'}), writes=True, heavy=True),
+    scenario('update_user', 'users.update_user', 'PUT',
+             lambda c: (f'/users/{_pick(c, "scratch_users")}',
+                        {'group_id': None, 'email': 'scratch@bench.example', 'first_name': 'Scratch',
+                         'last_name': 'User', 'password': 'scratch'}), writes=True, heavy=True),
+    scenario('delete_user', 'users.delete_user', 'DELETE',
+             lambda c: (f'/users/{_pop(c, "scratch_users")}', None), writes=True),
+    scenario('create_group', 'users.create_group', 'POST',
+             lambda c: (f'/users/group/{c["scratch_user"]}', {'group_name': 'Bench'}), writes=True),
+    scenario('update_group', 'users.update_group', 'PUT',
+             lambda c: (f'/users/group/{_pick(c, "groups")}',
+                        {'group_name': 'Bench', 'admin_user_id': c['scratch_user']}),
+             writes=True, needs='groups'),
+    scenario('retrain', 'purchases.retrain_categorizer', 'POST',
+             lambda c: ('/purchases/receipts/retrain', None), writes=True, heavy=True),
+]
+
+
+def _ids(cursor, query, params=()):
+    cursor.execute(query, params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def load_context(app, args):
+    """Sample ids from the database so every request targets real rows."""
+    with app.app_context():
+        cursor = db.get_db().cursor()
+        ctx = {
+            'rng': random.Random(args.seed),
+            'lock': threading.Lock(),
+            'users': _ids(cursor, 'SELECT DISTINCT user_id FROM Receipts ORDER BY user_id LIMIT 500'),
+            'receipts': _ids(cursor, 'SELECT receipt_id FROM Receipts ORDER BY receipt_id DESC LIMIT 2000'),
+            'transactions': _ids(cursor, 'SELECT transaction_id FROM Transactions ORDER BY transaction_id DESC LIMIT 2000'),
+            'stores': _ids(cursor, 'SELECT store_id FROM Stores LIMIT 2000'),
+            'categories': _ids(cursor, 'SELECT category_id FROM Categories'),
+            'goals': _ids(cursor, 'SELECT goal_id FROM Spending_goals LIMIT 2000'),
+            'groups': _ids(cursor, 'SELECT group_id FROM `Groups` LIMIT 500'),
+        }
+
+        cursor.execute("SELECT email FROM Users WHERE email LIKE 'bench%%@bench.example' LIMIT 1")
+        row = cursor.fetchone()
+        ctx['login_email'], ctx['login_password'] = (
+            (row[0], 'bench_password') if row else ('sophia@example.com', 'sophia_password')
+        )
+        from src.users.sessions import issue_token
+        with app.test_request_context():
+            ctx['session_token'] = issue_token({'user_id': ctx['users'][0] if ctx['users'] else 1})
+        if args.writes:
+            ctx.update(prepare_scratch(cursor, args.requests + args.warmup + 1))
+            db.get_db().commit()
+    return ctx
+
+
+def prepare_scratch(cursor, count):
+    """Rows owned by a throwaway user so write scenarios leave real data alone."""
+    today = date.today().isoformat()
+    cursor.execute(
+        "INSERT INTO Users (email, first_name, last_name, password) VALUES (%s, %s, %s, %s)",
+        ('scratch-owner@bench.example', 'Scratch', 'Owner', 'x')
+    )
+    owner = cursor.lastrowid
+    scratch = {'scratch_user': owner}
+
+    def fill(key, query, params):
+        ids = []
+        for _ in range(count):
+            cursor.execute(query, params)
+            ids.append(cursor.lastrowid)
+        scratch[key] = ids
+
+    fill('scratch_stores', 'INSERT INTO Stores (store_name, zip_code, street_address, city, state) '
+                           'VALUES (%s, %s, %s, %s, %s)', ('Bench Scratch Store', '02139', '1 Bench St', 'Cambridge', 'MA'))
+    store_id = scratch['scratch_stores'][0]
+    fill('scratch_receipts', 'INSERT INTO Receipts (date, total_amount, user_id, store_id) VALUES (%s, %s, %s, %s)',
+         (today, 10, owner, store_id))
+    fill('scratch_transactions', 'INSERT INTO Transactions (unit_cost, quantity, receipt_id, item_name) '
+                                 'VALUES (%s, %s, %s, %s)', (1, 1, scratch['scratch_receipts'][0], 'Scratch'))
+    fill('scratch_tags', 'INSERT INTO Tags (tag_name, user_id) VALUES (%s, %s)', ('bench', owner))
+    fill('scratch_goals', 'INSERT INTO Spending_goals (current_amount, target_amount, Month, user_id) '
+                          'VALUES (%s, %s, %s, %s)', (0, 400, 'March', owner))
+    fill('scratch_budgets', 'INSERT INTO Budgets (amount, start_date, end_date, user_id) VALUES (%s, %s, %s, %s)',
+         (300, today, today, owner))
+    fill('scratch_users', 'INSERT INTO Users (email, first_name, last_name, password) VALUES (%s, %s, %s, %s)',
+         ('scratch@bench.example', 'Scratch', 'User', 'x'))
+    # keep the first scratch store and receipt alive for rows that reference them
+    scratch['scratch_stores'] = scratch['scratch_stores'][1:]
+    scratch['scratch_receipt'] = scratch['scratch_receipts'].pop(0)
+    return scratch
+
+
+def _headers(token):
+    headers = {'Accept-Encoding': 'gzip'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    if os.environ.get('METRICS_TOKEN'):
+        headers['X-Metrics-Token'] = os.environ['METRICS_TOKEN']
+    return headers
+
+
+class InProcessClient:
+    def __init__(self, app, token=None):
+        self.client = app.test_client()
+        self.headers = _headers(token)
+
+    def request(self, method, path, body):
+        if isinstance(body, bytes):
+            response = self.client.open(path, method=method, data=body, headers=self.headers,
+                                        content_type='text/csv')
+        else:
+            response = self.client.open(path, method=method, json=body, headers=self.headers)
+        return response.status_code
+
+
+class HttpClient:
+    def __init__(self, base_url, token=None):
+        self.base_url = base_url.rstrip('/')
+        self.headers = dict(_headers(token), **{'Content-Type': 'application/json'})
+
+    def request(self, method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=self.headers)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                if resp.headers.get_content_type() == 'text/event-stream':
+                    # streams stay open; time to the first line is what counts
+                    resp.readline()
+                else:
+                    resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def run_scenario(make_client, ctx, spec, requests, warmup, concurrency):
+    """Fire requests across worker threads and collect per-request latency."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    remaining = [warmup + requests]
+
+    def worker():
+        nonlocal errors
+        client = make_client()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+                is_warmup = remaining[0] >= requests
+            path, body = spec.build(ctx)
+            started = time.perf_counter()
+            status = client.request(spec.method, path, body)
+            elapsed = time.perf_counter() - started
+            if is_warmup:
+                continue
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'endpoint': spec.endpoint,
+        'method': spec.method,
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'mean_ms': round(float(ms.mean()), 3),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+    }
+
+
+def uncovered_routes(app, scenarios):
+    covered = {(s.endpoint, s.method) for s in scenarios}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            if (rule.endpoint, method) not in covered:
+                missing.append(f'{method} {rule.rule}')
+    return sorted(missing)
+
+
+def compare(results, baseline_path, tolerance):
+    """Print p95 deltas against a previous results file, return regressed names."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['scenarios']
+    regressed = []
+    print(f'\n{"scenario":<22}{"base p95":>12}{"p95":>12}{"change":>10}')
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['p95_ms'], stats['p95_ms']
+        change = (after - before) / before if before else 0.0
+        flag = '  <-- regression' if change > tolerance else ''
+        print(f'{name:<22}{before:>12.2f}{after:>12.2f}{change:>+10.0%}{flag}')
+        if change > tolerance:
+            regressed.append(name)
+    return regressed
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every API route.')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--writes', action='store_true', help='include mutating routes (scratch rows only)')
+    parser.add_argument('--only', nargs='*', help='scenario names to run')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='previous results file to diff p95 against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown before failing')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    ctx = load_context(app, args)
+    if not ctx['users']:
+        sys.exit('No receipts found, run python -m bench.generate first.')
+
+    scenarios = [s for s in SCENARIOS if args.writes or not s.writes]
+    if args.url:
+        scenarios = [s for s in scenarios if not s.writes]
+        make_client = lambda: HttpClient(args.url, ctx['session_token'])  # noqa: E731
+    else:
+        make_client = lambda: InProcessClient(app, ctx['session_token'])  # noqa: E731
+    if args.only:
+        scenarios = [s for s in scenarios if s.name in args.only]
+    for spec in scenarios:
+        if spec.needs and not ctx[spec.needs]:
+            print(f'skipping {spec.name}: no {spec.needs} in the database', file=sys.stderr)
+    scenarios = [s for s in scenarios if not s.needs or ctx[s.needs]]
+
+    for route in uncovered_routes(app, SCENARIOS):
+        print(f'warning: no scenario for {route}', file=sys.stderr)
+
+    results = {}
+    for spec in scenarios:
+        count = max(1, args.requests // 20) if spec.heavy else args.requests
+        warmup = min(args.warmup, count)
+        results[spec.name] = run_scenario(make_client, ctx, spec, count, warmup, args.concurrency)
+        r = results[spec.name]
+        print(f'{spec.name:<22} p50 {r["p50_ms"]:>8.2f}ms  p95 {r["p95_ms"]:>8.2f}ms  '
+              f'p99 {r["p99_ms"]:>8.2f}ms  {r["throughput_rps"]:>8.1f} req/s  errors {r["errors"]}')
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'target': args.url or 'in-process',
+            'db_host': app.config.get('DB_HOST'),
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+        },
+        'scenarios': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nWrote {args.output}')
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
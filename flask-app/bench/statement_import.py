@@ -0,0 +1,118 @@
+"""
+Statement import throughput benchmark.
+
+    python -m bench.statement_import --rows 50000 --format csv --output import.json
+
+Writes a seeded CSV or OFX statement of --rows transactions (mostly debits
+over a few hundred merchants, some credits) to a temporary file, then
+streams it into POST /purchases/receipts/<user_id>/import in-process
+against the database the app is configured for. Reports rows per second
+and peak RSS growth, and deletes the scratch user's receipts afterwards.
+"""
+import argparse
+import json
+import random
+import resource
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src import create_app, db
+from src.purchases.receipts import purge_receipts
+
+MERCHANTS = ['Starbucks', 'Trader Joe', 'Shell Oil', 'CVS Pharmacy', 'Netflix.com', 'Uber Trip',
+             'Blue Bottle Cafe', 'Harbor Market', 'City Parking', 'Corner Deli']
+
+
+def _transactions(rows, seed):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=365)
+    for i in range(rows):
+        day = start + timedelta(days=rng.randint(0, 364))
+        merchant = f'{rng.choice(MERCHANTS)} #{rng.randint(1, 40)}'
+        amount = round(rng.uniform(2, 180), 2)
+        if rng.random() < 0.05:
+            yield i, day, amount, 'Payroll deposit'
+        else:
+            yield i, day, -amount, merchant
+
+
+def _write_csv(f, rows, seed):
+    f.write(b'Date,Description,Amount\n')
+    for _, day, amount, name in _transactions(rows, seed):
+        f.write(f'{day.strftime("%m/%d/%Y")},"{name}",{amount:.2f}\n'.encode())
+
+
+def _write_ofx(f, rows, seed):
+    f.write(b'OFXHEADER:100\nDATA:OFXSGML\nCHARSET:1252\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n')
+    for i, day, amount, name in _transactions(rows, seed):
+        f.write(f'<STMTTRN><TRNTYPE>{"DEBIT" if amount < 0 else "CREDIT"}<DTPOSTED>{day:%Y%m%d}'
+                f'<TRNAMT>{amount:.2f}<FITID>{i}<NAME>{name}\n</STMTTRN>\n'.encode())
+    f.write(b'</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--format', choices=['csv', 'ofx'], default='csv')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['ADMISSION'] = False
+    client = app.test_client()
+
+    with app.app_context():
+        cursor = db.get_db().cursor()
+        cursor.execute(
+            'INSERT INTO Users (email, first_name, last_name, password) VALUES (%s, %s, %s, %s)',
+            (f'import{random.random()}@bench.example', 'Import', 'Bench', 'x')
+        )
+        user_id = cursor.lastrowid
+        db.get_db().commit()
+
+    try:
+        with tempfile.TemporaryFile() as f:
+            (_write_csv if args.format == 'csv' else _write_ofx)(f, args.rows, args.seed)
+            size = f.tell()
+            f.seek(0)
+
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            started = time.perf_counter()
+            response = client.post(
+                f'/purchases/receipts/{user_id}/import?format={args.format}',
+                input_stream=f, content_type='application/octet-stream',
+                headers={'Content-Length': str(size)},
+            )
+            elapsed = time.perf_counter() - started
+            rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    finally:
+        with app.app_context():
+            cursor = db.get_db().cursor()
+            purge_receipts(cursor, 'user_id', user_id)
+            cursor.execute('DELETE FROM Users WHERE user_id = %s', (user_id,))
+            db.get_db().commit()
+
+    summary = response.get_json()
+    results = {
+        'format': args.format,
+        'rows': args.rows,
+        'file_mb': round(size / 1e6, 2),
+        'status': response.status_code,
+        'imported': summary.get('imported'),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(args.rows / elapsed),
+        'peak_rss_growth_mb': round((rss_after - rss_before) / 1024, 1),
+    }
+    print(f'{args.rows} {args.format} rows ({results["file_mb"]} MB): status {response.status_code}, '
+          f'{results["imported"]} imported in {elapsed:.2f}s = {results["rows_per_second"]} rows/s, '
+          f'peak RSS +{results["peak_rss_growth_mb"]} MB')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
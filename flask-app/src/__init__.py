@@ -1,59 +1,197 @@
+import hmac
+import itertools
 import os
-import ssl
+import threading
+import time
 
-import pymysql
-from flask import Flask, g
+from flask import Flask, abort, g, has_request_context, jsonify, request
 from flask_cors import CORS
 
+from src.backends import get_backend
+from src.backends.nodes import Node, parse_dsn
 
-class MySQL:
-    """Lightweight pymysql wrapper that mirrors the flask-mysql get_db() interface."""
+
+# owner of the row a write route names, for pinning the owner's reads
+OWNER_QUERIES = {
+    'receipt_id': 'SELECT user_id FROM Receipts WHERE receipt_id = %s',
+    'transaction_id': (
+        'SELECT r.user_id FROM Transactions t JOIN Receipts r ON r.receipt_id = t.receipt_id '
+        'WHERE t.transaction_id = %s'
+    ),
+    'budget_id': 'SELECT user_id FROM Budgets WHERE budget_id = %s',
+    'goal_id': 'SELECT user_id FROM Spending_goals WHERE goal_id = %s',
+}
+
+
+class Database:
+    """
+    Per-request connection holder that mirrors the flask-mysql get_db() interface.
+    get_db() always returns the primary; read-only handlers call get_read_db(),
+    which round-robins over healthy replicas unless the caller wrote recently.
+    """
 
     def __init__(self):
         self._app = None
+        self.backend = None
+        self.primary = None
+        self.replicas = []
+        self._next_replica = itertools.count()
+        self._pins = {}
+        self._pin_lock = threading.Lock()
 
     def init_app(self, app):
         self._app = app
-        app.teardown_appcontext(self._teardown)
-
-    def _connect(self):
-        kwargs = {
-            'host': self._app.config['DB_HOST'],
-            'port': self._app.config['DB_PORT'],
-            'user': self._app.config['DB_USER'],
-            'password': self._app.config['DB_PASSWORD'],
-            'database': self._app.config['DB_NAME'],
-        }
-
-        if self._app.config.get('DB_SSL'):
-            ctx = ssl.create_default_context()
-            kwargs['ssl'] = ctx
+        self.backend = get_backend(app.config['DB_BACKEND'])
+        self.backend.init_app(app)
 
-        return pymysql.connect(**kwargs)
+        pool_size = app.config.get('DB_POOL_SIZE', 0)
+        retry = app.config.get('DB_REPLICA_RETRY_SECONDS', 10)
+        self.primary = Node('primary', 'primary', self.backend, app.config, pool_size, retry)
+        self.replicas = [
+            Node(f'replica{i}', 'replica', get_backend(app.config['DB_BACKEND']),
+                 {**app.config, **parse_dsn(dsn)}, pool_size, retry)
+            for i, dsn in enumerate(app.config.get('DB_REPLICAS', []))
+        ]
+        self._pins = {}
+        app.teardown_appcontext(self._teardown)
 
     def get_db(self):
         if 'db_conn' not in g:
-            g.db_conn = self._connect()
+            g.db_conn = self.primary.checkout()
+            if self.replicas and has_request_context() and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                # looked up before the handler runs, while a deleted row still exists
+                g.db_pin_keys = self._pin_keys(g.db_conn)
         return g.db_conn
 
-    def _teardown(self, _exc):
-        conn = g.pop('db_conn', None)
+    def get_read_db(self):
+        if 'db_read' in g:
+            return g.db_read[1]
+        if not self.replicas or 'db_conn' in g or self._pinned():
+            return self.get_db()
+
+        start = next(self._next_replica)
+        for i in range(len(self.replicas)):
+            node = self.replicas[(start + i) % len(self.replicas)]
+            try:
+                conn = node.checkout()
+            except Exception:
+                continue
+            g.db_read = (node, conn)
+            return conn
+        return self.get_db()
+
+    def reads_pinned(self):
+        """True when this request's reads must stay on the primary."""
+        return 'db_conn' in g or self._pinned()
+
+    def _pin_keys(self, conn=None):
+        """
+        Pin keys for the users this request acts for: the user_id path
+        argument and the session token's user, plus on writes (given conn)
+        the user_id in the body and the owner of the row the path names.
+        """
+        from src.users.sessions import current_session
+
+        view_args = request.view_args or {}
+        users = {view_args.get('user_id'), (current_session() or {}).get('user_id')}
         if conn is not None:
-            conn.close()
+            body = request.get_json(silent=True)
+            if isinstance(body, dict):
+                users.add(body.get('user_id'))
+            for arg, query in OWNER_QUERIES.items():
+                if arg in view_args:
+                    cursor = conn.cursor()
+                    cursor.execute(query, (view_args[arg],))
+                    row = cursor.fetchone()
+                    users.add(row[0] if row else None)
+        return [('user', str(user_id)) for user_id in users if user_id is not None]
 
+    def _pinned(self):
+        if not has_request_context():
+            return False
+        now = time.monotonic()
+        return any(self._pins.get(key, 0) > now for key in self._pin_keys())
 
-db = MySQL()
+    def _pin(self, keys):
+        until = time.monotonic() + self._app.config.get('DB_PIN_SECONDS', 5)
+        with self._pin_lock:
+            if len(self._pins) > 10000:
+                now = time.monotonic()
+                self._pins = {k: v for k, v in self._pins.items() if v > now}
+            for key in keys:
+                self._pins[key] = until
+
+    def _teardown(self, exc):
+        read = g.pop('db_read', None)
+        if read is not None:
+            read[0].checkin(read[1])
+
+        conn = g.pop('db_conn', None)
+        keys = g.pop('db_pin_keys', None)
+        if conn is None:
+            return
+        self.primary.checkin(conn)
+        # replicas may lag, so a writer reads from the primary for a while
+        if keys and self.replicas and exc is None:
+            self._pin(keys)
+
+    def stats(self):
+        return {
+            'backend': self.backend.name,
+            'nodes': [node.stats() for node in [self.primary] + self.replicas],
+        }
+
+
+db = Database()
 
 
 def create_app():
     app = Flask(__name__)
 
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
+    app.config['DB_BACKEND'] = os.environ.get('DB_BACKEND', 'mysql')
+    app.config['DB_PATH'] = os.environ.get('DB_PATH', 'pocket_protector.db')
     app.config['DB_HOST'] = os.environ.get('DB_HOST', 'db')
     app.config['DB_PORT'] = int(os.environ.get('DB_PORT', 3306))
     app.config['DB_USER'] = os.environ.get('DB_USER', 'root')
     app.config['DB_NAME'] = os.environ.get('DB_NAME', 'FinanceAppDatabase')
     app.config['DB_SSL'] = os.environ.get('DB_SSL', '').lower() == 'true'
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 8))
+    app.config['DB_STATEMENT_CACHE_SIZE'] = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 256))
+    app.config['DB_REPLICAS'] = [dsn for dsn in os.environ.get('DB_REPLICAS', '').split(',') if dsn.strip()]
+    app.config['DB_PIN_SECONDS'] = float(os.environ.get('DB_PIN_SECONDS', 5))
+    app.config['DB_REPLICA_RETRY_SECONDS'] = float(os.environ.get('DB_REPLICA_RETRY_SECONDS', 10))
+    app.config['DB_SERVER_PREPARE'] = os.environ.get('DB_SERVER_PREPARE', '').lower() == 'true'
+    app.config['ARCHIVE_DIR'] = os.environ.get('ARCHIVE_DIR', 'archive')
+    app.config['ARCHIVE_AFTER_MONTHS'] = int(os.environ.get('ARCHIVE_AFTER_MONTHS', 24))
+    # off by default: writes only patch the writing process's cache, so with
+    # several workers the others serve data up to ANALYTICS_CACHE_TTL seconds old
+    app.config['ANALYTICS_CACHE_BYTES'] = int(os.environ.get('ANALYTICS_CACHE_BYTES', 0))
+    app.config['ANALYTICS_CACHE_TTL'] = int(os.environ.get('ANALYTICS_CACHE_TTL', 300))
+    # off by default for the same reason: other workers serve an index up to ITEM_SEARCH_TTL seconds old
+    app.config['ITEM_SEARCH_CACHE_BYTES'] = int(os.environ.get('ITEM_SEARCH_CACHE_BYTES', 0))
+    app.config['ITEM_SEARCH_TTL'] = int(os.environ.get('ITEM_SEARCH_TTL', 300))
+    app.config['DASHBOARD_WORKERS'] = int(os.environ.get('DASHBOARD_WORKERS', 8))
+    app.config['DASHBOARD_SECTION_TIMEOUT'] = float(os.environ.get('DASHBOARD_SECTION_TIMEOUT', 5))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    app.config['SESSION_TOKEN_TTL'] = int(os.environ.get('SESSION_TOKEN_TTL', 7 * 24 * 3600))
+    app.config['REQUIRE_SESSION_TOKEN'] = os.environ.get('REQUIRE_SESSION_TOKEN', '').lower() == 'true'
+    app.config['IMPORT_BATCH_ROWS'] = int(os.environ.get('IMPORT_BATCH_ROWS', 2000))
+    app.config['ADMISSION'] = os.environ.get('ADMISSION', 'true').lower() == 'true'
+    app.config['ADMISSION_CHEAP_LIMIT'] = int(os.environ.get('ADMISSION_CHEAP_LIMIT', 0))
+    app.config['ADMISSION_ANALYTICS_LIMIT'] = int(os.environ.get('ADMISSION_ANALYTICS_LIMIT', 6))
+    app.config['ADMISSION_BULK_LIMIT'] = int(os.environ.get('ADMISSION_BULK_LIMIT', 2))
+    app.config['ADMISSION_QUEUE'] = int(os.environ.get('ADMISSION_QUEUE', 16))
+    app.config['ADMISSION_QUEUE_TIMEOUT'] = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 2))
+    app.config['SINGLE_FLIGHT'] = os.environ.get('SINGLE_FLIGHT', 'true').lower() == 'true'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')
+    app.config['CHANGE_POLL_SECONDS'] = float(os.environ.get('CHANGE_POLL_SECONDS', 15))
+    app.config['CHANGE_STREAM_SECONDS'] = float(os.environ.get('CHANGE_STREAM_SECONDS', 300))
+    app.config['CHANGE_LOG_RETENTION_DAYS'] = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 30))
 
     pw_file = os.environ.get('DB_PASSWORD_FILE', '/secrets/db_root_password.txt')
     if os.environ.get('DB_PASSWORD'):
@@ -65,12 +203,54 @@ def create_app():
         app.config['DB_PASSWORD'] = ''
 
     db.init_app(app)
-    CORS(app)
+    CORS(app, expose_headers=['ETag'])
+
+    from src.helpers import finalize_response
+    app.after_request(finalize_response)
+
+    from src.admission import enter_request, leave_request
+    app.before_request(enter_request)
+    app.teardown_request(leave_request)
+
+    from src.changes import publish_changes
+    app.teardown_request(publish_changes)
 
     @app.route("/")
     def welcome():
         return "<h1>Pocket Protectors API</h1>"
 
+    @app.route("/metrics")
+    def metrics():
+        # internals stay hidden unless METRICS_TOKEN is set and presented
+        token = app.config['METRICS_TOKEN']
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('X-Metrics-Token', ''), token):
+            abort(401)
+        from src.purchases.columnar import analytics_cache
+        from src.purchases.item_search import item_search_cache
+        from src.admission import admission
+        from src.changes import change_bus
+        from src.singleflight import single_flight
+        stats = db.stats()
+        gates = admission()
+        if gates is not None:
+            stats['admission'] = gates.stats()
+        hasher = app.extensions.get('password_hasher')
+        if hasher is not None:
+            stats['password_hasher'] = hasher.stats()
+        cache = analytics_cache()
+        if cache is not None:
+            stats['analytics_cache'] = cache.stats()
+        items = item_search_cache()
+        if items is not None:
+            stats['item_search_cache'] = items.stats()
+        stats['change_bus'] = change_bus().stats()
+        flights = single_flight()
+        if flights is not None:
+            stats['single_flight'] = flights.stats()
+        return jsonify(stats)
+
     from src.descriptors.categories import descriptors
     from src.management.management import management
     from src.purchases import purchases
@@ -81,4 +261,19 @@ def create_app():
     app.register_blueprint(purchases, url_prefix='/purchases')
     app.register_blueprint(users, url_prefix='/users')
 
+    from src.anomalies import anomalies_cli
+    from src.archive import archive_cli
+    from src.changes import changes_cli
+    from src.forecast import forecast_cli
+    from src.plans import plans_cli
+    from src.prices import prices_cli
+    from src.recurring import recurring_cli
+    app.cli.add_command(anomalies_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(changes_cli)
+    app.cli.add_command(forecast_cli)
+    app.cli.add_command(plans_cli)
+    app.cli.add_command(prices_cli)
+    app.cli.add_command(recurring_cli)
+
     return app
@@ -0,0 +1,165 @@
+import math
+import threading
+import time
+
+from flask import current_app, g, request
+
+from src.helpers import error_response
+
+# Routes are sorted into cost classes, each with its own concurrency limit and
+# a short wait queue, so a spike of analytics or bulk work cannot take every
+# request thread and pooled connection away from cheap lookups. Past the
+# queue a request is turned away at once (429); one that waits out its
+# deadline gets a 503. Both carry Retry-After.
+
+COST_CLASSES = ('cheap', 'analytics', 'bulk')
+
+
+class Overloaded(Exception):
+    def __init__(self, status, retry_after):
+        super().__init__('Server busy, please retry')
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Gate:
+    """At most limit holders, at most queue waiters, each waiting up to timeout seconds."""
+
+    def __init__(self, limit, queue, timeout):
+        self._cond = threading.Condition()
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.max_wait_ms = 0.0
+
+    def enter(self):
+        with self._cond:
+            if self.limit <= 0 or (self.active < self.limit and not self.waiting):
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.queue:
+                self.rejected_full += 1
+                raise Overloaded(429, 1)
+
+            self.waiting += 1
+            self.queued += 1
+            started = time.monotonic()
+            deadline = started + self.timeout
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        raise Overloaded(503, max(1, math.ceil(self.timeout)))
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                self.max_wait_ms = max(self.max_wait_ms, (time.monotonic() - started) * 1000)
+            finally:
+                self.waiting -= 1
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'queue_depth': self.waiting,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected_full': self.rejected_full,
+            'rejected_timeout': self.rejected_timeout,
+            'max_wait_ms': round(self.max_wait_ms, 3),
+        }
+
+
+class Admission:
+    """One gate per cost class, plus one per route that sets its own limit."""
+
+    def __init__(self, config):
+        self.queue = config['ADMISSION_QUEUE']
+        self.timeout = config['ADMISSION_QUEUE_TIMEOUT']
+        self.classes = {
+            name: Gate(config[f'ADMISSION_{name.upper()}_LIMIT'], self.queue, self.timeout)
+            for name in COST_CLASSES
+        }
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def gates(self, endpoint, view):
+        cost_class = getattr(view, 'cost_class', 'cheap')
+        gates = [self.classes[cost_class]]
+        limit = getattr(view, 'route_limit', None)
+        if limit:
+            with self._lock:
+                gate = self.routes.get(endpoint)
+                if gate is None:
+                    gate = self.routes[endpoint] = Gate(limit, self.queue, self.timeout)
+            # the route's own gate first, so a queued export doesn't hold a class slot
+            gates.insert(0, gate)
+        return gates
+
+    def stats(self):
+        return {
+            'classes': {name: gate.stats() for name, gate in self.classes.items()},
+            'routes': {name: gate.stats() for name, gate in self.routes.items()},
+        }
+
+
+def admission():
+    """The app's Admission, None when ADMISSION is off."""
+    if not current_app.config.get('ADMISSION'):
+        return None
+    state = current_app.extensions.get('admission')
+    if state is None:
+        state = current_app.extensions.setdefault('admission', Admission(current_app.config))
+    return state
+
+
+def admit(cost_class, limit=None):
+    """Decorator putting a view in a cost class, optionally with its own concurrency limit."""
+    if cost_class not in COST_CLASSES:
+        raise ValueError(f'unknown cost class {cost_class}')
+
+    def decorate(view):
+        view.cost_class = cost_class
+        view.route_limit = limit
+        return view
+    return decorate
+
+
+def enter_request():
+    """before_request hook: take this route's gates or shed the request."""
+    state = admission()
+    if state is None or request.endpoint is None or request.method == 'OPTIONS':
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    held = []
+    try:
+        for gate in state.gates(request.endpoint, view):
+            gate.enter()
+            held.append(gate)
+    except Overloaded as e:
+        for gate in reversed(held):
+            gate.leave()
+        response = error_response(str(e), e.status)
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    g.admission_gates = held
+    return None
+
+
+def leave_request(exc=None):
+    """teardown_request hook: hand back whatever enter_request took."""
+    for gate in reversed(g.pop('admission_gates', [])):
+        gate.leave()
@@ -0,0 +1,249 @@
+import math
+from datetime import date, datetime, timedelta
+
+import click
+import numpy as np
+from flask.cli import AppGroup
+
+from src import db
+from src.money import to_cents
+
+# Unusual receipts are scored against robust statistics of the user's
+# spending in the same category: the median and median absolute deviation
+# (MAD) of log amounts, kept per (user, category) in SpendStats. Inserts
+# score and update their row in O(1) with a stochastic median/MAD step, so no
+# history is read on the request path. `flask anomalies backfill` recomputes
+# the exact statistics over each series' latest receipts in vectorized
+# chunks of users, and flags recent outliers the streaming path never saw.
+
+anomalies_cli = AppGroup('anomalies', help='Score receipts against per-category spending statistics.')
+
+# the latest receipts a series' statistics describe; also the streaming memory
+STATS_WINDOW = 50
+MIN_OBSERVATIONS = 8
+# modified z-score (0.6745 * deviation / MAD) above which a receipt is flagged
+THRESHOLD = 3.5
+MIN_AMOUNT_CENTS = 2000
+# floor on the MAD of log amounts, so a run of identical charges isn't infinitely strict
+MIN_LOG_MAD = 0.1
+BACKFILL_BATCH_USERS = 200
+BACKFILL_FLAG_DAYS = 30
+# 5 placeholders a row stays under SQLite's 999 bound-parameter limit
+STATS_CHUNK_ROWS = 190
+
+
+def modified_z(log_amount, median, mad):
+    return 0.6745 * (log_amount - median) / max(mad, MIN_LOG_MAD)
+
+
+def is_anomalous(cents, observations, median, mad):
+    """Whether an amount is an upside outlier for a series with these statistics."""
+    if observations < MIN_OBSERVATIONS or cents < MIN_AMOUNT_CENTS:
+        return False
+    return modified_z(math.log(cents), median, mad) >= THRESHOLD
+
+
+def observe(observations, median, mad, cents):
+    """
+    One stochastic step of the streaming median and MAD of log amounts.
+    Each moves a bounded step towards the new value, so a single outlier
+    can't drag them far. Returns the new (observations, median, mad).
+    """
+    value = math.log(max(cents, 1))
+    if observations == 0:
+        return 1, value, 0.0
+    rate = 1 / min(observations + 1, STATS_WINDOW)
+    scale = max(mad, MIN_LOG_MAD)
+    deviation = value - median
+    median += 1.5 * rate * scale * ((deviation > 0) - (deviation < 0))
+    spread = abs(deviation) - mad
+    mad = max(mad + rate * scale * ((spread > 0) - (spread < 0)), 0.0)
+    return observations + 1, median, mad
+
+
+def _load_stats(cursor, user_id, category_ids):
+    marks = ', '.join(['%s'] * len(category_ids))
+    cursor.execute(
+        f'SELECT category_id, observations, log_median, log_mad FROM SpendStats '
+        f'WHERE user_id = %s AND category_id IN ({marks})',
+        (user_id, *category_ids)
+    )
+    return {category_id: (int(n), float(m), float(d)) for category_id, n, m, d in cursor.fetchall()}
+
+
+def _save_stats(cursor, rows):
+    """REPLACE (user_id, category_id, observations, log_median, log_mad) rows in chunks."""
+    for i in range(0, len(rows), STATS_CHUNK_ROWS):
+        chunk = rows[i:i + STATS_CHUNK_ROWS]
+        cursor.execute(
+            'REPLACE INTO SpendStats (user_id, category_id, observations, log_median, log_mad) VALUES '
+            + ', '.join(['(%s, %s, %s, %s, %s)'] * len(chunk)),
+            [v for row in chunk for v in row]
+        )
+
+
+def _notify(cursor, user_id, receipt_id, cents, median):
+    cursor.execute('''
+        SELECT s.store_name, c.category_name
+        FROM Receipts r
+        JOIN Stores s ON s.store_id = r.store_id
+        LEFT JOIN Categories c ON c.category_id = r.category_id
+        WHERE r.receipt_id = %s
+    ''', (receipt_id,))
+    row = cursor.fetchone()
+    store_name, category_name = row if row else ('a store', None)
+    message = (f'Unusual ${cents / 100:.2f} charge at {store_name}; your {category_name or "usual"} '
+               f'receipts are typically about ${math.exp(median) / 100:.2f}')
+    now = datetime.now()
+    cursor.execute(
+        'INSERT INTO Notifications '
+        '(`repeat`, notification_time, notification_date, Message, user_id, receipt_id) '
+        'VALUES (%s, %s, %s, %s, %s, %s)',
+        ('never', now.strftime('%H:%M:%S'), now.date(), message[:255], user_id, receipt_id)
+    )
+
+
+def score_receipt(cursor, user_id, category_id, receipt_id, amount):
+    """
+    Score a just-inserted receipt against its series, notify if it's an
+    outlier, then fold it into the statistics. Runs on the caller's cursor
+    without committing. Returns whether the receipt was flagged.
+    """
+    if category_id is None:
+        return False
+    cents = to_cents(amount)
+    observations, median, mad = _load_stats(cursor, user_id, [category_id]).get(category_id, (0, 0.0, 0.0))
+
+    flagged = is_anomalous(cents, observations, median, mad)
+    if flagged:
+        _notify(cursor, user_id, receipt_id, cents, median)
+
+    _save_stats(cursor, [(user_id, category_id, *observe(observations, median, mad, cents))])
+    return flagged
+
+
+def observe_batch(cursor, user_id, changes):
+    """Fold a batch of (category_id, date, amount) receipts into the user's statistics, in order."""
+    category_ids = sorted({category_id for category_id, _, _ in changes if category_id is not None})
+    if not category_ids:
+        return
+    stats = _load_stats(cursor, user_id, category_ids)
+    for category_id, _, amount in changes:
+        if category_id is not None:
+            stats[category_id] = observe(*stats.get(category_id, (0, 0.0, 0.0)), to_cents(amount))
+    _save_stats(cursor, [(user_id, category_id, *stats[category_id]) for category_id in category_ids])
+
+
+def series_stats(user_ids, category_ids, order, cents):
+    """
+    Exact median and MAD of log amounts over the latest STATS_WINDOW
+    receipts of every (user, category) series in the columns (NumPy arrays;
+    `order` ranks receipts in time, e.g. date ordinal * 2**32 + receipt id).
+    Returns (index, series, observations, median, mad) where index sorts the
+    input by series then time and series[i] numbers the series of row index[i].
+    """
+    index = np.lexsort((order, category_ids, user_ids))
+    users, categories = user_ids[index], category_ids[index]
+    starts = np.r_[True, (users[1:] != users[:-1]) | (categories[1:] != categories[:-1])]
+    series = np.cumsum(starts) - 1
+    count = int(series[-1]) + 1
+    ends = np.cumsum(np.bincount(series, minlength=count))
+    recent = ends[series] - 1 - np.arange(len(series)) < STATS_WINDOW
+
+    values = np.log(np.maximum(cents[index], 1).astype(np.float64))
+    observations = np.bincount(series[recent], minlength=count)
+    median = _segment_median(values[recent], series[recent], observations)
+    deviation = np.abs(values[recent] - median[series[recent]])
+    mad = _segment_median(deviation, series[recent], observations)
+    return index, series, observations, median, mad
+
+
+def _segment_median(values, series, counts):
+    ordered = values[np.lexsort((values, series))]
+    first = np.cumsum(counts) - counts
+    low = first + (counts - 1) // 2
+    high = first + counts // 2
+    return (ordered[low] + ordered[high]) / 2
+
+
+def _backfill_batch(cursor, user_ids, flag_since):
+    marks = ', '.join(['%s'] * len(user_ids))
+    cursor.execute(f'''
+        SELECT receipt_id, user_id, category_id, date, total_amount
+        FROM Receipts
+        WHERE user_id IN ({marks}) AND category_id IS NOT NULL
+    ''', user_ids)
+    rows = cursor.fetchall()
+    if not rows:
+        cursor.execute(f'DELETE FROM SpendStats WHERE user_id IN ({marks})', user_ids)
+        return 0, 0
+
+    receipt_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    users = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    categories = np.fromiter((r[2] for r in rows), dtype=np.int64, count=len(rows))
+    days = np.fromiter((_as_date(r[3]).toordinal() for r in rows), dtype=np.int64, count=len(rows))
+    cents = np.fromiter((to_cents(r[4]) for r in rows), dtype=np.int64, count=len(rows))
+
+    index, series, observations, median, mad = series_stats(users, categories, (days << 32) + receipt_ids, cents)
+
+    cursor.execute(f'DELETE FROM SpendStats WHERE user_id IN ({marks})', user_ids)
+    firsts = np.r_[0, np.flatnonzero(np.diff(series)) + 1]
+    _save_stats(cursor, [
+        (int(users[index[row]]), int(categories[index[row]]), int(observations[s]), float(median[s]), float(mad[s]))
+        for s, row in enumerate(firsts)
+    ])
+
+    # recent receipts that stand out from their series' current statistics
+    z = 0.6745 * (np.log(np.maximum(cents[index], 1)) - median[series]) / np.maximum(mad[series], MIN_LOG_MAD)
+    flagged = (
+        (z >= THRESHOLD) & (observations[series] >= MIN_OBSERVATIONS)
+        & (cents[index] >= MIN_AMOUNT_CENTS) & (days[index] >= flag_since.toordinal())
+    )
+    candidates = index[flagged]
+    if not len(candidates):
+        return len(firsts), 0
+
+    cursor.execute(
+        f'SELECT receipt_id FROM Notifications WHERE user_id IN ({marks}) AND receipt_id IS NOT NULL', user_ids
+    )
+    notified = {row[0] for row in cursor.fetchall()}
+    sent = 0
+    for row, s in zip(candidates, series[flagged]):
+        if int(receipt_ids[row]) not in notified:
+            _notify(cursor, int(users[row]), int(receipt_ids[row]), int(cents[row]), float(median[s]))
+            sent += 1
+    return len(firsts), sent
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def backfill(cursor, flag_days=BACKFILL_FLAG_DAYS, today=None):
+    """
+    Recompute every user's statistics from their receipt history,
+    BACKFILL_BATCH_USERS at a time, and notify for receipts from the last
+    flag_days that are outliers and weren't flagged before. Writes on the
+    caller's cursor without committing. Returns (series, notifications).
+    """
+    flag_since = (today or date.today()) - timedelta(days=flag_days)
+    cursor.execute('SELECT DISTINCT user_id FROM Receipts ORDER BY user_id')
+    user_ids = [row[0] for row in cursor.fetchall()]
+
+    series = sent = 0
+    for i in range(0, len(user_ids), BACKFILL_BATCH_USERS):
+        s, n = _backfill_batch(cursor, user_ids[i:i + BACKFILL_BATCH_USERS], flag_since)
+        series += s
+        sent += n
+    return series, sent
+
+
+@anomalies_cli.command('backfill')
+@click.option('--flag-days', default=BACKFILL_FLAG_DAYS, show_default=True,
+              help='Notify for outliers dated within this many days.')
+def backfill_command(flag_days):
+    """Rebuild spending statistics from receipt history."""
+    conn = db.get_db()
+    series, sent = backfill(conn.cursor(), flag_days)
+    conn.commit()
+    click.echo(f'Rebuilt statistics for {series} series, {sent} new anomaly notifications')
@@ -0,0 +1,373 @@
+import json
+import os
+from datetime import date
+from functools import lru_cache
+
+import click
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from flask import current_app
+from flask.cli import AppGroup
+
+from src import db
+from src.money import cents_array, from_cents, to_cents
+
+# Receipts older than ARCHIVE_AFTER_MONTHS move out of the hot tables into one
+# compressed columnar file per month. Their spend stays in ArchivedSpend so
+# budgets and goals are unchanged; explicit old-range reads union the rows
+# back in through a temporary table.
+
+archive_cli = AppGroup('archive', help='Move old receipts to cold storage.')
+
+RECEIPT_COLUMNS = (
+    'receipt_id', 'date', 'total_amount', 'user_id',
+    'store_id', 'tag_id', 'category_id', 'category_source',
+)
+
+_MISSING = -1
+# ids per IN list, under SQLite's 999 bound-parameter limit
+DELETE_CHUNK_IDS = 500
+
+
+def _month_key(month):
+    return f'{month:%Y-%m}'
+
+
+def _paths():
+    root = current_app.config['ARCHIVE_DIR']
+    return os.path.join(root, 'receipts'), os.path.join(root, 'manifest.json')
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _read_manifest():
+    _, manifest = _paths()
+    try:
+        mtime = os.stat(manifest).st_mtime
+    except FileNotFoundError:
+        return {}
+    return _load_manifest(manifest, mtime)
+
+
+@lru_cache(maxsize=4)
+def _load_manifest(path, _mtime):
+    with open(path) as f:
+        return json.load(f)['months']
+
+
+def _write_manifest(months):
+    _, manifest = _paths()
+    tmp = manifest + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'months': months}, f, indent=2, sort_keys=True)
+    os.replace(tmp, manifest)
+
+
+@lru_cache(maxsize=32)
+def _load_month(path, _mtime):
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _month_file(month):
+    directory, _ = _paths()
+    return os.path.join(directory, _month_key(month) + '.npz')
+
+
+def read_month(month):
+    """Column arrays for one archived month, cached until the file changes."""
+    path = _month_file(month)
+    return _load_month(path, os.stat(path).st_mtime)
+
+
+def archived_through():
+    """First day after the newest archived month, None when nothing is archived."""
+    months = _read_manifest()
+    if not months:
+        return None
+    newest = date.fromisoformat(max(months) + '-01')
+    return newest + relativedelta(months=1)
+
+
+def covers(start):
+    """True when a range starting at start (None meaning all history) reaches into the archive."""
+    boundary = archived_through()
+    return boundary is not None and (start is None or _as_date(start) < boundary)
+
+
+def archived_receipts(user_id, start=None, end=None):
+    """Archived receipt rows for one user (or a list of users), in RECEIPT_COLUMNS order."""
+    user_ids = [int(u) for u in user_id] if isinstance(user_id, (list, tuple, set)) else [int(user_id)]
+    start = _as_date(start) if start else None
+    end = _as_date(end) if end else None
+    rows = []
+    for key in sorted(_read_manifest()):
+        month = date.fromisoformat(key + '-01')
+        if (end and month > end) or (start and month + relativedelta(months=1) <= start):
+            continue
+
+        cols = read_month(month)
+        dates = cols['date']
+        mask = np.isin(cols['user_id'], user_ids)
+        if start:
+            mask &= dates >= np.datetime64(start)
+        if end:
+            mask &= dates <= np.datetime64(end)
+
+        for i in np.flatnonzero(mask):
+            rows.append((
+                int(cols['receipt_id'][i]),
+                dates[i].astype(date),
+                from_cents(cols['total_cents'][i]),
+                int(cols['user_id'][i]),
+                int(cols['store_id'][i]),
+                None if cols['tag_id'][i] == _MISSING else int(cols['tag_id'][i]),
+                None if cols['category_id'][i] == _MISSING else int(cols['category_id'][i]),
+                str(cols['category_source'][i]) or None,
+            ))
+    return rows
+
+
+def archived_line_items(user_id):
+    """
+    One user's archived line items as column arrays: transaction_id,
+    receipt_id, day (date ordinal), store_id, unit_cents, quantity and item_name.
+    """
+    epoch = date(1970, 1, 1).toordinal()
+    parts = []
+    for key in sorted(_read_manifest()):
+        cols = read_month(date.fromisoformat(key + '-01'))
+        mine = np.flatnonzero(cols['user_id'] == int(user_id))
+        if not len(mine):
+            continue
+        order = np.argsort(cols['receipt_id'][mine])
+        receipts = mine[order]
+        items = np.flatnonzero(np.isin(cols['t_receipt_id'], cols['receipt_id'][receipts]))
+        # each item's receipt row, found by its position among the sorted receipt ids
+        owner = receipts[np.searchsorted(cols['receipt_id'][receipts], cols['t_receipt_id'][items])]
+        parts.append({
+            'transaction_id': cols['t_transaction_id'][items],
+            'receipt_id': cols['t_receipt_id'][items],
+            'day': cols['date'][owner].astype(np.int64) + epoch,
+            'store_id': cols['store_id'][owner],
+            'unit_cents': cols['t_unit_cents'][items],
+            'quantity': cols['t_quantity'][items],
+            'item_name': cols['t_item_name'][items],
+        })
+    names = ('transaction_id', 'receipt_id', 'day', 'store_id', 'unit_cents', 'quantity')
+    if not parts:
+        return {**{name: np.array([], dtype=np.int64) for name in names}, 'item_name': np.array([], dtype=str)}
+    return {name: np.concatenate([p[name] for p in parts]) for name in (*names, 'item_name')}
+
+
+def receipts_source(cursor, user_id, start=None, end=None):
+    """
+    Table expression to read receipts from: plain Receipts, or Receipts
+    UNION ALL this user's (or these users') archived rows when the range
+    reaches into the archive.
+    """
+    if not covers(start):
+        return 'Receipts'
+
+    cursor.execute('DROP TEMPORARY TABLE IF EXISTS ArchivedReceipts')
+    cursor.execute('''
+        CREATE TEMPORARY TABLE ArchivedReceipts (
+            receipt_id INT, date DATE, total_amount DECIMAL(10,2), user_id INT,
+            store_id INT, tag_id INT, category_id INT, category_source VARCHAR(20)
+        )
+    ''')
+    rows = archived_receipts(user_id, start, end)
+    if rows:
+        cursor.executemany(
+            'INSERT INTO ArchivedReceipts VALUES (%s, %s, %s, %s, %s, %s, %s, %s)', rows
+        )
+
+    columns = ', '.join(RECEIPT_COLUMNS)
+    return f'(SELECT {columns} FROM Receipts UNION ALL SELECT {columns} FROM ArchivedReceipts)'
+
+
+def _columns(receipts, transactions):
+    def ids(values):
+        return np.array([_MISSING if v is None else v for v in values], dtype=np.int64)
+
+    r = list(zip(*receipts)) or [()] * len(RECEIPT_COLUMNS)
+    t = list(zip(*transactions)) or [()] * 5
+    return {
+        'receipt_id': np.array(r[0], dtype=np.int64),
+        'date': np.array([_as_date(d) for d in r[1]], dtype='datetime64[D]'),
+        'total_cents': cents_array(r[2]),
+        'user_id': np.array(r[3], dtype=np.int64),
+        'store_id': np.array(r[4], dtype=np.int64),
+        'tag_id': ids(r[5]),
+        'category_id': ids(r[6]),
+        'category_source': np.array([v or '' for v in r[7]], dtype=str),
+        't_transaction_id': np.array(t[0], dtype=np.int64),
+        't_receipt_id': np.array(t[1], dtype=np.int64),
+        't_unit_cents': cents_array(t[2]),
+        't_quantity': np.array(t[3], dtype=np.int64),
+        't_item_name': np.array(list(t[4]), dtype=str),
+    }
+
+
+class ArchiveConflict(Exception):
+    """Line items were added to a receipt while its month was being archived."""
+
+
+def _chunks(ids):
+    for i in range(0, len(ids), DELETE_CHUNK_IDS):
+        yield ids[i:i + DELETE_CHUNK_IDS]
+
+
+def _archived_spend(receipts):
+    """ArchivedSpend rows (user, category, day, total, count) for archived receipt rows."""
+    spend = {}
+    for _, day, amount, user_id, _, _, category_id, _ in receipts:
+        entry = spend.setdefault((user_id, category_id, _as_date(day)), [0, 0])
+        entry[0] += to_cents(amount)
+        entry[1] += 1
+    return [(*key, from_cents(cents), count) for key, (cents, count) in spend.items()]
+
+
+def _check_no_items(cursor, receipt_ids, month):
+    """Raise ArchiveConflict if archived receipts still have line items, added after they were read."""
+    for chunk in _chunks(receipt_ids):
+        marks = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f'SELECT COUNT(*) FROM Transactions WHERE receipt_id IN ({marks})', chunk)
+        if cursor.fetchone()[0]:
+            raise ArchiveConflict(f'line items changed while archiving {_month_key(month)}; run again')
+
+
+def archive_month(conn, month):
+    """
+    Move one month of receipts and line items into its archive file and
+    ArchivedSpend. Only the rows that were read are deleted, by id, so a
+    receipt written into the month meanwhile stays hot for the next run.
+    The file is written to a temp path first and only swapped in once the
+    delete has committed.
+    """
+    following = month + relativedelta(months=1)
+    cursor = conn.cursor()
+
+    cursor.execute(f'''
+        SELECT {', '.join(RECEIPT_COLUMNS)} FROM Receipts
+        WHERE date >= %s AND date < %s
+    ''', (month, following))
+    receipts = list(cursor.fetchall())
+    if not receipts:
+        return 0
+    receipt_ids = [row[0] for row in receipts]
+    transactions = []
+    for chunk in _chunks(receipt_ids):
+        marks = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f'''
+            SELECT transaction_id, receipt_id, unit_cost, quantity, item_name
+            FROM Transactions WHERE receipt_id IN ({marks})
+        ''', chunk)
+        transactions.extend(cursor.fetchall())
+
+    columns = _columns(receipts, transactions)
+    path = _month_file(month)
+    if os.path.exists(path):
+        # back-dated receipts landed in an already archived month
+        existing = read_month(month)
+        columns = {k: np.concatenate([existing[k], v]) for k, v in columns.items()}
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp.npz'
+    np.savez_compressed(tmp, **columns)
+
+    try:
+        cursor.executemany(
+            'INSERT INTO ArchivedSpend (user_id, category_id, date, total_amount, receipts) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            _archived_spend(receipts)
+        )
+        for chunk in _chunks([row[0] for row in transactions]):
+            marks = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM Transactions WHERE transaction_id IN ({marks})', chunk)
+        _check_no_items(cursor, receipt_ids, month)
+        for chunk in _chunks(receipt_ids):
+            marks = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM Receipts WHERE receipt_id IN ({marks})', chunk)
+        # SQLite cascades items away with their receipt, so look before as well as after
+        _check_no_items(cursor, receipt_ids, month)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        os.remove(tmp)
+        raise
+
+    os.replace(tmp, path)
+    months = dict(_read_manifest())
+    months[_month_key(month)] = {
+        'receipts': int(len(columns['receipt_id'])),
+        'transactions': int(len(columns['t_transaction_id'])),
+    }
+    _write_manifest(months)
+    return len(receipts)
+
+
+def forget_user(user_id):
+    """Rewrite every archived month without a deleted user's receipts and line items."""
+    months = dict(_read_manifest())
+    changed = False
+    for key in sorted(months):
+        month = date.fromisoformat(key + '-01')
+        cols = read_month(month)
+        mine = cols['user_id'] == int(user_id)
+        if not mine.any():
+            continue
+        changed = True
+        items = np.isin(cols['t_receipt_id'], cols['receipt_id'][mine])
+        kept = {
+            name: values[~items] if name.startswith('t_') else values[~mine]
+            for name, values in cols.items()
+        }
+        path = _month_file(month)
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, **kept)
+        os.replace(tmp, path)
+        months[key] = {
+            'receipts': int(len(kept['receipt_id'])),
+            'transactions': int(len(kept['t_transaction_id'])),
+        }
+    if changed:
+        _write_manifest(months)
+
+
+@archive_cli.command('run')
+@click.option('--months', type=int, default=None,
+              help='Keep this many months hot (defaults to ARCHIVE_AFTER_MONTHS).')
+def run_archive(months):
+    """Archive every month older than the hot horizon."""
+    months = current_app.config['ARCHIVE_AFTER_MONTHS'] if months is None else months
+    cutoff = date.today().replace(day=1) - relativedelta(months=months)
+
+    conn = db.get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT MIN(date) FROM Receipts WHERE date < %s', (cutoff,))
+    row = cursor.fetchone()
+    oldest = _as_date(row[0]).replace(day=1) if row and row[0] else None
+    if oldest is None:
+        click.echo(f'Nothing older than {cutoff.isoformat()}')
+        return
+
+    month = oldest
+    while month < cutoff:
+        moved = archive_month(conn, month)
+        if moved:
+            click.echo(f'Archived {moved} receipts from {_month_key(month)}')
+        month += relativedelta(months=1)
+
+
+@archive_cli.command('status')
+def archive_status():
+    """List archived months and their row counts."""
+    months = _read_manifest()
+    if not months:
+        click.echo('Archive is empty')
+    for key in sorted(months):
+        click.echo(f"{key}  {months[key]['receipts']:>8} receipts  "
+                   f"{months[key]['transactions']:>8} transactions")
@@ -0,0 +1,15 @@
+from src.backends.mysql import MySQLBackend
+from src.backends.sqlite import SQLiteBackend
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+}
+
+
+def get_backend(name):
+    """Instantiate the backend registered under name (mysql or sqlite)."""
+    try:
+        return BACKENDS[name.lower()]()
+    except KeyError:
+        raise ValueError(f'Unknown DB_BACKEND {name!r}, expected one of {", ".join(BACKENDS)}')
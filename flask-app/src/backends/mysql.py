@@ -0,0 +1,121 @@
+import itertools
+import re
+import ssl
+
+import pymysql
+from pymysql.constants import CLIENT
+
+from src.backends.statements import StatementCache, StatementStats
+
+
+# IN lists built per call differ in length, so preparing them would add a
+# cache entry (and a server-side statement) for every length seen
+_IN_LIST = re.compile(r'\bIN\s*\(\s*%s\s*,', re.IGNORECASE)
+
+
+def _to_server_placeholders(query):
+    return query.replace('%%', '\0').replace('%s', '?').replace('\0', '%')
+
+
+class PreparedCursor:
+    """
+    pymysql has no binary-protocol prepare, so SELECTs with parameters run as
+    SQL-level PREPARE once per connection, then SET + EXECUTE in a single
+    round trip. pymysql still escapes the SET values client-side, so this
+    only saves the server's parse. Writes and SELECTs with a placeholder IN
+    list go straight through as text.
+    """
+
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def execute(self, query, params=None):
+        if not params or not query.lstrip()[:6].upper() == 'SELECT' or _IN_LIST.search(query):
+            return self._cursor.execute(query, params)
+
+        name = self._statements.get(query)
+        variables = [f'@pp{i}' for i in range(len(params))]
+        assignments = ', '.join(f'{v} = %s' for v in variables)
+        self._cursor.execute(
+            f'SET {assignments}; EXECUTE {name} USING {", ".join(variables)}',
+            list(params)
+        )
+        # first result is the SET, the rows come from EXECUTE
+        self._cursor.nextset()
+        return self._cursor.rowcount
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+
+class PreparedConnection:
+    """pymysql connection carrying its own server-side statement cache."""
+
+    def __init__(self, conn, capacity, stats):
+        self._conn = conn
+        self._names = itertools.count()
+        self.statements = StatementCache(capacity, self._prepare, stats, release=self._deallocate)
+
+    def _prepare(self, sql):
+        name = f'pp_stmt_{next(self._names)}'
+        with self._conn.cursor() as cursor:
+            cursor.execute(f'PREPARE {name} FROM %s', (_to_server_placeholders(sql),))
+        return name
+
+    def _deallocate(self, name):
+        with self._conn.cursor() as cursor:
+            cursor.execute(f'DEALLOCATE PREPARE {name}')
+
+    def cursor(self):
+        return PreparedCursor(self._conn.cursor(), self.statements)
+
+    def __getattr__(self, attr):
+        return getattr(self._conn, attr)
+
+
+class MySQLBackend:
+    """pymysql connections to MySQL or TiDB, the default backend."""
+
+    name = 'mysql'
+
+    def __init__(self):
+        self.stats = StatementStats()
+
+    def init_app(self, app):
+        pass
+
+    def connect(self, config):
+        kwargs = {
+            'host': config['DB_HOST'],
+            'port': config['DB_PORT'],
+            'user': config['DB_USER'],
+            'password': config['DB_PASSWORD'],
+            'database': config['DB_NAME'],
+        }
+
+        if config.get('DB_SSL'):
+            ctx = ssl.create_default_context()
+            kwargs['ssl'] = ctx
+
+        capacity = config.get('DB_STATEMENT_CACHE_SIZE', 256)
+        # without a cache every query would PREPARE a statement nothing deallocates
+        if not config.get('DB_SERVER_PREPARE') or capacity <= 0:
+            return pymysql.connect(**kwargs)
+
+        kwargs['client_flag'] = CLIENT.MULTI_STATEMENTS
+        return PreparedConnection(pymysql.connect(**kwargs), capacity, self.stats)
+
+    def is_alive(self, conn):
+        # no reconnect: a fresh session would silently lose prepared statements
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except pymysql.Error:
+            return False
@@ -0,0 +1,209 @@
+import calendar
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+
+from src.backends.statements import StatementCache, StatementStats
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'sqlite_schema.sql')
+
+# tuned for a read-heavy single node: WAL lets readers run alongside the writer
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA foreign_keys=ON',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA busy_timeout=5000',
+)
+
+_INTERVAL = re.compile(
+    r'([\w.]+)\s*([-+])\s*INTERVAL\s+(\w+\([^()]*\)|[\w.?]+)\s+(DAY|MONTH|YEAR)S?\b',
+    re.IGNORECASE
+)
+_INSERT_IGNORE = re.compile(r'\bINSERT\s+IGNORE\b', re.IGNORECASE)
+_DROP_TEMPORARY = re.compile(r'\bDROP\s+TEMPORARY\s+TABLE\b', re.IGNORECASE)
+_INSERT = re.compile(r'\s*INSERT\b', re.IGNORECASE)
+
+# MySQL DATE_FORMAT specifiers that the queries use, mapped to strftime
+_MYSQL_FORMATS = {
+    '%Y': '%Y', '%y': '%y', '%m': '%m', '%c': '{month}', '%d': '%d', '%e': '{day}',
+    '%M': '%B', '%b': '%b', '%W': '%A', '%a': '%a', '%H': '%H', '%i': '%M', '%s': '%S',
+}
+
+
+def translate(query):
+    """Rewrite the MySQL dialect used by the routes into SQLite."""
+    query = query.replace('%%', '\0').replace('%s', '?').replace('\0', '%')
+    query = _INTERVAL.sub(
+        lambda m: f"DATE({m.group(1)}, '{m.group(2)}' || ({m.group(3)}) || ' {m.group(4).lower()}s')",
+        query
+    )
+    query = _DROP_TEMPORARY.sub('DROP TABLE', query)
+    return _INSERT_IGNORE.sub('INSERT OR IGNORE', query)
+
+
+def _to_date(value):
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _weekday(value):
+    d = _to_date(value)
+    return d.weekday() if d else None
+
+
+def _year(value):
+    d = _to_date(value)
+    return d.year if d else None
+
+
+def _month(value):
+    d = _to_date(value)
+    return d.month if d else None
+
+
+def _day(value):
+    d = _to_date(value)
+    return d.day if d else None
+
+
+def _monthname(value):
+    d = _to_date(value)
+    return calendar.month_name[d.month] if d else None
+
+
+def _date_format(value, fmt):
+    d = _to_date(value)
+    if d is None:
+        return None
+    out = re.sub('%.', lambda m: _MYSQL_FORMATS.get(m.group(0), m.group(0)), fmt)
+    return d.strftime(out).format(month=d.month, day=d.day)
+
+
+def _convert_decimal(raw):
+    return Decimal(raw.decode())
+
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(' '))
+sqlite3.register_converter('DATE', lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter('DECIMAL', _convert_decimal)
+
+
+class SQLiteCursor:
+    """Cursor that speaks the pymysql subset the routes rely on."""
+
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+        self._lastrowid = None
+
+    def execute(self, query, params=None):
+        self._cursor.execute(self._statements.get(query), tuple(params or ()))
+        self._lastrowid = self._cursor.lastrowid
+        # like MySQL, a multi-row INSERT reports the id of its first row, not its last
+        if self._cursor.rowcount > 1 and _INSERT.match(query):
+            self._lastrowid -= self._cursor.rowcount - 1
+        return self._cursor.rowcount
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(self._statements.get(query), [tuple(p) for p in seq_of_params])
+        self._lastrowid = self._cursor.lastrowid
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def lastrowid(self):
+        return self._lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    Keeps translated SQL in a per-connection StatementCache. Because cache keys
+    are normalized, sqlite3's own compiled-statement cache (keyed on exact
+    text) also hits across requests once the connection is pooled.
+    """
+
+    def __init__(self, conn, capacity, stats):
+        self._conn = conn
+        self.statements = StatementCache(capacity, translate, stats)
+
+    def cursor(self):
+        return SQLiteCursor(self._conn.cursor(), self.statements)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteBackend:
+    """Embedded backend for tests, benchmarks and single-node deployments."""
+
+    name = 'sqlite'
+
+    def __init__(self):
+        self.stats = StatementStats()
+
+    def init_app(self, app):
+        if app.config.get('DB_INIT_SCHEMA', True):
+            conn = self._open(app.config)
+            with open(SCHEMA_PATH) as f:
+                conn.executescript(f.read())
+            conn.close()
+
+    def _open(self, config):
+        # pooled connections move between request threads, hence check_same_thread
+        conn = sqlite3.connect(
+            config['DB_PATH'],
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            cached_statements=config.get('DB_STATEMENT_CACHE_SIZE', 256),
+        )
+        for function, n_args, impl in (
+            ('WEEKDAY', 1, _weekday), ('YEAR', 1, _year), ('MONTH', 1, _month),
+            ('DAY', 1, _day), ('MONTHNAME', 1, _monthname), ('DATE_FORMAT', 2, _date_format),
+        ):
+            conn.create_function(function, n_args, impl, deterministic=True)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def connect(self, config):
+        return SQLiteConnection(
+            self._open(config), config.get('DB_STATEMENT_CACHE_SIZE', 256), self.stats
+        )
+
+    def is_alive(self, conn):
+        return True
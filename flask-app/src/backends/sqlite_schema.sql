@@ -0,0 +1,223 @@
+-- SQLite mirror of db/main_database.sql: tables, indexes and the fixed category list
+
+CREATE TABLE IF NOT EXISTS `Groups` (
+    group_name VARCHAR(255) NOT NULL,
+    group_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    admin_user_id INT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id INT,
+    email VARCHAR(255) NOT NULL,
+    first_name VARCHAR(50) NOT NULL,
+    middle_name VARCHAR(50),
+    last_name VARCHAR(50),
+    password VARCHAR(255) NOT NULL,
+    FOREIGN KEY (group_id) REFERENCES `Groups`(group_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_users_email ON Users (email);
+CREATE INDEX IF NOT EXISTS idx_users_group ON Users (group_id);
+
+CREATE TABLE IF NOT EXISTS Stores (
+    store_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    store_name VARCHAR(100) NOT NULL,
+    zip_code VARCHAR(10) NOT NULL,
+    street_address VARCHAR(255) NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    state VARCHAR(100) NOT NULL,
+    is_subscription BOOLEAN DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS Tags (
+    tag_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tag_name VARCHAR(50) NOT NULL,
+    user_id INT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS Categories (
+    category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category_name VARCHAR(50) NOT NULL UNIQUE,
+    category_description VARCHAR(255) UNIQUE
+);
+
+INSERT OR IGNORE INTO Categories (category_name, category_description)
+VALUES
+('Food & Drink', 'Expenses for groceries, restaurants, cafes, and beverages'),
+('Shopping', 'Expenses for clothing, electronics, household items, and general retail'),
+('Entertainment', 'Expenses for streaming, movies, games, hobbies, and leisure activities'),
+('Transportation', 'Expenses for gas, public transit, rideshares, and vehicle maintenance'),
+('Health', 'Expenses for medical care, prescriptions, fitness, and personal wellness'),
+('Travel', 'Expenses for flights, hotels, vacations, and trip-related costs'),
+('Services', 'Expenses for utilities, insurance, subscriptions, rent, and professional services');
+
+CREATE TABLE IF NOT EXISTS Receipts (
+    receipt_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date DATE NOT NULL,
+    total_amount DECIMAL(10,2) NOT NULL,
+    user_id INT NOT NULL,
+    store_id INT NOT NULL,
+    tag_id INT,
+    category_id INT,
+    category_source VARCHAR(20) DEFAULT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (store_id) REFERENCES Stores(store_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (tag_id) REFERENCES Tags(tag_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_receipts_user_category_date ON Receipts (user_id, category_id, date);
+CREATE INDEX IF NOT EXISTS idx_receipts_user_date ON Receipts (user_id, date);
+CREATE INDEX IF NOT EXISTS idx_receipts_date ON Receipts (date);
+
+CREATE TABLE IF NOT EXISTS Transactions (
+    transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    unit_cost DECIMAL(10,2) NOT NULL,
+    quantity INT NOT NULL,
+    receipt_id INT NOT NULL,
+    item_name VARCHAR(100) NOT NULL,
+    FOREIGN KEY (receipt_id) REFERENCES Receipts(receipt_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_receipt ON Transactions (receipt_id);
+
+CREATE TABLE IF NOT EXISTS Notifications (
+    notification_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    `repeat` VARCHAR(50) NOT NULL,
+    notification_time VARCHAR(255) NOT NULL,
+    notification_date DATE NOT NULL,
+    Message VARCHAR(255) NOT NULL,
+    user_id INT NOT NULL,
+    budget_id INT,
+    receipt_id INT,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (receipt_id) REFERENCES Receipts(receipt_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS Spending_goals (
+    goal_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    current_amount DECIMAL(10,2) NOT NULL,
+    target_amount DECIMAL(10,2) NOT NULL,
+    Month VARCHAR(10) NOT NULL,
+    user_id INT NOT NULL,
+    notification_id INT,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (notification_id) REFERENCES Notifications(notification_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS Budgets (
+    budget_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    amount DECIMAL(10,2) NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    notification_threshold DECIMAL(10,2),
+    category_id INT,
+    notification_id INT,
+    user_id INT NOT NULL,
+    FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (notification_id) REFERENCES Notifications(notification_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS BudgetProgress (
+    budget_id INT PRIMARY KEY,
+    spent DECIMAL(12,2) NOT NULL DEFAULT 0,
+    last_receipt_id INT,
+    notified BOOLEAN NOT NULL DEFAULT FALSE,
+    FOREIGN KEY (budget_id) REFERENCES Budgets(budget_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ArchivedSpend (
+    user_id INT NOT NULL,
+    category_id INT,
+    date DATE NOT NULL,
+    total_amount DECIMAL(12,2) NOT NULL,
+    receipts INT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_archived_spend_user_category_date ON ArchivedSpend (user_id, category_id, date);
+CREATE INDEX IF NOT EXISTS idx_archived_spend_user_date ON ArchivedSpend (user_id, date);
+
+CREATE TABLE IF NOT EXISTS RecurringCharges (
+    user_id INT NOT NULL,
+    store_id INT NOT NULL,
+    cadence VARCHAR(20) NOT NULL,
+    interval_days DECIMAL(6,1) NOT NULL,
+    typical_amount DECIMAL(10,2) NOT NULL,
+    monthly_cost DECIMAL(10,2) NOT NULL,
+    occurrences INT NOT NULL,
+    last_date DATE NOT NULL,
+    next_date DATE NOT NULL,
+    confidence DECIMAL(4,3) NOT NULL,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    PRIMARY KEY (user_id, store_id),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (store_id) REFERENCES Stores(store_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS RecurringScans (
+    user_id INT PRIMARY KEY,
+    receipt_count INT NOT NULL,
+    last_receipt_id INT NOT NULL,
+    scanned_at DATETIME NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Expected spend per user, category and day of the month, refitted by `flask forecast run`
+CREATE TABLE IF NOT EXISTS SpendCurves (
+    user_id INT NOT NULL,
+    category_id INT NOT NULL,
+    day SMALLINT NOT NULL,
+    expected_amount DECIMAL(12,4) NOT NULL,
+    PRIMARY KEY (user_id, category_id, day),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Median and MAD of log receipt amounts per user and category, for anomaly scoring
+CREATE TABLE IF NOT EXISTS SpendStats (
+    user_id INT NOT NULL,
+    category_id INT NOT NULL,
+    observations INT NOT NULL,
+    log_median DOUBLE NOT NULL,
+    log_mad DOUBLE NOT NULL,
+    PRIMARY KEY (user_id, category_id),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Line-item spend per user, normalized item name, store and day, for price history
+CREATE TABLE IF NOT EXISTS ItemPrices (
+    user_id INT NOT NULL,
+    item_key VARCHAR(100) NOT NULL,
+    store_id INT NOT NULL,
+    date DATE NOT NULL,
+    item_name VARCHAR(100) NOT NULL,
+    quantity INT NOT NULL,
+    spent DECIMAL(12,2) NOT NULL,
+    min_unit_cost DECIMAL(10,2) NOT NULL,
+    PRIMARY KEY (user_id, item_key, store_id, date),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE,
+    FOREIGN KEY (store_id) REFERENCES Stores(store_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_item_prices_store_date ON ItemPrices (user_id, store_id, date);
+
+-- Per-user sequence counters for ChangeLog
+CREATE TABLE IF NOT EXISTS ChangeCursors (
+    user_id INT NOT NULL PRIMARY KEY,
+    last_seq BIGINT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Append-only log of receipt and budget changes per user, for the change feed
+CREATE TABLE IF NOT EXISTS ChangeLog (
+    user_id INT NOT NULL,
+    seq BIGINT NOT NULL,
+    entity VARCHAR(20) NOT NULL,
+    entity_id INT,
+    action VARCHAR(10) NOT NULL,
+    payload TEXT NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, seq),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_change_log_created ON ChangeLog (created_at);
@@ -0,0 +1,81 @@
+import re
+import threading
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(query):
+    """Collapse whitespace so f-string and triple-quoted variants share one key."""
+    return _WHITESPACE.sub(' ', query).strip()
+
+
+class StatementStats:
+    """Hit/miss counters shared by every connection of one backend."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def record(self, hit=False, evicted=False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if evicted:
+                self.evictions += 1
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class StatementCache:
+    """
+    Per-connection LRU of normalized SQL -> prepared statement handle.
+    prepare(sql) builds the handle on a miss and release(handle) drops it on
+    eviction; a capacity of 0 disables caching and prepares every call.
+    """
+
+    def __init__(self, capacity, prepare, stats, release=None):
+        self.capacity = capacity
+        self._prepare = prepare
+        self._release = release
+        self._stats = stats
+        self._entries = OrderedDict()
+
+    def get(self, query):
+        key = normalize(query)
+        if self.capacity <= 0:
+            self._stats.record(hit=False)
+            return self._prepare(key)
+
+        handle = self._entries.get(key)
+        if handle is not None:
+            self._entries.move_to_end(key)
+            self._stats.record(hit=True)
+            return handle
+
+        handle = self._prepare(key)
+        self._entries[key] = handle
+        evicted = len(self._entries) > self.capacity
+        if evicted:
+            _, old = self._entries.popitem(last=False)
+            if self._release:
+                self._release(old)
+        self._stats.record(hit=False, evicted=evicted)
+        return handle
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
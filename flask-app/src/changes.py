@@ -0,0 +1,164 @@
+import json
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import click
+from flask import current_app, g
+from flask.cli import AppGroup
+
+from src import db
+from src.money import as_float, to_cents
+
+# Receipt and budget writes append a row to ChangeLog in their own
+# transaction, numbered per user by ChangeCursors, so a client holding the
+# last sequence number it saw can ask for exactly what changed since. Taking
+# the next number locks the user's ChangeCursors row until commit, so one
+# user's changes become visible in sequence order with no gaps. The change
+# feed serves the log by pull and as a Server-Sent Events stream; a ChangeBus
+# wakes waiting streams in this process as soon as a request that logged a
+# change finishes, and streams in other processes pick it up on their next poll.
+
+changes_cli = AppGroup('changes', help='Maintain the change log.')
+
+ENTITY_LENGTH = 20
+
+
+def _plain(value):
+    """JSON-friendly copy of a payload value: amounts as numbers, dates as ISO strings."""
+    if isinstance(value, Decimal):
+        return as_float(to_cents(value))
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _next_seq(cursor, user_id):
+    cursor.execute('UPDATE ChangeCursors SET last_seq = last_seq + 1 WHERE user_id = %s', (user_id,))
+    if cursor.rowcount == 0:
+        # first change for this user; IGNORE covers a concurrent first change
+        cursor.execute('INSERT IGNORE INTO ChangeCursors (user_id, last_seq) VALUES (%s, 0)', (user_id,))
+        cursor.execute('UPDATE ChangeCursors SET last_seq = last_seq + 1 WHERE user_id = %s', (user_id,))
+    cursor.execute('SELECT last_seq FROM ChangeCursors WHERE user_id = %s', (user_id,))
+    return int(cursor.fetchone()[0])
+
+
+def record(cursor, user_id, entity, entity_id, action, data=None):
+    """
+    Append one change for a user on the caller's cursor without committing;
+    waiting streams are woken when the request finishes. Returns its seq.
+    """
+    seq = _next_seq(cursor, user_id)
+    cursor.execute(
+        'INSERT INTO ChangeLog (user_id, seq, entity, entity_id, action, payload, created_at) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+        (user_id, seq, entity[:ENTITY_LENGTH], entity_id, action,
+         json.dumps(_plain(data or {}), sort_keys=True), datetime.now().replace(microsecond=0))
+    )
+    g.setdefault('changed_users', set()).add(int(user_id))
+    return seq
+
+
+def latest_seq(cursor, user_id):
+    """The last seq handed out for a user, 0 before their first change."""
+    cursor.execute('SELECT last_seq FROM ChangeCursors WHERE user_id = %s', (user_id,))
+    row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+
+def read_changes(cursor, user_id, after, limit):
+    """
+    Up to limit changes after seq, oldest first, with the seq to resume
+    from and whether the client has to reload: true when changes after its
+    seq were pruned, or when its seq is ahead of the log.
+    """
+    cursor.execute('''
+        SELECT seq, entity, entity_id, action, payload, created_at
+        FROM ChangeLog
+        WHERE user_id = %s AND seq > %s
+        ORDER BY seq
+        LIMIT %s
+    ''', (user_id, after, limit))
+    changes = [
+        {'seq': int(seq), 'entity': entity, 'entity_id': entity_id, 'action': action,
+         'data': json.loads(payload), 'created_at': str(created_at)}
+        for seq, entity, entity_id, action, payload, created_at in cursor.fetchall()
+    ]
+    # sequence numbers have no gaps, so a missing after + 1 was pruned
+    if changes:
+        return changes, changes[-1]['seq'], changes[0]['seq'] != after + 1
+    last = latest_seq(cursor, user_id)
+    return changes, last, last != after
+
+
+class ChangeBus:
+    """Per-user change counters that waiting streams block on."""
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._versions = {}
+        self.published = 0
+        self.waiting = 0
+
+    def version(self, user_id):
+        with self._changed:
+            return self._versions.get(int(user_id), 0)
+
+    def publish(self, user_ids):
+        with self._changed:
+            for user_id in user_ids:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self.published += 1
+            self._changed.notify_all()
+
+    def wait(self, user_id, version, timeout):
+        """Block until the user's version moves past version or timeout passes; returns the current one."""
+        user_id = int(user_id)
+        with self._changed:
+            self.waiting += 1
+            try:
+                self._changed.wait_for(lambda: self._versions.get(user_id, 0) != version, timeout)
+            finally:
+                self.waiting -= 1
+            return self._versions.get(user_id, 0)
+
+    def stats(self):
+        return {'waiting': self.waiting, 'published': self.published}
+
+
+def change_bus():
+    """The app's ChangeBus, created on first use."""
+    bus = current_app.extensions.get('change_bus')
+    if bus is None:
+        bus = current_app.extensions.setdefault('change_bus', ChangeBus())
+    return bus
+
+
+def publish_changes(exc=None):
+    """teardown_request hook: wake the streams of every user this request logged a change for."""
+    user_ids = g.pop('changed_users', None)
+    if user_ids:
+        # a rolled-back change only costs the stream an empty read
+        change_bus().publish(user_ids)
+
+
+def prune(cursor, days):
+    """Delete changes older than days on the caller's cursor without committing. Returns the count."""
+    cursor.execute('DELETE FROM ChangeLog WHERE created_at < %s', (datetime.now() - timedelta(days=days),))
+    return cursor.rowcount
+
+
+@changes_cli.command('prune')
+@click.option('--days', type=int, default=None,
+              help='Keep this many days of changes (defaults to CHANGE_LOG_RETENTION_DAYS).')
+def prune_command(days):
+    """Delete changes older than the retention window."""
+    days = current_app.config['CHANGE_LOG_RETENTION_DAYS'] if days is None else days
+    conn = db.get_db()
+    pruned = prune(conn.cursor(), days)
+    conn.commit()
+    click.echo(f'Pruned {pruned} changes older than {days} days')
@@ -1,6 +1,9 @@
 from flask import Blueprint, request
 from src import db
 from src.helpers import build_json_response, success_response, error_response, validate_fields
+from src.purchases.columnar import forget
+from src.purchases.item_search import forget_items
+from src.purchases.receipts import purge_receipts, receipts_purged
 
 descriptors = Blueprint('descriptors', __name__)
 
@@ -84,8 +87,13 @@ def delete_tag(tag_id):
     try:
         query = 'DELETE FROM Tags WHERE tag_id = %s'
         cursor = db.get_db().cursor()
+        purged = purge_receipts(cursor, 'tag_id', tag_id)
+        receipts_purged(cursor, purged)
         cursor.execute(query, (tag_id,))
         db.get_db().commit()
+        forget()
+        for user_id in {row[1] for row in purged}:
+            forget_items(user_id)
         return success_response({'message': 'Tag deleted successfully'})
     except Exception as e:
         return error_response(str(e), 500)
@@ -0,0 +1,192 @@
+import calendar
+from datetime import date, datetime, timedelta
+
+import click
+import numpy as np
+from flask.cli import AppGroup
+
+from src import db
+from src.money import to_cents
+
+# Spend forecasts come from each user's historical daily curve: for every
+# category, the average spend on each day of the month over the last
+# HISTORY_MONTHS complete months. The nightly `flask forecast run` fits the
+# curves for a batch of users at once with NumPy and stores them in
+# SpendCurves; requests only add the expected spend of the remaining days to
+# what has already been spent.
+
+forecast_cli = AppGroup('forecast', help='Fit the spend curves behind budget forecasts.')
+
+HISTORY_MONTHS = 6
+FIT_BATCH_USERS = 200
+# 4 placeholders a row stays under SQLite's 999 bound-parameter limit
+INSERT_CHUNK_ROWS = 240
+
+
+def _month_starts(today, months):
+    """First days of the `months` complete months before today's month, oldest first."""
+    starts = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+        starts.append(date(year, month, 1))
+    return starts[::-1]
+
+
+def fit_curves(user_ids, category_ids, days, cents, today, months=HISTORY_MONTHS):
+    """
+    Expected cents per day of month for every (user, category) in the daily
+    spend columns (NumPy arrays of user id, category id, day ordinal and
+    cents). Each user's average only counts months from their first receipt
+    in the window on, so a new user isn't diluted by months before they
+    joined. Returns (users, categories, curves) with curves[i, d - 1] the
+    expected spend of users[i]/categories[i] on day d.
+    """
+    empty = np.array([], dtype=np.int64)
+    if not len(days):
+        return empty, empty, np.zeros((0, 31))
+
+    starts = _month_starts(today, months)
+    ordinals = [start.toordinal() for start in starts]
+    month = np.searchsorted(ordinals, days, side='right') - 1
+    in_window = (month >= 0) & (days < today.replace(day=1).toordinal())
+    user_ids, category_ids, days, cents, month = (
+        user_ids[in_window], category_ids[in_window], days[in_window], cents[in_window], month[in_window]
+    )
+    if not len(days):
+        return empty, empty, np.zeros((0, 31))
+    day = days - np.take(ordinals, month)
+
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    pairs, pair_index = np.unique(np.stack([user_ids, category_ids], axis=1), axis=0, return_inverse=True)
+    pair_index = pair_index.ravel()
+    pair_user = np.searchsorted(users, pairs[:, 0])
+
+    # spend per (pair, month, day) via one bincount over the flattened index
+    spend = np.bincount(
+        (pair_index * months + month) * 31 + day, weights=cents.astype(np.float64),
+        minlength=len(pairs) * months * 31,
+    ).reshape(len(pairs), months, 31)
+
+    # months each user counts: from their first month in the window on
+    first = np.full(len(users), months)
+    np.minimum.at(first, user_index, month)
+    counted = np.arange(months)[None, :] >= first[:, None]
+    has_day = np.array([[d < calendar.monthrange(s.year, s.month)[1] for d in range(31)] for s in starts])
+    # how many counted months had each day of the month, per user
+    observed = counted.astype(np.float64) @ has_day
+
+    curves = spend.sum(axis=1) / np.maximum(observed[pair_user], 1)
+    return pairs[:, 0], pairs[:, 1], curves
+
+
+def remaining_days(after, end):
+    """Count of dates in (after, end] falling on each day of the month, as a length-31 array."""
+    counts = np.zeros(31)
+    current = after + timedelta(days=1)
+    while current <= end:
+        last = current.replace(day=calendar.monthrange(current.year, current.month)[1])
+        stop = min(end, last)
+        counts[current.day - 1:stop.day] += 1
+        current = stop + timedelta(days=1)
+    return counts
+
+
+def load_curves(cursor, user_id):
+    """{category_id: length-31 array of expected cents} for a user."""
+    cursor.execute(
+        'SELECT category_id, day, expected_amount FROM SpendCurves WHERE user_id = %s', (user_id,)
+    )
+    curves = {}
+    for category_id, day, amount in cursor.fetchall():
+        curve = curves.setdefault(category_id, np.zeros(31))
+        curve[int(day) - 1] = float(amount) * 100
+    return curves
+
+
+def project(spent_cents, curve, start, end, today):
+    """
+    Projected cents for a start..end period: what has been spent plus the
+    curve's expected spend on the period's days after today. None without a curve.
+    """
+    if curve is None:
+        return None
+    after = max(today, start - timedelta(days=1))
+    return int(round(spent_cents + float(remaining_days(after, end) @ curve)))
+
+
+def _fit_batch(cursor, user_ids, today):
+    starts = _month_starts(today, HISTORY_MONTHS)
+    marks = ', '.join(['%s'] * len(user_ids))
+    cursor.execute(f'''
+        SELECT user_id, category_id, date, SUM(total_amount)
+        FROM Receipts
+        WHERE user_id IN ({marks}) AND category_id IS NOT NULL
+          AND date >= %s AND date < %s
+        GROUP BY user_id, category_id, date
+    ''', (*user_ids, starts[0], today.replace(day=1)))
+    rows = cursor.fetchall()
+
+    users, categories, curves = fit_curves(
+        np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((_as_date(r[2]).toordinal() for r in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((to_cents(r[3]) for r in rows), dtype=np.int64, count=len(rows)),
+        today,
+    )
+
+    cursor.execute(f'DELETE FROM SpendCurves WHERE user_id IN ({marks})', user_ids)
+    # only days with expected spend are stored; missing days read back as zero
+    pair, day = np.nonzero(np.round(curves) > 0)
+    values = []
+    for i, d in zip(pair.tolist(), day.tolist()):
+        values.append((int(users[i]), int(categories[i]), d + 1, round(curves[i, d] / 100, 4)))
+    for i in range(0, len(values), INSERT_CHUNK_ROWS):
+        chunk = values[i:i + INSERT_CHUNK_ROWS]
+        cursor.execute(
+            'INSERT INTO SpendCurves (user_id, category_id, day, expected_amount) VALUES '
+            + ', '.join(['(%s, %s, %s, %s)'] * len(chunk)),
+            [v for row in chunk for v in row]
+        )
+    return len(np.unique(users))
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def fit(cursor, today=None):
+    """
+    Refit the spend curves of every user with receipts in the history
+    window, FIT_BATCH_USERS at a time, and drop the curves of users who no
+    longer have any. Writes on the caller's cursor without committing.
+    Returns the number of users fitted.
+    """
+    today = today or date.today()
+    window_start = _month_starts(today, HISTORY_MONTHS)[0]
+    cursor.execute(
+        'SELECT DISTINCT user_id FROM Receipts WHERE date >= %s AND date < %s ORDER BY user_id',
+        (window_start, today.replace(day=1))
+    )
+    user_ids = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute('''
+        DELETE FROM SpendCurves WHERE user_id NOT IN (
+            SELECT DISTINCT user_id FROM Receipts WHERE date >= %s AND date < %s
+        )
+    ''', (window_start, today.replace(day=1)))
+
+    fitted = 0
+    for i in range(0, len(user_ids), FIT_BATCH_USERS):
+        fitted += _fit_batch(cursor, user_ids[i:i + FIT_BATCH_USERS], today)
+    return fitted
+
+
+@forecast_cli.command('run')
+def run_command():
+    """Refit every user's spend curves (run nightly)."""
+    started = datetime.now()
+    conn = db.get_db()
+    fitted = fit(conn.cursor())
+    conn.commit()
+    click.echo(f'Fitted spend curves for {fitted} users in {(datetime.now() - started).total_seconds():.1f}s')
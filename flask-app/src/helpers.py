@@ -1,4 +1,14 @@
-from flask import jsonify, make_response, request
+import gzip
+import hashlib
+
+from flask import current_app, jsonify, make_response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html'}
 
 
 def build_json_response(cursor, rows):
@@ -34,3 +44,65 @@ def validate_fields(required_fields):
         return None, error_response(f'Missing required fields: {", ".join(missing)}', 400)
 
     return data, None
+
+
+def _payload_etag(body):
+    """Strong validator for an uncompressed response body."""
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def _pick_encoding():
+    """Choose br or gzip from Accept-Encoding, None if neither is accepted."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body)
+    return gzip.compress(body, compresslevel=current_app.config['COMPRESS_LEVEL'])
+
+
+def finalize_response(response):
+    """
+    after_request hook: tags successful GETs with a strong ETag, answers
+    If-None-Match with 304, and compresses large bodies per Accept-Encoding.
+    """
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    if response.direct_passthrough or response.is_streamed:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    body = response.get_data()
+    etag = _payload_etag(body)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+
+    # the client may echo back the tag of any encoding it was sent earlier
+    client_tags = {t.split('-')[0] for t in request.if_none_match.as_set()}
+    if etag in client_tags or request.if_none_match.star_tag:
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Type', None)
+        response.headers.pop('Content-Length', None)
+        response.set_etag(etag)
+        return response
+
+    encoding = None
+    if len(body) >= current_app.config['COMPRESS_MIN_SIZE']:
+        encoding = _pick_encoding()
+
+    if encoding:
+        response.set_data(_compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f'{etag}-{encoding}')
+    else:
+        response.set_etag(etag)
+
+    return response
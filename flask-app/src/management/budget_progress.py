@@ -0,0 +1,167 @@
+from datetime import date, datetime
+
+from src.money import from_cents, normalize, to_cents
+
+# BudgetProgress mirrors SUM(total_amount) per budget. Callers pass their own
+# cursor and commit, so updates land in the same transaction as the receipt.
+
+
+def _budgets_covering(cursor, user_id, category_id, receipt_date):
+    """Budget ids of this user/category whose window contains the date."""
+    if category_id is None:
+        return []
+    cursor.execute('''
+        SELECT budget_id FROM Budgets
+        WHERE user_id = %s AND category_id = %s
+          AND %s BETWEEN start_date AND end_date
+    ''', (user_id, category_id, receipt_date))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def apply_receipt_delta(cursor, user_id, category_id, receipt_date, delta, receipt_id):
+    """Add delta (negative for removals) to every budget the receipt falls in."""
+    return apply_receipt_changes(cursor, user_id, [(category_id, receipt_date, delta)], receipt_id)
+
+
+def apply_receipt_changes(cursor, user_id, changes, receipt_id):
+    """
+    Apply several (category_id, date, delta) changes for one receipt, netting
+    them per budget first so an edit inside the same budget doesn't clear and
+    re-raise its alert. Returns the ids of budgets that crossed their threshold.
+    """
+    deltas = {}
+    for category_id, receipt_date, delta in changes:
+        for budget_id in _budgets_covering(cursor, user_id, category_id, receipt_date):
+            deltas[budget_id] = deltas.get(budget_id, 0) + to_cents(delta)
+
+    return _add_spend(cursor, deltas, receipt_id)
+
+
+def _add_spend(cursor, deltas, receipt_id):
+    """Apply {budget_id: cents} to BudgetProgress and check the thresholds."""
+    if not deltas:
+        return []
+
+    for budget_id, delta in deltas.items():
+        cursor.execute(
+            'UPDATE BudgetProgress SET spent = spent + %s, last_receipt_id = %s '
+            'WHERE budget_id = %s',
+            (from_cents(delta), receipt_id, budget_id)
+        )
+    return check_thresholds(cursor, list(deltas))
+
+
+def _as_date(value):
+    # SQLite hands DATE columns back as ISO strings
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def apply_receipt_batch(cursor, user_id, changes, receipt_id):
+    """
+    apply_receipt_changes for many receipts of one user, e.g. a statement
+    import: the user's budgets are read once and matched in Python instead
+    of queried per receipt. receipt_id is recorded as last_receipt_id.
+    """
+    cursor.execute(
+        'SELECT budget_id, category_id, start_date, end_date FROM Budgets WHERE user_id = %s',
+        (user_id,)
+    )
+    budgets = [
+        (budget_id, category_id, _as_date(start), _as_date(end))
+        for budget_id, category_id, start, end in cursor.fetchall()
+    ]
+    if not budgets:
+        return []
+
+    deltas = {}
+    for category_id, receipt_date, delta in changes:
+        for budget_id, budget_category, start, end in budgets:
+            if budget_category == category_id and start <= _as_date(receipt_date) <= end:
+                deltas[budget_id] = deltas.get(budget_id, 0) + to_cents(delta)
+
+    return _add_spend(cursor, deltas, receipt_id)
+
+
+def refresh_budget_progress(cursor, budget_id):
+    """
+    Recompute one budget's spend from Receipts plus ArchivedSpend, used when a
+    budget is created or edited.
+    """
+    cursor.execute('''
+        SELECT COALESCE(SUM(r.total_amount), 0) + COALESCE((
+                   SELECT SUM(a.total_amount)
+                   FROM Budgets ab
+                   JOIN ArchivedSpend a ON a.user_id = ab.user_id
+                       AND a.category_id = ab.category_id
+                       AND a.date BETWEEN ab.start_date AND ab.end_date
+                   WHERE ab.budget_id = %s
+               ), 0),
+               MAX(r.receipt_id)
+        FROM Budgets b
+        JOIN Receipts r ON r.user_id = b.user_id
+            AND r.category_id = b.category_id
+            AND r.date BETWEEN b.start_date AND b.end_date
+        WHERE b.budget_id = %s
+    ''', (budget_id, budget_id))
+    row = cursor.fetchone()
+    spent, last_receipt_id = (row[0], row[1]) if row else (0, None)
+
+    # keep notified: check_thresholds clears it only if the edit took spend back under
+    cursor.execute(
+        'INSERT IGNORE INTO BudgetProgress (budget_id, spent, notified) VALUES (%s, 0, FALSE)',
+        (budget_id,)
+    )
+    cursor.execute(
+        'UPDATE BudgetProgress SET spent = %s, last_receipt_id = %s WHERE budget_id = %s',
+        (spent, last_receipt_id, budget_id)
+    )
+    return check_thresholds(cursor, [budget_id])
+
+
+def check_thresholds(cursor, budget_ids):
+    """
+    Insert a Notifications row for each budget whose spend just reached its
+    threshold (or its amount when no threshold is set). The notified flag
+    resets once spend drops back under, so a later crossing alerts again.
+    Returns the ids of budgets that were notified.
+    """
+    placeholders = ', '.join(['%s'] * len(budget_ids))
+    cursor.execute(f'''
+        SELECT b.budget_id, b.user_id, b.amount,
+               COALESCE(b.notification_threshold, b.amount) as threshold,
+               bp.spent, bp.notified, c.category_name
+        FROM Budgets b
+        JOIN BudgetProgress bp ON bp.budget_id = b.budget_id
+        LEFT JOIN Categories c ON b.category_id = c.category_id
+        WHERE b.budget_id IN ({placeholders})
+    ''', budget_ids)
+    rows = cursor.fetchall()
+
+    now = datetime.now()
+    crossed, cleared = [], []
+    for budget_id, user_id, amount, threshold, spent, notified, category_name in rows:
+        spent = normalize(spent)
+        reached = to_cents(spent) >= to_cents(threshold)
+        if reached and not notified:
+            cursor.execute(
+                'INSERT INTO Notifications '
+                '(`repeat`, notification_time, notification_date, Message, user_id, budget_id) '
+                'VALUES (%s, %s, %s, %s, %s, %s)',
+                (
+                    'never', now.strftime('%H:%M:%S'), now.date(),
+                    f'{category_name or "Budget"} spending reached ${spent} of your ${amount} budget',
+                    user_id, budget_id
+                )
+            )
+            crossed.append(budget_id)
+        elif not reached and notified:
+            cleared.append(budget_id)
+
+    for ids, flag in ((crossed, True), (cleared, False)):
+        if ids:
+            marks = ', '.join(['%s'] * len(ids))
+            cursor.execute(
+                f'UPDATE BudgetProgress SET notified = %s WHERE budget_id IN ({marks})',
+                [flag] + ids
+            )
+    return crossed
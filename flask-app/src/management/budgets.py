@@ -1,12 +1,24 @@
 from src import db
+from src.admission import admit
+from src.changes import record
 from src.helpers import build_json_response, success_response, error_response, validate_fields
 from src.management.management import management
+from src.management.budget_progress import refresh_budget_progress
+from src.money import as_float, to_cents
+from src.singleflight import coalesce
+
+
+def _budget_owner(cursor, budget_id):
+    cursor.execute('SELECT user_id FROM Budgets WHERE budget_id = %s', (budget_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
 
 @management.route('/budgets/<category_id>', methods=['GET'])
 def get_budget_of_category(category_id):
     """Fetch all budgets tied to a specific category."""
     try:
-        cursor = db.get_db().cursor()
+        cursor = db.get_read_db().cursor()
         cursor.execute('SELECT * FROM Budgets WHERE category_id = %s', (category_id,))
         data = build_json_response(cursor, cursor.fetchall())
         return success_response(data)
@@ -35,6 +47,12 @@ def create_budget(category_id):
         )
         cursor = db.get_db().cursor()
         cursor.execute(query, values)
+        budget_id = cursor.lastrowid
+        refresh_budget_progress(cursor, budget_id)
+        record(cursor, the_data['user_id'], 'budget', budget_id, 'create', {
+            'amount': as_float(to_cents(the_data['amount'])), 'start_date': the_data['start_date'],
+            'end_date': the_data['end_date'], 'category_id': int(category_id),
+        })
         db.get_db().commit()
         return success_response({'message': 'Budget created successfully'}, 201)
     except Exception as e:
@@ -63,6 +81,14 @@ def update_budget(budget_id):
         )
         cursor = db.get_db().cursor()
         cursor.execute(query, values)
+        refresh_budget_progress(cursor, budget_id)
+        owner = _budget_owner(cursor, budget_id)
+        if owner is not None:
+            record(cursor, owner, 'budget', int(budget_id), 'update', {
+                'amount': as_float(to_cents(the_data['amount'])), 'start_date': the_data['start_date'],
+                'end_date': the_data['end_date'],
+                'notification_threshold': the_data['notification_threshold'],
+            })
         db.get_db().commit()
         return success_response({'message': 'Budget updated successfully'})
     except Exception as e:
@@ -75,7 +101,10 @@ def delete_budget(budget_id):
     try:
         query = 'DELETE FROM Budgets WHERE budget_id = %s'
         cursor = db.get_db().cursor()
+        owner = _budget_owner(cursor, budget_id)
         cursor.execute(query, (budget_id,))
+        if owner is not None:
+            record(cursor, owner, 'budget', int(budget_id), 'delete')
         db.get_db().commit()
         return success_response({'message': 'Budget deleted successfully'})
     except Exception as e:
@@ -83,6 +112,8 @@ def delete_budget(budget_id):
 
 
 @management.route('/budgets/user/<user_id>', methods=['GET'])
+@admit('analytics')
+@coalesce
 def get_all_budgets_from_user(user_id):
     """
     Returns budgets with category name + spending inside the budget period.
@@ -94,7 +125,7 @@ def get_all_budgets_from_user(user_id):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
 
-        cursor = db.get_db().cursor()
+        cursor = db.get_read_db().cursor()
 
         if start_date and end_date:
             active_filter = 'AND b.start_date <= %s AND b.end_date >= %s'
@@ -106,21 +137,27 @@ def get_all_budgets_from_user(user_id):
             active_filter = ''
             extra_params = []
 
+        # correlated per-budget sum so only this user's receipts are touched,
+        # served by idx_receipts_user_category_date; archived spend adds back in
         cursor.execute(f'''
             SELECT b.budget_id, b.amount, b.start_date, b.end_date,
                    b.notification_threshold, b.category_id, b.user_id,
                    c.category_name,
-                   COALESCE(spent.total, 0) as spent_amount
+                   COALESCE((
+                       SELECT SUM(r.total_amount)
+                       FROM Receipts r
+                       WHERE r.user_id = b.user_id
+                         AND r.category_id = b.category_id
+                         AND r.date BETWEEN b.start_date AND b.end_date
+                   ), 0) + COALESCE((
+                       SELECT SUM(a.total_amount)
+                       FROM ArchivedSpend a
+                       WHERE a.user_id = b.user_id
+                         AND a.category_id = b.category_id
+                         AND a.date BETWEEN b.start_date AND b.end_date
+                   ), 0) as spent_amount
             FROM Budgets b
             LEFT JOIN Categories c ON b.category_id = c.category_id
-            LEFT JOIN (
-                SELECT r.category_id, r.user_id, b2.budget_id, SUM(r.total_amount) as total
-                FROM Receipts r
-                JOIN Budgets b2 ON r.category_id = b2.category_id
-                    AND r.user_id = b2.user_id
-                    AND r.date BETWEEN b2.start_date AND b2.end_date
-                GROUP BY r.category_id, r.user_id, b2.budget_id
-            ) spent ON spent.budget_id = b.budget_id
             WHERE b.user_id = %s {active_filter}
             ORDER BY b.start_date DESC
         ''', [user_id] + extra_params)
@@ -128,3 +165,31 @@ def get_all_budgets_from_user(user_id):
         return success_response(data)
     except Exception as e:
         return error_response(str(e), 500)
+
+
+@management.route('/budgets/alerts/<user_id>', methods=['GET'])
+@admit('analytics')
+@coalesce
+def get_budget_alerts(user_id):
+    """
+    Active budgets whose stored progress has reached the notification
+    threshold (or the amount when no threshold is set).
+    """
+    try:
+        cursor = db.get_read_db().cursor()
+        cursor.execute('''
+            SELECT b.budget_id, b.amount, b.start_date, b.end_date,
+                   b.notification_threshold, b.category_id, c.category_name,
+                   bp.spent as spent_amount, bp.last_receipt_id
+            FROM Budgets b
+            JOIN BudgetProgress bp ON bp.budget_id = b.budget_id
+            LEFT JOIN Categories c ON b.category_id = c.category_id
+            WHERE b.user_id = %s
+              AND CURRENT_DATE BETWEEN b.start_date AND b.end_date
+              AND bp.spent >= COALESCE(b.notification_threshold, b.amount)
+            ORDER BY bp.spent / b.amount DESC
+        ''', (user_id,))
+        data = build_json_response(cursor, cursor.fetchall())
+        return success_response(data)
+    except Exception as e:
+        return error_response(str(e), 500)
@@ -0,0 +1,105 @@
+import calendar
+from datetime import date
+
+from src import db
+from src.admission import admit
+from src.forecast import load_curves, project
+from src.helpers import success_response, error_response
+from src.management.management import management
+from src.money import as_float, to_cents
+from src.singleflight import coalesce
+
+
+def _amount(cents):
+    return None if cents is None else as_float(cents)
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+@management.route('/forecast/<user_id>', methods=['GET'])
+@admit('analytics')
+@coalesce
+def get_spend_forecast(user_id):
+    """
+    Projected end-of-period spend per category for the current month and
+    per budget that hasn't ended, from the curves `flask forecast run` fits.
+    Projections are null for categories with no history yet.
+    """
+    try:
+        today = date.today()
+        month_start = today.replace(day=1)
+        month_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+
+        cursor = db.get_read_db().cursor()
+        curves = load_curves(cursor, user_id)
+
+        cursor.execute('''
+            SELECT r.category_id, c.category_name, SUM(r.total_amount)
+            FROM Receipts r
+            LEFT JOIN Categories c ON c.category_id = r.category_id
+            WHERE r.user_id = %s AND r.category_id IS NOT NULL
+              AND r.date BETWEEN %s AND %s
+            GROUP BY r.category_id, c.category_name
+        ''', (user_id, month_start, month_end))
+        spent = {category_id: (name, to_cents(total)) for category_id, name, total in cursor.fetchall()}
+
+        missing = sorted(curves.keys() - spent.keys())
+        if missing:
+            cursor.execute(
+                f"SELECT category_id, category_name FROM Categories "
+                f"WHERE category_id IN ({', '.join(['%s'] * len(missing))})",
+                missing
+            )
+            for category_id, name in cursor.fetchall():
+                spent[category_id] = (name, 0)
+
+        categories = []
+        total_spent = total_projected = 0
+        for category_id, (name, cents) in spent.items():
+            projected = project(cents, curves.get(category_id), month_start, month_end, today)
+            total_spent += cents
+            total_projected += cents if projected is None else projected
+            categories.append({
+                'category_id': category_id,
+                'category_name': name,
+                'spent': as_float(cents),
+                'projected': _amount(projected),
+            })
+        categories.sort(key=lambda c: -(c['projected'] if c['projected'] is not None else c['spent']))
+
+        cursor.execute('''
+            SELECT b.budget_id, b.category_id, c.category_name, b.amount,
+                   b.start_date, b.end_date, bp.spent
+            FROM Budgets b
+            JOIN BudgetProgress bp ON bp.budget_id = b.budget_id
+            LEFT JOIN Categories c ON b.category_id = c.category_id
+            WHERE b.user_id = %s AND b.end_date >= %s
+            ORDER BY b.start_date
+        ''', (user_id, today))
+        budgets = []
+        for budget_id, category_id, name, amount, start, end, budget_spent in cursor.fetchall():
+            cents = to_cents(budget_spent)
+            projected = project(cents, curves.get(category_id), _as_date(start), _as_date(end), today)
+            budgets.append({
+                'budget_id': budget_id,
+                'category_id': category_id,
+                'category_name': name,
+                'amount': as_float(to_cents(amount)),
+                'spent': as_float(cents),
+                'projected': _amount(projected),
+                'projected_overrun': _amount(None if projected is None else max(projected - to_cents(amount), 0)),
+            })
+
+        return success_response({
+            'as_of': today.isoformat(),
+            'period_start': month_start.isoformat(),
+            'period_end': month_end.isoformat(),
+            'spent': as_float(total_spent),
+            'projected': as_float(total_projected),
+            'categories': categories,
+            'budgets': budgets,
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
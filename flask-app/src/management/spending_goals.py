@@ -1,34 +1,94 @@
+import calendar
+import time
+from datetime import date
+
 from src import db
 from src.helpers import build_json_response, success_response, error_response, validate_fields
 from src.management.management import management
+from src.money import from_cents, normalize
+from src.singleflight import coalesce
+
+# the newest receipt year across all users only moves when a new year of data
+# lands, so cache it instead of scanning Receipts on every call
+DATA_YEAR_TTL_SECONDS = 300
+_data_year = None
+_data_year_fetched_at = 0.0
+
+
+def get_data_year(cursor):
+    """Year of the newest receipt, cached for DATA_YEAR_TTL_SECONDS."""
+    global _data_year, _data_year_fetched_at
+
+    now = time.monotonic()
+    if _data_year is not None and now - _data_year_fetched_at < DATA_YEAR_TTL_SECONDS:
+        return _data_year
+
+    # MAX over the indexed date column is a single index seek
+    cursor.execute('SELECT MAX(date) FROM Receipts')
+    row = cursor.fetchone()
+    latest = row[0] if row else None
+    if isinstance(latest, str):
+        latest = date.fromisoformat(latest[:10])
+
+    _data_year = latest.year if latest else date.today().year
+    _data_year_fetched_at = now
+    return _data_year
+
+
+def reset_data_year():
+    """Drop the cached data year so the next call re-reads it."""
+    global _data_year
+    _data_year = None
+
+
+def monthly_totals(cursor, user_id, year):
+    """Map of month number -> total spent by this user in the given year."""
+    # half-open date range keeps the predicate sargable on (user_id, date);
+    # archived months only exist as ArchivedSpend rollups
+    bounds = (user_id, date(year, 1, 1), date(year + 1, 1, 1))
+    cursor.execute('''
+        SELECT month_num, SUM(total) as total FROM (
+            SELECT MONTH(date) as month_num, SUM(total_amount) as total
+            FROM Receipts
+            WHERE user_id = %s AND date >= %s AND date < %s
+            GROUP BY MONTH(date)
+            UNION ALL
+            SELECT MONTH(date) as month_num, SUM(total_amount) as total
+            FROM ArchivedSpend
+            WHERE user_id = %s AND date >= %s AND date < %s
+            GROUP BY MONTH(date)
+        ) totals
+        GROUP BY month_num
+    ''', bounds + bounds)
+    return {int(month): normalize(total) for month, total in cursor.fetchall()}
+
 
 @management.route('/spending-goals/<user_id>', methods=['GET'])
+@coalesce
 def get_spending_goals(user_id):
     """
     Return all spending goals for a user, with actual spending filled in.
-    Joins against Receipts grouped by month to calculate current_amount.
+    current_amount is the user's total for the goal's month in the latest data year.
     """
     try:
-        cursor = db.get_db().cursor()
-        cursor.execute('''
-            SELECT sg.goal_id, sg.target_amount, sg.Month, sg.user_id,
-                   COALESCE(r.total, 0) as current_amount,
-                   (SELECT MAX(YEAR(date)) FROM Receipts) as data_year
-            FROM Spending_goals sg
-            LEFT JOIN (
-                SELECT user_id,
-                       MONTHNAME(date) as month_name,
-                       SUM(total_amount) as total
-                FROM Receipts
-                WHERE YEAR(date) = (
-                    SELECT MAX(YEAR(date)) FROM Receipts
-                )
-                GROUP BY user_id, MONTHNAME(date)
-            ) r ON r.user_id = sg.user_id AND r.month_name = sg.Month
-            WHERE sg.user_id = %s
-        ''', (user_id,))
-        data = build_json_response(cursor, cursor.fetchall())
-        return success_response(data)
+        cursor = db.get_read_db().cursor()
+        cursor.execute(
+            'SELECT goal_id, target_amount, Month, user_id FROM Spending_goals WHERE user_id = %s',
+            (user_id,)
+        )
+        goals = build_json_response(cursor, cursor.fetchall())
+        if not goals:
+            return success_response([])
+
+        data_year = get_data_year(cursor)
+        totals = monthly_totals(cursor, user_id, data_year)
+        month_numbers = {calendar.month_name[m].lower(): m for m in range(1, 13)}
+
+        for goal in goals:
+            month_num = month_numbers.get(str(goal['Month']).strip().lower())
+            goal['current_amount'] = totals.get(month_num, from_cents(0))
+            goal['data_year'] = data_year
+        return success_response(goals)
     except Exception as e:
         return error_response(str(e), 500)
 
@@ -55,7 +115,7 @@ def create_spending_goal(user_id):
 def get_spending_goal(goal_id):
     """Fetch a single spending goal by its primary key."""
     try:
-        cursor = db.get_db().cursor()
+        cursor = db.get_read_db().cursor()
         cursor.execute('SELECT * FROM Spending_goals WHERE goal_id = %s', (goal_id,))
         row = cursor.fetchone()
         if not row:
@@ -115,6 +115,25 @@ def predict_category(store_name):
     return predicted_category, confidence
 
 
+def predict_categories(store_names):
+    """predict_category for a list of names in one model call, same order."""
+    results = [(None, 0.0)] * len(store_names)
+    model = _load_model()
+    if model is None:
+        return results
+
+    cleaned = [(i, name.lower().strip()) for i, name in enumerate(store_names)]
+    cleaned = [(i, name) for i, name in cleaned if name]
+    if not cleaned:
+        return results
+
+    probabilities = model.predict_proba([name for _, name in cleaned])
+    best = probabilities.argmax(axis=1)
+    for (i, _), idx, row in zip(cleaned, best, probabilities):
+        results[i] = (model.classes_[idx], float(row[idx]))
+    return results
+
+
 def reset_model():
     """Clears the cached model so the next prediction reloads from disk."""
     global _model
@@ -0,0 +1,43 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+# Money is summed and compared as integer cents inside the app. Amounts come
+# in as Decimal (MySQL DECIMAL columns), float (SQLite SUMs) or strings (JSON
+# bodies) and only turn back into Decimal or float at the response edge.
+
+_CENT = Decimal('0.01')
+
+
+def to_cents(amount):
+    """Exact integer cents for a Decimal, int, float or numeric string, rounded half up."""
+    if isinstance(amount, (int, np.integer)):
+        return int(amount) * 100
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    scaled = amount.scaleb(2)
+    whole = int(scaled)
+    # DECIMAL(10,2) values are already whole cents; only finer amounts need rounding
+    if whole == scaled:
+        return whole
+    return int(amount.quantize(_CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def from_cents(cents):
+    """Two-place Decimal for responses and DECIMAL(10,2) parameters."""
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def as_float(cents):
+    """Nearest float to the exact amount, for fields the API has always sent as numbers."""
+    return int(cents) / 100
+
+
+def cents_array(amounts):
+    """int64 array of cents for a sequence of amounts."""
+    return np.fromiter((to_cents(a) for a in amounts), dtype=np.int64, count=len(amounts))
+
+
+def normalize(amount):
+    """Round-trip an amount through cents, e.g. to tidy a float SUM from SQLite."""
+    return None if amount is None else from_cents(to_cents(amount))
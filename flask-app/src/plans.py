@@ -0,0 +1,63 @@
+import re
+
+import click
+from flask.cli import AppGroup
+
+from src import db
+from src.purchases.receipts import PERIOD_TOTAL_SQL, TOP_MERCHANTS_SQL, compute_date_range
+
+plans_cli = AppGroup('plans', help='Check the query plans of the date-bounded receipt reads.')
+
+_RECEIPTS = re.compile(r'table:(Receipts|r)\b')
+
+
+def receipts_indexes(cursor, sql, params):
+    """
+    Indexes the optimizer plans to read Receipts through, or None if any
+    step scans the whole table. Handles the MySQL `table`/`type`/`key`
+    columns and TiDB's operator `id` and `access object`
+    (table:r, index:idx_receipts_user_date(user_id, date)).
+    """
+    cursor.execute('EXPLAIN ' + sql, params)
+    columns = [d[0].lower() for d in cursor.description]
+    used = set()
+    for row in cursor.fetchall():
+        record = dict(zip(columns, row))
+        if 'key' in record:
+            if record.get('table') not in ('Receipts', 'r'):
+                continue
+            if record.get('type') in ('ALL', 'index') or not record['key']:
+                return None
+            used.add(record['key'])
+        else:
+            access = str(record.get('access object') or '')
+            if not _RECEIPTS.match(access):
+                continue
+            if str(record.get('id') or '').lstrip(' └├│─').startswith('TableFullScan'):
+                return None
+            used.update(re.findall(r'index:(\w+)', access))
+    return sorted(used)
+
+
+@plans_cli.command('verify')
+@click.option('--user-id', default=1, show_default=True)
+def verify_plans(user_id):
+    """EXPLAIN the summary and top-merchants queries and check they use an index."""
+    if db.backend.name != 'mysql':
+        raise click.ClickException('Query plans are only checked on the mysql backend')
+    cursor = db.get_db().cursor()
+
+    indexed = True
+    for period in ('week', 'month', 'year'):
+        start, end = compute_date_range(period, 0)
+        for label, sql, params in (
+            ('summary', PERIOD_TOTAL_SQL.format(receipts='Receipts'), (user_id, start, end)),
+            ('top-merchants', TOP_MERCHANTS_SQL.format(receipts='Receipts'), (user_id, start, end, 5)),
+        ):
+            used = receipts_indexes(cursor, sql, params)
+            ok = bool(used)
+            indexed = indexed and ok
+            click.echo(f'{label:14s} {period:5s} {"index " + ",".join(used) if ok else "FULL SCAN"}')
+
+    if not indexed:
+        raise click.ClickException('Some queries scan all of Receipts')
@@ -0,0 +1,170 @@
+import re
+from datetime import date
+
+import click
+import numpy as np
+from flask.cli import AppGroup
+
+from src import db
+from src.archive import archived_line_items, covers
+from src.money import from_cents, to_cents
+
+# Item price history lives in ItemPrices: one row per user, normalized item
+# name, store and day, with the quantity bought, the amount spent and the
+# lowest unit cost paid. Line-item writes refresh the rows of their receipt's
+# (user, store, day) in the same transaction, so price trends and store
+# comparisons read this compact table instead of joining Transactions to
+# Receipts. Rows outlive `flask archive run`; `flask prices rebuild` fills
+# the table from existing history, archived months included.
+
+prices_cli = AppGroup('prices', help='Maintain the item price history.')
+
+REBUILD_BATCH_USERS = 200
+# 8 placeholders a row stays under SQLite's 999 bound-parameter limit
+INSERT_CHUNK_ROWS = 120
+KEY_LENGTH = 100
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase alphanumeric runs of text."""
+    return _TOKEN.findall(str(text).lower())
+
+
+def item_key(name):
+    """Normalized item name: its lowercase words, without punctuation."""
+    return ' '.join(tokenize(name))[:KEY_LENGTH]
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def aggregate(items):
+    """
+    ItemPrices rows from (user_id, store_id, date, unit_cost, quantity,
+    item_name) line items, one per user, item key, store and day.
+    """
+    prices = {}
+    keys = {}
+    for user_id, store_id, day, unit_cost, quantity, name in items:
+        quantity = int(quantity)
+        if quantity <= 0:
+            continue
+        if name not in keys:
+            keys[name] = item_key(name)
+        cents = to_cents(unit_cost)
+        key = (int(user_id), keys[name], int(store_id), _as_date(day))
+        entry = prices.get(key)
+        if entry is None:
+            prices[key] = [str(name).strip()[:KEY_LENGTH], quantity, cents * quantity, cents]
+        else:
+            entry[1] += quantity
+            entry[2] += cents * quantity
+            entry[3] = min(entry[3], cents)
+    return [
+        (*key, name, quantity, from_cents(spent), from_cents(lowest))
+        for key, (name, quantity, spent, lowest) in prices.items()
+    ]
+
+
+def _insert(cursor, rows):
+    for i in range(0, len(rows), INSERT_CHUNK_ROWS):
+        chunk = rows[i:i + INSERT_CHUNK_ROWS]
+        cursor.execute(
+            'REPLACE INTO ItemPrices '
+            '(user_id, item_key, store_id, date, item_name, quantity, spent, min_unit_cost) VALUES '
+            + ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(chunk)),
+            [v for row in chunk for v in row]
+        )
+
+
+def _archived_items(user_id, store_id=None, day=None):
+    """Archived line items of a user, optionally only one store and day, as aggregate() input."""
+    cols = archived_line_items(user_id)
+    rows = np.arange(len(cols['transaction_id']))
+    if store_id is not None:
+        rows = np.flatnonzero((cols['store_id'] == int(store_id)) & (cols['day'] == day.toordinal()))
+    return [
+        (user_id, int(cols['store_id'][i]), date.fromordinal(int(cols['day'][i])),
+         from_cents(cols['unit_cents'][i]), int(cols['quantity'][i]), str(cols['item_name'][i]))
+        for i in rows
+    ]
+
+
+def refresh(cursor, user_id, store_id, day):
+    """
+    Recompute a user's ItemPrices rows for one store and day from their line
+    items, on the caller's cursor without committing.
+    """
+    day = _as_date(day)
+    cursor.execute(
+        'DELETE FROM ItemPrices WHERE user_id = %s AND store_id = %s AND date = %s', (user_id, store_id, day)
+    )
+    cursor.execute('''
+        SELECT r.user_id, r.store_id, r.date, t.unit_cost, t.quantity, t.item_name
+        FROM Transactions t
+        JOIN Receipts r ON r.receipt_id = t.receipt_id
+        WHERE r.user_id = %s AND r.store_id = %s AND r.date = %s
+    ''', (user_id, store_id, day))
+    items = list(cursor.fetchall())
+    if covers(day):
+        # a back-dated receipt landing on an archived day
+        items.extend(_archived_items(user_id, store_id, day))
+    _insert(cursor, aggregate(items))
+
+
+def receipt_key(cursor, receipt_id):
+    """(user_id, store_id, date) of a receipt, None when it doesn't exist."""
+    cursor.execute('SELECT user_id, store_id, date FROM Receipts WHERE receipt_id = %s', (receipt_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row[0], row[1], row[2]
+
+
+def receipt_changed(cursor, receipt_id):
+    """Refresh the price rows a receipt's line items feed, after adding or removing some."""
+    key = receipt_key(cursor, receipt_id)
+    if key is not None:
+        refresh(cursor, *key)
+
+
+def _rebuild_batch(cursor, user_ids):
+    marks = ', '.join(['%s'] * len(user_ids))
+    cursor.execute(f'DELETE FROM ItemPrices WHERE user_id IN ({marks})', user_ids)
+    cursor.execute(f'''
+        SELECT r.user_id, r.store_id, r.date, t.unit_cost, t.quantity, t.item_name
+        FROM Transactions t
+        JOIN Receipts r ON r.receipt_id = t.receipt_id
+        WHERE r.user_id IN ({marks})
+    ''', user_ids)
+    items = list(cursor.fetchall())
+    if covers(None):
+        for user_id in user_ids:
+            items.extend(_archived_items(user_id))
+    rows = aggregate(items)
+    _insert(cursor, rows)
+    return len(rows)
+
+
+def rebuild(cursor):
+    """
+    Recompute every user's price history, REBUILD_BATCH_USERS at a time.
+    Writes on the caller's cursor without committing. Returns (users, rows).
+    """
+    cursor.execute('SELECT user_id FROM Users ORDER BY user_id')
+    user_ids = [row[0] for row in cursor.fetchall()]
+    rows = 0
+    for i in range(0, len(user_ids), REBUILD_BATCH_USERS):
+        rows += _rebuild_batch(cursor, user_ids[i:i + REBUILD_BATCH_USERS])
+    return len(user_ids), rows
+
+
+@prices_cli.command('rebuild')
+def rebuild_command():
+    """Rebuild the item price history from every line item."""
+    conn = db.get_db()
+    users, rows = rebuild(conn.cursor())
+    conn.commit()
+    click.echo(f'Rebuilt {rows} item price rows for {users} users')
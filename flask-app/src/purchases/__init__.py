@@ -5,3 +5,7 @@ purchases = Blueprint('purchases', __name__)
 from . import receipts
 from . import transactions
 from . import stores
+from . import statements
+from . import subscriptions
+from . import item_search
+from . import item_prices
@@ -0,0 +1,425 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+from flask import current_app
+
+from src.archive import archived_receipts, covers
+from src.money import as_float, from_cents, to_cents
+
+# Each active user's receipts live in memory as parallel NumPy arrays sorted
+# by date, so the dashboard can flip period/offset or open a category
+# drilldown without another round of queries. Entries are immutable: a
+# receipt mutation swaps in a rebuilt entry, so readers never see a torn one.
+
+_MISSING = -1
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# composite group keys pack (day or month, category) into one int64
+_KEY_STRIDE = 1 << 32
+
+FIELDS = (
+    ('receipt_id', np.int64),
+    ('day', np.int32),
+    ('cents', np.int64),
+    ('category_id', np.int32),
+    ('store_id', np.int32),
+    ('tag_id', np.int32),
+    ('source', np.int8),
+)
+
+
+def _ordinal(value):
+    if not isinstance(value, date):
+        value = date.fromisoformat(str(value)[:10])
+    return value.toordinal()
+
+
+def _id(value):
+    return _MISSING if value is None or value == _MISSING else int(value)
+
+
+def _date(ordinal):
+    return date.fromordinal(int(ordinal))
+
+
+class UserColumns:
+    """One user's receipts as parallel arrays sorted by day."""
+
+    def __init__(self, arrays, loaded_at):
+        self.arrays = arrays
+        self.loaded_at = loaded_at
+        for name, _ in FIELDS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def from_rows(cls, rows, loaded_at):
+        """rows of (receipt_id, day, cents, category_id, store_id, tag_id, source)."""
+        arrays = {
+            name: np.fromiter((row[i] for row in rows), dtype=dtype, count=len(rows))
+            for i, (name, dtype) in enumerate(FIELDS)
+        }
+        order = np.lexsort((arrays['receipt_id'], arrays['day']))
+        return cls({k: v[order] for k, v in arrays.items()}, loaded_at)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def span(self, start, end):
+        """Slice of rows dated start..end inclusive."""
+        lo = np.searchsorted(self.day, _ordinal(start), side='left')
+        hi = np.searchsorted(self.day, _ordinal(end), side='right')
+        return slice(lo, hi)
+
+    def without(self, receipt_id):
+        keep = self.receipt_id != int(receipt_id)
+        return UserColumns({k: v[keep] for k, v in self.arrays.items()}, self.loaded_at)
+
+    def with_row(self, row):
+        at = np.searchsorted(self.day, row[1], side='right')
+        arrays = {
+            name: np.insert(self.arrays[name], at, np.array(row[i], dtype=dtype))
+            for i, (name, dtype) in enumerate(FIELDS)
+        }
+        return UserColumns(arrays, self.loaded_at)
+
+
+class ColumnarCache:
+    """
+    LRU of UserColumns bounded by budget_bytes across all users, with
+    shared category and store name lookups. Entries older than max_age
+    seconds are reloaded to pick up writes made outside the API.
+    """
+
+    def __init__(self, budget_bytes, max_age):
+        self.budget_bytes = budget_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+        self._bytes = 0
+        self.categories = {}
+        self.stores = {}
+        self.sources = [None]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _source_code(self, source):
+        if source not in self.sources:
+            self.sources.append(source)
+        return self.sources.index(source)
+
+    def _row(self, receipt_id, receipt_date, amount, category_id, store_id, tag_id, source):
+        return (
+            int(receipt_id), _ordinal(receipt_date), to_cents(amount),
+            _id(category_id), _id(store_id), _id(tag_id), self._source_code(source),
+        )
+
+    def _load_names(self, cursor, store_ids):
+        if not self.categories:
+            cursor.execute('SELECT category_id, category_name FROM Categories')
+            self.categories = {int(cid): name for cid, name in cursor.fetchall()}
+
+        missing = sorted(set(int(s) for s in store_ids) - set(self.stores) - {_MISSING})
+        for i in range(0, len(missing), 500):
+            chunk = missing[i:i + 500]
+            marks = ', '.join(['%s'] * len(chunk))
+            cursor.execute(
+                f'SELECT store_id, store_name, is_subscription FROM Stores WHERE store_id IN ({marks})',
+                chunk
+            )
+            for store_id, name, subscription in cursor.fetchall():
+                self.stores[int(store_id)] = (name, int(subscription or 0))
+
+    def _load(self, cursor, user_id):
+        cursor.execute('''
+            SELECT receipt_id, date, total_amount, category_id, store_id, tag_id, category_source
+            FROM Receipts
+            WHERE user_id = %s
+        ''', (user_id,))
+        rows = [self._row(*row) for row in cursor.fetchall()]
+        if covers(None):
+            rows.extend(
+                self._row(r[0], r[1], r[2], r[6], r[4], r[5], r[7])
+                for r in archived_receipts(user_id)
+            )
+        columns = UserColumns.from_rows(rows, time.monotonic())
+        self._load_names(cursor, columns.store_id)
+        return columns
+
+    def columns(self, cursor, user_id):
+        """This user's columns, loading them on first access."""
+        key = int(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.loaded_at < self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            generation = (self._epoch, self._generations.get(key, 0))
+
+        entry = self._load(cursor, key)
+
+        with self._lock:
+            self.misses += 1
+            # a receipt changed while we were loading, so this copy may be stale
+            if (self._epoch, self._generations.get(key, 0)) == generation:
+                self._store(key, entry)
+        return entry
+
+    def _store(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        if entry.nbytes > self.budget_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.budget_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _mutate(self, user_id, change):
+        """Bump the user's generation and swap in change(entry), dropping it on None."""
+        key = int(user_id)
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry = change(entry)
+            if entry is None:
+                self._drop(key)
+            else:
+                self._store(key, entry)
+
+    def receipt_added(self, user_id, receipt_id, receipt_date, amount,
+                      category_id, store_id, tag_id, source):
+        """Apply a committed insert; a store we have no name for forces a reload."""
+        def change(entry):
+            if store_id is None or int(store_id) not in self.stores:
+                return None
+            row = self._row(receipt_id, receipt_date, amount, category_id, store_id, tag_id, source)
+            return entry.with_row(row)
+        self._mutate(user_id, change)
+
+    def receipt_updated(self, user_id, receipt_id, receipt_date, amount, category_id, source=None):
+        """Apply a committed edit of date, amount and category; source None keeps the old one."""
+        def change(entry):
+            match = np.flatnonzero(entry.receipt_id == int(receipt_id))
+            if not len(match):
+                return None
+            i = match[0]
+            kept = self.sources[int(entry.source[i])] if source is None else source
+            row = self._row(
+                receipt_id, receipt_date, amount, category_id,
+                entry.store_id[i], entry.tag_id[i], kept,
+            )
+            return entry.without(receipt_id).with_row(row)
+        self._mutate(user_id, change)
+
+    def receipt_removed(self, user_id, receipt_id):
+        """Apply a committed delete."""
+        self._mutate(user_id, lambda entry: entry.without(receipt_id))
+
+    def _drop(self, key):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+
+    def invalidate(self, user_id=None):
+        """Forget one user, or every user and the store names when user_id is None."""
+        with self._lock:
+            if user_id is not None:
+                key = int(user_id)
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._drop(key)
+                return
+            self._epoch += 1
+            self._entries.clear()
+            self._bytes = 0
+            self.stores = {}
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'users': len(self._entries),
+            'bytes': self._bytes,
+            'budget_bytes': self.budget_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def analytics_cache():
+    """The app's ColumnarCache, created on first use; None when ANALYTICS_CACHE_BYTES is 0."""
+    budget = current_app.config.get('ANALYTICS_CACHE_BYTES', 0)
+    if budget <= 0:
+        return None
+    cache = current_app.extensions.get('columnar_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            'columnar_cache', ColumnarCache(budget, current_app.config['ANALYTICS_CACHE_TTL'])
+        )
+    return cache
+
+
+def forget(user_id=None):
+    """Drop cached columns after writes the receipt hooks don't describe."""
+    cache = analytics_cache()
+    if cache is not None:
+        cache.invalidate(user_id)
+
+
+def _group(keys, cents):
+    """Unique keys with their summed cents and row counts."""
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    # float64 weights are exact for integer sums below 2**53 cents
+    totals = np.bincount(inverse, weights=cents, minlength=len(uniq)).astype(np.int64)
+    counts = np.bincount(inverse, minlength=len(uniq))
+    return uniq, totals, counts
+
+
+def _week_start(days):
+    # ordinal 1 (0001-01-01) is a Monday
+    return days - (days - 1) % 7
+
+
+def _month_start(days):
+    months = (days - _EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]')
+    return months.astype('datetime64[D]').astype(np.int64) + _EPOCH_ORDINAL
+
+
+def _as_month(ordinal):
+    return date.fromordinal(int(ordinal)).strftime('%Y-%m-01')
+
+
+def _by_name(cache, category_ids, totals, counts, keys=None):
+    """Fold category ids onto names (several ids can share None) keeping order keys."""
+    merged = OrderedDict()
+    for i, cid in enumerate(category_ids):
+        name = cache.categories.get(int(cid))
+        slot = (None if keys is None else int(keys[i]), name)
+        total, count = merged.get(slot, (0, 0))
+        merged[slot] = (total + int(totals[i]), count + int(counts[i]))
+    return merged
+
+
+def _totals_by(cache, keys, categories, cents, render, key_name):
+    """[{key_name, total}] ascending, then [{key_name, category_name, total}] by key then total desc."""
+    uniq, totals, _ = _group(keys, cents)
+    plain = [{key_name: render(k), 'total': from_cents(t)} for k, t in zip(uniq, totals)]
+
+    combined = keys.astype(np.int64) * _KEY_STRIDE + (categories.astype(np.int64) - _MISSING)
+    uniq, totals, counts = _group(combined, cents)
+    merged = _by_name(cache, uniq % _KEY_STRIDE + _MISSING, totals, counts, uniq // _KEY_STRIDE)
+    split = sorted(merged.items(), key=lambda kv: (kv[0][0], -kv[1][0]))
+    by_category = [
+        {key_name: render(k), 'category_name': name, 'total': from_cents(total)}
+        for (k, name), (total, _) in split
+    ]
+    return plain, by_category
+
+
+def summary(cache, columns, period, start, end, prev_start, prev_end):
+    """Same payload as the SQL summary, computed from cached columns."""
+    window = columns.span(start, end)
+    days = columns.day[window]
+    cents = columns.cents[window]
+    categories = columns.category_id[window]
+
+    uniq, totals, counts = _group(categories, cents)
+    merged = _by_name(cache, uniq, totals, counts)
+    by_category = [
+        {'category_name': name, 'total': from_cents(total), 'count': count}
+        for (_, name), (total, count) in sorted(merged.items(), key=lambda kv: -kv[1][0])
+    ]
+
+    by_week, by_week_category = _totals_by(
+        cache, _week_start(days), categories, cents, _date, 'week_start'
+    )
+    by_day, by_day_category = _totals_by(cache, days, categories, cents, _date, 'day_date')
+
+    result = {
+        'total_spent': as_float(cents.sum()),
+        'previous_total': as_float(columns.cents[columns.span(prev_start, prev_end)].sum()),
+        'period': period,
+        'period_start': start.isoformat(),
+        'period_end': end.isoformat(),
+        'by_category': by_category,
+        'by_week': by_week,
+        'by_week_category': by_week_category,
+        'by_day': by_day,
+    }
+    if period == 'week':
+        result['by_day_category'] = by_day_category
+    if period == 'year':
+        result['by_month'], result['by_month_category'] = _totals_by(
+            cache, _month_start(days), categories, cents, _as_month, 'month_start'
+        )
+    return result
+
+
+def top_merchants(cache, columns, start, end, limit):
+    """Same rows as TOP_MERCHANTS_SQL, grouped by store name."""
+    window = columns.span(start, end)
+    uniq, totals, counts = _group(columns.store_id[window], columns.cents[window])
+
+    merged = {}
+    for store_id, total, count in zip(uniq, totals, counts):
+        name, subscription = cache.stores.get(int(store_id), (None, 0))
+        if name is None:
+            continue
+        prev_total, prev_count, prev_sub = merged.get(name, (0, 0, 0))
+        merged[name] = (prev_total + int(total), prev_count + int(count), max(prev_sub, subscription))
+
+    ranked = sorted(merged.items(), key=lambda kv: -kv[1][0])[:limit]
+    return [
+        {'store_name': name, 'total_spent': from_cents(total),
+         'visit_count': count, 'is_subscription': subscription}
+        for name, (total, count, subscription) in ranked
+    ]
+
+
+def receipt_rows(cache, columns, user_id, start, end, category=None,
+                 sort_by='date', descending=True, offset=0, limit=None):
+    """
+    (total, rows) for the drilldown listing: the match count and the receipt
+    dicts for one page of it, in the listing's column layout.
+    """
+    window = columns.span(start, end)
+    index = np.arange(window.start, window.stop)
+    if category is not None:
+        ids = [cid for cid, name in cache.categories.items() if name == category]
+        index = index[np.isin(columns.category_id[index], ids)]
+
+    sort_key = columns.cents[index] if sort_by == 'total_amount' else columns.day[index]
+    order = np.argsort(-sort_key if descending else sort_key, kind='stable')
+    total = len(order)
+    index = index[order[offset:None if limit is None else offset + limit]]
+
+    rows = []
+    for i in index:
+        category_id = int(columns.category_id[i])
+        store_id = int(columns.store_id[i])
+        tag_id = int(columns.tag_id[i])
+        rows.append({
+            'receipt_id': int(columns.receipt_id[i]),
+            'date': _date(columns.day[i]),
+            'total_amount': from_cents(columns.cents[i]),
+            'user_id': int(user_id),
+            'store_id': store_id,
+            'tag_id': None if tag_id == _MISSING else tag_id,
+            'category_id': None if category_id == _MISSING else category_id,
+            'category_source': cache.sources[int(columns.source[i])],
+            'store_name': cache.stores.get(store_id, (None, 0))[0],
+            'category_name': cache.categories.get(category_id),
+        })
+    return total, rows
@@ -0,0 +1,155 @@
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from flask import request
+
+from src import db
+from src.admission import admit
+from src.helpers import success_response, error_response
+from src.money import as_float, to_cents
+from src.prices import item_key
+from src.singleflight import coalesce
+
+from . import purchases
+
+# Price trends and store comparisons read the ItemPrices history (see
+# src/prices.py), never Transactions joined to Receipts.
+
+DEFAULT_MONTHS = 12
+
+
+def _window_start(months):
+    """First day of the month months - 1 months before this one."""
+    return date.today().replace(day=1) - relativedelta(months=months - 1)
+
+
+def _unit(cents, quantity):
+    return as_float(round(cents / quantity)) if quantity else None
+
+
+@purchases.route('/items/prices/<user_id>', methods=['GET'])
+@admit('analytics')
+@coalesce
+def get_item_prices(user_id):
+    """
+    Price history of one item (?item=, matched on its normalized name) over
+    the last ?months= months: the average and lowest unit cost per month and
+    per store, the cheapest store and the change from the first month to the last.
+    """
+    try:
+        key = item_key(request.args.get('item', ''))
+        if not key:
+            return error_response('item is required', 400)
+        months = max(int(request.args.get('months', DEFAULT_MONTHS)), 1)
+
+        cursor = db.get_read_db().cursor()
+        cursor.execute('''
+            SELECT p.store_id, s.store_name, p.date, p.item_name, p.quantity, p.spent, p.min_unit_cost
+            FROM ItemPrices p
+            JOIN Stores s ON s.store_id = p.store_id
+            WHERE p.user_id = %s AND p.item_key = %s AND p.date >= %s
+            ORDER BY p.date, p.store_id
+        ''', (user_id, key, _window_start(months)))
+        rows = cursor.fetchall()
+        if not rows:
+            return error_response('Item not found', 404)
+
+        by_month = {}
+        by_store = {}
+        for store_id, store_name, day, _, quantity, spent, lowest in rows:
+            cents, lowest = to_cents(spent), to_cents(lowest)
+            month = by_month.setdefault(str(day)[:7], [0, 0, lowest])
+            month[0] += cents
+            month[1] += quantity
+            month[2] = min(month[2], lowest)
+            store = by_store.setdefault(store_id, {
+                'store_name': store_name, 'spent': 0, 'quantity': 0, 'lowest': lowest, 'days': 0,
+            })
+            store['spent'] += cents
+            store['quantity'] += quantity
+            store['lowest'] = min(store['lowest'], lowest)
+            store['days'] += 1
+            # rows are in date order, so this ends on the latest purchase
+            store['last_date'] = str(day)[:10]
+            store['last_unit_cost'] = _unit(cents, quantity)
+
+        trend = [
+            {'month': month, 'avg_unit_cost': _unit(cents, quantity),
+             'min_unit_cost': as_float(lowest), 'quantity': quantity}
+            for month, (cents, quantity, lowest) in by_month.items()
+        ]
+        stores = sorted((
+            {'store_id': store_id, 'store_name': s['store_name'],
+             'avg_unit_cost': _unit(s['spent'], s['quantity']), 'min_unit_cost': as_float(s['lowest']),
+             'last_unit_cost': s['last_unit_cost'], 'last_date': s['last_date'],
+             'quantity': s['quantity'], 'purchase_days': s['days']}
+            for store_id, s in by_store.items()
+        ), key=lambda s: (s['avg_unit_cost'], s['store_id']))
+
+        first, last = trend[0]['avg_unit_cost'], trend[-1]['avg_unit_cost']
+        return success_response({
+            'item_key': key,
+            'item_name': rows[-1][3],
+            'months': months,
+            'avg_unit_cost': _unit(sum(to_cents(r[5]) for r in rows), sum(r[4] for r in rows)),
+            'change_percent': round((last - first) * 100 / first, 1) if first else None,
+            'cheapest_store': stores[0],
+            'by_month': trend,
+            'by_store': stores,
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+@purchases.route('/items/cheapest/<user_id>', methods=['GET'])
+@admit('analytics')
+@coalesce
+def get_cheapest_stores(user_id):
+    """
+    For items bought at more than one store in the last ?months= months,
+    the store where most were bought against the cheapest one by average
+    unit cost, with what buying them all there would have saved. Largest
+    savings first, at most ?limit= items.
+    """
+    try:
+        months = max(int(request.args.get('months', DEFAULT_MONTHS)), 1)
+        limit = int(request.args.get('limit', 20))
+
+        cursor = db.get_read_db().cursor()
+        cursor.execute('''
+            SELECT p.item_key, p.store_id, s.store_name, MAX(p.item_name), SUM(p.quantity), SUM(p.spent)
+            FROM ItemPrices p
+            JOIN Stores s ON s.store_id = p.store_id
+            WHERE p.user_id = %s AND p.date >= %s
+            GROUP BY p.item_key, p.store_id, s.store_name
+        ''', (user_id, _window_start(months)))
+        items = {}
+        for key, store_id, store_name, item_name, quantity, spent in cursor.fetchall():
+            quantity = int(quantity)
+            items.setdefault(key, []).append({
+                'store_id': store_id, 'store_name': store_name, 'item_name': item_name,
+                'quantity': quantity, 'unit_cents': to_cents(spent) / quantity,
+            })
+
+        data = []
+        for key, stores in items.items():
+            if len(stores) < 2:
+                continue
+            usual = max(stores, key=lambda s: (s['quantity'], -s['store_id']))
+            cheapest = min(stores, key=lambda s: (s['unit_cents'], s['store_id']))
+            total = sum(s['quantity'] for s in stores)
+            savings = sum((s['unit_cents'] - cheapest['unit_cents']) * s['quantity'] for s in stores)
+            data.append({
+                'item_key': key,
+                'item_name': usual['item_name'],
+                'quantity': total,
+                'usual_store': {'store_id': usual['store_id'], 'store_name': usual['store_name'],
+                                'avg_unit_cost': as_float(round(usual['unit_cents']))},
+                'cheapest_store': {'store_id': cheapest['store_id'], 'store_name': cheapest['store_name'],
+                                   'avg_unit_cost': as_float(round(cheapest['unit_cents']))},
+                'potential_savings': as_float(round(savings)),
+            })
+        data.sort(key=lambda item: (-item['potential_savings'], item['item_key']))
+        return success_response(data[:limit])
+    except Exception as e:
+        return error_response(str(e), 500)
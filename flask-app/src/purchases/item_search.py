@@ -0,0 +1,464 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+from flask import current_app, request
+
+from src import db
+from src.admission import admit
+from src.archive import archived_line_items, covers
+from src.helpers import success_response, error_response
+from src.money import as_float, to_cents
+from src.prices import item_key, tokenize
+from src.singleflight import coalesce
+
+from . import purchases
+
+# Line-item search runs on a per-user inverted index held in memory. Every
+# distinct item name is tokenized once, each term lists the names containing
+# it, and a sorted term list answers prefix lookups with a bisect. The line
+# items themselves are parallel NumPy arrays, so a query is a few term
+# lookups, one boolean mask and some bincounts over the user's rows. As with
+# the analytics columns, an index is never changed in place: writes swap in
+# an updated copy, and entries expire after ITEM_SEARCH_TTL seconds to pick
+# up changes made outside the API.
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# tokens shorter than this only match by prefix, never fuzzily
+FUZZY_MIN_LENGTH = 4
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+FIELDS = (
+    ('transaction_id', np.int64),
+    ('receipt_id', np.int64),
+    ('day', np.int32),
+    ('store_id', np.int64),
+    ('unit_cents', np.int64),
+    ('quantity', np.int64),
+)
+
+
+def _deletions(term):
+    """The term and every string one deleted character away from it."""
+    return {term} | {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _ordinal(value):
+    if not isinstance(value, date):
+        value = date.fromisoformat(str(value)[:10])
+    return value.toordinal()
+
+
+class Vocabulary:
+    """Distinct item names, each term's postings (name ids) and the sorted term list."""
+
+    def __init__(self, names, ids, postings, terms):
+        self.names = names
+        self.ids = ids
+        self.postings = postings
+        self.terms = terms
+        self._variants = None
+
+    @classmethod
+    def empty(cls):
+        return cls([], {}, {}, [])
+
+    def extended(self, names):
+        """
+        (vocabulary, ids) numbering each of names. Names are the same when
+        their tokens are, and new ones go into a copy, leaving self untouched.
+        """
+        ids = []
+        added = {}
+        # item names repeat a lot; tokenize each distinct spelling once
+        seen = {}
+        for name in names:
+            name_id = seen.get(name)
+            if name_id is None:
+                key = item_key(name)
+                name_id = self.ids.get(key)
+                if name_id is None:
+                    name_id = added.get(key)
+                    if name_id is None:
+                        name_id = added[key] = len(self.names) + len(added)
+                seen[name] = name_id
+            ids.append(name_id)
+        if not added:
+            return self, ids
+
+        display = {}
+        for name, name_id in zip(names, ids):
+            display.setdefault(name_id, str(name).strip())
+        touched = {}
+        for key, name_id in added.items():
+            for term in set(key.split()):
+                if term not in touched:
+                    touched[term] = list(self.postings.get(term, ()))
+                touched[term].append(name_id)
+        postings = dict(self.postings)
+        postings.update((term, tuple(ids_)) for term, ids_ in touched.items())
+        terms = sorted(self.terms + [term for term in touched if term not in self.postings])
+        vocabulary = Vocabulary(
+            self.names + [display[name_id] for name_id in added.values()],
+            {**self.ids, **added}, postings, terms,
+        )
+        return vocabulary, ids
+
+    def prefixed(self, token):
+        """Terms starting with token."""
+        lo = bisect_left(self.terms, token)
+        # terms are [a-z0-9] only, all below '{'
+        hi = bisect_left(self.terms, token + '{', lo)
+        return self.terms[lo:hi]
+
+    def similar(self, token):
+        """
+        Terms sharing a one-deletion variant with token: one letter missing,
+        extra, changed or (for neighbours) swapped. The variant map is built
+        on first use.
+        """
+        if self._variants is None:
+            variants = {}
+            for term in self.terms:
+                if len(term) >= FUZZY_MIN_LENGTH - 1:
+                    for variant in _deletions(term):
+                        variants.setdefault(variant, []).append(term)
+            self._variants = variants
+        return sorted({term for variant in _deletions(token) for term in self._variants.get(variant, ())})
+
+    def name_ids(self, terms):
+        return {name_id for term in terms for name_id in self.postings[term]}
+
+    @property
+    def nbytes(self):
+        # rough: the strings plus per-entry dict and tuple overhead
+        return (sum(len(name) for name in self.names) * 2 + len(self.names) * 120
+                + len(self.postings) * 150 + sum(len(ids) for ids in self.postings.values()) * 8)
+
+
+class ItemIndex:
+    """One user's line items as parallel arrays sorted by day, with their vocabulary."""
+
+    def __init__(self, arrays, name_id, vocabulary, loaded_at):
+        self.arrays = arrays
+        self.name_id = name_id
+        self.vocabulary = vocabulary
+        self.loaded_at = loaded_at
+        for name, _ in FIELDS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def build(cls, columns, loaded_at, vocabulary=None):
+        """columns: a FIELDS name -> array dict plus an item_name list."""
+        vocabulary, ids = (vocabulary or Vocabulary.empty()).extended(columns['item_name'])
+        arrays = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in FIELDS}
+        name_id = np.array(ids, dtype=np.int32)
+        order = np.lexsort((arrays['transaction_id'], arrays['day']))
+        return cls({k: v[order] for k, v in arrays.items()}, name_id[order], vocabulary, loaded_at)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays.values()) + self.name_id.nbytes + self.vocabulary.nbytes
+
+    def with_receipt(self, receipt_id, columns):
+        """A copy with receipt_id's line items replaced by columns, which all share one day."""
+        keep = self.receipt_id != int(receipt_id)
+        arrays = {k: v[keep] for k, v in self.arrays.items()}
+        name_id = self.name_id[keep]
+        if not len(columns['item_name']):
+            return ItemIndex(arrays, name_id, self.vocabulary, self.loaded_at)
+
+        vocabulary, ids = self.vocabulary.extended(columns['item_name'])
+        order = np.argsort(columns['transaction_id'])
+        at = np.searchsorted(arrays['day'], columns['day'][0], side='right')
+        arrays = {
+            name: np.insert(arrays[name], at, np.asarray(columns[name], dtype=dtype)[order])
+            for name, dtype in FIELDS
+        }
+        name_id = np.insert(name_id, at, np.array(ids, dtype=np.int32)[order])
+        return ItemIndex(arrays, name_id, vocabulary, self.loaded_at)
+
+    def search(self, tokens, fuzzy=True):
+        """
+        (row mask, fuzzy tokens) for line items whose names have a term
+        starting with every token. A token with no such term falls back to
+        similar terms when fuzzy; those tokens are returned.
+        """
+        vocabulary = self.vocabulary
+        selected = None
+        corrected = []
+        for token in tokens:
+            ids = vocabulary.name_ids(vocabulary.prefixed(token))
+            if not ids and fuzzy and len(token) >= FUZZY_MIN_LENGTH:
+                ids = vocabulary.name_ids(vocabulary.similar(token))
+                if ids:
+                    corrected.append(token)
+            selected = ids if selected is None else selected & ids
+            if not selected:
+                return np.zeros(len(self.name_id), dtype=bool), corrected
+
+        hit = np.zeros(len(vocabulary.names), dtype=bool)
+        hit[list(selected)] = True
+        return hit[self.name_id], corrected
+
+
+def _columns(rows):
+    """FIELDS columns plus item_name from (transaction_id, receipt_id, date, store_id, unit_cost, quantity, item_name) rows."""
+    return {
+        'transaction_id': np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)),
+        'receipt_id': np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows)),
+        'day': np.fromiter((_ordinal(r[2]) for r in rows), dtype=np.int32, count=len(rows)),
+        'store_id': np.fromiter((r[3] for r in rows), dtype=np.int64, count=len(rows)),
+        'unit_cents': np.fromiter((to_cents(r[4]) for r in rows), dtype=np.int64, count=len(rows)),
+        'quantity': np.fromiter((r[5] for r in rows), dtype=np.int64, count=len(rows)),
+        'item_name': [r[6] for r in rows],
+    }
+
+
+LINE_ITEMS = '''
+    SELECT t.transaction_id, t.receipt_id, r.date, r.store_id, t.unit_cost, t.quantity, t.item_name
+    FROM Transactions t
+    JOIN Receipts r ON r.receipt_id = t.receipt_id
+'''
+
+
+def load_index(cursor, user_id):
+    """Build a user's index from their line items, archived months included."""
+    cursor.execute(LINE_ITEMS + 'WHERE r.user_id = %s', (user_id,))
+    columns = _columns(cursor.fetchall())
+    if covers(None):
+        archived = archived_line_items(user_id)
+        names = columns['item_name'] + archived['item_name'].tolist()
+        columns = {name: np.concatenate([columns[name], archived[name]]) for name, _ in FIELDS}
+        columns['item_name'] = names
+    return ItemIndex.build(columns, time.monotonic())
+
+
+class ItemSearchCache:
+    """
+    LRU of ItemIndex entries bounded by budget_bytes across all users.
+    Entries older than max_age seconds are rebuilt.
+    """
+
+    def __init__(self, budget_bytes, max_age):
+        self.budget_bytes = budget_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def index(self, cursor, user_id):
+        """This user's index, building it on first access."""
+        key = int(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.loaded_at < self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            generation = self._generations.get(key, 0)
+
+        entry = load_index(cursor, key)
+
+        with self._lock:
+            self.misses += 1
+            # line items changed while we were loading, so this copy may be stale
+            if self._generations.get(key, 0) == generation:
+                self._store(key, entry)
+        return entry
+
+    def _store(self, key, entry):
+        self._drop(key)
+        if entry.nbytes > self.budget_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.budget_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _drop(self, key):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+
+    def receipt_changed(self, user_id, receipt_id, columns):
+        """Apply a committed change to a receipt's line items; columns holds all of them now."""
+        key = int(user_id)
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._store(key, entry.with_receipt(receipt_id, columns))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            key = int(user_id)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._drop(key)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'users': len(self._entries),
+            'bytes': self._bytes,
+            'budget_bytes': self.budget_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def item_search_cache():
+    """The app's ItemSearchCache, created on first use; None when ITEM_SEARCH_CACHE_BYTES is 0."""
+    budget = current_app.config.get('ITEM_SEARCH_CACHE_BYTES', 0)
+    if budget <= 0:
+        return None
+    cache = current_app.extensions.get('item_search_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            'item_search_cache', ItemSearchCache(budget, current_app.config['ITEM_SEARCH_TTL'])
+        )
+    return cache
+
+
+def items_changed(cursor, receipt_id):
+    """Refresh a receipt's line items in its owner's cached index after a committed write."""
+    cache = item_search_cache()
+    if cache is None:
+        return
+    cursor.execute('SELECT user_id FROM Receipts WHERE receipt_id = %s', (receipt_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return
+    cursor.execute(LINE_ITEMS + 'WHERE t.receipt_id = %s', (receipt_id,))
+    cache.receipt_changed(row[0], receipt_id, _columns(cursor.fetchall()))
+
+
+def receipt_items_removed(user_id, receipt_id):
+    """Drop a deleted receipt's line items from the user's cached index."""
+    cache = item_search_cache()
+    if cache is not None:
+        cache.receipt_changed(user_id, receipt_id, _columns([]))
+
+
+def forget_items(user_id):
+    """Drop a user's cached index after writes the hooks above don't describe."""
+    cache = item_search_cache()
+    if cache is not None:
+        cache.invalidate(user_id)
+
+
+def _store_names(cursor, store_ids):
+    names = {}
+    for i in range(0, len(store_ids), 500):
+        chunk = store_ids[i:i + 500]
+        cursor.execute(
+            f"SELECT store_id, store_name FROM Stores WHERE store_id IN ({', '.join(['%s'] * len(chunk))})",
+            chunk
+        )
+        names.update((int(store_id), name) for store_id, name in cursor.fetchall())
+    return names
+
+
+def _month(ordinals):
+    """Months since 1970-01 for day ordinals."""
+    return (ordinals.astype(np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+@purchases.route('/items/search/<user_id>', methods=['GET'])
+@admit('analytics')
+@coalesce
+def search_items(user_id):
+    """
+    Search a user's line items by name. Every word of ?q= must start a word
+    of the item name; a word with no match falls back to one-typo matches
+    unless ?fuzzy=false. Returns totals by item, store and month plus the
+    newest ?limit= matching line items.
+    """
+    try:
+        query = request.args.get('q', '')
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return error_response('q must contain at least one letter or digit', 400)
+        limit = min(max(int(request.args.get('limit', DEFAULT_LIMIT)), 0), MAX_LIMIT)
+        fuzzy = request.args.get('fuzzy', 'true').lower() != 'false'
+
+        cursor = db.get_read_db().cursor()
+        cache = item_search_cache()
+        index = cache.index(cursor, user_id) if cache is not None else load_index(cursor, user_id)
+        mask, corrected = index.search(tokens, fuzzy)
+        rows = np.flatnonzero(mask)
+
+        cents = index.unit_cents[rows] * index.quantity[rows]
+        quantity = index.quantity[rows]
+        names, name_of = np.unique(index.name_id[rows], return_inverse=True)
+        stores, store_of = np.unique(index.store_id[rows], return_inverse=True)
+        months, month_of = np.unique(_month(index.day[rows]), return_inverse=True)
+
+        def totals(keys, inverse):
+            # float64 weights are exact for integer sums below 2**53 cents
+            spent = np.bincount(inverse, weights=cents, minlength=len(keys)).astype(np.int64)
+            count = np.bincount(inverse, minlength=len(keys))
+            units = np.bincount(inverse, weights=quantity, minlength=len(keys)).astype(np.int64)
+            return spent, count, units
+
+        store_names = _store_names(cursor, [int(s) for s in stores])
+        vocabulary = index.vocabulary
+
+        spent, count, units = totals(names, name_of)
+        items = sorted((
+            {'item_name': vocabulary.names[int(n)], 'total': as_float(spent[i]),
+             'count': int(count[i]), 'quantity': int(units[i])}
+            for i, n in enumerate(names)
+        ), key=lambda item: (-item['total'], item['item_name']))
+
+        spent, count, _ = totals(stores, store_of)
+        by_store = sorted((
+            {'store_id': int(s), 'store_name': store_names.get(int(s)),
+             'total': as_float(spent[i]), 'count': int(count[i])}
+            for i, s in enumerate(stores)
+        ), key=lambda store: (-store['total'], store['store_id']))
+
+        spent, count, _ = totals(months, month_of)
+        by_month = [
+            {'month': str(np.datetime64(int(m), 'M')), 'total': as_float(spent[i]), 'count': int(count[i])}
+            for i, m in enumerate(months)
+        ]
+
+        matches = []
+        for row in rows[::-1][:limit]:
+            matches.append({
+                'transaction_id': int(index.transaction_id[row]),
+                'receipt_id': int(index.receipt_id[row]),
+                'date': date.fromordinal(int(index.day[row])).isoformat(),
+                'store_name': store_names.get(int(index.store_id[row])),
+                'item_name': vocabulary.names[int(index.name_id[row])],
+                'unit_cost': as_float(index.unit_cents[row]),
+                'quantity': int(index.quantity[row]),
+                'total': as_float(index.unit_cents[row] * index.quantity[row]),
+            })
+
+        return success_response({
+            'query': query,
+            'fuzzy_matched': corrected,
+            'total_spent': as_float(cents.sum()),
+            'count': int(len(rows)),
+            'quantity': int(quantity.sum()),
+            'items': items[:limit],
+            'by_store': by_store,
+            'by_month': by_month,
+            'matches': matches,
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
@@ -1,12 +1,28 @@
-from flask import request
+import csv
+import io
+
+from flask import make_response, request
 
 from src import db
+from src.admission import admit
+from src.anomalies import score_receipt
 from src.helpers import (
     build_json_response, success_response,
     error_response, validate_fields
 )
+from src.archive import receipts_source
+from src.changes import record
+from src.purchases import columnar
+from src.purchases.columnar import analytics_cache
+from src.purchases.item_search import items_changed, receipt_items_removed
+from src.management.budget_progress import apply_receipt_batch, apply_receipt_delta, apply_receipt_changes
+from src.money import as_float, normalize, to_cents
+from src.prices import receipt_changed, receipt_key, refresh
+from src.recurring import mark_stale
+from src.singleflight import coalesce
+from src.purchases.transactions import insert_line_items, validate_line_items
 from src.ml.categorizer import (
-    predict_category, CONFIDENCE_THRESHOLD,
+    predict_category, predict_categories, CONFIDENCE_THRESHOLD,
     train_model, reset_model
 )
 
@@ -62,6 +78,26 @@ SUBSCRIPTION_MERCHANTS = {
     'blue cross', 'bright horizons',
 }
 
+# shared with `flask plans verify`, which EXPLAINs them for index use
+# {receipts} is Receipts, or the archive union from receipts_source()
+PERIOD_TOTAL_SQL = (
+    'SELECT COALESCE(SUM(total_amount), 0) FROM {receipts} r WHERE user_id = %s AND date BETWEEN %s AND %s'
+)
+
+TOP_MERCHANTS_SQL = '''
+    SELECT s.store_name,
+           SUM(r.total_amount) as total_spent,
+           COUNT(*) as visit_count,
+           MAX(s.is_subscription) as is_subscription
+    FROM {receipts} r
+    LEFT JOIN Stores s ON r.store_id = s.store_id
+    WHERE r.user_id = %s AND r.date BETWEEN %s AND %s
+          AND s.store_name IS NOT NULL
+    GROUP BY s.store_name
+    ORDER BY total_spent DESC
+    LIMIT %s
+'''
+
 
 def is_subscription_merchant(store_name):
     """Check if a store name matches a known subscription or recurring service."""
@@ -101,17 +137,17 @@ CATEGORY_SIGNALS = {
 }
 
 
-def categorize_store(store_name):
+def _rule_category(store_name):
     """
-    Categorize a store by checking known merchants first, then scoring
-    against keyword signals, falling back to ML prediction when confident,
-    and defaulting to Shopping otherwise. Returns (category, source).
+    The merchant and keyword tiers of categorize_store. Returns
+    (category, source, ask_model): ask_model is set when no rule was strong
+    enough and an ML prediction should be tried before settling.
     """
     name_lower = store_name.lower().strip()
 
     for merchant, category in KNOWN_MERCHANTS.items():
         if merchant in name_lower:
-            return category, 'merchant_rule'
+            return category, 'merchant_rule', False
 
     scores = {cat: 0 for cat in CATEGORY_SIGNALS}
     for category, signals in CATEGORY_SIGNALS.items():
@@ -126,16 +162,84 @@ def categorize_store(store_name):
     best_score = scores[best]
 
     if best_score >= 3:
-        return best, 'keyword_rule'
+        return best, 'keyword_rule', False
+    if best_score > 0:
+        return best, 'keyword_rule', True
+    return 'Shopping', 'default', True
 
-    ml_category, confidence = predict_category(store_name)
-    if ml_category and confidence >= CONFIDENCE_THRESHOLD:
-        return ml_category, 'ml'
 
-    if best_score > 0:
-        return best, 'keyword_rule'
+def categorize_store(store_name):
+    """
+    Categorize a store by checking known merchants first, then scoring
+    against keyword signals, falling back to ML prediction when confident,
+    and defaulting to Shopping otherwise. Returns (category, source).
+    """
+    category, source, ask_model = _rule_category(store_name)
+    if ask_model:
+        ml_category, confidence = predict_category(store_name)
+        if ml_category and confidence >= CONFIDENCE_THRESHOLD:
+            return ml_category, 'ml'
+    return category, source
 
-    return 'Shopping', 'default'
+
+def categorize_stores(store_names):
+    """
+    categorize_store for many names at once, with a single model call for
+    the names the rules can't settle. Returns {name: (category, source)}.
+    """
+    results, pending = {}, []
+    for name in set(store_names):
+        category, source, ask_model = _rule_category(name)
+        results[name] = (category, source)
+        if ask_model:
+            pending.append(name)
+
+    for name, (ml_category, confidence) in zip(pending, predict_categories(pending)):
+        if ml_category and confidence >= CONFIDENCE_THRESHOLD:
+            results[name] = (ml_category, 'ml')
+    return results
+
+
+def purge_receipts(cursor, column, value):
+    """
+    Delete the receipts where column = value, returning the deleted
+    (receipt_id, user_id, store_id, date, category_id, total_amount) rows
+    for receipts_purged. Line items go with them by foreign key cascade.
+    """
+    cursor.execute(
+        'SELECT receipt_id, user_id, store_id, date, category_id, total_amount '
+        f'FROM Receipts WHERE {column} = %s',
+        (value,)
+    )
+    purged = cursor.fetchall()
+    cursor.execute(f'DELETE FROM Receipts WHERE {column} = %s', (value,))
+    return purged
+
+
+def receipts_purged(cursor, purged):
+    """
+    Take receipts removed by purge_receipts back out of the tables derived
+    from them, on the caller's cursor without committing. Budgets are
+    adjusted in one batch per user, price rows refreshed once per
+    (user, store, day), and each user logs one delete change listing the
+    removed receipt ids.
+    """
+    by_user = {}
+    for row in purged:
+        by_user.setdefault(row[1], []).append(row)
+    for user_id, rows in by_user.items():
+        dates = [receipt_date for _, _, _, receipt_date, _, _ in rows]
+        record(cursor, user_id, 'receipt', None, 'delete', {
+            'receipt_ids': sorted(int(receipt_id) for receipt_id, *_ in rows),
+            'total_amount': as_float(sum(to_cents(amount) for *_, amount in rows)),
+            'start_date': min(dates),
+            'end_date': max(dates),
+        })
+    for key in dict.fromkeys((user_id, store_id, day) for _, user_id, store_id, day, _, _ in purged):
+        refresh(cursor, *key)
+    for user_id, rows in by_user.items():
+        changes = [(category_id, receipt_date, -amount) for _, _, _, receipt_date, category_id, amount in rows]
+        apply_receipt_batch(cursor, user_id, changes, max(receipt_id for receipt_id, *_ in rows))
 
 
 def resolve_category_id(cursor, category_name):
@@ -149,6 +253,8 @@ def resolve_category_id(cursor, category_name):
 
 
 @purchases.route('/receipts/<user_id>', methods=['GET'])
+@admit('analytics')
+@coalesce
 def get_user_receipts(user_id):
     """Supports search/date/category filters, sorting, and pagination."""
     try:
@@ -189,11 +295,37 @@ def get_user_receipts(user_id):
             conditions.append('c.category_name = %s')
             params.append(category)
 
-        where = ' AND '.join(conditions)
         cursor = db.get_db().cursor()
 
-        base_from = '''
-            FROM Receipts r
+        # the dashboard drilldown (category + date range) is served from the columnar cache
+        cache = analytics_cache()
+        if cache is not None and start_date and end_date and not search and sort_by in ('date', 'total_amount'):
+            columns = cache.columns(cursor, user_id)
+            if not page:
+                _, rows = columnar.receipt_rows(
+                    cache, columns, user_id, start_date, end_date, category, sort_by, sort_order == 'desc'
+                )
+                return success_response(rows)
+
+            page = int(page)
+            total, rows = columnar.receipt_rows(
+                cache, columns, user_id, start_date, end_date, category, sort_by, sort_order == 'desc',
+                offset=(page - 1) * per_page, limit=per_page
+            )
+            return success_response({
+                'receipts': rows,
+                'total': total,
+                'page': page,
+                'per_page': per_page,
+                'total_pages': (total + per_page - 1) // per_page
+            })
+
+        where = ' AND '.join(conditions)
+
+        # archived rows only join in when the caller asks for an old range
+        source = receipts_source(cursor, user_id, start_date, end_date) if start_date else 'Receipts'
+        base_from = f'''
+            FROM {source} r
             LEFT JOIN Stores s ON r.store_id = s.store_id
             LEFT JOIN Categories c ON r.category_id = c.category_id
         '''
@@ -263,6 +395,8 @@ def compute_date_range(period, offset):
 
 
 @purchases.route('/receipts/<user_id>/summary', methods=['GET'])
+@admit('analytics')
+@coalesce
 def get_user_receipt_summary(user_id):
     """Aggregated spending data for a time period."""
     try:
@@ -272,23 +406,25 @@ def get_user_receipt_summary(user_id):
         start, end = compute_date_range(period, offset)
         prev_start, prev_end = compute_date_range(period, offset - 1)
 
-        cursor = db.get_db().cursor()
+        cursor = db.get_read_db().cursor()
+        cache = analytics_cache()
+        if cache is not None:
+            columns = cache.columns(cursor, user_id)
+            return success_response(
+                columnar.summary(cache, columns, period, start, end, prev_start, prev_end)
+            )
 
-        cursor.execute(
-            'SELECT COALESCE(SUM(total_amount), 0) FROM Receipts WHERE user_id = %s AND date BETWEEN %s AND %s',
-            (user_id, start, end)
-        )
-        total_spent = float(cursor.fetchone()[0])
+        source = receipts_source(cursor, user_id, prev_start, end)
 
-        cursor.execute(
-            'SELECT COALESCE(SUM(total_amount), 0) FROM Receipts WHERE user_id = %s AND date BETWEEN %s AND %s',
-            (user_id, prev_start, prev_end)
-        )
-        previous_total = float(cursor.fetchone()[0])
+        cursor.execute(PERIOD_TOTAL_SQL.format(receipts=source), (user_id, start, end))
+        total_spent = as_float(to_cents(cursor.fetchone()[0]))
 
-        cursor.execute('''
+        cursor.execute(PERIOD_TOTAL_SQL.format(receipts=source), (user_id, prev_start, prev_end))
+        previous_total = as_float(to_cents(cursor.fetchone()[0]))
+
+        cursor.execute(f'''
             SELECT c.category_name, SUM(r.total_amount) as total, COUNT(*) as count
-            FROM Receipts r
+            FROM {source} r
             LEFT JOIN Categories c ON r.category_id = c.category_id
             WHERE r.user_id = %s AND r.date BETWEEN %s AND %s
             GROUP BY c.category_name
@@ -296,21 +432,21 @@ def get_user_receipt_summary(user_id):
         ''', (user_id, start, end))
         by_category = build_json_response(cursor, cursor.fetchall())
 
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT DATE(date - INTERVAL WEEKDAY(date) DAY) as week_start,
                    SUM(total_amount) as total
-            FROM Receipts
+            FROM {source} r
             WHERE user_id = %s AND date BETWEEN %s AND %s
             GROUP BY week_start
             ORDER BY week_start ASC
         ''', (user_id, start, end))
         by_week = build_json_response(cursor, cursor.fetchall())
 
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT DATE(r.date - INTERVAL WEEKDAY(r.date) DAY) as week_start,
                    c.category_name,
                    SUM(r.total_amount) as total
-            FROM Receipts r
+            FROM {source} r
             LEFT JOIN Categories c ON r.category_id = c.category_id
             WHERE r.user_id = %s AND r.date BETWEEN %s AND %s
             GROUP BY week_start, c.category_name
@@ -329,9 +465,9 @@ def get_user_receipt_summary(user_id):
             'by_week_category': by_week_category
         }
 
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT r.date as day_date, SUM(r.total_amount) as total
-            FROM Receipts r
+            FROM {source} r
             WHERE r.user_id = %s AND r.date BETWEEN %s AND %s
             GROUP BY r.date
             ORDER BY r.date ASC
@@ -339,9 +475,9 @@ def get_user_receipt_summary(user_id):
         result['by_day'] = build_json_response(cursor, cursor.fetchall())
 
         if period == 'week':
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT r.date as day_date, c.category_name, SUM(r.total_amount) as total
-                FROM Receipts r
+                FROM {source} r
                 LEFT JOIN Categories c ON r.category_id = c.category_id
                 WHERE r.user_id = %s AND r.date BETWEEN %s AND %s
                 GROUP BY r.date, c.category_name
@@ -350,21 +486,21 @@ def get_user_receipt_summary(user_id):
             result['by_day_category'] = build_json_response(cursor, cursor.fetchall())
 
         if period == 'year':
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT DATE_FORMAT(date, '%%Y-%%m-01') as month_start,
                        SUM(total_amount) as total
-                FROM Receipts
+                FROM {source} r
                 WHERE user_id = %s AND date BETWEEN %s AND %s
                 GROUP BY month_start
                 ORDER BY month_start ASC
             ''', (user_id, start, end))
             result['by_month'] = build_json_response(cursor, cursor.fetchall())
 
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT DATE_FORMAT(r.date, '%%Y-%%m-01') as month_start,
                        c.category_name,
                        SUM(r.total_amount) as total
-                FROM Receipts r
+                FROM {source} r
                 LEFT JOIN Categories c ON r.category_id = c.category_id
                 WHERE r.user_id = %s AND r.date BETWEEN %s AND %s
                 GROUP BY month_start, c.category_name
@@ -378,6 +514,8 @@ def get_user_receipt_summary(user_id):
 
 
 @purchases.route('/receipts/<user_id>/top-merchants', methods=['GET'])
+@admit('analytics')
+@coalesce
 def get_top_merchants(user_id):
     """Returns the top merchants by total spend for the given period and offset."""
     try:
@@ -386,21 +524,15 @@ def get_top_merchants(user_id):
         limit = int(request.args.get('limit', 5))
 
         start, end = compute_date_range(period, offset)
-        cursor = db.get_db().cursor()
+        cursor = db.get_read_db().cursor()
+        cache = analytics_cache()
+        if cache is not None:
+            columns = cache.columns(cursor, user_id)
+            return success_response(columnar.top_merchants(cache, columns, start, end, limit))
 
-        cursor.execute('''
-            SELECT s.store_name,
-                   SUM(r.total_amount) as total_spent,
-                   COUNT(*) as visit_count,
-                   MAX(s.is_subscription) as is_subscription
-            FROM Receipts r
-            LEFT JOIN Stores s ON r.store_id = s.store_id
-            WHERE r.user_id = %s AND r.date BETWEEN %s AND %s
-                  AND s.store_name IS NOT NULL
-            GROUP BY s.store_name
-            ORDER BY total_spent DESC
-            LIMIT %s
-        ''', (user_id, start, end, limit))
+        source = receipts_source(cursor, user_id, start, end)
+
+        cursor.execute(TOP_MERCHANTS_SQL.format(receipts=source), (user_id, start, end, limit))
         data = build_json_response(cursor, cursor.fetchall())
         return success_response(data)
     except Exception as e:
@@ -408,6 +540,8 @@ def get_top_merchants(user_id):
 
 
 @purchases.route('/receipts/<user_id>/store/<store_id>', methods=['GET'])
+@admit('analytics')
+@coalesce
 def get_receipts_by_store(user_id, store_id):
     """Returns all receipts for a user at a specific store, newest first."""
     try:
@@ -428,6 +562,118 @@ def get_receipts_by_store(user_id, store_id):
         return error_response(str(e), 500)
 
 
+@purchases.route('/receipts/<user_id>/export', methods=['GET'])
+@admit('bulk', limit=2)
+@coalesce
+def export_receipts(user_id):
+    """Full receipt history as CSV, archived months included."""
+    try:
+        cursor = db.get_db().cursor()
+        source = receipts_source(cursor, user_id)
+        cursor.execute(f'''
+            SELECT r.receipt_id, r.date, r.total_amount, s.store_name,
+                   c.category_name, r.category_source
+            FROM {source} r
+            LEFT JOIN Stores s ON r.store_id = s.store_id
+            LEFT JOIN Categories c ON r.category_id = c.category_id
+            WHERE r.user_id = %s
+            ORDER BY r.date ASC, r.receipt_id ASC
+        ''', (user_id,))
+
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow([d[0] for d in cursor.description])
+        for receipt_id, receipt_date, amount, *rest in cursor.fetchall():
+            writer.writerow([receipt_id, receipt_date, normalize(amount), *rest])
+
+        response = make_response(out.getvalue())
+        response.mimetype = 'text/csv'
+        response.headers['Content-Disposition'] = f'attachment; filename=receipts_{user_id}.csv'
+        return response
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+def insert_receipt(cursor, user_id, the_data):
+    """
+    Resolve (or create) the store, categorize, insert the receipt and update
+    budget progress on the caller's cursor without committing. Returns
+    (receipt_id, store_id, category_id, category_source).
+    """
+    store_name = the_data.get('store_name', '').strip()
+    store_id = the_data.get('store_id')
+
+    if store_name and not store_id:
+        cursor.execute(
+            'SELECT store_id FROM Stores WHERE store_name = %s LIMIT 1',
+            (store_name,)
+        )
+        row = cursor.fetchone()
+        if row:
+            store_id = row[0]
+        else:
+            subscription = is_subscription_merchant(store_name)
+            cursor.execute(
+                'INSERT INTO Stores '
+                '(store_name, zip_code, street_address, city, state, is_subscription) '
+                'VALUES (%s, %s, %s, %s, %s, %s)',
+                (store_name, '', '', '', '', subscription)
+            )
+            store_id = cursor.lastrowid
+
+    user_category_id = the_data.get('category_id')
+
+    if user_category_id:
+        category_id = user_category_id
+        category_source = 'user_override'
+    else:
+        category_name, category_source = categorize_store(store_name or '')
+        category_id = resolve_category_id(cursor, category_name)
+
+    query = '''
+        INSERT INTO Receipts (date, total_amount, user_id, store_id, tag_id, category_id, category_source)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    '''
+    values = (
+        the_data['date'],
+        the_data['total_amount'],
+        user_id,
+        store_id,
+        the_data.get('tag_id'),
+        category_id,
+        category_source
+    )
+    cursor.execute(query, values)
+    receipt_id = cursor.lastrowid
+    apply_receipt_delta(
+        cursor, user_id, category_id, the_data['date'],
+        the_data['total_amount'], receipt_id
+    )
+    score_receipt(cursor, user_id, category_id, receipt_id, the_data['total_amount'])
+    return receipt_id, store_id, category_id, category_source
+
+
+def _log_created(cursor, user_id, receipt_id, the_data, store_id, category_id, category_source, **extra):
+    record(cursor, user_id, 'receipt', receipt_id, 'create', {
+        'date': the_data['date'],
+        'total_amount': as_float(to_cents(the_data['total_amount'])),
+        'store_id': store_id,
+        'tag_id': the_data.get('tag_id'),
+        'category_id': category_id,
+        'category_source': category_source,
+        **extra,
+    })
+
+
+def _receipt_added(user_id, receipt_id, the_data, store_id, category_id, category_source):
+    cache = analytics_cache()
+    if cache is not None:
+        cache.receipt_added(
+            user_id, receipt_id, the_data['date'], the_data['total_amount'],
+            category_id, store_id, the_data.get('tag_id'), category_source
+        )
+
+
 @purchases.route('/receipts/<user_id>', methods=['POST'])
 def create_receipt(user_id):
     """
@@ -438,65 +684,61 @@ def create_receipt(user_id):
         the_data, err = validate_fields(['date', 'total_amount'])
         if err:
             return err
-
-        store_name = the_data.get('store_name', '').strip()
-        store_id = the_data.get('store_id')
-
-        if not store_id and not store_name:
+        if not the_data.get('store_id') and not the_data.get('store_name', '').strip():
             return error_response('Either store_id or store_name is required', 400)
 
-        cursor = db.get_db().cursor()
         conn = db.get_db()
+        cursor = conn.cursor()
+        receipt_id, store_id, category_id, category_source = insert_receipt(cursor, user_id, the_data)
+        _log_created(cursor, user_id, receipt_id, the_data, store_id, category_id, category_source)
+        conn.commit()
 
-        if store_name and not store_id:
-            cursor.execute(
-                'SELECT store_id FROM Stores WHERE store_name = %s LIMIT 1',
-                (store_name,)
-            )
-            row = cursor.fetchone()
-            if row:
-                store_id = row[0]
-            else:
-                subscription = is_subscription_merchant(store_name)
-                cursor.execute(
-                    'INSERT INTO Stores '
-                    '(store_name, zip_code, street_address, city, state, is_subscription) '
-                    'VALUES (%s, %s, %s, %s, %s, %s)',
-                    (store_name, '', '', '', '', subscription)
-                )
-                conn.commit()
-                store_id = cursor.lastrowid
+        _receipt_added(user_id, receipt_id, the_data, store_id, category_id, category_source)
+        return success_response({'message': 'Receipt created successfully', 'receipt_id': receipt_id}, 201)
+    except Exception as e:
+        return error_response(str(e), 500)
 
-        user_category_id = the_data.get('category_id')
 
-        if user_category_id:
-            category_id = user_category_id
-            category_source = 'user_override'
-        else:
-            category_name, category_source = categorize_store(store_name or '')
-            category_id = resolve_category_id(cursor, category_name)
+@purchases.route('/receipts/<user_id>/with-items', methods=['POST'])
+@admit('bulk')
+def create_receipt_with_items(user_id):
+    """
+    Create a receipt and all of its line items in one transaction. Takes the
+    create_receipt fields plus items: [{unit_cost, quantity, item_name}, ...].
+    Nothing is written unless every item is valid and every insert succeeds.
+    """
+    try:
+        the_data, err = validate_fields(['date', 'total_amount', 'items'])
+        if err:
+            return err
+        if not the_data.get('store_id') and not the_data.get('store_name', '').strip():
+            return error_response('Either store_id or store_name is required', 400)
+        err = validate_line_items(the_data['items'])
+        if err:
+            return err
 
-        query = '''
-            INSERT INTO Receipts (date, total_amount, user_id, store_id, tag_id, category_id, category_source)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        '''
-        values = (
-            the_data['date'],
-            the_data['total_amount'],
-            user_id,
-            store_id,
-            the_data.get('tag_id'),
-            category_id,
-            category_source
-        )
-        cursor.execute(query, values)
+        conn = db.get_db()
+        cursor = conn.cursor()
+        receipt_id, store_id, category_id, category_source = insert_receipt(cursor, user_id, the_data)
+        insert_line_items(cursor, receipt_id, the_data['items'])
+        refresh(cursor, user_id, store_id, the_data['date'])
+        _log_created(cursor, user_id, receipt_id, the_data, store_id, category_id, category_source,
+                     items=len(the_data['items']))
         conn.commit()
-        return success_response({'message': 'Receipt created successfully'}, 201)
+        items_changed(cursor, receipt_id)
+
+        _receipt_added(user_id, receipt_id, the_data, store_id, category_id, category_source)
+        return success_response({
+            'message': 'Receipt created successfully',
+            'receipt_id': receipt_id,
+            'transactions': len(the_data['items']),
+        }, 201)
     except Exception as e:
         return error_response(str(e), 500)
 
 
 @purchases.route('/receipts/retrain', methods=['POST'])
+@admit('bulk', limit=1)
 def retrain_categorizer():
     """Retrain the ML categorizer using current receipt data."""
     try:
@@ -549,8 +791,45 @@ def update_receipt(receipt_id):
         query = f"UPDATE Receipts SET {', '.join(set_clauses)} WHERE receipt_id = %s"
 
         cursor = db.get_db().cursor()
+        cursor.execute(
+            'SELECT user_id, category_id, date, total_amount FROM Receipts WHERE receipt_id = %s',
+            (receipt_id,)
+        )
+        old = cursor.fetchone()
+        if not old:
+            return error_response('Receipt not found', 404)
+        user_id, old_category_id, old_date, old_amount = old
+        moved = receipt_key(cursor, receipt_id) if 'date' in the_data else None
+
         cursor.execute(query, values)
+        if moved is not None:
+            # line items move with the receipt, so both days' prices change
+            refresh(cursor, *moved)
+            receipt_changed(cursor, receipt_id)
+        apply_receipt_changes(cursor, user_id, [
+            (old_category_id, old_date, -old_amount),
+            (the_data.get('category_id', old_category_id),
+             the_data.get('date', old_date),
+             the_data['total_amount']),
+        ], receipt_id)
+        mark_stale(cursor, user_id)
+        record(cursor, user_id, 'receipt', int(receipt_id), 'update', {
+            'date': the_data.get('date', old_date),
+            'total_amount': as_float(to_cents(the_data['total_amount'])),
+            'category_id': the_data.get('category_id', old_category_id),
+            'previous': {'date': old_date, 'total_amount': old_amount, 'category_id': old_category_id},
+        })
         db.get_db().commit()
+
+        cache = analytics_cache()
+        if cache is not None:
+            cache.receipt_updated(
+                user_id, receipt_id, the_data.get('date', old_date), the_data['total_amount'],
+                the_data.get('category_id', old_category_id),
+                'user_override' if 'category_id' in the_data else None
+            )
+        if 'date' in the_data:
+            items_changed(cursor, receipt_id)
         return success_response({'message': 'Receipt updated successfully'})
     except Exception as e:
         return error_response(str(e), 500)
@@ -558,12 +837,31 @@ def update_receipt(receipt_id):
 
 @purchases.route('/receipts/<receipt_id>', methods=['DELETE'])
 def delete_receipt(receipt_id):
-    """Remove a receipt and let the DB cascade to its transactions."""
+    """Remove a receipt and its transactions."""
     try:
-        query = 'DELETE FROM Receipts WHERE receipt_id = %s'
         cursor = db.get_db().cursor()
-        cursor.execute(query, (receipt_id,))
+        cursor.execute(
+            'SELECT user_id, category_id, date, total_amount FROM Receipts WHERE receipt_id = %s',
+            (receipt_id,)
+        )
+        old = cursor.fetchone()
+        if not old:
+            return error_response('Receipt not found', 404)
+        user_id, category_id, receipt_date, amount = old
+        key = receipt_key(cursor, receipt_id)
+
+        cursor.execute('DELETE FROM Receipts WHERE receipt_id = %s', (receipt_id,))
+        refresh(cursor, *key)
+        apply_receipt_delta(cursor, user_id, category_id, receipt_date, -amount, receipt_id)
+        record(cursor, user_id, 'receipt', int(receipt_id), 'delete', {
+            'date': receipt_date, 'total_amount': amount, 'category_id': category_id,
+        })
         db.get_db().commit()
+
+        cache = analytics_cache()
+        if cache is not None:
+            cache.receipt_removed(user_id, receipt_id)
+        receipt_items_removed(user_id, receipt_id)
         return success_response({'message': 'Receipt deleted successfully'})
     except Exception as e:
         return error_response(str(e), 500)
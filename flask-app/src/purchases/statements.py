@@ -0,0 +1,458 @@
+import codecs
+import csv
+import html
+import json
+import logging
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from dateutil import parser as date_parser
+from flask import Response, current_app, request, stream_with_context
+
+from src import db
+from src.admission import admit
+from src.anomalies import observe_batch
+from src.changes import record
+from src.helpers import success_response, error_response
+from src.management.budget_progress import apply_receipt_batch
+from src.money import as_float, to_cents
+from src.purchases.columnar import forget
+from src.purchases.receipts import categorize_stores, is_subscription_merchant
+
+from . import purchases
+
+logger = logging.getLogger(__name__)
+
+# Bank statements are read as a stream of byte chunks and parsed record by
+# record, so memory stays flat however large the upload is. Spending rows
+# become receipts in batches of IMPORT_BATCH_ROWS, each batch resolving its
+# stores and categories with a handful of set-based queries and committing
+# on its own.
+
+IMPORT_FORMATS = ('csv', 'ofx', 'qfx')
+READ_BYTES = 64 * 1024
+# 7 placeholders a row stays under SQLite's 999 bound-parameter limit
+RECEIPT_INSERT_ROWS = 140
+LOOKUP_CHUNK = 500
+MAX_REPORTED_ERRORS = 20
+
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'trans. date', 'posted date', 'posting date', 'post date'),
+    'description': ('description', 'payee', 'merchant', 'name', 'store_name', 'store', 'memo'),
+    'amount': ('amount', 'total_amount', 'total'),
+    'debit': ('debit', 'withdrawal', 'withdrawals', 'debit amount'),
+}
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+class StatementError(ValueError):
+    """The upload can't be read as a statement at all (bad format or header)."""
+
+
+def _counted(stream, counter):
+    while True:
+        chunk = stream.read(READ_BYTES)
+        if not chunk:
+            return
+        counter[0] += len(chunk)
+        yield chunk
+
+
+def _decoded(chunks, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def _lines(texts):
+    """Newline-terminated lines from text chunks, as csv.reader expects."""
+    pending = ''
+    for text in texts:
+        parts = (pending + text).split('\n')
+        pending = parts.pop()
+        for part in parts:
+            yield part + '\n'
+    if pending:
+        yield pending
+
+
+def _column(header, kind):
+    for name in CSV_COLUMNS[kind]:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+def parse_csv(chunks, debits='negative'):
+    """
+    (record, date, amount, description, sign) per CSV row. Amounts come from
+    a Debit column when there is one, otherwise from Amount, where spending
+    is negative (debits='negative', the usual bank export) or positive.
+    """
+    reader = csv.reader(_lines(_decoded(chunks, 'utf-8-sig')))
+    header = next(reader, None)
+    if header is None:
+        raise StatementError('The file is empty')
+    header = [name.strip().lower() for name in header]
+
+    date_col = _column(header, 'date')
+    description_col = _column(header, 'description')
+    amount_col = _column(header, 'debit')
+    sign = 0
+    if amount_col is None:
+        amount_col = _column(header, 'amount')
+        sign = -1 if debits == 'negative' else 1
+    if None in (date_col, description_col, amount_col):
+        raise StatementError('CSV needs date, description and amount (or debit) columns')
+
+    width = max(date_col, description_col, amount_col) + 1
+    for row in reader:
+        if not any(field.strip() for field in row):
+            continue
+        if len(row) < width:
+            row += [''] * (width - len(row))
+        yield reader.line_num, row[date_col], row[amount_col], row[description_col], sign
+
+
+def _ofx_tags(chunks, encoding):
+    """(closing, TAG, value) for every tag in the stream, values unescaped."""
+    def split(text):
+        for closing, tag, value in _OFX_TAG.findall(text):
+            value = value.strip()
+            yield closing, tag.upper(), html.unescape(value) if '&' in value else value
+
+    pending = ''
+    for text in _decoded(chunks, encoding):
+        pending += text
+        cut = pending.rfind('<')
+        if cut > 0:
+            # everything before the last '<' is complete tags and values
+            yield from split(pending[:cut])
+            pending = pending[cut:]
+    yield from split(pending)
+
+
+def parse_ofx(chunks, encoding='utf-8'):
+    """
+    (record, date, amount, description, sign) per STMTTRN in an OFX or QFX
+    file. Handles both SGML (v1, unclosed leaf tags) and XML (v2) bodies.
+    """
+    count = 0
+    current = None
+
+    def finish(txn):
+        description = txn.get('NAME') or txn.get('PAYEE') or txn.get('MEMO')
+        return count, txn.get('DTPOSTED'), txn.get('TRNAMT'), description, -1
+
+    for closing, tag, value in _ofx_tags(chunks, encoding):
+        if tag == 'STMTTRN' or (closing and tag == 'BANKTRANLIST'):
+            if current is not None:
+                yield finish(current)
+            current = None
+            if tag == 'STMTTRN' and not closing:
+                count += 1
+                current = {}
+        elif current is not None and not closing:
+            current[tag] = value
+    if current is not None:
+        yield finish(current)
+
+
+def parse_amount(text):
+    """Decimal from '1,234.56', '$-12.00' or '(12.00)', None when blank."""
+    text = (text or '').strip().replace(',', '').replace('$', '')
+    if not text:
+        return None
+    negative = text.startswith('(') and text.endswith(')')
+    if negative:
+        text = text[1:-1]
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f'bad amount {text!r}')
+    return -amount if negative else amount
+
+
+def parse_date(text):
+    """date from ISO, US (MM/DD/YYYY) or OFX (YYYYMMDD...) forms."""
+    text = (text or '').strip()
+    parsed = None
+    if not text:
+        raise ValueError('missing date')
+    try:
+        if len(text) >= 8 and text[:8].isdigit():
+            parsed = date(int(text[:4]), int(text[4:6]), int(text[6:8]))
+        elif len(text) == 10 and text[4] == '-':
+            parsed = date.fromisoformat(text)
+        else:
+            for fmt in ('%m/%d/%Y', '%m/%d/%y'):
+                try:
+                    parsed = datetime.strptime(text, fmt).date()
+                    break
+                except ValueError:
+                    continue
+            if parsed is None:
+                parsed = date_parser.parse(text).date()
+    except (ValueError, OverflowError):
+        raise ValueError(f'bad date {text!r}')
+    return parsed
+
+
+def _store_name(description):
+    return ' '.join((description or '').split())[:100]
+
+
+class StatementImport:
+    """Turns parsed records into receipts for one user, a batch at a time."""
+
+    def __init__(self, cursor, user_id):
+        self.cursor = cursor
+        self.user_id = user_id
+        self.store_ids = {}
+        self.categories = {}
+        self.category_ids = None
+        # statements repeat a few hundred dates across thousands of rows
+        self.dates = {}
+        self.stats = {
+            'rows': 0, 'imported': 0, 'skipped': 0, 'invalid': 0,
+            'stores_created': 0, 'budget_alerts': 0, 'errors': [],
+        }
+
+    def convert(self, record):
+        """(date, amount, store_name) for a spending record, None for anything else."""
+        number, date_text, amount_text, description, sign = record
+        self.stats['rows'] += 1
+        try:
+            amount = parse_amount(amount_text)
+            if amount is None or amount == 0:
+                self.stats['skipped'] += 1
+                return None
+            # sign 0: an unsigned Debit column; otherwise credits and refunds are skipped
+            amount = abs(amount) if sign == 0 else amount * sign
+            if amount <= 0:
+                self.stats['skipped'] += 1
+                return None
+            store_name = _store_name(description)
+            if not store_name:
+                raise ValueError('missing description')
+            receipt_date = self.dates.get(date_text)
+            if receipt_date is None:
+                receipt_date = self.dates[date_text] = parse_date(date_text)
+            return receipt_date, amount.quantize(Decimal('0.01')), store_name
+        except ValueError as e:
+            self.stats['invalid'] += 1
+            if len(self.stats['errors']) < MAX_REPORTED_ERRORS:
+                self.stats['errors'].append({'record': number, 'error': str(e)})
+            return None
+
+    def _resolve_stores(self, names):
+        missing = [name for name in names if name.lower() not in self.store_ids]
+        if not missing:
+            return
+        self._load_stores(missing)
+
+        new = [name for name in missing if name.lower() not in self.store_ids]
+        new = list({name.lower(): name for name in new}.values())
+        for i in range(0, len(new), LOOKUP_CHUNK // 6):
+            chunk = new[i:i + LOOKUP_CHUNK // 6]
+            rows = ', '.join(["(%s, '', '', '', '', %s)"] * len(chunk))
+            values = []
+            for name in chunk:
+                values.extend((name, is_subscription_merchant(name)))
+            self.cursor.execute(
+                'INSERT INTO Stores (store_name, zip_code, street_address, city, state, is_subscription) '
+                f'VALUES {rows}',
+                values
+            )
+        self.stats['stores_created'] += len(new)
+        self._load_stores(new)
+
+    def _load_stores(self, names):
+        for i in range(0, len(names), LOOKUP_CHUNK):
+            chunk = names[i:i + LOOKUP_CHUNK]
+            marks = ', '.join(['%s'] * len(chunk))
+            self.cursor.execute(
+                f'SELECT store_id, store_name FROM Stores WHERE store_name IN ({marks}) ORDER BY store_id',
+                chunk
+            )
+            for store_id, store_name in self.cursor.fetchall():
+                self.store_ids.setdefault(store_name.lower(), store_id)
+
+    def _resolve_categories(self, names):
+        if self.category_ids is None:
+            self.cursor.execute('SELECT category_id, category_name FROM Categories')
+            self.category_ids = {name: category_id for category_id, name in self.cursor.fetchall()}
+        missing = [name for name in names if name not in self.categories]
+        for name, (category, source) in categorize_stores(missing).items():
+            self.categories[name] = (self.category_ids.get(category), source)
+
+    def write(self, rows):
+        """Insert one batch of (date, amount, store_name) on the cursor, without committing."""
+        names = list({store_name for _, _, store_name in rows})
+        self._resolve_stores(names)
+        self._resolve_categories(names)
+
+        changes = []
+        receipt_id = None
+        for i in range(0, len(rows), RECEIPT_INSERT_ROWS):
+            chunk = rows[i:i + RECEIPT_INSERT_ROWS]
+            values = []
+            for receipt_date, amount, store_name in chunk:
+                category_id, source = self.categories[store_name]
+                values.extend((
+                    receipt_date, amount, self.user_id, self.store_ids[store_name.lower()],
+                    None, category_id, source
+                ))
+                changes.append((category_id, receipt_date, amount))
+            marks = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(chunk))
+            self.cursor.execute(
+                'INSERT INTO Receipts (date, total_amount, user_id, store_id, tag_id, category_id, category_source) '
+                f'VALUES {marks}',
+                values
+            )
+            # MySQL reports the first id of a multi-row INSERT; the chunk's ids are consecutive
+            receipt_id = self.cursor.lastrowid + len(chunk) - 1
+
+        alerts = apply_receipt_batch(self.cursor, self.user_id, changes, receipt_id)
+        # imported rows are mostly past charges: they shape the statistics but raise no anomaly alerts
+        observe_batch(self.cursor, self.user_id, changes)
+        # one change per batch: clients reload rather than replay thousands of rows
+        dates = [receipt_date for receipt_date, _, _ in rows]
+        record(self.cursor, self.user_id, 'receipt', None, 'import', {
+            'receipts': len(rows),
+            'total_amount': as_float(sum(to_cents(amount) for _, amount, _ in rows)),
+            'start_date': min(dates),
+            'end_date': max(dates),
+        })
+        self.stats['budget_alerts'] += len(alerts)
+        self.stats['imported'] += len(rows)
+
+
+def _sniff(head, filename, content_type):
+    requested = request.args.get('format', '').lower()
+    if requested:
+        return requested
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in IMPORT_FORMATS:
+        return extension
+    if 'ofx' in content_type or 'qfx' in content_type:
+        return 'ofx'
+    sample = head.lstrip().upper()
+    if sample.startswith(b'OFXHEADER') or sample.startswith(b'<?XML') or b'<OFX>' in sample:
+        return 'ofx'
+    return 'csv'
+
+
+def _records(stream, counter):
+    """Parsed records from the upload, with the format picked from args, filename or content."""
+    upload = request.files.get('file')
+    filename = (upload.filename or '') if upload else ''
+    content_type = (upload.mimetype if upload else request.mimetype) or ''
+    source = upload.stream if upload else stream
+
+    head = source.read(512)
+    counter[0] += len(head)
+    chunks = _counted(source, counter)
+
+    def everything():
+        yield head
+        yield from chunks
+
+    kind = _sniff(head, filename, content_type)
+    if kind not in IMPORT_FORMATS:
+        raise StatementError(f'format must be one of: {", ".join(IMPORT_FORMATS)}')
+    if kind == 'csv':
+        debits = request.args.get('debits', 'negative')
+        if debits not in ('negative', 'positive'):
+            raise StatementError('debits must be negative or positive')
+        return parse_csv(everything(), debits)
+    encoding = 'cp1252' if b'CHARSET:1252' in head.upper() else 'utf-8'
+    return parse_ofx(everything(), encoding)
+
+
+def run_import(conn, user_id, records, batch_rows, counter):
+    """
+    Write records as receipts, committing every batch_rows spending rows.
+    Yields progress dicts after each commit; the last one has done set, and
+    error set if the import stopped early (earlier batches stay committed).
+    """
+    job = StatementImport(conn.cursor(), user_id)
+    total = request.content_length
+
+    def progress(done=False):
+        state = dict(job.stats, bytes_read=counter[0], bytes_total=total, done=done)
+        if not done:
+            state.pop('errors')
+        return state
+
+    pending = []
+    try:
+        for record in records:
+            row = job.convert(record)
+            if row is None:
+                continue
+            pending.append(row)
+            if len(pending) >= batch_rows:
+                job.write(pending)
+                conn.commit()
+                forget(user_id)
+                pending = []
+                yield progress()
+        if pending:
+            job.write(pending)
+            conn.commit()
+            forget(user_id)
+    except Exception as e:
+        conn.rollback()
+        forget(user_id)
+        state = progress(done=True)
+        state['error'] = str(e)
+        state['status'] = 400 if isinstance(e, StatementError) else 500
+        logger.warning('statement import for user %s stopped after %d rows: %s',
+                       user_id, job.stats['imported'], e)
+        yield state
+        return
+    yield progress(done=True)
+
+
+@purchases.route('/receipts/<user_id>/import', methods=['POST'])
+@admit('bulk', limit=2)
+def import_statement(user_id):
+    """
+    Import a CSV, OFX or QFX bank statement as receipts. The file is either
+    the raw request body or a multipart field named file. Spending rows
+    become receipts; credits and zero rows are skipped. ?progress=true
+    streams one JSON line per committed batch before the final summary.
+    """
+    try:
+        conn = db.get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM Users WHERE user_id = %s', (user_id,))
+        if not cursor.fetchone():
+            return error_response('User not found', 404)
+
+        counter = [0]
+        records = _records(request.stream, counter)
+        steps = run_import(conn, user_id, records, current_app.config['IMPORT_BATCH_ROWS'], counter)
+
+        if request.args.get('progress', '').lower() == 'true':
+            lines = (json.dumps(step) + '\n' for step in steps)
+            return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+        summary = None
+        for summary in steps:
+            pass
+        status = summary.pop('status', 201)
+        summary.pop('done')
+        return success_response(summary, status)
+    except StatementError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return error_response(str(e), 500)
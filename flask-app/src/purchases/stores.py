@@ -2,6 +2,9 @@ from flask import request
 
 from src import db
 from src.helpers import build_json_response, success_response, error_response, validate_fields
+from src.purchases.columnar import forget
+from src.purchases.item_search import forget_items
+from src.purchases.receipts import purge_receipts, receipts_purged
 
 from . import purchases
 
@@ -105,6 +108,7 @@ def update_store(store_id):
         cursor = db.get_db().cursor()
         cursor.execute(query, values)
         db.get_db().commit()
+        forget()
         return success_response({'message': 'Store updated successfully'})
     except Exception as e:
         return error_response(str(e), 500)
@@ -116,8 +120,13 @@ def delete_store(store_id):
     try:
         query = 'DELETE FROM Stores WHERE store_id = %s'
         cursor = db.get_db().cursor()
+        purged = purge_receipts(cursor, 'store_id', store_id)
+        receipts_purged(cursor, purged)
         cursor.execute(query, (store_id,))
         db.get_db().commit()
+        forget()
+        for user_id in {row[1] for row in purged}:
+            forget_items(user_id)
         return success_response({'message': 'Store deleted successfully'})
     except Exception as e:
         return error_response(str(e), 500)
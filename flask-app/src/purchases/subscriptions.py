@@ -0,0 +1,73 @@
+from flask import request
+
+from src import db
+from src.admission import admit
+from src.helpers import build_json_response, success_response, error_response
+from src.money import as_float, from_cents, to_cents
+from src.recurring import detect_user, stale_users
+
+from . import purchases
+
+
+def _detected(cursor, user_id, include_inactive):
+    """Subscription rows detected in memory, shaped like the stored ones."""
+    found = [f for f in detect_user(cursor, user_id) if include_inactive or f['active']]
+    names = {}
+    if found:
+        store_ids = sorted({f['store_id'] for f in found})
+        cursor.execute(
+            f"SELECT store_id, store_name FROM Stores WHERE store_id IN ({', '.join(['%s'] * len(store_ids))})",
+            store_ids
+        )
+        names = dict(cursor.fetchall())
+    found.sort(key=lambda f: (-f['monthly_cents'], str(names.get(f['store_id']))))
+    return [{
+        'store_id': f['store_id'],
+        'store_name': names.get(f['store_id']),
+        'cadence': f['cadence'],
+        'interval_days': f['interval_days'],
+        'typical_amount': from_cents(f['typical_cents']),
+        'monthly_cost': from_cents(f['monthly_cents']),
+        'occurrences': f['occurrences'],
+        'last_date': f['last_date'],
+        'next_date': f['next_date'],
+        'confidence': f['confidence'],
+        'active': f['active'],
+    } for f in found]
+
+
+@purchases.route('/subscriptions/<user_id>', methods=['GET'])
+@admit('analytics')
+def get_subscriptions(user_id):
+    """
+    Detected recurring charges and their projected monthly cost, from the
+    last `flask recurring scan`. When the user's receipts changed since,
+    detection runs in memory for this response and nothing is written.
+    """
+    try:
+        cursor = db.get_read_db().cursor()
+        include_inactive = request.args.get('include_inactive', 'false').lower() == 'true'
+
+        if stale_users(cursor, [int(user_id)]):
+            subscriptions = _detected(cursor, user_id, include_inactive)
+        else:
+            where = 'rc.user_id = %s'
+            if not include_inactive:
+                where += ' AND rc.active = TRUE'
+            cursor.execute(f'''
+                SELECT rc.store_id, s.store_name, rc.cadence, rc.interval_days, rc.typical_amount,
+                       rc.monthly_cost, rc.occurrences, rc.last_date, rc.next_date, rc.confidence, rc.active
+                FROM RecurringCharges rc
+                JOIN Stores s ON s.store_id = rc.store_id
+                WHERE {where}
+                ORDER BY rc.monthly_cost DESC, s.store_name
+            ''', (user_id,))
+            subscriptions = build_json_response(cursor, cursor.fetchall())
+
+        monthly = sum(to_cents(s['monthly_cost']) for s in subscriptions if s['active'])
+        return success_response({
+            'subscriptions': subscriptions,
+            'monthly_cost': as_float(monthly),
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
@@ -1,8 +1,44 @@
 from src import db
+from src.admission import admit
 from src.helpers import build_json_response, success_response, error_response, validate_fields
+from src.prices import receipt_changed, receipt_key, refresh
+from src.purchases.item_search import items_changed
 
 from . import purchases
 
+LINE_ITEM_FIELDS = ('unit_cost', 'quantity', 'item_name')
+MAX_LINE_ITEMS = 1000
+# 4 placeholders a row stays under SQLite's 999 bound-parameter limit
+INSERT_CHUNK_ROWS = 200
+
+
+def validate_line_items(items):
+    """None when items is a non-empty list of complete line items, else a 400 response."""
+    if not isinstance(items, list) or not items:
+        return error_response('items must be a non-empty list', 400)
+    if len(items) > MAX_LINE_ITEMS:
+        return error_response(f'At most {MAX_LINE_ITEMS} items per request', 400)
+    for i, item in enumerate(items):
+        missing = [f for f in LINE_ITEM_FIELDS if not isinstance(item, dict) or f not in item]
+        if missing:
+            return error_response(f'items[{i}] is missing: {", ".join(missing)}', 400)
+    return None
+
+
+def insert_line_items(cursor, receipt_id, items):
+    """Multi-row INSERT of every item on the caller's cursor, without committing."""
+    for i in range(0, len(items), INSERT_CHUNK_ROWS):
+        chunk = items[i:i + INSERT_CHUNK_ROWS]
+        rows = ', '.join(['(%s, %s, %s, %s)'] * len(chunk))
+        values = []
+        for item in chunk:
+            values.extend((item['unit_cost'], item['quantity'], item['item_name'], receipt_id))
+        cursor.execute(
+            f'INSERT INTO Transactions (unit_cost, quantity, item_name, receipt_id) VALUES {rows}',
+            values
+        )
+
+
 @purchases.route('/transactions/<receipt_id>', methods=['GET'])
 def get_transactions(receipt_id):
     """Return all line-item transactions for a given receipt."""
@@ -23,16 +59,52 @@ def create_transaction(receipt_id):
         if err:
             return err
 
+        cursor = db.get_db().cursor()
+        # answer an unknown receipt with 404 rather than a foreign key error
+        key = receipt_key(cursor, receipt_id)
+        if key is None:
+            return error_response('Receipt not found', 404)
+
         query = 'INSERT INTO Transactions (unit_cost, quantity, item_name, receipt_id) VALUES (%s, %s, %s, %s)'
         values = (the_data['unit_cost'], the_data['quantity'], the_data['item_name'], receipt_id)
-        cursor = db.get_db().cursor()
         cursor.execute(query, values)
+        refresh(cursor, *key)
         db.get_db().commit()
+        items_changed(cursor, receipt_id)
         return success_response({'message': 'Transaction created successfully'}, 201)
     except Exception as e:
         return error_response(str(e), 500)
 
 
+@purchases.route('/transactions/<receipt_id>/bulk', methods=['POST'])
+@admit('bulk')
+def create_transactions_bulk(receipt_id):
+    """Add many line items to an existing receipt in one transaction."""
+    try:
+        the_data, err = validate_fields(['items'])
+        if err:
+            return err
+        err = validate_line_items(the_data['items'])
+        if err:
+            return err
+
+        cursor = db.get_db().cursor()
+        key = receipt_key(cursor, receipt_id)
+        if key is None:
+            return error_response('Receipt not found', 404)
+
+        insert_line_items(cursor, receipt_id, the_data['items'])
+        refresh(cursor, *key)
+        db.get_db().commit()
+        items_changed(cursor, receipt_id)
+        return success_response({
+            'message': 'Transactions created successfully',
+            'created': len(the_data['items']),
+        }, 201)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
 @purchases.route('/transactions/detail/<transaction_id>', methods=['GET'])
 def get_transaction(transaction_id):
     """Fetch a single transaction by ID."""
@@ -55,8 +127,14 @@ def delete_transaction(transaction_id):
     try:
         query = 'DELETE FROM Transactions WHERE transaction_id = %s'
         cursor = db.get_db().cursor()
+        cursor.execute('SELECT receipt_id FROM Transactions WHERE transaction_id = %s', (transaction_id,))
+        row = cursor.fetchone()
         cursor.execute(query, (transaction_id,))
+        if row:
+            receipt_changed(cursor, row[0])
         db.get_db().commit()
+        if row:
+            items_changed(cursor, row[0])
         return success_response({'message': 'Transaction deleted successfully'})
     except Exception as e:
         return error_response(str(e), 500)
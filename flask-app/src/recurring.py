@@ -0,0 +1,241 @@
+from datetime import date, datetime, timedelta
+
+import click
+import numpy as np
+from flask.cli import AppGroup
+
+from src import db
+from src.money import from_cents, to_cents
+
+# Recurring charges are found per (user, store) series from the receipt
+# history alone: a series is recurring when its gaps settle on a known
+# cadence and its amounts barely move. Every series of a batch of users is
+# scored at once with NumPy segment operations. Results are stored per user
+# in RecurringCharges by `flask recurring scan` only; RecurringScans
+# remembers each user's receipt count and newest receipt id at their last
+# scan, so only users whose receipts changed since are scanned again.
+
+recurring_cli = AppGroup('recurring', help='Detect recurring charges in receipt history.')
+
+# (name, nominal days, allowed deviation in days)
+CADENCES = (
+    ('weekly', 7.0, 1.5),
+    ('biweekly', 14.0, 2.5),
+    ('monthly', 30.44, 4.0),
+    ('quarterly', 91.31, 10.0),
+    ('yearly', 365.25, 20.0),
+)
+_CADENCE_DAYS = np.array([days for _, days, _ in CADENCES])
+_CADENCE_TOLERANCE = np.array([tolerance for _, _, tolerance in CADENCES])
+
+DAYS_PER_MONTH = 30.44
+MIN_OCCURRENCES = 3
+# only the latest charges of a series are scored, so old price changes don't count
+RECENT_CHARGES = 13
+MIN_REGULARITY = 0.75
+MAX_AMOUNT_CV = 0.25
+HISTORY_DAYS = 3 * 366
+SCAN_BATCH_USERS = 200
+# 11 placeholders a row stays under SQLite's 999 bound-parameter limit
+INSERT_CHUNK_ROWS = 90
+
+
+def detect(user_ids, store_ids, days, cents, today):
+    """
+    Recurring series in receipt columns (NumPy arrays of user id, store id,
+    day ordinal and cents, any order). Returns one dict per recurring
+    (user, store) series, scored on its latest RECENT_CHARGES receipts.
+    """
+    if not len(days):
+        return []
+    order = np.lexsort((days, store_ids, user_ids))
+    user_ids, store_ids, days, cents = user_ids[order], store_ids[order], days[order], cents[order]
+
+    starts_series = np.r_[True, (user_ids[1:] != user_ids[:-1]) | (store_ids[1:] != store_ids[:-1])]
+    series = np.cumsum(starts_series) - 1
+    count = int(series[-1]) + 1
+    ends = np.cumsum(np.bincount(series, minlength=count))
+
+    # the latest charges of each series, with same-day repeats counted once
+    from_end = ends[series] - 1 - np.arange(len(days))
+    repeat = np.r_[False, ~starts_series[1:] & (days[1:] == days[:-1])]
+    keep = (from_end < RECENT_CHARGES) & ~repeat
+    user_ids, store_ids, days, cents, series = (
+        user_ids[keep], store_ids[keep], days[keep], cents[keep], series[keep]
+    )
+
+    same = series[1:] == series[:-1]
+    gaps = np.diff(days)[same].astype(np.float64)
+    gap_series = series[1:][same]
+    gap_count = np.bincount(gap_series, minlength=count)
+    candidate = gap_count >= MIN_OCCURRENCES - 1
+
+    # median gap per series: sort gaps within each series, pick the middle
+    median = np.zeros(count)
+    if len(gaps):
+        sorted_gaps = gaps[np.lexsort((gaps, gap_series))]
+        first = np.cumsum(gap_count) - gap_count
+        has = gap_count > 0
+        low = first[has] + (gap_count[has] - 1) // 2
+        high = first[has] + gap_count[has] // 2
+        median[has] = (sorted_gaps[low] + sorted_gaps[high]) / 2
+
+    matches = np.abs(median[:, None] - _CADENCE_DAYS[None, :]) <= _CADENCE_TOLERANCE[None, :]
+    cadence = matches.argmax(axis=1)
+    candidate &= matches.any(axis=1)
+
+    on_cadence = np.abs(gaps - _CADENCE_DAYS[cadence[gap_series]]) <= _CADENCE_TOLERANCE[cadence[gap_series]]
+    regularity = np.bincount(gap_series, weights=on_cadence, minlength=count) / np.maximum(gap_count, 1)
+    candidate &= regularity >= MIN_REGULARITY
+
+    occurrences = np.bincount(series, minlength=count)
+    amounts = cents.astype(np.float64)
+    mean = np.bincount(series, weights=amounts, minlength=count) / np.maximum(occurrences, 1)
+    square = np.bincount(series, weights=amounts * amounts, minlength=count) / np.maximum(occurrences, 1)
+    spread = np.sqrt(np.maximum(square - mean * mean, 0)) / np.maximum(mean, 1)
+    candidate &= (spread <= MAX_AMOUNT_CV) & (mean > 0)
+
+    last = np.zeros(count, dtype=np.int64)
+    last[series] = np.arange(len(series))
+    found = []
+    for index in np.flatnonzero(candidate):
+        row = last[index]
+        name, nominal, tolerance = CADENCES[cadence[index]]
+        last_day = int(days[row])
+        amount = int(cents[row])
+        found.append({
+            'user_id': int(user_ids[row]),
+            'store_id': int(store_ids[row]),
+            'cadence': name,
+            'interval_days': round(float(median[index]), 1),
+            'typical_cents': amount,
+            'monthly_cents': int(round(amount * DAYS_PER_MONTH / nominal)),
+            'occurrences': int(occurrences[index]),
+            'last_date': date.fromordinal(last_day),
+            'next_date': date.fromordinal(last_day + int(round(median[index]))),
+            'confidence': round(float(regularity[index] * (1 - spread[index])), 3),
+            # two missed charges in a row and the series counts as cancelled
+            'active': bool(today.toordinal() - last_day <= median[index] + 2 * tolerance),
+        })
+    return found
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _user_filter(user_ids):
+    if user_ids is None:
+        return '', ()
+    return f"WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})", tuple(user_ids)
+
+
+def _receipt_states(cursor, user_ids=None):
+    where, params = _user_filter(user_ids)
+    cursor.execute(f'SELECT user_id, COUNT(*), MAX(receipt_id) FROM Receipts {where} GROUP BY user_id', params)
+    return {int(user_id): (int(n), int(last)) for user_id, n, last in cursor.fetchall()}
+
+
+def stale_users(cursor, user_ids=None):
+    """{user_id: (receipt_count, last_receipt_id)} for users whose receipts changed since their last scan."""
+    if user_ids is not None and not user_ids:
+        return {}
+    current = _receipt_states(cursor, user_ids)
+
+    where, params = _user_filter(user_ids)
+    cursor.execute(f'SELECT user_id, receipt_count, last_receipt_id FROM RecurringScans {where}', params)
+    scanned = {int(user_id): (int(n), int(last)) for user_id, n, last in cursor.fetchall()}
+
+    stale = {user_id: state for user_id, state in current.items() if scanned.get(user_id) != state}
+    # users who have since lost all their receipts
+    for user_id in scanned.keys() - current.keys():
+        stale[user_id] = (0, 0)
+    return stale
+
+
+def mark_stale(cursor, user_id):
+    """Force a rescan after an edit that keeps the receipt count and ids the same."""
+    cursor.execute('DELETE FROM RecurringScans WHERE user_id = %s', (user_id,))
+
+
+def _detect_users(cursor, user_ids, today):
+    marks = ', '.join(['%s'] * len(user_ids))
+    cursor.execute(f'''
+        SELECT user_id, store_id, date, total_amount
+        FROM Receipts
+        WHERE user_id IN ({marks}) AND date >= %s
+    ''', (*user_ids, today - timedelta(days=HISTORY_DAYS)))
+    rows = cursor.fetchall()
+
+    return detect(
+        np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((_as_date(r[2]).toordinal() for r in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((to_cents(r[3]) for r in rows), dtype=np.int64, count=len(rows)),
+        today,
+    )
+
+
+def detect_user(cursor, user_id, today=None):
+    """One user's recurring series from their receipts, read only: nothing is stored."""
+    return _detect_users(cursor, [int(user_id)], today or date.today())
+
+
+def _scan_batch(cursor, states, today):
+    user_ids = list(states)
+    marks = ', '.join(['%s'] * len(user_ids))
+    found = _detect_users(cursor, user_ids, today)
+
+    cursor.execute(f'DELETE FROM RecurringCharges WHERE user_id IN ({marks})', user_ids)
+    for i in range(0, len(found), INSERT_CHUNK_ROWS):
+        chunk = found[i:i + INSERT_CHUNK_ROWS]
+        values = []
+        for f in chunk:
+            values.extend((
+                f['user_id'], f['store_id'], f['cadence'], f['interval_days'],
+                from_cents(f['typical_cents']), from_cents(f['monthly_cents']), f['occurrences'],
+                f['last_date'], f['next_date'], f['confidence'], f['active'],
+            ))
+        cursor.execute(
+            'INSERT INTO RecurringCharges (user_id, store_id, cadence, interval_days, typical_amount, '
+            'monthly_cost, occurrences, last_date, next_date, confidence, active) VALUES '
+            + ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(chunk)),
+            values
+        )
+
+    now = datetime.now().replace(microsecond=0)
+    cursor.execute(
+        'REPLACE INTO RecurringScans (user_id, receipt_count, last_receipt_id, scanned_at) VALUES '
+        + ', '.join(['(%s, %s, %s, %s)'] * len(user_ids)),
+        [v for user_id in user_ids for v in (user_id, *states[user_id], now)]
+    )
+    return len(found)
+
+
+def scan(cursor, user_ids=None, force=False, today=None):
+    """
+    Rescan the given users (all users by default) whose receipts changed
+    since their last scan, or every one of them with force. Writes on the
+    caller's cursor without committing. Returns (users scanned, series found).
+    """
+    today = today or date.today()
+    states = stale_users(cursor, user_ids)
+    if force and (user_ids is None or user_ids):
+        states.update(_receipt_states(cursor, user_ids))
+
+    users = sorted(states)
+    found = 0
+    for i in range(0, len(users), SCAN_BATCH_USERS):
+        batch = {user_id: states[user_id] for user_id in users[i:i + SCAN_BATCH_USERS]}
+        found += _scan_batch(cursor, batch, today)
+    return len(users), found
+
+
+@recurring_cli.command('scan')
+@click.option('--force', is_flag=True, help='Rescan every user, not only those with changed receipts.')
+def scan_command(force):
+    """Detect recurring charges for users with new or changed receipts."""
+    conn = db.get_db()
+    users, found = scan(conn.cursor(), force=force)
+    conn.commit()
+    click.echo(f'Scanned {users} users, {found} recurring charges')
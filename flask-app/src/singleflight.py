@@ -0,0 +1,104 @@
+import functools
+import threading
+
+from flask import current_app, request
+
+from src import db
+
+# Identical GETs that arrive while one is already being computed (several
+# tabs, a re-rendering page) wait for that computation instead of repeating
+# it. Only requests in flight at the same time share; nothing is cached.
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs fn once per key at a time; concurrent callers with the same key get its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        total = self.leaders + self.shared
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'shared': self.shared,
+            'shared_rate': round(self.shared / total, 4) if total else 0.0,
+        }
+
+
+def single_flight():
+    """The app's SingleFlight, None when SINGLE_FLIGHT is off."""
+    if not current_app.config.get('SINGLE_FLIGHT'):
+        return None
+    flights = current_app.extensions.get('single_flight')
+    if flights is None:
+        flights = current_app.extensions.setdefault('single_flight', SingleFlight())
+    return flights
+
+
+def _flight_key(view_args):
+    return (
+        request.endpoint,
+        tuple(sorted(view_args.items())),
+        tuple(sorted(request.args.items(multi=True))),
+        # requests pinned to the primary after a write don't share with replica reads
+        db.reads_pinned(),
+    )
+
+
+def coalesce(view):
+    """
+    Decorator for read-only views: concurrent identical requests share one
+    run of the view. Each caller gets its own copy of the response, so the
+    after_request hooks never touch a shared object.
+    """
+    @functools.wraps(view)
+    def wrapper(**view_args):
+        flights = single_flight()
+        if flights is None:
+            return view(**view_args)
+
+        def run():
+            response = current_app.make_response(view(**view_args))
+            return response.status_code, list(response.headers.items()), response.get_data()
+
+        status, headers, body = flights.do(_flight_key(view_args), run)
+        return current_app.response_class(body, status=status, headers=headers)
+    return wrapper
@@ -1,6 +1,9 @@
-from werkzeug.security import generate_password_hash
 from src import db
+from src.archive import forget_user
 from src.helpers import build_json_response, success_response, error_response, validate_fields
+from src.purchases.columnar import forget
+from src.purchases.item_search import forget_items
+from src.users.passwords import HashingBusy, busy_response, hash_password
 from src.users.users import users
 
 @users.route('', methods=['GET'])
@@ -25,7 +28,7 @@ def create_user():
         if err:
             return err
 
-        hashed_pw = generate_password_hash(the_data['password'])
+        hashed_pw = hash_password(the_data['password'])
         query = (
             'INSERT INTO Users '
             '(group_id, email, first_name, middle_name, last_name, password) '
@@ -43,6 +46,8 @@ def create_user():
         cursor.execute(query, values)
         db.get_db().commit()
         return success_response({'message': 'User created successfully'}, 201)
+    except HashingBusy:
+        return busy_response()
     except Exception as e:
         return error_response(str(e), 500)
 
@@ -57,7 +62,7 @@ def update_user(user_id):
         if err:
             return err
 
-        hashed_pw = generate_password_hash(the_data['password'])
+        hashed_pw = hash_password(the_data['password'])
         query = (
             'UPDATE Users SET group_id=%s, email=%s, first_name=%s, '
             'middle_name=%s, last_name=%s, password=%s '
@@ -76,6 +81,8 @@ def update_user(user_id):
         cursor.execute(query, values)
         db.get_db().commit()
         return success_response({'message': 'User updated successfully'})
+    except HashingBusy:
+        return busy_response()
     except Exception as e:
         return error_response(str(e), 500)
 
@@ -107,6 +114,9 @@ def delete_user(user_id):
         cursor = db.get_db().cursor()
         cursor.execute(query, (user_id,))
         db.get_db().commit()
+        forget_user(user_id)
+        forget(user_id)
+        forget_items(user_id)
         return success_response({'message': 'User deleted successfully'})
     except Exception as e:
         return error_response(str(e), 500)
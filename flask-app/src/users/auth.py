@@ -1,20 +1,25 @@
-from werkzeug.security import check_password_hash
 from src import db
 from src.helpers import success_response, error_response, validate_fields
+from src.users.passwords import HashingBusy, busy_response, verify_password
+from src.users.sessions import issue_token
 from src.users.users import users
 
 # login endpoint
 
 @users.route('/login', methods=['POST'])
 def login():
-    """Checks email/password and returns the user if it matches."""
+    """Checks email/password and returns the user, with a session token, if it matches."""
     try:
         the_data, err = validate_fields(['email', 'password'])
         if err:
             return err
 
         cursor = db.get_db().cursor()
-        cursor.execute('SELECT * FROM Users WHERE email = %s', (the_data['email'],))
+        cursor.execute(
+            'SELECT user_id, group_id, email, first_name, middle_name, last_name, password '
+            'FROM Users WHERE email = %s LIMIT 1',
+            (the_data['email'],)
+        )
         row = cursor.fetchone()
 
         if not row:
@@ -23,10 +28,13 @@ def login():
         row_headers = [x[0] for x in cursor.description]
         user = dict(zip(row_headers, row))
 
-        if not check_password_hash(user['password'], the_data['password']):
+        if not verify_password(user['password'], the_data['password']):
             return error_response('Invalid email or password', 401)
 
         user.pop('password', None)
+        user['token'] = issue_token(user)
         return success_response(user)
+    except HashingBusy:
+        return busy_response()
     except Exception as e:
         return error_response(str(e), 500)
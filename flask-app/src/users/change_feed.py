@@ -0,0 +1,92 @@
+import json
+import time
+
+from flask import Response, current_app, request
+
+from src import db
+from src.changes import change_bus, read_changes
+from src.helpers import success_response, error_response
+from src.users.users import users
+
+# The stream's generator runs after the view has returned, outside the
+# request's app context: it holds no admission slot and no connection while
+# it waits, and borrows a connection only for each read.
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def _limit():
+    return min(max(int(request.args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+
+
+@users.route('/<user_id>/changes', methods=['GET'])
+def get_changes(user_id):
+    """
+    Changes to a user's receipts and budgets after seq ?after= (0 for
+    everything retained), oldest first. Pass last_seq back as ?after= for
+    the next page; reset means changes were missed and the client should
+    reload its data before carrying on from last_seq.
+    """
+    try:
+        after = int(request.args.get('after', 0))
+        limit = _limit()
+        cursor = db.get_read_db().cursor()
+        changes, last_seq, reset = read_changes(cursor, user_id, after, limit)
+        return success_response({
+            'changes': changes,
+            'last_seq': last_seq,
+            'has_more': len(changes) == limit,
+            'reset': reset,
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+def _event(name, data, seq=None):
+    head = f'id: {seq}\n' if seq is not None else ''
+    return f'{head}event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+def _stream(app, bus, user_id, after, limit):
+    poll = app.config['CHANGE_POLL_SECONDS']
+    deadline = time.monotonic() + app.config['CHANGE_STREAM_SECONDS']
+    yield f'retry: {int(poll * 1000)}\n\n'
+    while True:
+        # taken before the read, so a change committed during it still wakes the wait
+        version = bus.version(user_id)
+        with app.app_context():
+            changes, last_seq, reset = read_changes(db.get_read_db().cursor(), user_id, after, limit)
+        if reset:
+            yield _event('reset', {'last_seq': last_seq}, last_seq)
+        for change in changes:
+            yield _event('change', change, change['seq'])
+        after = last_seq
+        if len(changes) == limit:
+            continue
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if bus.wait(user_id, version, min(poll, remaining)) == version:
+            yield ': keepalive\n\n'
+
+
+@users.route('/<user_id>/changes/stream', methods=['GET'])
+def stream_changes(user_id):
+    """
+    Server-Sent Events stream of a user's changes, one change event per
+    change with its seq as the event id. Resumes after the Last-Event-ID
+    header (sent by EventSource on reconnect) or ?after=. Ends after
+    CHANGE_STREAM_SECONDS; clients reconnect and pick up where they left off.
+    """
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+        limit = _limit()
+        app = current_app._get_current_object()
+        response = Response(_stream(app, change_bus(), user_id, after, limit), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        return error_response(str(e), 500)
@@ -0,0 +1,105 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from flask import current_app, request
+from werkzeug.test import EnvironBuilder
+
+from src.admission import admit
+from src.helpers import success_response, error_response
+from src.purchases.receipts import compute_date_range
+from src.singleflight import coalesce
+from src.users.users import users
+
+# The dashboard's independent reads, as (name, path, query) run concurrently
+# through the same views the page used to call one by one. Each one runs in
+# its own request context, so it takes its own pooled (or replica) connection.
+DASHBOARD_SECTIONS = (
+    ('summary', '/purchases/receipts/{user_id}/summary',
+     lambda period, offset, start, end: {'period': period, 'offset': offset}),
+    ('receipts', '/purchases/receipts/{user_id}',
+     lambda period, offset, start, end: {'start_date': start, 'end_date': end, 'page': 1, 'per_page': 5}),
+    ('budgets', '/management/budgets/user/{user_id}',
+     lambda period, offset, start, end: {'start_date': start, 'end_date': end}),
+    ('top_merchants', '/purchases/receipts/{user_id}/top-merchants',
+     lambda period, offset, start, end: {'period': period, 'offset': offset, 'limit': 5}),
+    ('spending_goals', '/management/spending-goals/{user_id}',
+     lambda period, offset, start, end: {}),
+)
+
+
+def _executor(app):
+    executor = app.extensions.get('dashboard_executor')
+    if executor is None:
+        executor = app.extensions.setdefault('dashboard_executor', ThreadPoolExecutor(
+            max_workers=app.config['DASHBOARD_WORKERS'], thread_name_prefix='dashboard'
+        ))
+    return executor
+
+
+def run_section(app, path, query, remote_addr):
+    """Dispatch one GET to its view without the after_request hooks; returns (status, json)."""
+    environ = EnvironBuilder(
+        path=path, query_string=query, environ_base={'REMOTE_ADDR': remote_addr}
+    ).get_environ()
+    with app.request_context(environ):
+        response = app.make_response(app.dispatch_request())
+        return response.status_code, response.get_json()
+
+
+@users.route('/<user_id>/dashboard', methods=['GET'])
+@admit('analytics')
+@coalesce
+def get_dashboard(user_id):
+    """
+    Summary, recent receipts, budgets, top merchants and spending goals for
+    one period in a single payload. Sections that fail or miss the deadline
+    come back as null with a message under errors.
+    """
+    try:
+        period = request.args.get('period', 'month')
+        offset = int(request.args.get('offset', 0))
+        start, end = compute_date_range(period, offset)
+
+        app = current_app._get_current_object()
+        timeout = app.config['DASHBOARD_SECTION_TIMEOUT']
+        executor = _executor(app)
+
+        started = time.monotonic()
+        futures = {}
+        for name, path, query in DASHBOARD_SECTIONS:
+            args = query(period, offset, start.isoformat(), end.isoformat())
+            futures[name] = executor.submit(
+                run_section, app, path.format(user_id=user_id), args, request.remote_addr
+            )
+
+        payload = {
+            'period': period,
+            'offset': offset,
+            'period_start': start.isoformat(),
+            'period_end': end.isoformat(),
+            'errors': {},
+        }
+        for name, future in futures.items():
+            remaining = max(0.0, started + timeout - time.monotonic())
+            try:
+                status, body = future.result(timeout=remaining)
+            except FutureTimeout:
+                # the worker finishes on its own and checks its connection back in
+                payload[name] = None
+                payload['errors'][name] = f'timed out after {timeout:g}s'
+                continue
+            except Exception as e:
+                payload[name] = None
+                payload['errors'][name] = str(e)
+                continue
+
+            if status >= 400:
+                payload[name] = None
+                payload['errors'][name] = (body or {}).get('error', f'status {status}')
+            else:
+                payload[name] = body
+
+        return success_response(payload)
+    except Exception as e:
+        return error_response(str(e), 500)
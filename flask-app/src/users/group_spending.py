@@ -0,0 +1,265 @@
+from flask import request
+
+from src import db
+from src.admission import admit
+from src.archive import covers, receipts_source
+from src.helpers import success_response, error_response
+from src.money import as_float, to_cents
+from src.purchases.receipts import compute_date_range
+from src.singleflight import coalesce
+from src.users.users import users
+
+# Group analytics aggregate every member in one grouped query joined through
+# Users.group_id (idx_users_group on SQLite, the group_id foreign key index
+# on MySQL), then split the per-member rows in Python, so the number of
+# queries doesn't grow with the group. Archived months come from the
+# ArchivedSpend daily rollup for totals and from the archive files for
+# merchants.
+
+ARCHIVED_SPEND = '''(
+    SELECT x.user_id, x.category_id, x.date, x.total_amount, 1 AS receipts
+    FROM Receipts x JOIN Users xu ON xu.user_id = x.user_id
+    WHERE xu.group_id = %s AND x.date BETWEEN %s AND %s
+    UNION ALL
+    SELECT a.user_id, a.category_id, a.date, a.total_amount, a.receipts
+    FROM ArchivedSpend a JOIN Users au ON au.user_id = a.user_id
+    WHERE au.group_id = %s AND a.date BETWEEN %s AND %s
+)'''
+
+
+def _spend_source(group_id, start, end):
+    """
+    (table expression, receipt count expression, its params) for the group's
+    spend between start and end; the union carries the group and date
+    filters into both branches so neither scans the whole table.
+    """
+    if covers(start):
+        return ARCHIVED_SPEND, 'SUM(r.receipts)', (group_id, start, end) * 2
+    return 'Receipts', 'COUNT(*)', ()
+
+
+def _members(cursor, group_id):
+    """{user_id: member dict} for the group, or None when the group doesn't exist."""
+    cursor.execute(
+        'SELECT user_id, first_name, last_name FROM Users WHERE group_id = %s ORDER BY user_id', (group_id,)
+    )
+    members = {
+        user_id: {'user_id': user_id, 'first_name': first_name, 'last_name': last_name}
+        for user_id, first_name, last_name in cursor.fetchall()
+    }
+    if not members:
+        cursor.execute('SELECT group_id FROM `Groups` WHERE group_id = %s', (group_id,))
+        if cursor.fetchone() is None:
+            return None
+    return members
+
+
+def _by_total(rows):
+    return sorted(rows, key=lambda row: (-row['total'], str(row.get('category_name'))))
+
+
+@users.route('/group/<group_id>/summary', methods=['GET'])
+@admit('analytics')
+@coalesce
+def get_group_summary(group_id):
+    """Spending across every member of a group for a period, with a per-member breakdown."""
+    try:
+        period = request.args.get('period', 'month')
+        offset = int(request.args.get('offset', 0))
+        start, end = compute_date_range(period, offset)
+        prev_start, prev_end = compute_date_range(period, offset - 1)
+
+        cursor = db.get_read_db().cursor()
+        members = _members(cursor, group_id)
+        if members is None:
+            return error_response('Group not found', 404)
+        source, count, source_params = _spend_source(group_id, prev_start, end)
+
+        cursor.execute(f'''
+            SELECT r.user_id, c.category_name, SUM(r.total_amount), {count}
+            FROM {source} r
+            JOIN Users u ON u.user_id = r.user_id
+            LEFT JOIN Categories c ON c.category_id = r.category_id
+            WHERE u.group_id = %s AND r.date BETWEEN %s AND %s
+            GROUP BY r.user_id, c.category_name
+        ''', source_params + (group_id, start, end))
+        spent = {}
+        categories = {}
+        for user_id, category_name, total, receipts in cursor.fetchall():
+            cents = to_cents(total)
+            spent.setdefault(user_id, []).append((category_name, cents, int(receipts)))
+            entry = categories.setdefault(category_name, [0, 0])
+            entry[0] += cents
+            entry[1] += int(receipts)
+
+        cursor.execute(f'''
+            SELECT r.user_id, SUM(r.total_amount)
+            FROM {source} r
+            JOIN Users u ON u.user_id = r.user_id
+            WHERE u.group_id = %s AND r.date BETWEEN %s AND %s
+            GROUP BY r.user_id
+        ''', source_params + (group_id, prev_start, prev_end))
+        previous = {user_id: to_cents(total) for user_id, total in cursor.fetchall()}
+
+        cursor.execute(f'''
+            SELECT DATE(r.date - INTERVAL WEEKDAY(r.date) DAY) as week_start, SUM(r.total_amount) as total
+            FROM {source} r
+            JOIN Users u ON u.user_id = r.user_id
+            WHERE u.group_id = %s AND r.date BETWEEN %s AND %s
+            GROUP BY week_start
+            ORDER BY week_start ASC
+        ''', source_params + (group_id, start, end))
+        by_week = [{'week_start': str(week)[:10], 'total': as_float(to_cents(total))}
+                   for week, total in cursor.fetchall()]
+
+        total_spent = sum(cents for cents, _ in categories.values())
+        by_member = []
+        for user_id, member in members.items():
+            rows = spent.get(user_id, [])
+            member_total = sum(cents for _, cents, _ in rows)
+            by_member.append({
+                **member,
+                'total': as_float(member_total),
+                'previous_total': as_float(previous.get(user_id, 0)),
+                'count': sum(receipts for _, _, receipts in rows),
+                'share': round(member_total / total_spent, 4) if total_spent else 0,
+                'by_category': _by_total([
+                    {'category_name': name, 'total': as_float(cents), 'count': receipts}
+                    for name, cents, receipts in rows
+                ]),
+            })
+        by_member.sort(key=lambda m: (-m['total'], m['user_id']))
+
+        return success_response({
+            'group_id': int(group_id),
+            'member_count': len(members),
+            'total_spent': as_float(total_spent),
+            'previous_total': as_float(sum(previous.values())),
+            'period': period,
+            'period_start': start.isoformat(),
+            'period_end': end.isoformat(),
+            'by_category': _by_total([
+                {'category_name': name, 'total': as_float(cents), 'count': receipts}
+                for name, (cents, receipts) in categories.items()
+            ]),
+            'by_week': by_week,
+            'by_member': by_member,
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+@users.route('/group/<group_id>/top-merchants', methods=['GET'])
+@admit('analytics')
+@coalesce
+def get_group_top_merchants(group_id):
+    """
+    The group's top merchants by total spend for a period, each with what
+    every member spent there, archived months included.
+    """
+    try:
+        period = request.args.get('period', 'month')
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 5))
+        start, end = compute_date_range(period, offset)
+
+        cursor = db.get_read_db().cursor()
+        members = _members(cursor, group_id)
+        if members is None:
+            return error_response('Group not found', 404)
+
+        source = receipts_source(cursor, list(members), start, end)
+
+        # one pass: per (store, member) totals, ranked per store in Python
+        cursor.execute(f'''
+            SELECT s.store_name, r.user_id, SUM(r.total_amount), COUNT(*), MAX(s.is_subscription)
+            FROM {source} r
+            JOIN Users u ON u.user_id = r.user_id
+            JOIN Stores s ON s.store_id = r.store_id
+            WHERE u.group_id = %s AND r.date BETWEEN %s AND %s
+            GROUP BY s.store_name, r.user_id
+        ''', (group_id, start, end))
+        stores = {}
+        for store_name, user_id, total, visits, subscription in cursor.fetchall():
+            store = stores.setdefault(store_name, {
+                'store_name': store_name, 'total': 0, 'visits': 0, 'is_subscription': False, 'members': []
+            })
+            cents = to_cents(total)
+            store['total'] += cents
+            store['visits'] += int(visits)
+            store['is_subscription'] = store['is_subscription'] or bool(subscription)
+            store['members'].append((cents, int(visits), user_id))
+
+        top = sorted(stores.values(), key=lambda s: (-s['total'], s['store_name']))[:limit]
+        data = []
+        for store in top:
+            data.append({
+                'store_name': store['store_name'],
+                'total_spent': as_float(store['total']),
+                'visit_count': store['visits'],
+                'is_subscription': store['is_subscription'],
+                'members': [
+                    {'user_id': user_id, 'total_spent': as_float(cents), 'visit_count': visits}
+                    for cents, visits, user_id in sorted(store['members'], key=lambda m: (-m[0], m[2]))
+                ],
+            })
+        return success_response(data)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+@users.route('/group/<group_id>/budgets', methods=['GET'])
+@admit('analytics')
+@coalesce
+def get_group_budgets(group_id):
+    """
+    Members' budgets rolled up per category from BudgetProgress, with each
+    member's budget underneath. ?active=true keeps budgets active today.
+    """
+    try:
+        active_filter = ''
+        if request.args.get('active', '').lower() == 'true':
+            active_filter = 'AND CURRENT_DATE BETWEEN b.start_date AND b.end_date'
+
+        cursor = db.get_read_db().cursor()
+        members = _members(cursor, group_id)
+        if members is None:
+            return error_response('Group not found', 404)
+
+        cursor.execute(f'''
+            SELECT b.budget_id, b.user_id, b.category_id, c.category_name, b.amount,
+                   b.start_date, b.end_date, bp.spent
+            FROM Budgets b
+            JOIN Users u ON u.user_id = b.user_id
+            JOIN BudgetProgress bp ON bp.budget_id = b.budget_id
+            LEFT JOIN Categories c ON c.category_id = b.category_id
+            WHERE u.group_id = %s {active_filter}
+            ORDER BY b.start_date DESC, b.budget_id
+        ''', (group_id,))
+        categories = {}
+        for budget_id, user_id, category_id, name, amount, start, end, spent in cursor.fetchall():
+            entry = categories.setdefault(category_id, {
+                'category_id': category_id, 'category_name': name, 'amount': 0, 'spent': 0, 'budgets': []
+            })
+            entry['amount'] += to_cents(amount)
+            entry['spent'] += to_cents(spent)
+            entry['budgets'].append({
+                'budget_id': budget_id,
+                'user_id': user_id,
+                'amount': as_float(to_cents(amount)),
+                'spent_amount': as_float(to_cents(spent)),
+                'start_date': str(start)[:10],
+                'end_date': str(end)[:10],
+            })
+
+        data = []
+        for entry in sorted(categories.values(), key=lambda e: (-e['spent'], str(e['category_name']))):
+            data.append({
+                **entry,
+                'amount': as_float(entry['amount']),
+                'spent': as_float(entry['spent']),
+                'percent_used': round(entry['spent'] * 100 / entry['amount'], 1) if entry['amount'] else None,
+            })
+        return success_response(data)
+    except Exception as e:
+        return error_response(str(e), 500)
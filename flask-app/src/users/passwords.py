@@ -0,0 +1,116 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from src.helpers import error_response
+
+# PBKDF2 is deliberately slow, so hashing runs in a small process pool rather
+# than on the request thread (where it holds the GIL and every worker's CPU).
+# A bounded number of hashes may be queued; past that, callers get a 503 and
+# retry instead of piling up behind a login burst.
+
+
+class HashingBusy(Exception):
+    """Too many password hashes already queued or running."""
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords in worker processes, with admission control."""
+
+    def __init__(self, workers, max_pending, timeout):
+        self._pool = None
+        if workers > 0:
+            # spawn: forking a threaded server can copy held locks into the child
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending > 0 else None
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _release(self, _future=None):
+        if self._slots is not None:
+            self._slots.release()
+
+    def _run(self, fn, *args):
+        # max_pending <= 0 means unbounded: no slots to take
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusy()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            if self._pool is None:
+                try:
+                    return fn(*args)
+                finally:
+                    self._release()
+            try:
+                future = self._pool.submit(fn, *args)
+            except Exception:
+                self._release()
+                raise
+            # the slot is held until the pool finishes the job, even if this
+            # caller gives up waiting, so queued work never exceeds max_pending
+            future.add_done_callback(self._release)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                raise HashingBusy()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+
+def password_hasher():
+    """The app's PasswordHasher, created on first use."""
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        config = current_app.config
+        hasher = current_app.extensions.setdefault('password_hasher', PasswordHasher(
+            config['PASSWORD_HASH_WORKERS'],
+            config['PASSWORD_HASH_MAX_PENDING'],
+            config['PASSWORD_HASH_TIMEOUT'],
+        ))
+    return hasher
+
+
+def hash_password(password):
+    return password_hasher().hash(password)
+
+
+def verify_password(pwhash, password):
+    return password_hasher().verify(pwhash, password)
+
+
+def busy_response():
+    """503 for a request turned away by the hashing queue."""
+    response = error_response('Server busy, please retry', 503)
+    response.headers['Retry-After'] = '1'
+    return response
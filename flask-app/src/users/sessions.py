@@ -0,0 +1,73 @@
+import hashlib
+
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from src.helpers import success_response, error_response
+from src.users.users import users
+
+# Login hands back a signed, timestamped token carrying the user's identity.
+# Checking it is an HMAC over the token, so authenticated requests need no
+# session table and no Users read. Rotating SECRET_KEY invalidates them all.
+
+TOKEN_FIELDS = ('user_id', 'group_id', 'email', 'first_name', 'last_name')
+
+
+def _serializer():
+    return URLSafeTimedSerializer(
+        current_app.config['SECRET_KEY'],
+        salt='session-token',
+        signer_kwargs={'digest_method': hashlib.sha256},
+    )
+
+
+def issue_token(user):
+    """Signed session token for a user row."""
+    return _serializer().dumps({field: user.get(field) for field in TOKEN_FIELDS})
+
+
+def read_token(token):
+    """The claims in a token, None if it is tampered with or older than SESSION_TOKEN_TTL."""
+    try:
+        return _serializer().loads(token, max_age=current_app.config['SESSION_TOKEN_TTL'])
+    except BadSignature:  # SignatureExpired is a subclass
+        return None
+
+
+def current_session():
+    """Claims from this request's Bearer token, None if absent or invalid."""
+    if 'session' not in g:
+        header = request.headers.get('Authorization', '')
+        scheme, _, token = header.partition(' ')
+        g.session = read_token(token.strip()) if scheme.lower() == 'bearer' and token else None
+    return g.session
+
+
+@users.before_app_request
+def require_session():
+    """
+    With REQUIRE_SESSION_TOKEN on, routes scoped to a user_id only answer
+    to a token for that user, and routes scoped to a group_id to a token
+    of one of its members. Off by default so existing clients keep working.
+    """
+    if not current_app.config.get('REQUIRE_SESSION_TOKEN'):
+        return None
+    view_args = request.view_args or {}
+    scope = 'user_id' if 'user_id' in view_args else 'group_id' if 'group_id' in view_args else None
+    if scope is None:
+        return None
+    claims = current_session()
+    if claims is None:
+        return error_response('Authentication required', 401)
+    if str(claims.get(scope)) != str(view_args[scope]):
+        return error_response('Forbidden', 403)
+    return None
+
+
+@users.route('/me', methods=['GET'])
+def get_me():
+    """The signed-in user, straight from the session token."""
+    claims = current_session()
+    if claims is None:
+        return error_response('Invalid or expired session', 401)
+    return success_response(claims)
@@ -4,4 +4,8 @@ users = Blueprint('users', __name__)
 
 from src.users import accounts
 from src.users import groups
+from src.users import group_spending
 from src.users import auth
+from src.users import sessions
+from src.users import dashboard
+from src.users import change_feed
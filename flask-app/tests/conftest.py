@@ -1,7 +1,38 @@
 import pytest
+from contextlib import ExitStack
 from unittest.mock import MagicMock, patch
 from src import create_app
 
+# every module that imported src.db, in patch order
+PATCHED_DB_MODULES = (
+    'src.purchases.receipts.db',
+    'src.purchases.transactions.db',
+    'src.purchases.stores.db',
+    'src.purchases.statements.db',
+    'src.purchases.subscriptions.db',
+    'src.purchases.item_search.db',
+    'src.purchases.item_prices.db',
+    'src.prices.db',
+    'src.recurring.db',
+    'src.descriptors.categories.db',
+    'src.management.spending_goals.db',
+    'src.management.budgets.db',
+    'src.management.notifications.db',
+    'src.management.forecasts.db',
+    'src.forecast.db',
+    'src.anomalies.db',
+    'src.changes.db',
+    'src.users.accounts.db',
+    'src.users.groups.db',
+    'src.users.group_spending.db',
+    'src.users.auth.db',
+    'src.users.change_feed.db',
+    'src.plans.db',
+    'src.archive.db',
+    'src.singleflight.db',
+    'src.db',
+)
+
 
 @pytest.fixture
 def app():
@@ -12,21 +43,21 @@ def app():
 
     mock_db = MagicMock()
     mock_db.get_db.return_value = mock_conn
+    mock_db.get_read_db.return_value = mock_conn
 
-    with patch('src.db', mock_db), \
-         patch('src.purchases.receipts.db', mock_db), \
-         patch('src.purchases.transactions.db', mock_db), \
-         patch('src.purchases.stores.db', mock_db), \
-         patch('src.descriptors.categories.db', mock_db), \
-         patch('src.management.spending_goals.db', mock_db), \
-         patch('src.management.budgets.db', mock_db), \
-         patch('src.management.notifications.db', mock_db), \
-         patch('src.users.accounts.db', mock_db), \
-         patch('src.users.groups.db', mock_db), \
-         patch('src.users.auth.db', mock_db):
+    # src.db is patched last so route modules imported by the patches
+    # before it bind the real db, not this test's mock
+    with ExitStack() as stack:
+        for target in PATCHED_DB_MODULES:
+            stack.enter_context(patch(target, mock_db))
 
         test_app = create_app()
         test_app.config['TESTING'] = True
+        # mocked cursors can't feed the columnar cache; route reads through SQL
+        test_app.config['ANALYTICS_CACHE_BYTES'] = 0
+        test_app.config['ITEM_SEARCH_CACHE_BYTES'] = 0
+        # hash on the request thread; the process pool has its own test
+        test_app.config['PASSWORD_HASH_WORKERS'] = 0
 
         test_app.mock_db = mock_db
         test_app.mock_cursor = mock_cursor
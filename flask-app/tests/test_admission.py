@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from src.admission import Gate, Overloaded, admission
+
+
+class TestGate:
+    def test_admits_up_to_limit(self):
+        gate = Gate(limit=2, queue=0, timeout=1)
+        gate.enter()
+        gate.enter()
+
+        with pytest.raises(Overloaded) as e:
+            gate.enter()
+        assert e.value.status == 429
+        assert gate.stats()['rejected_full'] == 1
+
+    def test_unlimited_when_limit_is_zero(self):
+        gate = Gate(limit=0, queue=0, timeout=1)
+        for _ in range(50):
+            gate.enter()
+        assert gate.stats()['active'] == 50
+
+    def test_waiter_gets_slot_when_released(self):
+        gate = Gate(limit=1, queue=1, timeout=2)
+        gate.enter()
+        threading.Timer(0.1, gate.leave).start()
+
+        gate.enter()
+        stats = gate.stats()
+        assert stats['queued'] == 1
+        assert stats['max_wait_ms'] >= 50
+        assert stats['active'] == 1
+
+    def test_waiter_times_out(self):
+        gate = Gate(limit=1, queue=1, timeout=0.05)
+        gate.enter()
+
+        started = time.monotonic()
+        with pytest.raises(Overloaded) as e:
+            gate.enter()
+        assert e.value.status == 503
+        assert e.value.retry_after == 1
+        assert time.monotonic() - started >= 0.05
+        assert gate.stats()['queue_depth'] == 0
+
+
+class TestAdmissionRoutes:
+    def _hold(self, app, cost_class):
+        with app.app_context():
+            gate = admission().classes[cost_class]
+        gate.enter()
+        return gate
+
+    def test_saturated_class_sheds_with_retry_after(self, app, client, mock_cursor):
+        app.config['ADMISSION_ANALYTICS_LIMIT'] = 1
+        app.config['ADMISSION_QUEUE'] = 0
+        self._hold(app, 'analytics')
+
+        response = client.get('/purchases/receipts/1/summary')
+
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+
+    def test_cheap_routes_unaffected(self, app, client, mock_cursor):
+        app.config['ADMISSION_ANALYTICS_LIMIT'] = 1
+        app.config['ADMISSION_QUEUE'] = 0
+        self._hold(app, 'analytics')
+        mock_cursor.description = [('category_id',), ('category_name',)]
+        mock_cursor.fetchall.return_value = [(1, 'Groceries')]
+
+        response = client.get('/descriptors/categories')
+        assert response.status_code == 200
+
+    def test_queue_deadline_returns_503(self, app, client):
+        app.config['ADMISSION_BULK_LIMIT'] = 1
+        app.config['ADMISSION_QUEUE'] = 1
+        app.config['ADMISSION_QUEUE_TIMEOUT'] = 0.05
+        self._hold(app, 'bulk')
+
+        response = client.post('/purchases/transactions/1/bulk', json={'items': []})
+        assert response.status_code == 503
+        assert 'Retry-After' in response.headers
+
+    def test_slots_released_after_request(self, app, client, mock_cursor):
+        mock_cursor.fetchall.return_value = []
+        mock_cursor.description = [('receipt_id',)]
+        client.get('/purchases/receipts/1')
+
+        with app.app_context():
+            metrics = admission().stats()['classes']['analytics']
+        assert metrics['admitted'] == 1
+        assert metrics['active'] == 0
+
+    def test_route_limit(self, app, client):
+        app.config['ADMISSION_QUEUE'] = 0
+        with app.app_context():
+            state = admission()
+            view = app.view_functions['purchases.retrain_categorizer']
+            state.gates('purchases.retrain_categorizer', view)[0].enter()
+
+        response = client.post('/purchases/receipts/retrain')
+        assert response.status_code == 429
+        assert state.stats()['routes']['purchases.retrain_categorizer']['rejected_full'] == 1
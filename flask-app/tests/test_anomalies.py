@@ -0,0 +1,79 @@
+import math
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from src.anomalies import MIN_OBSERVATIONS, is_anomalous, observe, score_receipt, series_stats
+
+
+def _executed(cursor):
+    return [c[0][0] for c in cursor.execute.call_args_list]
+
+
+class TestStreamingStats:
+    def test_tracks_median_of_noisy_stream(self):
+        rng = np.random.default_rng(1)
+        state = (0, 0.0, 0.0)
+        for cents in rng.lognormal(math.log(1500), 0.3, 400).astype(int):
+            state = observe(*state, int(cents))
+
+        observations, median, mad = state
+        assert observations == 400
+        assert abs(math.exp(median) - 1500) < 150
+        # MAD of a normal with sigma 0.3 is about 0.2
+        assert 0.12 < mad < 0.3
+
+    def test_single_outlier_barely_moves_median(self):
+        state = (40, math.log(600), 0.2)
+        _, median, _ = observe(*state, 90000)
+        assert math.exp(median) < 620
+
+    def test_flags_only_established_upside_outliers(self):
+        median, mad = math.log(600), 0.2
+        assert is_anomalous(90000, 20, median, mad)
+        assert not is_anomalous(900, 20, median, mad)
+        assert not is_anomalous(90000, MIN_OBSERVATIONS - 1, median, mad)
+        # cheap outliers aren't worth a notification
+        assert not is_anomalous(1900, 20, math.log(100), mad)
+
+
+class TestSeriesStats:
+    def test_exact_per_series_median_and_mad(self):
+        users = np.array([1, 2, 1, 1, 2, 1])
+        categories = np.array([3, 3, 3, 4, 3, 3])
+        order = np.arange(6)
+        cents = np.array([100, 800, 400, 50, 200, 900])
+
+        index, series, observations, median, mad = series_stats(users, categories, order, cents)
+
+        assert observations.tolist() == [3, 1, 2]
+        assert np.allclose(np.exp(median), [400, 50, 400])
+        assert math.isclose(mad[0], math.log(900 / 400))
+        assert series[np.argsort(index)].tolist() == [0, 2, 0, 1, 2, 0]
+
+
+class TestScoreReceipt:
+    def test_outlier_notifies_and_updates_stats(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [(3, 20, math.log(600), 0.2)]
+        cursor.fetchone.return_value = ('Dunkin', 'Food & Drink')
+
+        assert score_receipt(cursor, 1, 3, 99, 900.00) is True
+
+        executed = _executed(cursor)
+        assert any('INSERT INTO Notifications' in q for q in executed)
+        assert 'REPLACE INTO SpendStats' in executed[-1]
+        message = cursor.execute.call_args_list[-2][0][1][3]
+        assert message.startswith('Unusual $900.00 charge at Dunkin')
+
+    def test_normal_receipt_only_updates_stats(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [(3, 20, math.log(600), 0.2)]
+
+        assert score_receipt(cursor, 1, 3, 99, 6.50) is False
+        assert not any('Notifications' in q for q in _executed(cursor))
+
+    def test_uncategorized_receipt_skipped(self):
+        cursor = MagicMock()
+        assert score_receipt(cursor, 1, None, 99, 900.00) is False
+        cursor.execute.assert_not_called()
@@ -0,0 +1,51 @@
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from src.changes import ChangeBus, _plain
+
+
+class TestPayload:
+    def test_amounts_and_dates_become_json_values(self):
+        assert _plain({'total_amount': Decimal('12.50'), 'date': date(2024, 3, 5),
+                       'previous': [Decimal('0.10'), None, 'x']}) == {
+            'total_amount': 12.5, 'date': '2024-03-05', 'previous': [0.1, None, 'x'],
+        }
+
+
+class TestChangeBus:
+    def test_wait_times_out_without_a_change(self):
+        bus = ChangeBus()
+        started = time.monotonic()
+        assert bus.wait(1, bus.version(1), 0.05) == 0
+        assert time.monotonic() - started >= 0.05
+
+    def test_publish_wakes_only_that_users_waiters(self):
+        bus = ChangeBus()
+        woke = {}
+
+        def wait(user_id):
+            started = time.monotonic()
+            bus.wait(user_id, 0, 2)
+            woke[user_id] = time.monotonic() - started
+
+        waiters = [threading.Thread(target=wait, args=(user_id,)) for user_id in (1, 2)]
+        for waiter in waiters:
+            waiter.start()
+        time.sleep(0.1)
+        bus.publish({1})
+        waiters[0].join()
+        assert woke[1] < 1 and 2 not in woke
+
+        bus.publish({2})
+        waiters[1].join()
+        assert bus.version(1) == bus.version(2) == 1
+        assert bus.stats() == {'waiting': 0, 'published': 2}
+
+    def test_a_missed_publish_still_counts(self):
+        bus = ChangeBus()
+        seen = bus.version(3)
+        bus.publish({3})
+        # the change landed between reading the version and waiting
+        assert bus.wait(3, seen, 1) == seen + 1
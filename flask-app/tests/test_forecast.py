@@ -0,0 +1,94 @@
+import json
+from datetime import date
+
+import numpy as np
+
+from src.forecast import fit_curves, project, remaining_days
+
+TODAY = date(2024, 7, 10)
+
+
+def _columns(rows):
+    """Daily spend columns from (user_id, category_id, date, cents) rows."""
+    users, categories, days, cents = zip(*rows)
+    return (np.array(users), np.array(categories),
+            np.array([d.toordinal() for d in days]), np.array(cents), TODAY)
+
+
+class TestFitCurves:
+    def test_averages_each_day_over_the_window(self):
+        rows = [(1, 5, date(2024, month, 1), 1500) for month in range(1, 7)]
+        rows += [(1, 5, date(2024, 6, 15), 6000)]
+        users, categories, curves = fit_curves(*_columns(rows))
+
+        assert users.tolist() == [1] and categories.tolist() == [5]
+        assert curves[0, 0] == 1500
+        assert curves[0, 14] == 1000
+        assert curves[0, 1:14].sum() == 0
+
+    def test_new_user_only_counts_months_since_first_receipt(self):
+        rows = [(1, 5, date(2024, 5, 3), 900), (1, 5, date(2024, 6, 3), 1100), (2, 5, date(2024, 1, 3), 600)]
+        users, _, curves = fit_curves(*_columns(rows))
+
+        assert users.tolist() == [1, 2]
+        assert curves[0, 2] == 1000
+        assert curves[1, 2] == 100
+
+    def test_short_months_only_count_days_they_have(self):
+        rows = [(1, 5, date(2024, 1, 31), 3000), (1, 5, date(2024, 3, 31), 3000), (1, 5, date(2024, 5, 31), 3000)]
+        _, _, curves = fit_curves(*_columns(rows))
+
+        # six months in the window, three of them with a 31st
+        assert curves[0, 30] == 3000
+
+    def test_ignores_current_month_and_older_history(self):
+        rows = [(1, 5, date(2024, 7, 2), 500), (1, 5, date(2023, 12, 31), 500)]
+        users, _, curves = fit_curves(*_columns(rows))
+
+        assert len(users) == 0 and curves.shape == (0, 31)
+
+
+class TestProjection:
+    def test_remaining_days_span_months(self):
+        counts = remaining_days(date(2024, 1, 30), date(2024, 3, 2))
+
+        assert counts[:2].tolist() == [2, 2]
+        assert counts[29] == 0 and counts[30] == 1
+        assert counts.sum() == 32
+
+    def test_project_adds_expected_remaining_spend(self):
+        curve = np.zeros(31)
+        curve[[4, 19]] = 1000
+        assert project(2500, curve, date(2024, 7, 1), date(2024, 7, 31), TODAY) == 3500
+        assert project(2500, curve, date(2024, 7, 1), date(2024, 7, 31), date(2024, 7, 31)) == 2500
+        # a budget that hasn't started yet gets its whole window
+        assert project(0, curve, date(2024, 8, 1), date(2024, 8, 31), TODAY) == 2000
+        assert project(2500, None, date(2024, 7, 1), date(2024, 7, 31), TODAY) is None
+
+
+class TestForecastRoute:
+    def test_projects_categories_and_budgets(self, client, mock_cursor):
+        today = date.today()
+        mock_cursor.fetchall.side_effect = [
+            [(1, day, 10.0) for day in range(1, 32)],
+            [(1, 'Food & Drink', 40.0), (2, 'Travel', 15.0)],
+            [(7, 1, 'Food & Drink', 1_000_000, today.replace(day=1), today, 40.0),
+             (8, 2, 'Travel', 5.0, today.replace(day=1), today, 15.0)],
+        ]
+
+        response = client.get('/management/forecast/1')
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        food, travel = data['categories']
+        assert food['spent'] == 40.0 and food['projected'] >= 40.0
+        assert travel['projected'] is None
+        assert data['spent'] == 55.0
+        assert [b['projected'] for b in data['budgets']] == [40.0, None]
+        assert data['budgets'][0]['projected_overrun'] == 0
+
+    def test_db_error(self, client, mock_cursor):
+        mock_cursor.execute.side_effect = Exception('DB error')
+
+        response = client.get('/management/forecast/1')
+        assert response.status_code == 500
@@ -0,0 +1,96 @@
+import gzip
+import json
+
+
+class TestConditionalGet:
+    def test_sets_strong_etag(self, client, mock_cursor):
+        mock_cursor.description = [('category_id',), ('category_name',)]
+        mock_cursor.fetchall.return_value = [(1, 'Groceries')]
+
+        response = client.get('/descriptors/categories')
+
+        assert response.status_code == 200
+        assert response.headers['ETag'].startswith('"')
+        assert 'Accept-Encoding' in response.headers['Vary']
+
+    def test_matching_etag_returns_304(self, client, mock_cursor):
+        mock_cursor.description = [('category_id',), ('category_name',)]
+        mock_cursor.fetchall.return_value = [(1, 'Groceries')]
+
+        first = client.get('/descriptors/categories')
+        second = client.get(
+            '/descriptors/categories',
+            headers={'If-None-Match': first.headers['ETag']}
+        )
+
+        assert second.status_code == 304
+        assert second.data == b''
+
+    def test_changed_payload_returns_200(self, client, mock_cursor):
+        mock_cursor.description = [('category_id',), ('category_name',)]
+        mock_cursor.fetchall.return_value = [(1, 'Groceries')]
+        first = client.get('/descriptors/categories')
+
+        mock_cursor.fetchall.return_value = [(1, 'Groceries'), (2, 'Rent')]
+        second = client.get(
+            '/descriptors/categories',
+            headers={'If-None-Match': first.headers['ETag']}
+        )
+
+        assert second.status_code == 200
+        assert len(json.loads(second.data)) == 2
+
+    def test_writes_are_not_tagged(self, client, mock_cursor):
+        response = client.delete('/descriptors/tags/1')
+        assert 'ETag' not in response.headers
+
+
+class TestCompression:
+    def test_large_payload_is_gzipped(self, client, mock_cursor):
+        mock_cursor.description = [('store_id',), ('store_name',)]
+        mock_cursor.fetchall.return_value = [(i, f'Store {i}') for i in range(500)]
+
+        response = client.get('/purchases/stores', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['ETag'].endswith('-gzip"')
+        data = json.loads(gzip.decompress(response.data))
+        assert len(data) == 500
+
+    def test_gzip_etag_revalidates(self, client, mock_cursor):
+        mock_cursor.description = [('store_id',), ('store_name',)]
+        mock_cursor.fetchall.return_value = [(i, f'Store {i}') for i in range(500)]
+
+        first = client.get('/purchases/stores', headers={'Accept-Encoding': 'gzip'})
+        second = client.get('/purchases/stores', headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': first.headers['ETag'],
+        })
+
+        assert second.status_code == 304
+
+    def test_small_payload_is_not_compressed(self, client, mock_cursor):
+        mock_cursor.description = [('store_id',), ('store_name',)]
+        mock_cursor.fetchall.return_value = [(1, 'Whole Foods')]
+
+        response = client.get('/purchases/stores', headers={'Accept-Encoding': 'gzip'})
+
+        assert 'Content-Encoding' not in response.headers
+
+    def test_no_accept_encoding_is_not_compressed(self, client, mock_cursor):
+        mock_cursor.description = [('store_id',), ('store_name',)]
+        mock_cursor.fetchall.return_value = [(i, f'Store {i}') for i in range(500)]
+
+        response = client.get('/purchases/stores')
+
+        assert 'Content-Encoding' not in response.headers
+
+
+class TestMetrics:
+    def test_hidden_without_a_token(self, client):
+        assert client.get('/metrics').status_code == 404
+
+    def test_requires_the_token(self, app, client):
+        app.config['METRICS_TOKEN'] = 'secret'
+        assert client.get('/metrics').status_code == 401
+        assert client.get('/metrics', headers={'X-Metrics-Token': 'wrong'}).status_code == 401
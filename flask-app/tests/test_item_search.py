@@ -0,0 +1,113 @@
+from datetime import date
+
+import numpy as np
+
+from src.prices import tokenize
+from src.purchases.item_search import ItemIndex, Vocabulary
+
+DAY = date(2024, 6, 1).toordinal()
+
+
+def _index(*items):
+    """Index from (transaction_id, receipt_id, days_after, store_id, unit_cents, quantity, name) items."""
+    rows = list(zip(*items))
+    return ItemIndex.build({
+        'transaction_id': np.array(rows[0]),
+        'receipt_id': np.array(rows[1]),
+        'day': np.array(rows[2]) + DAY,
+        'store_id': np.array(rows[3]),
+        'unit_cents': np.array(rows[4]),
+        'quantity': np.array(rows[5]),
+        'item_name': list(rows[6]),
+    }, 0.0)
+
+
+def _names(index, tokens, fuzzy=True):
+    mask, _ = index.search(tokens, fuzzy)
+    return [index.vocabulary.names[i] for i in index.name_id[mask]]
+
+
+INDEX = _index(
+    (1, 10, 0, 1, 450, 1, 'Oat Milk'),
+    (2, 10, 0, 1, 300, 2, 'Greek Yogurt'),
+    (3, 11, 5, 2, 499, 1, 'OAT-MILK'),
+    (4, 11, 5, 2, 899, 1, 'Oatmeal Cookies'),
+    (5, 12, 9, 1, 250, 3, 'Almond Milk 64oz'),
+)
+
+
+class TestTokenize:
+    def test_lowercases_and_splits_on_punctuation(self):
+        assert tokenize('OAT-MILK 64oz!') == ['oat', 'milk', '64oz']
+
+
+class TestVocabulary:
+    def test_names_with_the_same_tokens_share_an_id(self):
+        vocabulary, ids = Vocabulary.empty().extended(['Oat Milk', 'oat milk', 'Oat-Milk', 'Soy Milk'])
+
+        assert ids == [0, 0, 0, 1]
+        assert vocabulary.names == ['Oat Milk', 'Soy Milk']
+        assert vocabulary.postings['milk'] == (0, 1)
+
+    def test_extending_leaves_the_original_untouched(self):
+        base, _ = Vocabulary.empty().extended(['Oat Milk'])
+        same, ids = base.extended(['oat milk'])
+        grown, new_ids = base.extended(['Oat Bran'])
+
+        assert same is base and ids == [0]
+        assert new_ids == [1]
+        assert base.terms == ['milk', 'oat']
+        assert grown.terms == ['bran', 'milk', 'oat']
+
+    def test_prefix_and_similar_terms(self):
+        vocabulary, _ = Vocabulary.empty().extended(['Oat Milk', 'Oatmeal', 'Chocolate Bar'])
+
+        assert vocabulary.prefixed('oat') == ['oat', 'oatmeal']
+        assert vocabulary.prefixed('oatz') == []
+        assert vocabulary.similar('choclate') == ['chocolate']
+        assert vocabulary.similar('chocolatte') == ['chocolate']
+        assert vocabulary.similar('cohcolate') == ['chocolate']
+        assert vocabulary.similar('chcolote') == []
+
+
+class TestItemIndex:
+    def test_every_token_must_prefix_a_term(self):
+        assert _names(INDEX, ['oat']) == ['Oat Milk', 'Oat Milk', 'Oatmeal Cookies']
+        assert _names(INDEX, ['oat', 'mil']) == ['Oat Milk', 'Oat Milk']
+        assert _names(INDEX, ['milk', '64']) == ['Almond Milk 64oz']
+        assert _names(INDEX, ['oat', 'yogurt']) == []
+
+    def test_fuzzy_fallback_only_for_unmatched_tokens(self):
+        mask, corrected = INDEX.search(['yougrt'])
+        assert corrected == ['yougrt']
+        assert INDEX.transaction_id[mask].tolist() == [2]
+
+        mask, corrected = INDEX.search(['yougrt'], fuzzy=False)
+        assert not mask.any() and corrected == []
+
+        # short tokens never match fuzzily
+        assert _names(INDEX, ['mlk']) == []
+
+    def test_with_receipt_replaces_its_items(self):
+        changed = INDEX.with_receipt(11, {
+            'transaction_id': np.array([7, 6]),
+            'receipt_id': np.array([11, 11]),
+            'day': np.array([DAY + 5, DAY + 5]),
+            'store_id': np.array([2, 2]),
+            'unit_cents': np.array([199, 599]),
+            'quantity': np.array([1, 1]),
+            'item_name': ['Oat Bran', 'Coffee Beans'],
+        })
+
+        assert changed.transaction_id.tolist() == [1, 2, 6, 7, 5]
+        assert _names(changed, ['oat']) == ['Oat Milk', 'Oat Bran']
+        assert _names(changed, ['coffee']) == ['Coffee Beans']
+        # the original index is unchanged
+        assert INDEX.transaction_id.tolist() == [1, 2, 3, 4, 5]
+        assert _names(INDEX, ['coffee']) == []
+
+    def test_with_receipt_removes_items(self):
+        removed = INDEX.with_receipt(10, {'transaction_id': [], 'item_name': []})
+
+        assert removed.transaction_id.tolist() == [3, 4, 5]
+        assert _names(removed, ['yogurt']) == []
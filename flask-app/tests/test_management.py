@@ -1,16 +1,59 @@
 import json
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from src.management.budget_progress import apply_receipt_changes, check_thresholds
+from src.management.spending_goals import reset_data_year
 
 
 class TestSpendingGoals:
+    def setup_method(self):
+        reset_data_year()
+
     def test_get_spending_goals(self, client, mock_cursor):
-        mock_cursor.description = [('goal_id',), ('current_amount',), ('target_amount',)]
-        mock_cursor.fetchall.return_value = [(1, 50.00, 200.00)]
+        mock_cursor.description = [('goal_id',), ('target_amount',), ('Month',), ('user_id',)]
+        mock_cursor.fetchall.side_effect = [[(1, 200.00, 'January', 1)], [(1, 50.00)]]
+        mock_cursor.fetchone.return_value = (date(2024, 12, 30),)
 
         response = client.get('/management/spending-goals/1')
         data = json.loads(response.data)
 
         assert response.status_code == 200
         assert len(data) == 1
+        assert data[0]['current_amount'] == '50.00'
+        assert data[0]['data_year'] == 2024
+
+    def test_goal_month_without_spending_is_zero(self, client, mock_cursor):
+        mock_cursor.description = [('goal_id',), ('target_amount',), ('Month',), ('user_id',)]
+        mock_cursor.fetchall.side_effect = [[(1, 200.00, 'June', 1)], [(1, 50.00)]]
+        mock_cursor.fetchone.return_value = (date(2024, 12, 30),)
+
+        data = json.loads(client.get('/management/spending-goals/1').data)
+
+        assert data[0]['current_amount'] == '0.00'
+
+    def test_data_year_is_cached(self, client, mock_cursor):
+        mock_cursor.description = [('goal_id',), ('target_amount',), ('Month',), ('user_id',)]
+        mock_cursor.fetchall.side_effect = [[(1, 200.00, 'June', 1)], []] * 2
+        mock_cursor.fetchone.return_value = (date(2024, 12, 30),)
+
+        client.get('/management/spending-goals/1')
+        client.get('/management/spending-goals/1')
+
+        queries = [c[0][0] for c in mock_cursor.execute.call_args_list]
+        assert queries.count('SELECT MAX(date) FROM Receipts') == 1
+
+    def test_monthly_totals_use_date_range(self, client, mock_cursor):
+        mock_cursor.description = [('goal_id',), ('target_amount',), ('Month',), ('user_id',)]
+        mock_cursor.fetchall.side_effect = [[(1, 200.00, 'June', 1)], []]
+        mock_cursor.fetchone.return_value = (date(2024, 12, 30),)
+
+        client.get('/management/spending-goals/1')
+        query, params = mock_cursor.execute.call_args[0]
+
+        assert 'YEAR(date)' not in query
+        assert params == ('1', date(2024, 1, 1), date(2025, 1, 1)) * 2
 
     def test_create_spending_goal(self, client, mock_cursor):
         payload = {
@@ -94,6 +137,72 @@ class TestBudgets:
         assert response.status_code == 200
         assert len(data) == 2
 
+    def test_user_budgets_only_aggregate_own_receipts(self, client, mock_cursor):
+        mock_cursor.description = [('budget_id',), ('spent_amount',)]
+        mock_cursor.fetchall.return_value = [(1, 120.00)]
+
+        client.get('/management/budgets/user/1?active=true')
+        query, params = mock_cursor.execute.call_args[0]
+
+        assert 'JOIN Budgets b2' not in query
+        assert 'r.user_id = b.user_id' in query
+        assert params == ['1']
+
+
+class TestBudgetProgress:
+    def _executed(self, cursor):
+        return [c[0][0] for c in cursor.execute.call_args_list]
+
+    def test_crossing_threshold_inserts_notification(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [
+            (1, 1, Decimal('500'), Decimal('400'), Decimal('410'), False, 'Food & Drink')
+        ]
+
+        crossed = check_thresholds(cursor, [1])
+
+        assert crossed == [1]
+        assert any('INSERT INTO Notifications' in q for q in self._executed(cursor))
+
+    def test_already_notified_is_not_repeated(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [
+            (1, 1, Decimal('500'), Decimal('400'), Decimal('450'), True, 'Food & Drink')
+        ]
+
+        assert check_thresholds(cursor, [1]) == []
+        assert not any('INSERT INTO Notifications' in q for q in self._executed(cursor))
+
+    def test_edit_within_budget_nets_to_one_update(self):
+        cursor = MagicMock()
+        cursor.fetchall.side_effect = [[(7,)], [(7,)], []]
+
+        apply_receipt_changes(cursor, 1, [
+            (2, '2024-01-05', Decimal('-20.00')),
+            (2, '2024-01-05', Decimal('35.00')),
+        ], 42)
+
+        updates = [c[0] for c in cursor.execute.call_args_list
+                   if c[0][0].startswith('UPDATE BudgetProgress SET spent')]
+        assert len(updates) == 1
+        assert updates[0][1] == (Decimal('15.00'), 42, 7)
+
+    def test_receipt_outside_budgets_is_ignored(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = []
+
+        assert apply_receipt_changes(cursor, 1, [(2, '2024-01-05', 10)], 42) == []
+
+    def test_get_budget_alerts(self, client, mock_cursor):
+        mock_cursor.description = [('budget_id',), ('spent_amount',)]
+        mock_cursor.fetchall.return_value = [(1, 450.00)]
+
+        response = client.get('/management/budgets/alerts/1')
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert data[0]['budget_id'] == 1
+
 
 class TestNotifications:
     def test_get_user_notifications(self, client, mock_cursor):
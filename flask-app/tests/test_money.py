@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+import numpy as np
+
+from src.money import as_float, cents_array, from_cents, normalize, to_cents
+
+
+class TestMoney:
+    def test_to_cents_accepts_every_input_type(self):
+        assert to_cents(Decimal('12.30')) == 1230
+        assert to_cents(12.3) == 1230
+        assert to_cents('12.3') == 1230
+        assert to_cents(12) == 1200
+        assert to_cents(np.int64(3)) == 300
+
+    def test_to_cents_rounds_half_up(self):
+        assert to_cents('0.005') == 1
+        assert to_cents('-0.005') == -1
+        assert to_cents(Decimal('2.675')) == 268
+
+    def test_from_cents_keeps_two_places(self):
+        assert str(from_cents(1500)) == '15.00'
+        assert str(from_cents(np.int64(-5))) == '-0.05'
+
+    def test_sums_are_exact(self):
+        amounts = [0.1] * 10 + [133.32999999999998]
+
+        assert sum(amounts) != 134.33
+        assert as_float(cents_array(amounts).sum()) == 134.33
+        assert normalize(133.32999999999998) == Decimal('133.33')
+        assert normalize(None) is None
@@ -0,0 +1,60 @@
+from src.plans import receipts_indexes
+
+EXPLAIN_COLUMNS = [(c,) for c in ('id', 'select_type', 'table', 'partitions', 'type', 'key')]
+TIDB_COLUMNS = [(c,) for c in ('id', 'estRows', 'task', 'access object', 'operator info')]
+
+
+class TestReceiptsIndexes:
+    def test_tidb_index_range_scan(self, mock_cursor):
+        mock_cursor.description = TIDB_COLUMNS
+        mock_cursor.fetchall.return_value = [
+            ('StreamAgg_9', 1, 'root', '', 'funcs:sum(r.total_amount)'),
+            ('└─IndexLookUp_21', 30, 'root', '', ''),
+            ('  ├─IndexRangeScan_19(Build)', 30, 'cop[tikv]',
+             'table:r, index:idx_receipts_user_date(user_id, date)', 'range:[1 2026-10-01,1 2026-11-01)'),
+            ('  └─TableRowIDScan_20(Probe)', 30, 'cop[tikv]', 'table:r', 'keep order:false'),
+        ]
+
+        assert receipts_indexes(mock_cursor, 'SELECT 1', ()) == ['idx_receipts_user_date']
+
+    def test_tidb_full_scan(self, mock_cursor):
+        mock_cursor.description = TIDB_COLUMNS
+        mock_cursor.fetchall.return_value = [
+            ('HashAgg_6', 1, 'root', '', ''),
+            ('└─TableFullScan_10', 10000, 'cop[tikv]', 'table:r', 'keep order:false'),
+        ]
+
+        assert receipts_indexes(mock_cursor, 'SELECT 1', ()) is None
+
+
+class TestPlanCommands:
+    def test_verify_passes_when_queries_use_an_index(self, app, mock_cursor):
+        app.mock_db.backend.name = 'mysql'
+        mock_cursor.description = EXPLAIN_COLUMNS
+        indexed = [(1, 'SIMPLE', 'r', None, 'range', 'idx_receipts_user_date')]
+        mock_cursor.fetchall.side_effect = [indexed] * 6
+
+        result = app.test_cli_runner().invoke(args=['plans', 'verify'])
+
+        assert result.exit_code == 0
+        assert 'FULL SCAN' not in result.output
+        assert 'idx_receipts_user_date' in result.output
+
+    def test_verify_fails_on_full_scan(self, app, mock_cursor):
+        app.mock_db.backend.name = 'mysql'
+        mock_cursor.description = EXPLAIN_COLUMNS
+        full = [(1, 'SIMPLE', 'Receipts', None, 'ALL', None)]
+        mock_cursor.fetchall.side_effect = [full] * 6
+
+        result = app.test_cli_runner().invoke(args=['plans', 'verify'])
+
+        assert result.exit_code == 1
+        assert 'FULL SCAN' in result.output
+
+    def test_refuses_on_sqlite(self, app):
+        app.mock_db.backend.name = 'sqlite'
+
+        result = app.test_cli_runner().invoke(args=['plans', 'verify'])
+
+        assert result.exit_code == 1
+        assert 'mysql backend' in result.output
@@ -0,0 +1,34 @@
+from datetime import date
+from decimal import Decimal
+
+from src.prices import aggregate, item_key
+
+DAY = date(2024, 6, 1)
+
+
+class TestItemKey:
+    def test_case_and_punctuation_dropped(self):
+        assert item_key('  OAT-MILK, 64oz ') == 'oat milk 64oz'
+        assert item_key('Oat Milk 64OZ') == item_key('oat milk (64oz)')
+
+    def test_truncated_to_column_width(self):
+        assert len(item_key('word ' * 40)) == 100
+
+
+class TestAggregate:
+    def test_one_row_per_item_store_and_day(self):
+        rows = aggregate([
+            (1, 10, DAY, Decimal('4.50'), 2, 'Oat Milk'),
+            (1, 10, DAY, Decimal('3.99'), 1, 'OAT MILK'),
+            (1, 11, DAY, Decimal('4.25'), 1, 'Oat Milk'),
+            (1, 10, '2024-06-02', '4.50', 1, 'Oat Milk'),
+        ])
+
+        assert sorted(rows, key=lambda r: (r[2], r[3])) == [
+            (1, 'oat milk', 10, DAY, 'Oat Milk', 3, Decimal('12.99'), Decimal('3.99')),
+            (1, 'oat milk', 10, date(2024, 6, 2), 'Oat Milk', 1, Decimal('4.50'), Decimal('4.50')),
+            (1, 'oat milk', 11, DAY, 'Oat Milk', 1, Decimal('4.25'), Decimal('4.25')),
+        ]
+
+    def test_items_without_quantity_skipped(self):
+        assert aggregate([(1, 10, DAY, Decimal('2.00'), 0, 'Refund')]) == []
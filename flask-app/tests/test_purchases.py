@@ -20,8 +20,10 @@ class TestReceipts:
             'store_id': 1,
             'category_id': 1
         }
+        mock_cursor.lastrowid = 7
         response = client.post('/purchases/receipts/1', json=payload)
         assert response.status_code == 201
+        assert json.loads(response.data)['receipt_id'] == 7
 
     def test_create_receipt_missing_fields(self, client):
         response = client.post('/purchases/receipts/1', json={'date': '2024-01-01'})
@@ -44,10 +46,20 @@ class TestReceipts:
         assert response.status_code == 404
 
     def test_update_receipt(self, client, mock_cursor):
+        mock_cursor.fetchone.return_value = (1, 1, '2024-01-01', 50.00)
+
         response = client.put('/purchases/receipts/1', json={'total_amount': 75.00})
         assert response.status_code == 200
 
+    def test_update_receipt_not_found(self, client, mock_cursor):
+        mock_cursor.fetchone.return_value = None
+
+        response = client.put('/purchases/receipts/999', json={'total_amount': 75.00})
+        assert response.status_code == 404
+
     def test_delete_receipt(self, client, mock_cursor):
+        mock_cursor.fetchone.return_value = (1, 1, '2024-01-01', 50.00)
+
         response = client.delete('/purchases/receipts/1')
         assert response.status_code == 200
 
@@ -65,6 +77,7 @@ class TestTransactions:
         assert data[0]['item_name'] == 'Milk'
 
     def test_create_transaction(self, client, mock_cursor):
+        mock_cursor.fetchone.return_value = (1, 3, '2024-01-01')
         payload = {
             'unit_cost': 5.99,
             'quantity': 2,
@@ -73,6 +86,46 @@ class TestTransactions:
         response = client.post('/purchases/transactions/1', json=payload)
         assert response.status_code == 201
 
+    def test_create_transaction_unknown_receipt(self, client, mock_cursor):
+        mock_cursor.fetchone.return_value = None
+        response = client.post('/purchases/transactions/999', json={
+            'unit_cost': 5.99, 'quantity': 2, 'item_name': 'Bread'
+        })
+        assert response.status_code == 404
+        inserts = [c for c in mock_cursor.execute.call_args_list if c[0][0].startswith('INSERT')]
+        assert inserts == []
+
+    def test_bulk_create_uses_one_multi_row_insert(self, client, mock_cursor):
+        mock_cursor.fetchone.return_value = (1, 3, '2024-01-01')
+        items = [{'unit_cost': 1.25, 'quantity': i + 1, 'item_name': f'Item {i}'} for i in range(40)]
+
+        response = client.post('/purchases/transactions/7/bulk', json={'items': items})
+        inserts = [c[0] for c in mock_cursor.execute.call_args_list
+                   if c[0][0].startswith('INSERT INTO Transactions')]
+
+        assert response.status_code == 201
+        assert json.loads(response.data)['created'] == 40
+        assert len(inserts) == 1
+        assert len(inserts[0][1]) == 160
+        assert inserts[0][1][-4:] == [1.25, 40, 'Item 39', '7']
+
+    def test_bulk_create_rejects_incomplete_item(self, client, mock_cursor):
+        items = [{'unit_cost': 1, 'quantity': 1, 'item_name': 'Milk'}, {'unit_cost': 2}]
+
+        response = client.post('/purchases/transactions/7/bulk', json={'items': items})
+
+        assert response.status_code == 400
+        assert 'items[1]' in json.loads(response.data)['error']
+        mock_cursor.execute.assert_not_called()
+
+    def test_bulk_create_unknown_receipt(self, client, mock_cursor):
+        mock_cursor.fetchone.return_value = None
+        items = [{'unit_cost': 1, 'quantity': 1, 'item_name': 'Milk'}]
+
+        response = client.post('/purchases/transactions/999/bulk', json={'items': items})
+
+        assert response.status_code == 404
+
     def test_get_single_transaction(self, client, mock_cursor):
         mock_cursor.description = [('transaction_id',), ('item_name',)]
         mock_cursor.fetchone.return_value = (1, 'Milk')
@@ -87,6 +140,7 @@ class TestTransactions:
         assert response.status_code == 404
 
     def test_delete_transaction(self, client, mock_cursor):
+        mock_cursor.fetchone.return_value = (1, 3, '2024-01-01')
         response = client.delete('/purchases/transactions/1')
         assert response.status_code == 200
 
@@ -138,3 +192,10 @@ class TestStores:
     def test_delete_store(self, client, mock_cursor):
         response = client.delete('/purchases/stores/1')
         assert response.status_code == 200
+
+    def test_delete_store_removes_its_receipts(self, client, mock_cursor):
+        client.delete('/purchases/stores/1')
+
+        statements = [c[0][0] for c in mock_cursor.execute.call_args_list]
+        assert statements[0].startswith('SELECT receipt_id, user_id')
+        assert statements[1] == 'DELETE FROM Receipts WHERE store_id = %s'
@@ -0,0 +1,106 @@
+import json
+from datetime import date, timedelta
+
+import numpy as np
+
+from src.recurring import detect
+
+TODAY = date(2024, 6, 30)
+
+
+def _columns(*series):
+    """Receipt columns from (user_id, store_id, [(days_ago, cents), ...]) series."""
+    rows = [(user_id, store_id, (TODAY - timedelta(days=ago)).toordinal(), cents)
+            for user_id, store_id, charges in series for ago, cents in charges]
+    return tuple(np.array(column, dtype=np.int64) for column in zip(*rows)) + (TODAY,)
+
+
+class TestDetect:
+    def test_monthly_subscription(self):
+        charges = [(ago, 1599) for ago in (2, 32, 63, 93, 124, 154)]
+        found = detect(*_columns((1, 10, charges)))
+
+        assert len(found) == 1
+        series = found[0]
+        assert (series['user_id'], series['store_id'], series['cadence']) == (1, 10, 'monthly')
+        assert series['typical_cents'] == 1599
+        assert series['monthly_cents'] == 1599
+        assert series['occurrences'] == 6
+        assert series['last_date'] == TODAY - timedelta(days=2)
+        assert series['active'] is True
+        assert series['confidence'] == 1.0
+
+    def test_weekly_projects_monthly_cost(self):
+        found = detect(*_columns((1, 10, [(ago, 1000) for ago in range(0, 56, 7)])))
+
+        assert found[0]['cadence'] == 'weekly'
+        assert found[0]['monthly_cents'] == 4349
+        assert found[0]['next_date'] == TODAY + timedelta(days=7)
+
+    def test_irregular_and_variable_series_rejected(self):
+        irregular = [(ago, 500) for ago in (1, 4, 20, 21, 60, 95)]
+        variable = [(ago, cents) for ago, cents in zip((2, 32, 63, 93), (900, 4000, 1200, 7000))]
+        too_few = [(2, 999), (32, 999)]
+
+        assert detect(*_columns((1, 10, irregular), (1, 11, variable), (2, 10, too_few))) == []
+
+    def test_stopped_series_inactive(self):
+        charges = [(ago, 1299) for ago in (120, 150, 181, 211)]
+        found = detect(*_columns((1, 10, charges)))
+
+        assert found[0]['active'] is False
+
+    def test_series_split_by_user_and_store(self):
+        monthly = [(ago, 1099) for ago in (5, 35, 66)]
+        found = detect(*_columns((2, 10, monthly), (1, 10, monthly), (1, 12, [(3, 200)] + monthly)))
+
+        assert sorted((f['user_id'], f['store_id']) for f in found) == [(1, 10), (2, 10)]
+
+    def test_empty(self):
+        empty = np.array([], dtype=np.int64)
+        assert detect(empty, empty, empty, empty, TODAY) == []
+
+
+class TestSubscriptionsRoute:
+    def test_lists_stored_charges(self, client, mock_cursor):
+        # receipts unchanged since the last scan, so nothing is rescanned
+        mock_cursor.fetchall.side_effect = [
+            [(1, 6, 40)],
+            [(1, 6, 40)],
+            [(10, 'Netflix', 'monthly', 30.5, 15.99, 15.99, 6, '2024-06-28', '2024-07-29', 1.0, 1),
+             (11, 'Gym', 'monthly', 30.0, 40.00, 40.00, 4, '2024-06-01', '2024-07-01', 0.9, 1)],
+        ]
+        mock_cursor.description = [
+            ('store_id',), ('store_name',), ('cadence',), ('interval_days',), ('typical_amount',),
+            ('monthly_cost',), ('occurrences',), ('last_date',), ('next_date',), ('confidence',), ('active',),
+        ]
+
+        response = client.get('/purchases/subscriptions/1')
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert [s['store_name'] for s in data['subscriptions']] == ['Netflix', 'Gym']
+        assert data['monthly_cost'] == 55.99
+        assert 'rc.active = TRUE' in mock_cursor.execute.call_args_list[-1][0][0]
+
+    def test_changed_user_is_detected_without_writes(self, app, client, mock_cursor):
+        today = date.today()
+        charges = [(1, 10, today - timedelta(days=ago), 15.99) for ago in (2, 32, 63, 93)]
+        # receipts changed since the last scan (none stored), so detection runs in memory
+        mock_cursor.fetchall.side_effect = [[(1, 4, 40)], [], charges, [(10, 'Netflix')]]
+
+        response = client.get('/purchases/subscriptions/1')
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert [s['store_name'] for s in data['subscriptions']] == ['Netflix']
+        assert data['monthly_cost'] == 15.99
+        statements = [c[0][0].strip() for c in mock_cursor.execute.call_args_list]
+        assert all(q.startswith('SELECT') for q in statements)
+        app.mock_conn.commit.assert_not_called()
+
+    def test_db_error(self, client, mock_cursor):
+        mock_cursor.execute.side_effect = Exception('DB error')
+
+        response = client.get('/purchases/subscriptions/1')
+        assert response.status_code == 500
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def _together(count, fn):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+class TestSingleFlight:
+    def test_concurrent_callers_share_one_run(self):
+        flights = SingleFlight()
+        runs = []
+
+        def slow():
+            runs.append(1)
+            time.sleep(0.2)
+            return 'total'
+
+        results, _ = _together(5, lambda: flights.do(('summary', '1'), slow))
+
+        assert results == ['total'] * 5
+        assert len(runs) == 1
+        assert flights.stats()['shared'] == 4
+
+    def test_sequential_callers_run_again(self):
+        flights = SingleFlight()
+        runs = []
+
+        flights.do('k', lambda: runs.append(1))
+        flights.do('k', lambda: runs.append(1))
+
+        assert len(runs) == 2
+        assert flights.stats()['in_flight'] == 0
+
+    def test_error_reaches_every_waiter(self):
+        flights = SingleFlight()
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError('db down')
+
+        results, errors = _together(3, lambda: flights.do('k', fail))
+
+        assert results == []
+        assert [str(e) for e in errors] == ['db down'] * 3
+        with pytest.raises(KeyError):
+            flights.do('k', lambda: {}['missing'])
@@ -0,0 +1,1292 @@
+import io
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from email.utils import parsedate_to_datetime
+
+import pytest
+
+from src import archive, create_app, db
+from src.backends.sqlite import SCHEMA_PATH, translate
+from src.purchases.columnar import ColumnarCache
+
+METRICS_TOKEN = 'metrics-test'
+METRICS_HEADERS = {'X-Metrics-Token': METRICS_TOKEN}
+
+
+@pytest.fixture
+def sqlite_app(tmp_path, monkeypatch):
+    """App wired to a real, empty SQLite database instead of the mocked cursor."""
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('METRICS_TOKEN', METRICS_TOKEN)
+    monkeypatch.setenv('DB_PATH', str(tmp_path / 'test.db'))
+    test_app = create_app()
+    test_app.config['TESTING'] = True
+    test_app.config['ANALYTICS_CACHE_BYTES'] = 0
+    test_app.config['ITEM_SEARCH_CACHE_BYTES'] = 0
+    test_app.config['PASSWORD_HASH_WORKERS'] = 0
+
+    with test_app.app_context():
+        cursor = db.get_db().cursor()
+        cursor.execute(
+            'INSERT INTO Users (email, first_name, last_name, password) VALUES (%s, %s, %s, %s)',
+            ('test@example.com', 'Test', 'User', 'x')
+        )
+        db.get_db().commit()
+    return test_app
+
+
+@pytest.fixture
+def sqlite_client(sqlite_app):
+    return sqlite_app.test_client()
+
+
+class TestDialectTranslation:
+    def test_placeholders_and_literal_percent(self):
+        sql = translate("SELECT DATE_FORMAT(date, '%%Y-%%m-01') FROM Receipts WHERE user_id = %s")
+        assert sql == "SELECT DATE_FORMAT(date, '%Y-%m-01') FROM Receipts WHERE user_id = ?"
+
+    def test_interval_arithmetic(self):
+        sql = translate('SELECT DATE(r.date - INTERVAL WEEKDAY(r.date) DAY) FROM Receipts r')
+        assert sql == "SELECT DATE(DATE(r.date, '-' || (WEEKDAY(r.date)) || ' days')) FROM Receipts r"
+
+    def test_insert_ignore(self):
+        assert translate('INSERT IGNORE INTO Tags VALUES (%s)').startswith('INSERT OR IGNORE INTO')
+
+
+class TestSQLiteRoutes:
+    def _add_receipt(self, client, day, amount, store='Trader Joe'):
+        response = client.post('/purchases/receipts/1', json={
+            'date': day.isoformat(), 'total_amount': amount, 'store_name': store
+        })
+        assert response.status_code == 201
+
+    def test_summary_runs_real_queries(self, sqlite_client):
+        today = date.today()
+        monday = today - timedelta(days=today.weekday())
+        self._add_receipt(sqlite_client, monday, 20.50)
+        self._add_receipt(sqlite_client, monday, 9.50, store='CVS')
+
+        data = json.loads(sqlite_client.get('/purchases/receipts/1/summary?period=week').data)
+
+        assert data['total_spent'] == 30.0
+        assert {c['category_name'] for c in data['by_category']} == {'Food & Drink', 'Health'}
+        assert data['by_week'][0]['week_start'] == monday.isoformat()
+
+    def test_year_summary_groups_by_month(self, sqlite_client):
+        self._add_receipt(sqlite_client, date.today().replace(day=1), 12.00)
+
+        data = json.loads(sqlite_client.get('/purchases/receipts/1/summary?period=year').data)
+
+        assert data['by_month'][0]['month_start'] == date.today().strftime('%Y-%m-01')
+
+    def test_receipt_round_trips_types(self, sqlite_app, sqlite_client):
+        self._add_receipt(sqlite_client, date(2024, 3, 5), 12.30)
+
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('SELECT date, total_amount FROM Receipts')
+            assert cursor.fetchone() == (date(2024, 3, 5), Decimal('12.30'))
+
+    def test_decimals_keep_their_scale(self, sqlite_app):
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute("INSERT INTO Categories (category_name) VALUES ('Groceries')")
+            cursor.execute(
+                'INSERT INTO SpendCurves (user_id, category_id, day, expected_amount) VALUES (%s, %s, %s, %s)',
+                (1, cursor.lastrowid, 3, Decimal('0.1234'))
+            )
+            cursor.execute('SELECT expected_amount FROM SpendCurves')
+            assert cursor.fetchone() == (Decimal('0.1234'),)
+
+    def test_budget_progress_and_alert(self, sqlite_client):
+        today = date.today()
+        sqlite_client.post('/management/budgets/1', json={
+            'amount': 50, 'start_date': today.replace(day=1).isoformat(),
+            'end_date': (today + timedelta(days=1)).isoformat(), 'user_id': 1
+        })
+        self._add_receipt(sqlite_client, today, 45.00)
+
+        budgets = json.loads(sqlite_client.get('/management/budgets/user/1').data)
+        alerts = json.loads(sqlite_client.get('/management/budgets/alerts/1').data)
+        notifications = json.loads(sqlite_client.get('/management/budgets/notifications/1').data)
+
+        assert float(budgets[0]['spent_amount']) == 45.0
+        assert len(alerts) == 0
+        assert notifications == []
+
+        self._add_receipt(sqlite_client, today, 10.00)
+        alerts = json.loads(sqlite_client.get('/management/budgets/alerts/1').data)
+        notifications = json.loads(sqlite_client.get('/management/budgets/notifications/1').data)
+
+        assert float(alerts[0]['spent_amount']) == 55.0
+        assert len(notifications) == 1
+
+    def test_budget_edit_keeps_alert_flag(self, sqlite_client):
+        today = date.today()
+        window = {'start_date': today.replace(day=1).isoformat(),
+                  'end_date': (today + timedelta(days=1)).isoformat()}
+        sqlite_client.post('/management/budgets/1', json={'amount': 50, 'user_id': 1, **window})
+        self._add_receipt(sqlite_client, today, 55.00)
+
+        # still over the new amount: no second alert
+        sqlite_client.put('/management/budgets/1', json={
+            'amount': 52, 'notification_threshold': None, **window
+        })
+        notifications = json.loads(sqlite_client.get('/management/budgets/notifications/1').data)
+        assert len(notifications) == 1
+
+        # raised past the spend and lowered again: a fresh crossing alerts
+        sqlite_client.put('/management/budgets/1', json={
+            'amount': 100, 'notification_threshold': None, **window
+        })
+        sqlite_client.put('/management/budgets/1', json={
+            'amount': 50, 'notification_threshold': None, **window
+        })
+        notifications = json.loads(sqlite_client.get('/management/budgets/notifications/1').data)
+        assert len(notifications) == 2
+
+    def test_deleting_store_or_tag_lowers_budget_progress(self, sqlite_app, sqlite_client):
+        today = date.today()
+        sqlite_client.post('/management/budgets/1', json={
+            'amount': 100, 'start_date': today.replace(day=1).isoformat(),
+            'end_date': (today + timedelta(days=1)).isoformat(), 'user_id': 1
+        })
+        self._add_receipt(sqlite_client, today, 30.00)
+        self._add_receipt(sqlite_client, today, 20.00, store='Whole Foods')
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute("INSERT INTO Tags (tag_name, user_id) VALUES ('trip', 1)")
+            cursor.execute('SELECT tag_id FROM Tags')
+            tag_id = cursor.fetchone()[0]
+            cursor.execute("SELECT store_id FROM Stores WHERE store_name = 'Trader Joe'")
+            store_id = cursor.fetchone()[0]
+            cursor.execute("UPDATE Receipts SET tag_id = %s WHERE store_id <> %s", (tag_id, store_id))
+            db.get_db().commit()
+
+        def spent():
+            with sqlite_app.app_context():
+                cursor = db.get_db().cursor()
+                cursor.execute('SELECT spent FROM BudgetProgress')
+                return float(cursor.fetchone()[0])
+
+        assert sqlite_client.delete(f'/purchases/stores/{store_id}').status_code == 200
+        assert spent() == 20.0
+        assert sqlite_client.delete(f'/descriptors/tags/{tag_id}').status_code == 200
+        assert spent() == 0.0
+
+    @pytest.mark.parametrize('path', ['receipt', 'store', 'tag', 'user'])
+    def test_deletes_leave_no_orphans(self, sqlite_app, sqlite_client, path):
+        receipt_id = json.loads(sqlite_client.post('/purchases/receipts/1', json={
+            'date': '2024-05-01', 'total_amount': 8.00, 'store_name': 'Harbor Market',
+            'items': [{'item_name': 'Oat Milk', 'unit_cost': 4, 'quantity': 2}],
+        }).data)['receipt_id']
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute("INSERT INTO Tags (tag_name, user_id) VALUES ('trip', 1)")
+            tag_id = cursor.lastrowid
+            cursor.execute('UPDATE Receipts SET tag_id = %s', (tag_id,))
+            cursor.execute('SELECT store_id FROM Receipts')
+            store_id = cursor.fetchone()[0]
+            cursor.execute(
+                'INSERT INTO Notifications (`repeat`, notification_time, notification_date, Message, user_id, '
+                'receipt_id) VALUES (%s, %s, %s, %s, %s, %s)',
+                ('never', '09:00', '2024-05-01', 'Unusual charge', 1, receipt_id)
+            )
+            db.get_db().commit()
+
+        url = {
+            'receipt': f'/purchases/receipts/{receipt_id}', 'store': f'/purchases/stores/{store_id}',
+            'tag': f'/descriptors/tags/{tag_id}', 'user': '/users/1',
+        }[path]
+        assert sqlite_client.delete(url).status_code == 200
+
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            for table in ('Receipts', 'Transactions', 'Notifications'):
+                cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                assert cursor.fetchone()[0] == 0, table
+
+    def test_spending_goals(self, sqlite_client):
+        from src.management.spending_goals import reset_data_year
+        reset_data_year()
+        self._add_receipt(sqlite_client, date(2024, 1, 10), 40.10)
+        self._add_receipt(sqlite_client, date(2024, 1, 20), 2.20)
+        sqlite_client.post('/management/spending-goals/1', json={
+            'current_amount': 0, 'target_amount': 100, 'month': 'January'
+        })
+
+        goals = json.loads(sqlite_client.get('/management/spending-goals/1').data)
+
+        assert goals[0]['current_amount'] == '42.30'
+        assert goals[0]['data_year'] == 2024
+
+    def test_pooled_connection_reuses_statements(self, sqlite_client):
+        for _ in range(3):
+            assert sqlite_client.get('/purchases/receipts/1/summary?period=week').status_code == 200
+
+        stats = json.loads(sqlite_client.get('/metrics', headers=METRICS_HEADERS).data)
+
+        primary = stats['nodes'][0]
+        assert stats['backend'] == 'sqlite'
+        assert primary['pool']['reused'] >= 2
+        assert primary['statements']['hits'] > 0
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    """Primary plus one schema-only replica, so replica reads see no receipts."""
+    replica = tmp_path / 'replica.db'
+    conn = sqlite3.connect(replica)
+    with open(SCHEMA_PATH) as f:
+        conn.executescript(f.read())
+    conn.close()
+
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('METRICS_TOKEN', METRICS_TOKEN)
+    monkeypatch.setenv('DB_PATH', str(tmp_path / 'primary.db'))
+    monkeypatch.setenv('DB_REPLICAS', f'sqlite:///{replica}')
+    test_app = create_app()
+    test_app.config['TESTING'] = True
+
+    with test_app.app_context():
+        cursor = db.get_db().cursor()
+        cursor.execute(
+            'INSERT INTO Users (email, first_name, last_name, password) VALUES (%s, %s, %s, %s)',
+            ('test@example.com', 'Test', 'User', 'x')
+        )
+        db.get_db().commit()
+    return test_app
+
+
+class TestReadReplicas:
+    def _summary_total(self, client, **kwargs):
+        data = json.loads(client.get('/purchases/receipts/1/summary?period=year', **kwargs).data)
+        return float(data['total_spent'] or 0)
+
+    def _post_receipt(self, client):
+        response = client.post('/purchases/receipts/1', json={
+            'date': date.today().isoformat(), 'total_amount': 12.00, 'store_name': 'CVS'
+        })
+        assert response.status_code == 201
+
+    def test_writer_reads_own_writes_from_primary(self, replica_app):
+        self._post_receipt(replica_app.test_client())
+        reader = replica_app.test_client()
+
+        # pinned by user_id, so another client sees the new receipt too
+        assert self._summary_total(reader, environ_base={'REMOTE_ADDR': '10.0.0.2'}) == 12.0
+
+    def _replica_queries(self, client):
+        return json.loads(client.get('/metrics', headers=METRICS_HEADERS).data)['nodes'][1]['queries']
+
+    def test_write_pins_only_its_user(self, replica_app):
+        client = replica_app.test_client()
+        self._post_receipt(client)
+
+        # same client address, different user: still read from the replica
+        before = self._replica_queries(client)
+        client.get('/purchases/receipts/2/summary?period=year')
+        assert self._replica_queries(client) > before
+
+    def test_receipt_write_pins_its_owner(self, replica_app):
+        replica_app.config['DB_PIN_SECONDS'] = 0
+        client = replica_app.test_client()
+        self._post_receipt(client)
+        with replica_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('SELECT receipt_id FROM Receipts')
+            receipt_id = cursor.fetchone()[0]
+
+        replica_app.config['DB_PIN_SECONDS'] = 5
+        client.put(f'/purchases/receipts/{receipt_id}', json={'total_amount': 20.00},
+                   environ_base={'REMOTE_ADDR': '10.0.0.3'})
+
+        assert self._summary_total(client) == 20.0
+
+    def test_unpinned_reads_go_to_replica(self, replica_app):
+        replica_app.config['DB_PIN_SECONDS'] = 0
+        client = replica_app.test_client()
+        self._post_receipt(client)
+
+        assert self._summary_total(client) == 0.0
+        nodes = json.loads(client.get('/metrics', headers=METRICS_HEADERS).data)['nodes']
+        assert nodes[1]['role'] == 'replica'
+        assert nodes[1]['queries'] > 0
+
+    def test_unreachable_replica_falls_back_to_primary(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('DB_BACKEND', 'sqlite')
+        monkeypatch.setenv('METRICS_TOKEN', METRICS_TOKEN)
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'primary.db'))
+        monkeypatch.setenv('DB_REPLICAS', f'sqlite:///{tmp_path}/missing/replica.db')
+        client = create_app().test_client()
+
+        assert client.get('/purchases/receipts/1/summary').status_code == 200
+        nodes = json.loads(client.get('/metrics', headers=METRICS_HEADERS).data)['nodes']
+        assert nodes[1]['healthy'] is False
+        assert nodes[0]['queries'] > 0
+
+
+class TestArchive:
+    def _add_receipt(self, client, day, amount):
+        response = client.post('/purchases/receipts/1', json={
+            'date': day.isoformat(), 'total_amount': amount, 'store_name': 'Trader Joe'
+        })
+        assert response.status_code == 201
+
+    def test_archived_receipts_stay_visible(self, sqlite_app, sqlite_client, tmp_path):
+        sqlite_app.config['ARCHIVE_DIR'] = str(tmp_path / 'archive')
+        sqlite_client.post('/management/budgets/1', json={
+            'amount': 100, 'start_date': '2020-03-01', 'end_date': '2020-03-31', 'user_id': 1
+        })
+        self._add_receipt(sqlite_client, date(2020, 3, 5), 30.00)
+        self._add_receipt(sqlite_client, date(2020, 3, 20), 12.50)
+        self._add_receipt(sqlite_client, date.today(), 5.00)
+
+        result = sqlite_app.test_cli_runner().invoke(args=['archive', 'run', '--months', '12'])
+        assert 'Archived 2 receipts from 2020-03' in result.output
+
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('SELECT COUNT(*) FROM Receipts')
+            assert cursor.fetchone()[0] == 1
+
+        hot = json.loads(sqlite_client.get('/purchases/receipts/1').data)
+        old = json.loads(sqlite_client.get(
+            '/purchases/receipts/1?start_date=2020-01-01&end_date=2020-12-31'
+        ).data)
+        assert len(hot) == 1
+        assert [r['store_name'] for r in old] == ['Trader Joe', 'Trader Joe']
+
+        offset = 2020 - date.today().year
+        summary = json.loads(sqlite_client.get(
+            f'/purchases/receipts/1/summary?period=year&offset={offset}'
+        ).data)
+        assert summary['total_spent'] == 42.5
+        assert float(summary['by_month'][0]['total']) == 42.5
+
+        budgets = json.loads(sqlite_client.get('/management/budgets/user/1').data)
+        assert float(budgets[0]['spent_amount']) == 42.5
+
+        export = sqlite_client.get('/purchases/receipts/1/export')
+        assert export.mimetype == 'text/csv'
+        assert len(export.data.decode().strip().splitlines()) == 4
+
+    def test_receipts_written_during_the_run_stay_hot(self, sqlite_app, sqlite_client, tmp_path, monkeypatch):
+        sqlite_app.config['ARCHIVE_DIR'] = str(tmp_path / 'archive')
+        self._add_receipt(sqlite_client, date(2020, 3, 5), 30.00)
+        columns = archive._columns
+
+        def late_receipt(receipts, transactions):
+            # committed by another request after the month was read
+            self._add_receipt(sqlite_app.test_client(), date(2020, 3, 9), 7.00)
+            return columns(receipts, transactions)
+
+        monkeypatch.setattr(archive, '_columns', late_receipt)
+        result = sqlite_app.test_cli_runner().invoke(args=['archive', 'run', '--months', '12'])
+        assert 'Archived 1 receipts from 2020-03' in result.output
+
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('SELECT total_amount FROM Receipts')
+            assert [float(r[0]) for r in cursor.fetchall()] == [7.0]
+            cursor.execute('SELECT total_amount, receipts FROM ArchivedSpend')
+            assert [(float(a), n) for a, n in cursor.fetchall()] == [(30.0, 1)]
+            assert archive.read_month(date(2020, 3, 1))['total_cents'].tolist() == [3000]
+
+    def test_items_added_during_the_run_abort_it(self, sqlite_app, sqlite_client, tmp_path, monkeypatch):
+        sqlite_app.config['ARCHIVE_DIR'] = str(tmp_path / 'archive')
+        self._add_receipt(sqlite_client, date(2020, 3, 5), 30.00)
+        columns = archive._columns
+
+        def late_item(receipts, transactions):
+            sqlite_app.test_client().post(f'/purchases/transactions/{receipts[0][0]}', json={
+                'item_name': 'Oat Milk', 'unit_cost': 4, 'quantity': 1
+            })
+            return columns(receipts, transactions)
+
+        monkeypatch.setattr(archive, '_columns', late_item)
+        result = sqlite_app.test_cli_runner().invoke(args=['archive', 'run', '--months', '12'])
+        assert isinstance(result.exception, archive.ArchiveConflict)
+
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('SELECT COUNT(*) FROM Receipts')
+            assert cursor.fetchone()[0] == 1
+            cursor.execute('SELECT COUNT(*) FROM ArchivedSpend')
+            assert cursor.fetchone()[0] == 0
+        assert not os.path.exists(tmp_path / 'archive' / 'receipts' / '2020-03.npz')
+
+    def test_deleting_a_user_drops_their_archived_data(self, sqlite_app, sqlite_client, tmp_path):
+        sqlite_app.config['ARCHIVE_DIR'] = str(tmp_path / 'archive')
+        sqlite_client.post('/purchases/receipts/1/with-items', json={
+            'date': '2020-03-05', 'total_amount': 8, 'store_name': 'Trader Joe',
+            'items': [{'item_name': 'Oat Milk', 'unit_cost': 4, 'quantity': 2}],
+        })
+        sqlite_app.test_cli_runner().invoke(args=['archive', 'run', '--months', '12'])
+
+        assert sqlite_client.delete('/users/1').status_code == 200
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('SELECT COUNT(*) FROM ArchivedSpend')
+            assert cursor.fetchone()[0] == 0
+            cols = archive.read_month(date(2020, 3, 1))
+            assert len(cols['receipt_id']) == 0 and len(cols['t_transaction_id']) == 0
+
+
+def _normalized(value):
+    """Payload with totals as rounded floats and dates as ISO strings, so SQLite's
+    loose SUM/DATE typing compares equal to the MySQL-shaped columnar output."""
+    if isinstance(value, dict):
+        return {k: _normalized(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalized(v) for v in value]
+    if isinstance(value, str):
+        try:
+            return round(float(value), 2)
+        except ValueError:
+            pass
+        try:
+            return parsedate_to_datetime(value).date().isoformat()
+        except (TypeError, ValueError):
+            return value
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+class TestColumnarCache:
+    def _add_receipt(self, client, day, amount, store):
+        response = client.post('/purchases/receipts/1', json={
+            'date': day.isoformat(), 'total_amount': amount, 'store_name': store
+        })
+        assert response.status_code == 201
+
+    def _seed(self, client):
+        today = date.today()
+        for days, amount, store in [(0, 20.50, 'Trader Joe'), (2, 9.50, 'CVS'), (9, 3.33, 'Uber'),
+                                    (40, 100.00, 'Delta'), (200, 14.99, 'Netflix')]:
+            self._add_receipt(client, today - timedelta(days=days), amount, store)
+
+    def _both(self, app, client, url):
+        app.config['ANALYTICS_CACHE_BYTES'] = 0
+        from_sql = json.loads(client.get(url).data)
+        app.config['ANALYTICS_CACHE_BYTES'] = 1 << 20
+        cached = json.loads(client.get(url).data)
+        return _normalized(from_sql), _normalized(cached)
+
+    @pytest.mark.parametrize('url', [
+        '/purchases/receipts/1/summary?period=week',
+        '/purchases/receipts/1/summary?period=month&offset=-1',
+        '/purchases/receipts/1/summary?period=year',
+        '/purchases/receipts/1/top-merchants?period=year&limit=3',
+        '/purchases/receipts/1?start_date=2000-01-01&end_date=2100-01-01&sort_by=total_amount',
+        '/purchases/receipts/1?start_date=2000-01-01&end_date=2100-01-01&category=Health',
+        '/purchases/receipts/1?start_date=2000-01-01&end_date=2100-01-01&page=2&per_page=2',
+    ])
+    def test_matches_sql(self, sqlite_app, sqlite_client, url):
+        self._seed(sqlite_client)
+
+        from_sql, cached = self._both(sqlite_app, sqlite_client, url)
+
+        assert cached == from_sql
+
+    def test_writes_update_cached_columns(self, sqlite_app, sqlite_client):
+        self._seed(sqlite_client)
+        sqlite_app.config['ANALYTICS_CACHE_BYTES'] = 1 << 20
+        url = '/purchases/receipts/1/summary?period=year'
+        sqlite_client.get(url)
+
+        self._add_receipt(sqlite_client, date.today(), 7.00, 'CVS')
+        sqlite_client.put('/purchases/receipts/6', json={
+            'total_amount': 8.00, 'category_id': 6
+        })
+        sqlite_client.delete('/purchases/receipts/1')
+
+        from_sql, cached = self._both(sqlite_app, sqlite_client, url)
+        assert cached == from_sql
+        stats = json.loads(sqlite_client.get('/metrics', headers=METRICS_HEADERS).data)['analytics_cache']
+        assert stats['misses'] == 1
+
+    def test_evicts_least_recently_used_user(self, sqlite_app, sqlite_client):
+        self._seed(sqlite_client)
+        cache = ColumnarCache(budget_bytes=1, max_age=300)
+
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute(
+                'INSERT INTO Users (email, first_name, last_name, password) VALUES (%s, %s, %s, %s)',
+                ('other@example.com', 'Other', 'User', 'x')
+            )
+            cursor.execute('UPDATE Receipts SET user_id = 2 WHERE receipt_id > 2')
+            db.get_db().commit()
+            first = cache.columns(cursor, 1)
+            second = cache.columns(cursor, 2)
+            assert cache.stats()['users'] == 0
+
+            cache.budget_bytes = max(first.nbytes, second.nbytes)
+            cache.columns(cursor, 1)
+            cache.columns(cursor, 2)
+
+        stats = cache.stats()
+        assert stats['users'] == 1
+        assert stats['bytes'] <= cache.budget_bytes
+        assert stats['evictions'] == 1
+
+
+class TestDashboard:
+    def test_sections_match_their_endpoints(self, sqlite_client):
+        today = date.today()
+        sqlite_client.post('/purchases/receipts/1', json={
+            'date': today.isoformat(), 'total_amount': 18.25, 'store_name': 'Trader Joe'
+        })
+        sqlite_client.post('/management/budgets/1', json={
+            'amount': 100, 'start_date': today.replace(day=1).isoformat(),
+            'end_date': today.isoformat(), 'user_id': 1
+        })
+
+        data = json.loads(sqlite_client.get('/users/1/dashboard?period=month').data)
+        start, end = data['period_start'], data['period_end']
+
+        assert data['errors'] == {}
+        assert data['summary'] == json.loads(
+            sqlite_client.get('/purchases/receipts/1/summary?period=month').data)
+        assert data['receipts'] == json.loads(sqlite_client.get(
+            f'/purchases/receipts/1?start_date={start}&end_date={end}&page=1&per_page=5').data)
+        assert data['budgets'] == json.loads(sqlite_client.get(
+            f'/management/budgets/user/1?start_date={start}&end_date={end}').data)
+        assert data['top_merchants'][0]['store_name'] == 'Trader Joe'
+        assert data['spending_goals'] == []
+
+    def test_slow_section_returns_partial_payload(self, sqlite_app, sqlite_client):
+        sqlite_app.config['DASHBOARD_SECTION_TIMEOUT'] = 0.2
+        release = threading.Event()
+        sqlite_app.view_functions['purchases.get_top_merchants'] = lambda user_id: release.wait(5) and []
+
+        started = time.monotonic()
+        data = json.loads(sqlite_client.get('/users/1/dashboard').data)
+        release.set()
+
+        assert time.monotonic() - started < 2
+        assert data['top_merchants'] is None
+        assert data['errors'] == {'top_merchants': 'timed out after 0.2s'}
+        assert data['summary']['total_spent'] == 0.0
+
+
+class TestSingleFlightRoutes:
+    def test_identical_summaries_share_one_computation(self, sqlite_app, monkeypatch):
+        from src.purchases import receipts
+        calls = []
+        real = receipts.compute_date_range
+
+        def slow_range(period, offset):
+            calls.append(period)
+            time.sleep(0.2)
+            return real(period, offset)
+
+        monkeypatch.setattr(receipts, 'compute_date_range', slow_range)
+        bodies = []
+
+        def fetch():
+            response = sqlite_app.test_client().get('/purchases/receipts/1/summary?period=month')
+            bodies.append((response.status_code, response.data))
+
+        threads = [threading.Thread(target=fetch) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # one summary computes the current and the previous period
+        assert len(calls) == 2
+        assert len(set(bodies)) == 1 and bodies[0][0] == 200
+        stats = json.loads(sqlite_app.test_client().get('/metrics', headers=METRICS_HEADERS).data)['single_flight']
+        assert stats['shared'] == 3
+
+
+class TestBulkReceipts:
+    def _counts(self, app):
+        with app.app_context():
+            cursor = db.get_db().cursor()
+            counts = []
+            for table in ('Receipts', 'Transactions', 'Stores'):
+                cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                counts.append(cursor.fetchone()[0])
+            return counts
+
+    def test_receipt_with_items_is_one_transaction(self, sqlite_app, sqlite_client):
+        items = [{'unit_cost': 0.5 + i, 'quantity': 1, 'item_name': f'Item {i}'} for i in range(450)]
+
+        response = sqlite_client.post('/purchases/receipts/1/with-items', json={
+            'date': '2024-05-01', 'total_amount': 42.00, 'store_name': 'Harbor Market', 'items': items
+        })
+        data = json.loads(response.data)
+
+        assert response.status_code == 201
+        assert data['transactions'] == 450
+        lines = json.loads(sqlite_client.get(f'/purchases/transactions/{data["receipt_id"]}').data)
+        assert len(lines) == 450
+        assert self._counts(sqlite_app) == [1, 450, 1]
+
+    def test_failed_item_rolls_back_receipt_and_store(self, sqlite_app, sqlite_client):
+        items = [{'unit_cost': 1, 'quantity': 1, 'item_name': 'Milk'},
+                 {'unit_cost': 1, 'quantity': 1, 'item_name': None}]
+
+        response = sqlite_client.post('/purchases/receipts/1/with-items', json={
+            'date': '2024-05-01', 'total_amount': 2.00, 'store_name': 'Harbor Market', 'items': items
+        })
+
+        assert response.status_code == 500
+        assert self._counts(sqlite_app) == [0, 0, 0]
+
+
+class TestSessionTokens:
+    def _login(self, client):
+        client.post('/users', json={
+            'email': 'jane@example.com', 'first_name': 'Jane',
+            'last_name': 'Doe', 'password': 'password123'
+        })
+        response = client.post('/users/login', json={
+            'email': 'jane@example.com', 'password': 'password123'
+        })
+        assert response.status_code == 200
+        return response.get_json()
+
+    def test_login_round_trip(self, sqlite_client):
+        user = self._login(sqlite_client)
+
+        response = sqlite_client.get('/users/me', headers={'Authorization': f'Bearer {user["token"]}'})
+        assert response.status_code == 200
+        assert response.get_json()['user_id'] == user['user_id']
+
+    def test_required_token_scopes_user_routes(self, sqlite_app, sqlite_client):
+        user = self._login(sqlite_client)
+        sqlite_app.config['REQUIRE_SESSION_TOKEN'] = True
+        auth = {'Authorization': f'Bearer {user["token"]}'}
+
+        assert sqlite_client.get(f'/users/{user["user_id"]}').status_code == 401
+        assert sqlite_client.get(f'/users/{user["user_id"]}', headers=auth).status_code == 200
+        assert sqlite_client.get('/users/1', headers=auth).status_code == 403
+
+
+class TestStatementImport:
+    CSV = (
+        b'Date,Description,Amount\n'
+        b'2024-01-03,STARBUCKS #123,-4.50\n'
+        b'01/04/2024,"Joe\'s Pizza, Inc",-20.00\n'
+        b'2024-01-05,Payroll,1500.00\n'
+        b'not a date,Thing,-3.00\n'
+        b'2024-01-06,Target,(12.00)\n'
+    )
+
+    def _receipts(self, app):
+        with app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('''
+                SELECT r.date, r.total_amount, s.store_name
+                FROM Receipts r JOIN Stores s ON s.store_id = r.store_id
+                ORDER BY r.date
+            ''')
+            return cursor.fetchall()
+
+    def test_csv_import(self, sqlite_app, sqlite_client):
+        response = sqlite_client.post('/purchases/receipts/1/import', data=self.CSV, content_type='text/csv')
+        data = json.loads(response.data)
+
+        assert response.status_code == 201
+        assert (data['rows'], data['imported'], data['skipped'], data['invalid']) == (5, 3, 1, 1)
+        assert data['errors'] == [{'record': 5, 'error': "bad date 'not a date'"}]
+        assert self._receipts(sqlite_app) == [
+            (date(2024, 1, 3), Decimal('4.50'), 'STARBUCKS #123'),
+            (date(2024, 1, 4), Decimal('20.00'), "Joe's Pizza, Inc"),
+            (date(2024, 1, 6), Decimal('12.00'), 'Target'),
+        ]
+
+    def test_reuses_existing_stores(self, sqlite_app, sqlite_client):
+        sqlite_client.post('/purchases/receipts/1', json={
+            'date': '2024-01-01', 'total_amount': 3.00, 'store_name': 'Target'
+        })
+        response = sqlite_client.post('/purchases/receipts/1/import', data=self.CSV, content_type='text/csv')
+
+        assert json.loads(response.data)['stores_created'] == 2
+
+    def test_qfx_upload_in_batches(self, sqlite_app, sqlite_client):
+        sqlite_app.config['IMPORT_BATCH_ROWS'] = 2
+        transactions = ''.join(
+            f'<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>202402{day:02d}120000[-5:EST]'
+            f'<TRNAMT>-{day}.25<FITID>{day}<NAME>AT&amp;T Store {day}\n</STMTTRN>\n'
+            for day in range(1, 6)
+        )
+        body = ('OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKTRANLIST>\n'
+                + transactions + '</BANKTRANLIST></OFX>\n').encode()
+
+        response = sqlite_client.post(
+            '/purchases/receipts/1/import?progress=true',
+            data={'file': (io.BytesIO(body), 'march.qfx')}, content_type='multipart/form-data'
+        )
+        steps = [json.loads(line) for line in response.data.splitlines()]
+
+        assert response.mimetype == 'application/x-ndjson'
+        assert [step['imported'] for step in steps] == [2, 4, 5]
+        assert steps[-1]['done'] is True
+        assert self._receipts(sqlite_app)[0] == (date(2024, 2, 1), Decimal('1.25'), 'AT&T Store 1')
+
+    def test_updates_budget_progress(self, sqlite_client):
+        sqlite_client.post('/management/budgets/1', json={
+            'amount': 20, 'start_date': '2024-01-01', 'end_date': '2024-01-31', 'user_id': 1
+        })
+        # both merchant-rule Food & Drink, so the categories don't depend on the model
+        sqlite_client.post('/purchases/receipts/1/import', content_type='text/csv', data=(
+            b'Date,Description,Amount\n2024-01-03,STARBUCKS #123,-4.50\n2024-01-09,Trader Joe,-30.00\n'
+        ))
+
+        budgets = json.loads(sqlite_client.get('/management/budgets/user/1').data)
+        notifications = json.loads(sqlite_client.get('/management/budgets/notifications/1').data)
+        assert float(budgets[0]['spent_amount']) == 34.50
+        assert len(notifications) == 1
+
+    def test_records_last_receipt_of_multi_row_insert(self, sqlite_app, sqlite_client):
+        sqlite_client.post('/management/budgets/1', json={
+            'amount': 100, 'start_date': '2024-01-01', 'end_date': '2024-01-31', 'user_id': 1
+        })
+        sqlite_client.post('/purchases/receipts/1/import', content_type='text/csv', data=(
+            b'Date,Description,Amount\n2024-01-03,STARBUCKS #123,-4.50\n'
+            b'2024-01-05,Trader Joe,-30.00\n2024-01-09,Target,-12.00\n'
+        ))
+
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('SELECT MAX(receipt_id) FROM Receipts')
+            last = cursor.fetchone()[0]
+            cursor.execute('SELECT last_receipt_id FROM BudgetProgress')
+            assert cursor.fetchall() == [(last,)]
+
+    def test_bad_header_is_400(self, sqlite_app, sqlite_client):
+        response = sqlite_client.post('/purchases/receipts/1/import', data=b'when,what\n1,2\n',
+                                      content_type='text/csv')
+
+        assert response.status_code == 400
+        assert self._receipts(sqlite_app) == []
+
+    def test_unknown_user(self, sqlite_client):
+        response = sqlite_client.post('/purchases/receipts/99/import', data=self.CSV, content_type='text/csv')
+        assert response.status_code == 404
+
+
+class TestSubscriptions:
+    def _charge(self, client, store_name, days_ago, amount):
+        day = date.today() - timedelta(days=days_ago)
+        return client.post('/purchases/receipts/1', json={
+            'date': day.isoformat(), 'total_amount': amount, 'store_name': store_name
+        })
+
+    def _subscriptions(self, client, query=''):
+        return json.loads(client.get(f'/purchases/subscriptions/1{query}').data)
+
+    def _scan(self, sqlite_app):
+        result = sqlite_app.test_cli_runner().invoke(args=['recurring', 'scan'])
+        assert result.exit_code == 0
+
+    def _stored(self, sqlite_app):
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('SELECT user_id, store_id FROM RecurringCharges')
+            return cursor.fetchall()
+
+    def test_detects_without_writing(self, sqlite_app, sqlite_client):
+        for ago in (3, 33, 64, 94):
+            self._charge(sqlite_client, 'Streamly', ago, 12.99)
+        for ago, amount in ((2, 40.10), (9, 3.50), (40, 88.00)):
+            self._charge(sqlite_client, 'Corner Market', ago, amount)
+
+        data = self._subscriptions(sqlite_client)
+
+        assert [s['store_name'] for s in data['subscriptions']] == ['Streamly']
+        assert data['subscriptions'][0]['cadence'] == 'monthly'
+        assert data['monthly_cost'] == 12.99
+        assert self._stored(sqlite_app) == []
+
+        self._scan(sqlite_app)
+        stored = self._subscriptions(sqlite_client)
+        assert [s['store_name'] for s in stored['subscriptions']] == ['Streamly']
+        assert stored['monthly_cost'] == 12.99
+        assert len(self._stored(sqlite_app)) == 1
+        # results stay per user: the store itself is not flagged for everyone
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute("SELECT is_subscription FROM Stores WHERE store_name = 'Streamly'")
+            assert cursor.fetchone()[0] == 0
+
+    def test_rescans_only_changed_users(self, sqlite_app, sqlite_client):
+        for ago in (10, 40, 71):
+            self._charge(sqlite_client, 'Streamly', ago, 9.99)
+        self._scan(sqlite_app)
+        assert len(self._subscriptions(sqlite_client)['subscriptions']) == 1
+
+        with sqlite_app.app_context():
+            from src.recurring import scan, stale_users
+            cursor = db.get_db().cursor()
+            assert stale_users(cursor) == {}
+            assert scan(cursor) == (0, 0)
+
+        # a receipt that breaks the cadence makes the user stale again
+        self._charge(sqlite_client, 'Streamly', 1, 60.00)
+        with sqlite_app.app_context():
+            assert list(stale_users(db.get_db().cursor())) == [1]
+        assert self._subscriptions(sqlite_client)['subscriptions'] == []
+
+    def test_edit_marks_user_stale(self, sqlite_app, sqlite_client):
+        receipt_ids = [json.loads(self._charge(sqlite_client, 'Streamly', ago, 9.99).data)['receipt_id']
+                       for ago in (10, 40, 71)]
+        self._scan(sqlite_app)
+        assert self._subscriptions(sqlite_client)['monthly_cost'] == 9.99
+
+        # same receipt count and ids, so only the edit hook can trigger the rescan
+        sqlite_client.put(f'/purchases/receipts/{receipt_ids[0]}', json={'total_amount': 60.00})
+
+        data = self._subscriptions(sqlite_client, '?include_inactive=true')
+        assert data == {'subscriptions': [], 'monthly_cost': 0}
+
+
+class TestForecast:
+    def test_nightly_fit_projects_upcoming_budget(self, sqlite_app, sqlite_client):
+        month_start = date.today().replace(day=1)
+        for back in (1, 2, 3):
+            day = (month_start - timedelta(days=28 * back)).replace(day=5)
+            sqlite_client.post('/purchases/receipts/1', json={
+                'date': day.isoformat(), 'total_amount': 20.00, 'store_name': 'Starbucks'
+            })
+        next_start = (month_start + timedelta(days=32)).replace(day=1)
+        next_end = (next_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        sqlite_client.post('/management/budgets/1', json={
+            'amount': 10, 'start_date': next_start.isoformat(), 'end_date': next_end.isoformat(), 'user_id': 1
+        })
+
+        before = json.loads(sqlite_client.get('/management/forecast/1').data)
+        assert before['budgets'][0]['projected'] is None
+
+        with sqlite_app.app_context():
+            from src.forecast import fit
+            assert fit(db.get_db().cursor()) == 1
+            db.get_db().commit()
+
+        data = json.loads(sqlite_client.get('/management/forecast/1').data)
+        budget = data['budgets'][0]
+        assert (budget['spent'], budget['projected'], budget['projected_overrun']) == (0, 20.0, 10.0)
+        assert data['categories'][0]['category_name'] == 'Food & Drink'
+
+
+class TestAnomalies:
+    def _charge(self, client, amount, store_name='Starbucks'):
+        return json.loads(client.post('/purchases/receipts/1', json={
+            'date': date.today().isoformat(), 'total_amount': amount, 'store_name': store_name
+        }).data)['receipt_id']
+
+    def _anomalies(self, client):
+        notifications = json.loads(client.get('/management/budgets/notifications/1').data)
+        return [n for n in notifications if n['receipt_id'] is not None]
+
+    def test_outlier_receipt_notifies(self, sqlite_client):
+        for amount in (5.25, 6.10, 4.80, 5.75, 6.40, 5.10, 4.95, 6.00, 5.50, 5.30):
+            self._charge(sqlite_client, amount)
+        assert self._anomalies(sqlite_client) == []
+
+        receipt_id = self._charge(sqlite_client, 900.00, 'Dunkin')
+
+        anomalies = self._anomalies(sqlite_client)
+        assert [n['receipt_id'] for n in anomalies] == [receipt_id]
+        assert anomalies[0]['budget_id'] is None
+        assert 'Unusual $900.00 charge at Dunkin' in anomalies[0]['Message']
+
+    def test_backfill_flags_history_once(self, sqlite_app, sqlite_client):
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute("INSERT INTO Stores (store_name, zip_code, street_address, city, state) "
+                           "VALUES ('Starbucks', '', '', '', '')")
+            store_id = cursor.lastrowid
+            amounts = [5 + (i % 4) * 0.5 for i in range(12)] + [450.00]
+            for i, amount in enumerate(amounts):
+                cursor.execute(
+                    'INSERT INTO Receipts (date, total_amount, user_id, store_id, category_id) '
+                    'VALUES (%s, %s, 1, %s, 1)',
+                    (date.today() - timedelta(days=len(amounts) - i), amount, store_id)
+                )
+            db.get_db().commit()
+
+            from src.anomalies import backfill
+            assert backfill(cursor) == (1, 1)
+            assert backfill(cursor) == (1, 0)
+            db.get_db().commit()
+
+            cursor.execute('SELECT observations, log_median FROM SpendStats WHERE user_id = 1')
+            observations, median = cursor.fetchone()
+        assert observations == 13
+        assert 500 <= math.exp(median) <= 650
+        assert len(self._anomalies(sqlite_client)) == 1
+
+
+class TestGroupSpending:
+    def test_group_endpoints(self, sqlite_app, sqlite_client):
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('INSERT INTO `Groups` (group_name, admin_user_id) VALUES (%s, %s)', ('House', 1))
+            group_id = cursor.lastrowid
+            cursor.execute(
+                'INSERT INTO Users (email, first_name, last_name, password, group_id) VALUES (%s, %s, %s, %s, %s)',
+                ('roommate@example.com', 'Room', 'Mate', 'x', group_id)
+            )
+            roommate = cursor.lastrowid
+            cursor.execute('UPDATE Users SET group_id = %s WHERE user_id = 1', (group_id,))
+            db.get_db().commit()
+
+        today = date.today().isoformat()
+        for user_id, amount, store in ((1, 12.50, 'Starbucks'), (roommate, 7.50, 'Starbucks'), (roommate, 40.00, 'Trader Joe')):
+            sqlite_client.post(f'/purchases/receipts/{user_id}', json={
+                'date': today, 'total_amount': amount, 'store_name': store
+            })
+        sqlite_client.post('/management/budgets/1', json={
+            'amount': 100, 'start_date': today, 'end_date': today, 'user_id': roommate
+        })
+
+        summary = json.loads(sqlite_client.get(f'/users/group/{group_id}/summary').data)
+        merchants = json.loads(sqlite_client.get(f'/users/group/{group_id}/top-merchants').data)
+        budgets = json.loads(sqlite_client.get(f'/users/group/{group_id}/budgets?active=true').data)
+
+        assert summary['total_spent'] == 60.0
+        assert [(m['user_id'], m['total']) for m in summary['by_member']] == [(roommate, 47.5), (1, 12.5)]
+        assert sum(w['total'] for w in summary['by_week']) == 60.0
+        assert [(m['store_name'], m['total_spent']) for m in merchants] == [('Trader Joe', 40.0), ('Starbucks', 20.0)]
+        assert budgets[0]['spent'] == 47.5
+
+
+    def test_archived_months_count_for_members_only(self, sqlite_app, sqlite_client, tmp_path):
+        sqlite_app.config['ARCHIVE_DIR'] = str(tmp_path / 'archive')
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('INSERT INTO `Groups` (group_name, admin_user_id) VALUES (%s, %s)', ('House', 1))
+            group_id = cursor.lastrowid
+            cursor.execute('UPDATE Users SET group_id = %s WHERE user_id = 1', (group_id,))
+            cursor.execute(
+                'INSERT INTO Users (email, first_name, last_name, password) VALUES (%s, %s, %s, %s)',
+                ('stranger@example.com', 'Some', 'One', 'x')
+            )
+            stranger = cursor.lastrowid
+            db.get_db().commit()
+
+        for user_id, amount, store in ((1, 30.00, 'Starbucks'), (1, 5.00, 'CVS'), (stranger, 99.00, 'Starbucks')):
+            sqlite_client.post(f'/purchases/receipts/{user_id}', json={
+                'date': '2020-03-05', 'total_amount': amount, 'store_name': store
+            })
+        sqlite_app.test_cli_runner().invoke(args=['archive', 'run', '--months', '12'])
+
+        query = f'period=year&offset={2020 - date.today().year}'
+        summary = json.loads(sqlite_client.get(f'/users/group/{group_id}/summary?{query}').data)
+        merchants = json.loads(sqlite_client.get(f'/users/group/{group_id}/top-merchants?{query}').data)
+
+        assert summary['total_spent'] == 35.0
+        assert [(m['store_name'], m['total_spent']) for m in merchants] == [('Starbucks', 30.0), ('CVS', 5.0)]
+
+
+class TestItemSearch:
+    def _receipt(self, client, day, store_name, items):
+        response = client.post('/purchases/receipts/1/with-items', json={
+            'date': day, 'store_name': store_name,
+            'total_amount': sum(cost * quantity for _, cost, quantity in items),
+            'items': [{'item_name': name, 'unit_cost': cost, 'quantity': quantity} for name, cost, quantity in items],
+        })
+        return json.loads(response.data)['receipt_id']
+
+    def _search(self, client, query):
+        return json.loads(client.get(f'/purchases/items/search/1?{query}').data)
+
+    def _seed(self, client):
+        self._receipt(client, '2024-01-05', 'Trader Joe', [('Oat Milk', 4.50, 2), ('Greek Yogurt', 1.25, 4)])
+        self._receipt(client, '2024-02-10', 'Harbor Market', [('OAT MILK 64oz', 6.00, 1), ('Oatmeal', 3.00, 1)])
+        return self._receipt(client, '2024-02-20', 'Trader Joe', [('Chocolate Bar', 2.00, 3)])
+
+    @pytest.mark.parametrize('cache_bytes', [0, 1 << 20])
+    def test_totals_by_item_store_and_month(self, sqlite_app, sqlite_client, cache_bytes):
+        sqlite_app.config['ITEM_SEARCH_CACHE_BYTES'] = cache_bytes
+        self._seed(sqlite_client)
+
+        data = self._search(sqlite_client, 'q=oat+milk')
+
+        assert (data['total_spent'], data['count'], data['quantity']) == (15.0, 2, 3)
+        assert [(i['item_name'], i['total']) for i in data['items']] == [('Oat Milk', 9.0), ('OAT MILK 64oz', 6.0)]
+        assert [(s['store_name'], s['total']) for s in data['by_store']] == [('Trader Joe', 9.0), ('Harbor Market', 6.0)]
+        assert [(m['month'], m['total']) for m in data['by_month']] == [('2024-01', 9.0), ('2024-02', 6.0)]
+        assert [m['date'] for m in data['matches']] == ['2024-02-10', '2024-01-05']
+
+        assert self._search(sqlite_client, 'q=oat')['count'] == 3
+        fuzzy = self._search(sqlite_client, 'q=chocolte')
+        assert (fuzzy['fuzzy_matched'], fuzzy['total_spent']) == (['chocolte'], 6.0)
+        assert self._search(sqlite_client, 'q=chocolte&fuzzy=false')['count'] == 0
+
+    def test_cached_index_follows_writes(self, sqlite_app, sqlite_client):
+        sqlite_app.config['ITEM_SEARCH_CACHE_BYTES'] = 1 << 20
+        chocolate = self._seed(sqlite_client)
+        assert self._search(sqlite_client, 'q=milk')['count'] == 2
+
+        sqlite_client.post(f'/purchases/transactions/{chocolate}', json={
+            'item_name': 'Almond Milk', 'unit_cost': 3.50, 'quantity': 1
+        })
+        data = self._search(sqlite_client, 'q=milk')
+        assert (data['count'], data['total_spent']) == (3, 18.5)
+
+        sqlite_client.put(f'/purchases/receipts/{chocolate}', json={'total_amount': 9.5, 'date': '2024-03-01'})
+        assert self._search(sqlite_client, 'q=almond')['by_month'][0]['month'] == '2024-03'
+
+        transaction_id = self._search(sqlite_client, 'q=almond')['matches'][0]['transaction_id']
+        sqlite_client.delete(f'/purchases/transactions/{transaction_id}')
+        assert self._search(sqlite_client, 'q=almond')['count'] == 0
+
+        sqlite_client.delete(f'/purchases/receipts/{chocolate}')
+        assert self._search(sqlite_client, 'q=chocolate')['count'] == 0
+        stats = json.loads(sqlite_client.get('/metrics', headers=METRICS_HEADERS).data)['item_search_cache']
+        assert stats['misses'] == 1
+
+    def test_cached_index_drops_deleted_store(self, sqlite_app, sqlite_client):
+        sqlite_app.config['ITEM_SEARCH_CACHE_BYTES'] = 1 << 20
+        self._seed(sqlite_client)
+        assert self._search(sqlite_client, 'q=milk')['count'] == 2
+
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute("SELECT store_id FROM Stores WHERE store_name = 'Harbor Market'")
+            store_id = cursor.fetchone()[0]
+        sqlite_client.delete(f'/purchases/stores/{store_id}')
+
+        data = self._search(sqlite_client, 'q=milk')
+        assert (data['count'], data['total_spent']) == (1, 9.0)
+
+    def test_requires_a_query(self, sqlite_client):
+        response = sqlite_client.get('/purchases/items/search/1?q=%20-')
+        assert response.status_code == 400
+
+    def test_includes_archived_items(self, sqlite_app, sqlite_client, tmp_path):
+        sqlite_app.config['ARCHIVE_DIR'] = str(tmp_path / 'archive')
+        self._receipt(sqlite_client, '2020-03-05', 'Trader Joe', [('Oat Milk', 4.50, 2), ('Bread', 3.00, 1)])
+        self._receipt(sqlite_client, date.today().isoformat(), 'Harbor Market', [('Oat Milk', 5.00, 1)])
+
+        result = sqlite_app.test_cli_runner().invoke(args=['archive', 'run', '--months', '12'])
+        assert 'Archived 1 receipts from 2020-03' in result.output
+
+        data = self._search(sqlite_client, 'q=oat')
+        assert (data['count'], data['total_spent']) == (2, 14.0)
+        assert data['by_month'][0] == {'month': '2020-03', 'total': 9.0, 'count': 1}
+        assert data['matches'][-1]['store_name'] == 'Trader Joe'
+
+
+class TestItemPrices:
+    def _receipt(self, client, day, store_name, items):
+        response = client.post('/purchases/receipts/1/with-items', json={
+            'date': day.isoformat(), 'store_name': store_name,
+            'total_amount': sum(cost * quantity for _, cost, quantity in items),
+            'items': [{'item_name': name, 'unit_cost': cost, 'quantity': quantity} for name, cost, quantity in items],
+        })
+        return json.loads(response.data)['receipt_id']
+
+    def _rows(self, sqlite_app):
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute('''
+                SELECT item_key, store_id, date, quantity, spent, min_unit_cost FROM ItemPrices
+                ORDER BY item_key, store_id, date
+            ''')
+            return [(k, s, str(d), q, float(spent), float(low)) for k, s, d, q, spent, low in cursor.fetchall()]
+
+    def _seed(self, client):
+        today = date.today().replace(day=1)
+        last_month = today - timedelta(days=20)
+        self._receipt(client, last_month, 'Trader Joe', [('Oat Milk', 4.00, 2), ('Eggs', 3.00, 1)])
+        self._receipt(client, today, 'Trader Joe', [('OAT MILK', 4.50, 1), ('Eggs', 3.20, 1)])
+        return self._receipt(client, today, 'Harbor Market', [('Oat-Milk', 3.50, 1), ('Eggs', 3.60, 1)])
+
+    def test_trend_and_cheapest_store(self, sqlite_client):
+        self._seed(sqlite_client)
+
+        data = json.loads(sqlite_client.get('/purchases/items/prices/1?item=oat%20milk').data)
+        assert data['item_key'] == 'oat milk'
+        assert [(m['avg_unit_cost'], m['quantity']) for m in data['by_month']] == [(4.0, 2), (4.0, 2)]
+        assert data['change_percent'] == 0.0
+        assert data['cheapest_store']['store_name'] == 'Harbor Market'
+        assert [(s['store_name'], s['avg_unit_cost'], s['last_unit_cost']) for s in data['by_store']] == [
+            ('Harbor Market', 3.5, 3.5), ('Trader Joe', 4.17, 4.5),
+        ]
+        assert sqlite_client.get('/purchases/items/prices/1?item=kombucha').status_code == 404
+
+        cheapest = json.loads(sqlite_client.get('/purchases/items/cheapest/1').data)
+        assert [(c['item_key'], c['usual_store']['store_name'], c['cheapest_store']['store_name'],
+                 c['potential_savings']) for c in cheapest] == [
+            ('oat milk', 'Trader Joe', 'Harbor Market', 2.0),
+            ('eggs', 'Trader Joe', 'Trader Joe', 0.5),
+        ]
+
+    def test_line_item_writes_keep_history_current(self, sqlite_app, sqlite_client):
+        harbor = self._seed(sqlite_client)
+        seeded = self._rows(sqlite_app)
+        assert len(seeded) == 6
+
+        sqlite_client.post(f'/purchases/transactions/{harbor}', json={
+            'item_name': 'oat milk', 'unit_cost': 3.00, 'quantity': 1
+        })
+        data = json.loads(sqlite_client.get('/purchases/items/prices/1?item=oat%20milk').data)
+        assert data['cheapest_store']['store_name'] == 'Harbor Market'
+        assert (data['cheapest_store']['quantity'], data['cheapest_store']['min_unit_cost']) == (2, 3.0)
+
+        transactions = json.loads(sqlite_client.get(f'/purchases/transactions/{harbor}').data)
+        sqlite_client.delete(f"/purchases/transactions/{transactions[-1]['transaction_id']}")
+        assert self._rows(sqlite_app) == seeded
+
+        moved = (date.today() - timedelta(days=3)).isoformat()
+        sqlite_client.put(f'/purchases/receipts/{harbor}', json={'total_amount': 7.10, 'date': moved})
+        assert sorted({r[2] for r in self._rows(sqlite_app) if r[1] != seeded[0][1]}) == [moved]
+
+        sqlite_client.delete(f'/purchases/receipts/{harbor}')
+        rows = self._rows(sqlite_app)
+        assert len(rows) == 4
+
+        # the rebuild agrees with what the incremental updates left behind
+        result = sqlite_app.test_cli_runner().invoke(args=['prices', 'rebuild'])
+        assert 'Rebuilt 4 item price rows for 1 users' in result.output
+        assert self._rows(sqlite_app) == rows
+
+    def test_history_outlives_archiving(self, sqlite_app, sqlite_client, tmp_path):
+        sqlite_app.config['ARCHIVE_DIR'] = str(tmp_path / 'archive')
+        self._receipt(sqlite_client, date(2020, 3, 5), 'Trader Joe', [('Oat Milk', 2.50, 2)])
+        before = self._rows(sqlite_app)
+
+        sqlite_app.test_cli_runner().invoke(args=['archive', 'run', '--months', '12'])
+        assert self._rows(sqlite_app) == before
+        sqlite_app.test_cli_runner().invoke(args=['prices', 'rebuild'])
+        assert self._rows(sqlite_app) == before
+
+    def test_deleting_tag_drops_its_price_rows(self, sqlite_app, sqlite_client):
+        receipt_id = self._seed(sqlite_client)
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute("INSERT INTO Tags (tag_name, user_id) VALUES ('trip', 1)")
+            tag_id = cursor.lastrowid
+            cursor.execute('UPDATE Receipts SET tag_id = %s WHERE receipt_id = %s', (tag_id, receipt_id))
+            db.get_db().commit()
+
+        assert sqlite_client.delete(f'/descriptors/tags/{tag_id}').status_code == 200
+
+        assert len(self._rows(sqlite_app)) == 4
+        data = json.loads(sqlite_client.get('/purchases/items/prices/1?item=oat%20milk').data)
+        assert [s['store_name'] for s in data['by_store']] == ['Trader Joe']
+
+
+class TestChangeFeed:
+    def _changes(self, client, query=''):
+        return json.loads(client.get(f'/users/1/changes{query}').data)
+
+    def _seed(self, client):
+        created = client.post('/purchases/receipts/1', json={
+            'date': '2024-03-05', 'total_amount': 12.5, 'store_name': 'Trader Joe'
+        })
+        receipt_id = json.loads(created.data)['receipt_id']
+        client.put(f'/purchases/receipts/{receipt_id}', json={'total_amount': 15})
+        client.post('/management/budgets/1', json={
+            'amount': 200, 'start_date': '2024-03-01', 'end_date': '2024-03-31', 'user_id': 1
+        })
+        client.delete(f'/purchases/receipts/{receipt_id}')
+        return receipt_id
+
+    def test_writes_are_logged_in_order(self, sqlite_client):
+        receipt_id = self._seed(sqlite_client)
+
+        data = self._changes(sqlite_client)
+        assert [(c['seq'], c['entity'], c['action']) for c in data['changes']] == [
+            (1, 'receipt', 'create'), (2, 'receipt', 'update'), (3, 'budget', 'create'), (4, 'receipt', 'delete'),
+        ]
+        assert (data['last_seq'], data['has_more'], data['reset']) == (4, False, False)
+        created, updated = data['changes'][0], data['changes'][1]
+        assert created['entity_id'] == receipt_id
+        assert (created['data']['date'], created['data']['total_amount']) == ('2024-03-05', 12.5)
+        assert (updated['data']['total_amount'], updated['data']['previous']['total_amount']) == (15.0, 12.5)
+
+        page = self._changes(sqlite_client, '?after=1&limit=2')
+        assert [c['seq'] for c in page['changes']] == [2, 3]
+        assert (page['last_seq'], page['has_more']) == (3, True)
+        assert self._changes(sqlite_client, '?after=4') == {
+            'changes': [], 'last_seq': 4, 'has_more': False, 'reset': False,
+        }
+
+    def test_store_delete_logs_one_change_per_user(self, sqlite_app, sqlite_client):
+        receipt_ids = [json.loads(sqlite_client.post('/purchases/receipts/1', json={
+            'date': day, 'total_amount': 9.5, 'store_name': 'Streamly'
+        }).data)['receipt_id'] for day in ('2024-03-05', '2024-04-05')]
+        with sqlite_app.app_context():
+            cursor = db.get_db().cursor()
+            cursor.execute("SELECT store_id FROM Stores WHERE store_name = 'Streamly'")
+            store_id = cursor.fetchone()[0]
+
+        sqlite_client.delete(f'/purchases/stores/{store_id}')
+
+        deletes = [c for c in self._changes(sqlite_client)['changes'] if c['action'] == 'delete']
+        assert [c['entity_id'] for c in deletes] == [None]
+        assert deletes[0]['data'] == {
+            'receipt_ids': sorted(receipt_ids), 'total_amount': 19.0,
+            'start_date': '2024-03-05', 'end_date': '2024-04-05',
+        }
+
+    def test_statement_import_logs_one_change_per_batch(self, sqlite_client):
+        sqlite_client.post('/purchases/receipts/1/import', data=TestStatementImport.CSV, content_type='text/csv')
+
+        changes = self._changes(sqlite_client)['changes']
+        assert [(c['action'], c['entity_id']) for c in changes] == [('import', None)]
+        assert changes[0]['data'] == {
+            'receipts': 3, 'total_amount': 36.5, 'start_date': '2024-01-03', 'end_date': '2024-01-06',
+        }
+
+    def test_pruned_or_foreign_cursors_reset(self, sqlite_app, sqlite_client):
+        self._seed(sqlite_client)
+        with sqlite_app.app_context():
+            from src.changes import prune
+            assert prune(db.get_db().cursor(), -1) == 4
+            db.get_db().commit()
+
+        data = self._changes(sqlite_client, '?after=1')
+        assert (data['changes'], data['last_seq'], data['reset']) == ([], 4, True)
+        assert self._changes(sqlite_client, '?after=4')['reset'] is False
+        assert self._changes(sqlite_client, '?after=9')['reset'] is True
+
+    def test_stream_resumes_after_last_event_id(self, sqlite_app, sqlite_client):
+        sqlite_app.config['CHANGE_STREAM_SECONDS'] = 0
+        self._seed(sqlite_client)
+
+        response = sqlite_client.get('/users/1/changes/stream', headers={'Last-Event-ID': '2'})
+        assert response.mimetype == 'text/event-stream'
+        events = [block for block in response.get_data(as_text=True).split('\n\n') if block.startswith('id:')]
+        assert [block.split('\n')[:2] for block in events] == [
+            ['id: 3', 'event: change'], ['id: 4', 'event: change'],
+        ]
+        assert json.loads(events[1].split('data: ', 1)[1])['action'] == 'delete'
+
+    def test_waiting_stream_wakes_on_a_change(self, sqlite_app, sqlite_client):
+        sqlite_app.config['CHANGE_POLL_SECONDS'] = 10
+        sqlite_app.config['CHANGE_STREAM_SECONDS'] = 10
+        response = sqlite_client.get('/users/1/changes/stream')
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'retry: ')
+
+        def write():
+            time.sleep(0.2)
+            sqlite_app.test_client().post('/purchases/receipts/1', json={
+                'date': '2024-03-05', 'total_amount': 9, 'store_name': 'Trader Joe'
+            })
+
+        writer = threading.Thread(target=write)
+        started = time.monotonic()
+        writer.start()
+        event = next(chunks)
+        writer.join()
+        response.close()
+        assert event.startswith(b'id: 1\nevent: change')
+        assert time.monotonic() - started < 5
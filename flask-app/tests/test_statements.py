@@ -0,0 +1,81 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from src.purchases.statements import StatementError, parse_amount, parse_csv, parse_date, parse_ofx
+
+
+def _chunks(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+class TestParseCsv:
+    def test_signed_amount_column(self):
+        data = b'\xef\xbb\xbfPosted Date,Payee,Amount\n01/02/2024,Cafe,-3.50\n'
+        assert list(parse_csv([data])) == [(2, '01/02/2024', '-3.50', 'Cafe', -1)]
+
+    def test_debit_column_is_unsigned(self):
+        data = b'Date,Description,Debit,Credit\n2024-01-02,Cafe,3.50,\n'
+        assert list(parse_csv([data]))[0][2:] == ('3.50', 'Cafe', 0)
+
+    def test_positive_debits(self):
+        data = b'Date,Description,Amount\n2024-01-02,Cafe,3.50\n'
+        assert list(parse_csv([data], debits='positive'))[0][4] == 1
+
+    def test_rows_split_across_chunks(self):
+        data = b'Date,Description,Amount\n' + b''.join(
+            f'2024-01-{d:02d},"Store, {d}",-{d}.00\n'.encode() for d in range(1, 29)
+        )
+        records = list(parse_csv(_chunks(data, 7)))
+        assert len(records) == 28
+        assert records[-1][1:4] == ('2024-01-28', '-28.00', 'Store, 28')
+
+    def test_missing_columns(self):
+        with pytest.raises(StatementError):
+            list(parse_csv([b'when,what\n']))
+
+
+class TestParseOfx:
+    def test_sgml(self):
+        data = (b'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKTRANLIST>\n'
+                b'<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20240105\n<TRNAMT>-12.00\n<NAME>Shell &amp; Co\n</STMTTRN>\n'
+                b'<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20240106\n<TRNAMT>50.00\n<MEMO>Refund\n</STMTTRN>\n'
+                b'</BANKTRANLIST></OFX>')
+        assert list(parse_ofx(_chunks(data, 5))) == [
+            (1, '20240105', '-12.00', 'Shell & Co', -1),
+            (2, '20240106', '50.00', 'Refund', -1),
+        ]
+
+    def test_xml(self):
+        data = (b'<?xml version="1.0"?><?OFX OFXHEADER="200"?><OFX><BANKTRANLIST>'
+                b'<STMTTRN><DTPOSTED>20240105000000</DTPOSTED><TRNAMT>-1.00</TRNAMT><NAME>Deli</NAME></STMTTRN>'
+                b'</BANKTRANLIST></OFX>')
+        assert list(parse_ofx([data])) == [(1, '20240105000000', '-1.00', 'Deli', -1)]
+
+
+class TestFields:
+    @pytest.mark.parametrize('text, expected', [
+        ('2024-03-05', date(2024, 3, 5)),
+        ('03/05/2024', date(2024, 3, 5)),
+        ('03/05/24', date(2024, 3, 5)),
+        ('20240305120000[-5:EST]', date(2024, 3, 5)),
+        ('March 5, 2024', date(2024, 3, 5)),
+    ])
+    def test_dates(self, text, expected):
+        assert parse_date(text) == expected
+
+    @pytest.mark.parametrize('text, expected', [
+        ('1,234.56', Decimal('1234.56')),
+        ('$-12.00', Decimal('-12.00')),
+        ('(12.00)', Decimal('-12.00')),
+        ('', None),
+    ])
+    def test_amounts(self, text, expected):
+        assert parse_amount(text) == expected
+
+    def test_bad_values(self):
+        with pytest.raises(ValueError):
+            parse_amount('twelve')
+        with pytest.raises(ValueError):
+            parse_date('not a date')
@@ -1,6 +1,11 @@
 import json
+import time
+
+import pytest
 from werkzeug.security import generate_password_hash
 
+from src.users.passwords import HashingBusy, PasswordHasher, password_hasher
+
 
 class TestGetUsers:
     def test_returns_all_users(self, client, mock_cursor):
@@ -129,6 +134,105 @@ class TestLogin:
         response = client.post('/users/login', json={'email': 'test@example.com'})
         assert response.status_code == 400
 
+    def test_issues_session_token(self, client, mock_cursor):
+        hashed = generate_password_hash('password123')
+        mock_cursor.description = [('user_id',), ('email',), ('first_name',), ('password',)]
+        mock_cursor.fetchone.return_value = (1, 'test@example.com', 'John', hashed)
+
+        response = client.post('/users/login', json={
+            'email': 'test@example.com',
+            'password': 'password123'
+        })
+        token = json.loads(response.data)['token']
+
+        mock_cursor.reset_mock()
+        response = client.get('/users/me', headers={'Authorization': f'Bearer {token}'})
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert data['user_id'] == 1
+        assert data['email'] == 'test@example.com'
+        # the token is checked by signature alone
+        mock_cursor.execute.assert_not_called()
+
+    def test_busy_hasher_returns_503(self, app, client, mock_cursor):
+        app.config['PASSWORD_HASH_MAX_PENDING'] = 1
+        with app.app_context():
+            # another request holds the only slot
+            password_hasher()._slots.acquire()
+        mock_cursor.description = [('user_id',), ('email',), ('password',)]
+        mock_cursor.fetchone.return_value = (1, 'test@example.com', 'hash')
+
+        response = client.post('/users/login', json={
+            'email': 'test@example.com',
+            'password': 'password123'
+        })
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+
+class TestSessions:
+    def test_missing_token(self, client):
+        response = client.get('/users/me')
+        assert response.status_code == 401
+
+    def test_tampered_token(self, app, client):
+        with app.test_request_context():
+            from src.users.sessions import issue_token
+            token = issue_token({'user_id': 1, 'email': 'test@example.com'})
+        forged = token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB')
+
+        response = client.get('/users/me', headers={'Authorization': f'Bearer {forged}'})
+        assert response.status_code == 401
+
+    def test_expired_token(self, app, client):
+        with app.test_request_context():
+            from src.users.sessions import issue_token
+            token = issue_token({'user_id': 1, 'email': 'test@example.com'})
+        app.config['SESSION_TOKEN_TTL'] = -1
+
+        response = client.get('/users/me', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 401
+
+
+class TestPasswordHasher:
+    def test_hashes_in_worker_process(self):
+        hasher = PasswordHasher(workers=1, max_pending=4, timeout=30)
+        pwhash = hasher.hash('password123')
+
+        assert hasher.verify(pwhash, 'password123')
+        assert not hasher.verify(pwhash, 'wrong')
+        assert hasher.stats()['completed'] == 3
+
+    def test_rejects_past_max_pending(self):
+        hasher = PasswordHasher(workers=0, max_pending=1, timeout=30)
+        hasher._slots.acquire()
+        with pytest.raises(HashingBusy):
+            hasher.hash('password123')
+        assert hasher.stats()['rejected'] == 1
+
+        hasher._slots.release()
+        assert hasher.verify(hasher.hash('password123'), 'password123')
+
+    def test_zero_max_pending_is_unbounded(self):
+        hasher = PasswordHasher(workers=0, max_pending=0, timeout=30)
+        assert hasher.verify(hasher.hash('password123'), 'password123')
+        assert hasher.stats()['rejected'] == 0
+
+    def test_timed_out_job_keeps_its_slot_until_it_finishes(self):
+        hasher = PasswordHasher(workers=1, max_pending=1, timeout=0)
+        with pytest.raises(HashingBusy):
+            hasher.hash('password123')
+        # the abandoned hash is still running in the pool and still counts
+        with pytest.raises(HashingBusy):
+            hasher.hash('password123')
+        assert hasher.stats()['rejected'] == 1
+
+        deadline = time.monotonic() + 30
+        while not hasher._slots.acquire(timeout=0.05):
+            assert time.monotonic() < deadline
+        hasher._slots.release()
+
 
 class TestGroups:
     def test_create_group(self, client, mock_cursor):
@@ -148,3 +252,88 @@ class TestGroups:
 
         response = client.get('/users/group-members/1')
         assert response.status_code == 200
+
+
+class TestGroupSpending:
+    MEMBERS = [(1, 'Ana', 'Lee'), (2, 'Ben', 'Ortiz')]
+
+    def test_summary_splits_members(self, client, mock_cursor):
+        mock_cursor.fetchall.side_effect = [
+            self.MEMBERS,
+            [(1, 'Food & Drink', 30.00, 3), (2, 'Food & Drink', 10.00, 1), (2, 'Travel', 60.00, 1)],
+            [(1, 25.00)],
+            [('2024-06-03', 100.00)],
+        ]
+
+        response = client.get('/users/group/4/summary')
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert (data['member_count'], data['total_spent'], data['previous_total']) == (2, 100.0, 25.0)
+        assert data['by_category'] == [
+            {'category_name': 'Travel', 'total': 60.0, 'count': 1},
+            {'category_name': 'Food & Drink', 'total': 40.0, 'count': 4},
+        ]
+        ben, ana = data['by_member']
+        assert (ben['user_id'], ben['total'], ben['share'], ben['previous_total']) == (2, 70.0, 0.7, 0)
+        assert [c['category_name'] for c in ben['by_category']] == ['Travel', 'Food & Drink']
+        assert ana['count'] == 3
+        # members come from one grouped query, not one per member
+        assert mock_cursor.execute.call_count == 4
+
+    def test_top_merchants_rank_across_members(self, client, mock_cursor):
+        mock_cursor.fetchall.side_effect = [
+            self.MEMBERS,
+            [('Cafe', 1, 12.00, 4, 0), ('Cafe', 2, 9.00, 2, 0), ('Airline', 2, 15.00, 1, 0), ('Gym', 1, 5.00, 1, 1)],
+        ]
+
+        response = client.get('/users/group/4/top-merchants?limit=2')
+        data = json.loads(response.data)
+
+        assert [m['store_name'] for m in data] == ['Cafe', 'Airline']
+        assert (data[0]['total_spent'], data[0]['visit_count']) == (21.0, 6)
+        assert [m['user_id'] for m in data[0]['members']] == [1, 2]
+
+    def test_budgets_roll_up_per_category(self, client, mock_cursor):
+        mock_cursor.fetchall.side_effect = [
+            self.MEMBERS,
+            [(7, 1, 3, 'Food & Drink', 200.00, '2024-06-01', '2024-06-30', 150.00),
+             (8, 2, 3, 'Food & Drink', 100.00, '2024-06-01', '2024-06-30', 90.00)],
+        ]
+
+        response = client.get('/users/group/4/budgets?active=true')
+        data = json.loads(response.data)
+
+        assert len(data) == 1
+        assert (data[0]['amount'], data[0]['spent'], data[0]['percent_used']) == (300.0, 240.0, 80.0)
+        assert [b['budget_id'] for b in data[0]['budgets']] == [7, 8]
+
+    def test_unknown_group(self, client, mock_cursor):
+        mock_cursor.fetchall.return_value = []
+        mock_cursor.fetchone.return_value = None
+
+        response = client.get('/users/group/99/summary')
+        assert response.status_code == 404
+
+    def test_requires_member_token(self, app, client, mock_cursor):
+        app.config['REQUIRE_SESSION_TOKEN'] = True
+        with app.test_request_context():
+            from src.users.sessions import issue_token
+            token = issue_token({'user_id': 1, 'group_id': 5})
+
+        response = client.get('/users/group/4/budgets', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 403
+
+
+class TestDashboard:
+    def test_failed_sections_are_reported_not_raised(self, client, mock_cursor):
+        mock_cursor.execute.side_effect = Exception('db down')
+
+        response = client.get('/users/1/dashboard?period=week&offset=-1')
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert data['period'] == 'week'
+        assert data['summary'] is None
+        assert set(data['errors']) == {'summary', 'receipts', 'budgets', 'top_merchants', 'spending_goals'}
+        assert data['errors']['budgets'] == 'db down'
@@ -7,4 +7,14 @@ const client = axios.create({
   }
 })
 
+// send the session token from login with every request
+client.interceptors.request.use((config) => {
+  const saved = localStorage.getItem('user')
+  const token = saved ? JSON.parse(saved).token : null
+  if (token) {
+    config.headers.Authorization = `Bearer ${token}`
+  }
+  return config
+})
+
 export default client
@@ -4,7 +4,7 @@ import { getCategoryColor } from '../utils/categoryColors'
 import AnimatedNumber from './AnimatedNumber'
 import client from '../api/client'
 
-function BudgetCard({ budget, onDelete, onUpdate }) {
+function BudgetCard({ budget, projection, onDelete, onUpdate }) {
   const [mounted, setMounted] = useState(false)
   const [editing, setEditing] = useState(false)
   const [editForm, setEditForm] = useState({
@@ -26,7 +26,8 @@ function BudgetCard({ budget, onDelete, onUpdate }) {
   const percentage = Math.min(Math.round((spent / limit) * 100), 100)
   const remaining = Math.max(limit - spent, 0)
 
-  // projection math: extrapolate current daily spending rate to the full
+  // projection: the server's forecast from the user's spending history when
+  // there is one, otherwise extrapolate the current daily rate to the full
   // budget window so we can warn the user if they're on pace to exceed it
   const now = new Date()
   const budgetStart = budget.start_date ? new Date(budget.start_date) : null
@@ -39,9 +40,10 @@ function BudgetCard({ budget, onDelete, onUpdate }) {
   const daysElapsed = budgetStart
     ? Math.max(Math.round((refDate - budgetStart) / (1000 * 60 * 60 * 24)), 1)
     : 1
-  const projectedSpend = spent > 0 ? (spent / daysElapsed) * totalDays : 0
+  const forecast = projection != null ? Number(projection) : null
+  const projectedSpend = forecast != null ? forecast : spent > 0 ? (spent / daysElapsed) * totalDays : 0
   const overProjected = projectedSpend > limit
-  const showProjection = spent > 0 && budgetStart && budgetEnd && !budgetEnded
+  const showProjection = (spent > 0 || forecast > 0) && budgetStart && budgetEnd && !budgetEnded
 
   // color-code the progress bar: green -> amber -> red
   let barColor = 'bg-emerald-500'
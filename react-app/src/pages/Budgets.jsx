@@ -13,6 +13,7 @@ function Budgets() {
   const { user } = useAuth()
   const [budgets, setBudgets] = useState([])
   const [goals, setGoals] = useState([])
+  const [projections, setProjections] = useState({})
   const [loading, setLoading] = useState(true)
   const [showForm, setShowForm] = useState(false)
   const [showHistorical, setShowHistorical] = useState(false)
@@ -21,17 +22,23 @@ function Budgets() {
   const [categoryFilter, setCategoryFilter] = useState('')
   const [error, setError] = useState('')
 
-  // fetch budgets and goals in parallel, using allSettled so one
-  // failure doesn't block the other from rendering
+  // fetch budgets, goals and forecasts in parallel, using allSettled so one
+  // failure doesn't block the others from rendering
   function fetchData() {
     setLoading(true)
     const activeParam = showHistorical ? '' : '?active=true'
     Promise.allSettled([
       client.get(`/management/budgets/user/${user.user_id}${activeParam}`),
-      client.get(`/management/spending-goals/${user.user_id}`)
-    ]).then(([rBudgets, rGoals]) => {
+      client.get(`/management/spending-goals/${user.user_id}`),
+      client.get(`/management/forecast/${user.user_id}`)
+    ]).then(([rBudgets, rGoals, rForecast]) => {
       if (rBudgets.status === 'fulfilled') setBudgets(rBudgets.value.data)
       if (rGoals.status === 'fulfilled') setGoals(rGoals.value.data)
+      if (rForecast.status === 'fulfilled') {
+        const byBudget = {}
+        rForecast.value.data.budgets.forEach(b => { byBudget[b.budget_id] = b.projected })
+        setProjections(byBudget)
+      }
     }).finally(() => setLoading(false))
   }
 
@@ -198,7 +205,7 @@ function Budgets() {
               </h2>
               <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
                 {needsAttention.map(b => (
-                  <BudgetCard key={b.budget_id} budget={b} onDelete={handleDeleteBudget} onUpdate={fetchData} />
+                  <BudgetCard key={b.budget_id} budget={b} projection={projections[b.budget_id]} onDelete={handleDeleteBudget} onUpdate={fetchData} />
                 ))}
               </div>
             </div>
@@ -211,7 +218,7 @@ function Budgets() {
               </h2>
               <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
                 {onTrack.map(b => (
-                  <BudgetCard key={b.budget_id} budget={b} onDelete={handleDeleteBudget} onUpdate={fetchData} />
+                  <BudgetCard key={b.budget_id} budget={b} projection={projections[b.budget_id]} onDelete={handleDeleteBudget} onUpdate={fetchData} />
                 ))}
               </div>
             </div>
@@ -121,37 +121,25 @@ function Dashboard() {
       })
   }, [user])
 
-  // pulls summary + recent receipts + budgets + top merchants in parallel
-  // once the summary endpoint returns the date range for this period
+  // one round trip: the API runs summary, recent receipts, budgets and top
+  // merchants concurrently and returns whichever sections made it in time
   const fetchPeriodData = useCallback(() => {
     if (!user || initialOffset === null) return
 
     setLoading(true)
 
-    client.get(`/purchases/receipts/${user.user_id}/summary?period=${period}&offset=${offset}`)
+    client.get(`/users/${user.user_id}/dashboard?period=${period}&offset=${offset}`)
       .then(res => {
-        setSummary(res.data)
-        const { period_start, period_end } = res.data
-
-        return Promise.allSettled([
-          client.get(`/purchases/receipts/${user.user_id}?start_date=${period_start}&end_date=${period_end}&per_page=5&page=1`),
-          client.get(`/management/budgets/user/${user.user_id}?start_date=${period_start}&end_date=${period_end}`),
-          client.get(`/purchases/receipts/${user.user_id}/top-merchants?period=${period}&offset=${offset}&limit=5`)
-        ])
-      })
-      .then(results => {
-        if (!results) return
-        const [rReceipts, rBudgets, rMerchants] = results
-
-        if (rReceipts.status === 'fulfilled') {
-          const data = rReceipts.value.data
-          setReceipts(data.receipts || data)
+        const data = res.data
+        setSummary(data.summary)
+        if (data.receipts) {
+          setReceipts(data.receipts.receipts || data.receipts)
         }
-        if (rBudgets.status === 'fulfilled') {
-          setBudgets(rBudgets.value.data || [])
+        if (data.budgets) {
+          setBudgets(data.budgets)
         }
-        if (rMerchants.status === 'fulfilled') {
-          setTopMerchants(rMerchants.value.data || [])
+        if (data.top_merchants) {
+          setTopMerchants(data.top_merchants)
         }
       })
       .catch(() => setSummary(null))